@@ -0,0 +1,75 @@
+"""Shared helpers for the benchmark scripts in this package.
+
+Each benchmark is a module run with `python -m mini_c_compiler.benchmarks.<name>`.
+"""
+import contextlib
+import io
+import os
+import time
+
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.semantic import SemanticAnalyzer
+from mini_c_compiler.ir import IRGenerator
+from mini_c_compiler.optimizer import Optimizer
+from mini_c_compiler.main import compile_source
+from mini_c_compiler.vm import VirtualMachine
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), 'programs')
+
+def load_program(name):
+    with open(os.path.join(PROGRAMS, name), 'r') as f:
+        return f.read()
+
+def program_names():
+    return sorted(name for name in os.listdir(PROGRAMS) if name.endswith('.c'))
+
+def build_ir(source, opt_level=2, profile=None):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    SemanticAnalyzer().analyze(ast)
+    ir = IRGenerator().generate(ast)
+    return Optimizer(ir, profile=profile).optimize(level=opt_level)
+
+def compile_asm(source, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        code = compile_source(source, verbose=False, target='asm', **kwargs)
+    if code is None:
+        raise RuntimeError("Compilation failed")
+    return code
+
+def run_vm(code, vm_class=VirtualMachine, **kwargs):
+    """Run assembly on a fresh VM: returns (vm, printed output, seconds)."""
+    vm = vm_class(**kwargs)
+    vm.load_program(code)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        vm.run()
+    return vm, output.getvalue(), time.perf_counter() - start
+
+class CountingVM(VirtualMachine):
+    """VM that tallies executed opcodes and reads/writes of named variables."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.op_counts = {}
+        self.variable_traffic = 0
+
+    def execute(self, instr):
+        op = instr[0].name
+        self.op_counts[op] = self.op_counts.get(op, 0) + 1
+        if op in ('PUSH', 'LOAD', 'STORE', 'PARAM', 'LOAD_LOCAL', 'STORE_LOCAL', 'LOAD_GLOBAL', 'STORE_GLOBAL'):
+            self.variable_traffic += 1
+        super().execute(instr)
+
+def count_run(code):
+    """Run assembly on a CountingVM: returns (vm, printed output)."""
+    vm = CountingVM()
+    vm.load_program(code)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        vm.run()
+    return vm, output.getvalue()
+
+def best_time(run, repeat=5):
+    return min(run() for _ in range(repeat))
@@ -0,0 +1,49 @@
+"""Function call benchmark.
+
+Runs the benchmark programs with CALL filling in the callee's frame itself
+and with every call going through the callee's ENTER/STORE_LOCAL prologue,
+on both engines, and compares executed instructions and time:
+
+    python -m mini_c_compiler.benchmarks.calls [-O<n>]
+"""
+import sys
+
+from mini_c_compiler.benchmarks import run_vm, best_time, compile_asm, load_program, program_names
+from mini_c_compiler.threaded import ThreadedVM
+from mini_c_compiler.vm import VirtualMachine
+
+class PrologueVM(VirtualMachine):
+    direct_calls = False
+
+class PrologueThreadedVM(ThreadedVM):
+    direct_calls = False
+
+ENGINES = {
+    'table': (PrologueVM, VirtualMachine),
+    'threaded': (PrologueThreadedVM, ThreadedVM),
+}
+
+def main():
+    opt_level = 2
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+    print(f"{'program':<14} {'engine':<9} {'executed':>17} {'prologue (ms)':>14} {'direct (ms)':>12} {'speedup':>8}")
+    programs = [(name, compile_asm(load_program(name), opt_level=opt_level)) for name in program_names()]
+    for _, code in programs:
+        for vm_classes in ENGINES.values():
+            for vm_class in vm_classes:
+                run_vm(code, vm_class) # Warm up, so the first program isn't penalized
+    for name, code in programs:
+        for engine, (before, after) in ENGINES.items():
+            old_vm, expected, _ = run_vm(code, before)
+            new_vm, output, _ = run_vm(code, after)
+            if output != expected:
+                raise RuntimeError(f"Direct calls changed the output of {name}")
+            old = best_time(lambda: run_vm(code, before)[2])
+            new = best_time(lambda: run_vm(code, after)[2])
+            executed = f"{old_vm.executed} -> {new_vm.executed}"
+            print(f"{name:<14} {engine:<9} {executed:>17} {old * 1000:>14.2f} {new * 1000:>12.2f} {old / new:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Shared-library backend benchmark.
+
+Calls mini-C functions from Python two ways and checks they agree: with
+IRInterpreter.call (the VM's semantics, straight from the IR) and through
+the C backend's library (NativeModule). Also times loading the library cold
+(built by the C compiler) and from a LibraryCache:
+
+    python -m mini_c_compiler.benchmarks.cbackend
+"""
+import tempfile
+import time
+
+from mini_c_compiler.benchmarks import build_ir, best_time
+from mini_c_compiler.ir_interpreter import IRInterpreter
+from mini_c_compiler.cbackend import NativeModule, LibraryCache
+
+SOURCE = """
+int fib(int n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+int collatz(int n) {
+    int steps = 0;
+    while (n != 1) {
+        if (n - n / 2 * 2 == 0) { n = n / 2; } else { n = 3 * n + 1; }
+        steps = steps + 1;
+    }
+    return steps;
+}
+float score(int age, float income) {
+    float s = income * 0.02;
+    if (age < 25) { s = s - 10; }
+    return s;
+}
+"""
+
+# (function, argument tuples): a few heavy calls, then many cheap ones
+WORKLOADS = [
+    ('fib', [(22,)] * 3),
+    ('collatz', [(n,) for n in range(1, 3001)]),
+    ('score', [(age, age * 1000.0) for age in range(18, 90)] * 200),
+]
+
+def run_calls(function, calls):
+    start = time.perf_counter()
+    results = [function(*args) for args in calls]
+    return results, time.perf_counter() - start
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = LibraryCache(directory)
+        start = time.perf_counter()
+        module = NativeModule.from_source(SOURCE, cache=cache)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        NativeModule.from_source(SOURCE, cache=cache)
+        cached = time.perf_counter() - start
+        print(f"load: {cold * 1000:.1f} ms built, {cached * 1000:.1f} ms cached")
+
+        interpreter = IRInterpreter(build_ir(SOURCE, opt_level=0), max_steps=10 ** 9) # -O0 keeps every function
+        print(f"{'function':<10} {'calls':>7} {'interp (ms)':>12} {'native (ms)':>12} {'speedup':>8}")
+        for name, calls in WORKLOADS:
+            interpreted = lambda *args: interpreter.call(name, list(args))
+            expected, slow = run_calls(interpreted, calls) # Slow enough to time once
+            results, _ = run_calls(module.functions[name], calls)
+            if results != expected:
+                raise RuntimeError(f"{name}: the library computed different results")
+            fast = best_time(lambda: run_calls(module.functions[name], calls)[1], repeat=3)
+            print(f"{name:<10} {len(calls):>7} {slow * 1000:>12.2f} {fast * 1000:>12.2f} {slow / fast:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
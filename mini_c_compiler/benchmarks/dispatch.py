@@ -0,0 +1,95 @@
+"""VM dispatch micro-benchmarks.
+
+Small assembly loops that each stress one kind of instruction, reported
+as instructions executed per second:
+
+    python -m mini_c_compiler.benchmarks.dispatch [name ...]
+"""
+import sys
+
+from mini_c_compiler.benchmarks import run_vm, best_time
+
+ITERATIONS = 20000
+
+def counted_loop(body, iterations=ITERATIONS):
+    # Runs `body` `iterations` times with the counter in local slot 0
+    return f"""
+JMP start
+bench:
+ENTER 3
+PUSH 0
+STORE_LOCAL 0
+PUSH 0
+STORE_LOCAL 1
+PUSH 1
+STORE_LOCAL 2
+loop:
+LOAD_LOCAL 0
+PUSH {iterations}
+LT
+JZ done
+{body}
+LOAD_LOCAL 0
+PUSH 1
+ADD
+STORE_LOCAL 0
+JMP loop
+done:
+LOAD_LOCAL 1
+RET
+identity:
+ENTER 1
+STORE_LOCAL 0
+LOAD_LOCAL 0
+RET
+start:
+PUSH 0
+STORE_GLOBAL 0
+PUSH 0
+STORE_GLOBAL 1
+CALL bench
+POP
+HALT
+"""
+
+BODIES = {
+    # Integer arithmetic on locals
+    'arith': "LOAD_LOCAL 1\nLOAD_LOCAL 0\nADD\nLOAD_LOCAL 2\nMUL\nPUSH 3\nSUB\nSTORE_LOCAL 1",
+    # Compares and conditional jumps
+    'branch': "LOAD_LOCAL 0\nPUSH 2\nGT\nJZ skip\nLOAD_LOCAL 0\nPUSH 5\nEQ\nJNZ skip\nskip:",
+    # Global variable traffic
+    'globals': "LOAD_GLOBAL 0\nPUSH 1\nADD\nSTORE_GLOBAL 0\nLOAD_GLOBAL 0\nSTORE_GLOBAL 1",
+    # Calls and returns
+    'calls': "LOAD_LOCAL 0\nCALL identity\nSTORE_LOCAL 1",
+    # Pure stack shuffling
+    'stack': "PUSH 1\nDUP\nADD\nDUP\nNEG\nADD\nPOP",
+    # Name-addressed variables, as in hand-written assembly (quickened)
+    'names': "LOAD_LOCAL 0\nSTORE x\nPUSH x\nPUSH x\nADD\nSTORE y\nLOAD y\nSTORE_LOCAL 1",
+    # Superinstructions
+    'fused': "LOAD_LOCAL 1\nADD_LOCAL 0\nADD_CONST 3\nSTORE_LOCAL 1\nINC_LOCAL 2",
+}
+
+MICRO = {name: counted_loop(body) for name, body in BODIES.items()}
+
+def benchmark(name, **kwargs):
+    code = MICRO[name]
+    vm = run_vm(code, **kwargs)[0]
+    seconds = best_time(lambda: run_vm(code, **kwargs)[2])
+    return vm.executed, seconds
+
+def main():
+    names = sys.argv[1:] or list(MICRO)
+    for name in names:
+        run_vm(MICRO[name]) # Warm up, so the first benchmark isn't penalized
+    print(f"{'benchmark':<10} {'executed':>10} {'time (ms)':>10} {'Minstr/s':>9}")
+    total_executed = total_seconds = 0
+    for name in names:
+        executed, seconds = benchmark(name)
+        total_executed += executed
+        total_seconds += seconds
+        print(f"{name:<10} {executed:>10} {seconds * 1000:>10.2f} {executed / seconds / 1e6:>9.2f}")
+    print(f"{'total':<10} {total_executed:>10} {total_seconds * 1000:>10.2f} "
+          f"{total_executed / total_seconds / 1e6:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Compare the VM's execution engines.
+
+Runs the dispatch micro-benchmarks and the benchmark programs on each
+engine, checks that they print the same output, and reports the time:
+
+    python -m mini_c_compiler.benchmarks.engines
+"""
+from mini_c_compiler.benchmarks import run_vm, best_time, compile_asm, load_program, program_names
+from mini_c_compiler.benchmarks.dispatch import MICRO
+from mini_c_compiler.threaded import ThreadedVM
+from mini_c_compiler.vm import VirtualMachine
+
+ENGINES = {'table': VirtualMachine, 'threaded': ThreadedVM}
+
+def workloads():
+    for name, code in MICRO.items():
+        yield name, code
+    for name in program_names():
+        yield name, compile_asm(load_program(name), opt_level=2)
+
+def main():
+    print(f"{'workload':<14} {'executed':>10}" + ''.join(f" {name + ' (ms)':>15}" for name in ENGINES)
+          + f" {'speedup':>8}")
+    totals = dict.fromkeys(ENGINES, 0.0)
+    workload_list = list(workloads())
+    for _, code in workload_list:
+        for vm_class in ENGINES.values():
+            run_vm(code, vm_class) # Warm up, so the first workload isn't penalized
+    for name, code in workload_list:
+        outputs = set()
+        times = {}
+        for engine, vm_class in ENGINES.items():
+            vm, output, _ = run_vm(code, vm_class)
+            outputs.add(output)
+            times[engine] = best_time(lambda: run_vm(code, vm_class)[2])
+            totals[engine] += times[engine]
+        if len(outputs) != 1:
+            raise RuntimeError(f"Engines disagree on {name}")
+        print(f"{name:<14} {vm.executed:>10}" + ''.join(f" {t * 1000:>15.2f}" for t in times.values())
+              + f" {times['table'] / times['threaded']:>7.2f}x")
+    print(f"{'total':<14} {'':>10}" + ''.join(f" {t * 1000:>15.2f}" for t in totals.values())
+          + f" {totals['table'] / totals['threaded']:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
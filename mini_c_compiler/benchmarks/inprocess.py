@@ -0,0 +1,84 @@
+"""In-process execution benchmark.
+
+Runs the benchmark programs three ways, checks they print the same output,
+and times each:
+
+- script: the generated Python written to a file and run with a new
+  interpreter, the way `main.py`'s default output is used;
+- cold: compiled in-process to a code object and run (CompiledProgram);
+- cached: the code object loaded from a CodeCache and run.
+
+    python -m mini_c_compiler.benchmarks.inprocess [-O<n>] [file.c ...]
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mini_c_compiler.benchmarks import build_ir, load_program, program_names, best_time
+from mini_c_compiler.codegen import PythonCodeGenerator
+from mini_c_compiler.inprocess import CompiledProgram, CodeCache
+
+def run_script(source, opt_level, directory):
+    """Compile to a .py file and run it in a new interpreter: returns (output, seconds)."""
+    start = time.perf_counter()
+    path = os.path.join(directory, 'program.py')
+    with open(path, 'w') as f:
+        f.write(PythonCodeGenerator(build_ir(source, opt_level=opt_level)).generate())
+    result = subprocess.run([sys.executable, path], capture_output=True, text=True, check=True)
+    return result.stdout, time.perf_counter() - start
+
+def run_inprocess(source, opt_level, cache=None):
+    """Compile (or load from `cache`) and run in this process: returns (program, output, seconds)."""
+    output = io.StringIO()
+    start = time.perf_counter()
+    program = CompiledProgram.from_source(source, opt_level=opt_level, cache=cache)
+    with contextlib.redirect_stdout(output):
+        program.run()
+    return program, output.getvalue(), time.perf_counter() - start
+
+def benchmark(source, opt_level):
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CodeCache(directory)
+        expected, _ = run_script(source, opt_level, directory)
+        _, cold, _ = run_inprocess(source, opt_level)
+        program, cached, _ = run_inprocess(source, opt_level, cache=cache)
+        program, cached, _ = run_inprocess(source, opt_level, cache=cache)
+        if cold != expected or cached != expected or not program.cached:
+            raise RuntimeError("In-process runs printed different output")
+        return {
+            'script': best_time(lambda: run_script(source, opt_level, directory)[1]),
+            'cold': best_time(lambda: run_inprocess(source, opt_level)[2]),
+            'cached': best_time(lambda: run_inprocess(source, opt_level, cache=cache)[2]),
+        }
+
+def main():
+    opt_level = 2
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            paths.append(arg)
+    workloads = [(name, load_program(name)) for name in program_names()]
+    if paths:
+        workloads = []
+        for path in paths:
+            with open(path, 'r') as f:
+                workloads.append((os.path.basename(path), f.read()))
+
+    print(f"{'program':<16} {'run':<7} {'time (ms)':>10} {'speedup':>8}")
+    totals = {'script': 0.0, 'cold': 0.0, 'cached': 0.0}
+    for name, source in workloads:
+        results = benchmark(source, opt_level)
+        for run, seconds in results.items():
+            totals[run] += seconds
+            print(f"{name:<16} {run:<7} {seconds * 1000:>10.3f} {results['script'] / seconds:>7.2f}x")
+    for run in ('cold', 'cached'):
+        print(f"{'total':<16} {run:<7} {totals[run] * 1000:>10.3f} {totals['script'] / totals[run]:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""JIT benchmark.
+
+Runs each program on the interpreter and on the JIT (a fresh VM per run,
+so translation time is included) and checks they print the same output:
+
+    python -m mini_c_compiler.benchmarks.jit [-O2|-O3] [program.c ...]
+"""
+import sys
+
+from mini_c_compiler.benchmarks import load_program, program_names, compile_asm, run_vm, best_time
+from mini_c_compiler.jit import JitVM
+
+def benchmark(name, opt_level):
+    code = compile_asm(load_program(name), opt_level=opt_level)
+    results = {}
+    outputs = set()
+    for engine, kwargs in (('interp', {'jit': False}), ('jit', {})):
+        vm, output, _ = run_vm(code, JitVM, **kwargs)
+        outputs.add(output)
+        seconds = best_time(lambda: run_vm(code, JitVM, **kwargs)[2])
+        results[engine] = (vm.executed, sorted(vm.sources), seconds)
+    if len(outputs) != 1:
+        raise RuntimeError(f"{name}: the JIT printed different output")
+    return results
+
+def main():
+    opt_level = 2
+    names = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            names.append(arg)
+    names = names or program_names()
+
+    print(f"{'program':<16} {'engine':<7} {'executed':>10} {'time (ms)':>10} {'speedup':>8}  compiled")
+    for name in names:
+        results = benchmark(name, opt_level)
+        base = results['interp'][2]
+        for engine, (executed, compiled, seconds) in results.items():
+            print(f"{name:<16} {engine:<7} {executed:>10} {seconds * 1000:>10.2f} "
+                  f"{base / seconds:>7.1f}x  {', '.join(compiled)}")
+
+if __name__ == '__main__':
+    main()
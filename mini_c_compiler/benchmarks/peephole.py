@@ -0,0 +1,52 @@
+"""Peephole optimizer benchmark.
+
+Compares assembly without and with the peephole cleanup rules, and lists
+how often each rule fired:
+
+    python -m mini_c_compiler.benchmarks.peephole [-O<n>] [program.c ...]
+"""
+import sys
+
+from mini_c_compiler.benchmarks import load_program, program_names, build_ir, count_run, run_vm, best_time
+from mini_c_compiler.codegen import AssemblyCodeGenerator
+
+def benchmark(name, opt_level):
+    ir = build_ir(load_program(name), opt_level=opt_level)
+    results = {}
+    expected = None
+    counts = {}
+    for build, peephole in (('plain', False), ('peep', True)):
+        codegen = AssemblyCodeGenerator(ir, peephole=peephole, superinstructions=False)
+        code = codegen.generate()
+        vm, output = count_run(code)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError(f"{name}: the {build} build printed different output")
+        seconds = best_time(lambda: run_vm(code)[2])
+        size = sum(1 for line in code.split('\n') if line and not line.startswith(';') and not line.endswith(':'))
+        results[build] = (size, vm.executed, seconds)
+        counts = codegen.peephole_counts
+    return results, counts
+
+def main():
+    opt_level = 2
+    names = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            names.append(arg)
+
+    print(f"{'program':<20} {'build':<6} {'size':>6} {'executed':>10} {'time (ms)':>10}")
+    for name in names or program_names():
+        results, counts = benchmark(name, opt_level)
+        for build, (size, executed, seconds) in results.items():
+            print(f"{name:<20} {build:<6} {size:>6} {executed:>10} {seconds * 1000:>10.2f}")
+        before, after = results['plain'], results['peep']
+        print(f"{name:<20} {'gain':<6} {before[0] / after[0]:>5.2f}x {before[1] / after[1]:>9.2f}x "
+              f"{before[2] / after[2]:>9.2f}x")
+        print(f"{'':<20} rules: " + ", ".join(f"{rule} {count}" for rule, count in sorted(counts.items())))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Profile-guided optimization benchmark.
+
+Builds each program without a profile, runs it on a profiling VM, rebuilds
+it with that profile and compares the two builds:
+
+    python -m mini_c_compiler.benchmarks.pgo [-O2|-O3] [program.c ...]
+"""
+import sys
+
+from mini_c_compiler.benchmarks import load_program, program_names, compile_asm, run_vm, best_time
+
+def benchmark(name, opt_level):
+    source = load_program(name)
+    plain = compile_asm(source, opt_level=opt_level)
+    vm, expected, _ = run_vm(plain, profile=True)
+    guided = compile_asm(source, opt_level=opt_level, profile=vm.profile)
+
+    results = {}
+    for build, code in (('plain', plain), ('pgo', guided)):
+        vm, output, _ = run_vm(code)
+        if output != expected:
+            raise RuntimeError(f"{name}: the {build} build printed different output")
+        seconds = best_time(lambda: run_vm(code)[2])
+        results[build] = (vm.executed, seconds)
+    return results
+
+def main():
+    opt_level = 2
+    names = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            names.append(arg)
+    names = names or program_names()
+
+    print(f"{'program':<20} {'build':<6} {'executed':>10} {'time (ms)':>10}")
+    for name in names:
+        results = benchmark(name, opt_level)
+        for build, (executed, seconds) in results.items():
+            print(f"{name:<20} {build:<6} {executed:>10} {seconds * 1000:>10.2f}")
+        plain, guided = results['plain'], results['pgo']
+        print(f"{name:<20} {'gain':<6} {plain[0] / guided[0]:>9.2f}x {plain[1] / guided[1]:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+int factorial(int n) {
+    int result = 1;
+    while (n > 1) {
+        result = result * n;
+        n = n - 1;
+    }
+    return result;
+}
+
+int main() {
+    int round = 0;
+    int total = 0;
+    while (round < 300) {
+        total = total + factorial(round / 20 + 6) / 1000;
+        round = round + 1;
+    }
+    print(total);
+}
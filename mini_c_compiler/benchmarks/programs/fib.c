@@ -0,0 +1,16 @@
+int fib(int n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    int n = 10;
+    int total = 0;
+    while (n <= 16) {
+        total = total + fib(n);
+        n = n + 1;
+    }
+    print(total);
+}
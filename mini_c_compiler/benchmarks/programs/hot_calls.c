@@ -0,0 +1,33 @@
+int square(int x) {
+    return x * x;
+}
+
+int clamp(int v, int limit) {
+    if (v > limit) {
+        return limit;
+    }
+    return v;
+}
+
+int checksum(int n) {
+    int total = 0;
+    int i = 0;
+    while (i < n) {
+        total = total + clamp(square(i), 5000);
+        if (total < 0) {
+            print(0 - 1);
+        }
+        i = i + 1;
+    }
+    return total;
+}
+
+int main() {
+    int round = 0;
+    int result = 0;
+    while (round < 20) {
+        result = result + checksum(100);
+        round = round + 1;
+    }
+    print(result);
+}
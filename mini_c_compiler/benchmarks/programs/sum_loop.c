@@ -0,0 +1,19 @@
+int weighted_sum(int n) {
+    int total = 0;
+    int k = 0;
+    while (k < n) {
+        total = total + k * 3 - 1;
+        k = k + 1;
+    }
+    return total;
+}
+
+int main() {
+    int round = 0;
+    int result = 0;
+    while (round < 10) {
+        result = result + weighted_sum(500 + round);
+        round = round + 1;
+    }
+    print(result);
+}
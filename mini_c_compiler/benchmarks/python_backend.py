@@ -0,0 +1,45 @@
+"""Python backend benchmark.
+
+Generates Python for the benchmark programs twice: with structured
+while/if statements and with the label state machine (`structured=False`).
+Checks that both print the same output and compares their run time:
+
+    python -m mini_c_compiler.benchmarks.python_backend [-O<n>]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from mini_c_compiler.benchmarks import build_ir, load_program, program_names, best_time
+from mini_c_compiler.codegen import PythonCodeGenerator
+
+def run_python(code):
+    """Run generated Python as a script: returns (printed output, seconds)."""
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        exec(code, {'__name__': '__main__'})
+    return output.getvalue(), time.perf_counter() - start
+
+def main():
+    opt_level = 2
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+    print(f"{'program':<14} {'state machine (ms)':>19} {'structured (ms)':>16} {'speedup':>8}")
+    totals = [0.0, 0.0]
+    for name in program_names():
+        ir = build_ir(load_program(name), opt_level=opt_level)
+        codes = [compile(PythonCodeGenerator(ir, structured=structured).generate(), name, 'exec')
+                 for structured in (False, True)]
+        outputs = [run_python(code)[0] for code in codes]
+        if outputs[0] != outputs[1]:
+            raise RuntimeError(f"Structured code printed different output for {name}")
+        times = [best_time(lambda: run_python(code)[1]) for code in codes]
+        totals = [total + t for total, t in zip(totals, times)]
+        print(f"{name:<14} {times[0] * 1000:>19.2f} {times[1] * 1000:>16.2f} {times[0] / times[1]:>7.2f}x")
+    print(f"{'total':<14} {totals[0] * 1000:>19.2f} {totals[1] * 1000:>16.2f} {totals[0] / totals[1]:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Register VM benchmark.
+
+Runs the example programs and the benchmark programs on the stack VM (table
+dispatch) and on the register VM, checks they print the same output, and
+compares executed instructions and run time:
+
+    python -m mini_c_compiler.benchmarks.regvm [-O<n>] [file.c ...]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+from mini_c_compiler.benchmarks import build_ir, compile_asm, load_program, program_names, run_vm, best_time
+from mini_c_compiler.codegen import RegisterCodeGenerator
+from mini_c_compiler.regvm import RegisterVM
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'examples')
+
+def corpus():
+    # Example programs that compile and run (some exist to show errors), then the benchmark programs
+    for name in ('test1.c', 'test2.c', 'test_opt.c'):
+        with open(os.path.join(EXAMPLES, name), 'r') as f:
+            yield name, f.read()
+    for name in program_names():
+        yield name, load_program(name)
+
+def run_regvm(code):
+    """Run register code on a fresh RegisterVM: returns (vm, printed output, seconds)."""
+    vm = RegisterVM()
+    vm.load_program(code)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        vm.run()
+    return vm, output.getvalue(), time.perf_counter() - start
+
+def benchmark(source, opt_level):
+    asm = compile_asm(source, opt_level=opt_level)
+    reg = RegisterCodeGenerator(build_ir(source, opt_level=opt_level)).generate()
+    stack_vm, expected, _ = run_vm(asm)
+    reg_vm, output, _ = run_regvm(reg)
+    if output != expected:
+        raise RuntimeError("The register VM printed different output")
+    return {
+        'stack': (stack_vm.executed, best_time(lambda: run_vm(asm)[2])),
+        'register': (reg_vm.executed, best_time(lambda: run_regvm(reg)[2])),
+    }
+
+def main():
+    opt_level = 2
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            paths.append(arg)
+    workloads = list(corpus())
+    if paths:
+        workloads = []
+        for path in paths:
+            with open(path, 'r') as f:
+                workloads.append((os.path.basename(path), f.read()))
+
+    print(f"{'program':<16} {'vm':<9} {'executed':>10} {'time (ms)':>10} {'speedup':>8}")
+    totals = {'stack': 0.0, 'register': 0.0}
+    for name, source in workloads:
+        results = benchmark(source, opt_level)
+        base = results['stack']
+        for vm, (executed, seconds) in results.items():
+            totals[vm] += seconds
+            print(f"{name:<16} {vm:<9} {executed:>10} {seconds * 1000:>10.3f} "
+                  f"{base[1] / seconds:>7.2f}x")
+    print(f"{'total':<16} {'':<9} {'':>10} {totals['register'] * 1000:>10.3f} "
+          f"{totals['stack'] / totals['register']:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Stack code generation benchmark.
+
+Compares assembly that stores every temp in a variable with assembly that
+keeps single-use temps on the operand stack:
+
+    python -m mini_c_compiler.benchmarks.stack_codegen [-O<n>] [program.c ...]
+"""
+import sys
+
+from mini_c_compiler.benchmarks import load_program, program_names, build_ir, count_run, run_vm, best_time
+from mini_c_compiler.codegen import AssemblyCodeGenerator
+
+def benchmark(name, opt_level):
+    ir = build_ir(load_program(name), opt_level=opt_level)
+    results = {}
+    expected = None
+    for build, stack_temps in (('temps', False), ('stack', True)):
+        code = AssemblyCodeGenerator(ir, stack_temps=stack_temps).generate()
+        vm, output = count_run(code)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError(f"{name}: the {build} build printed different output")
+        seconds = best_time(lambda: run_vm(code)[2])
+        results[build] = (vm.executed, vm.variable_traffic, seconds)
+    return results
+
+def main():
+    opt_level = 2
+    names = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            names.append(arg)
+
+    print(f"{'program':<20} {'build':<6} {'executed':>10} {'variables':>10} {'time (ms)':>10}")
+    for name in names or program_names():
+        results = benchmark(name, opt_level)
+        for build, (executed, traffic, seconds) in results.items():
+            print(f"{name:<20} {build:<6} {executed:>10} {traffic:>10} {seconds * 1000:>10.2f}")
+        before, after = results['temps'], results['stack']
+        print(f"{name:<20} {'gain':<6} {before[0] / after[0]:>9.2f}x {before[1] / after[1]:>9.2f}x "
+              f"{before[2] / after[2]:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Program start-up benchmark for static data.
+
+Builds programs with a large table of constant globals and compares
+initializing them with code under `__init_globals` against preloading
+them from the data section:
+
+    python -m mini_c_compiler.benchmarks.startup [size ...]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from mini_c_compiler.benchmarks import build_ir, count_run, best_time
+from mini_c_compiler.bytecode import assemble
+from mini_c_compiler.codegen import AssemblyCodeGenerator
+from mini_c_compiler.ir import parse_instruction
+from mini_c_compiler.vm import VirtualMachine
+
+def table_program(size):
+    lines = [f"int g{i} = {i} * 3 + 1;" for i in range(size)]
+    lines.append(f"int main() {{ print(g0 + g{size - 1}); }}")
+    return "\n".join(lines)
+
+def without_data(ir):
+    # What the IR looked like before static data: each global assigned by code
+    out = []
+    for instr in ir:
+        decoded = parse_instruction(instr)
+        out.append(f"{decoded[1]} = {decoded[2]}" if decoded[0] == 'data' else instr)
+    return out
+
+def start(program):
+    # Load and run already-assembled code: loading is where the data goes
+    start = time.perf_counter()
+    vm = VirtualMachine()
+    vm.load_bytecode(program)
+    with contextlib.redirect_stdout(io.StringIO()):
+        vm.run()
+    return time.perf_counter() - start
+
+def benchmark(size):
+    ir = build_ir(table_program(size))
+    results = {}
+    expected = None
+    for build, build_ir_ in (('code', without_data(ir)), ('data', ir)):
+        code = AssemblyCodeGenerator(build_ir_).generate()
+        vm, output = count_run(code)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError(f"size {size}: the {build} build printed different output")
+        program = assemble(code)
+        seconds = best_time(lambda: start(program))
+        results[build] = (vm.executed, seconds)
+    return results
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 1000, 10000]
+    print(f"{'globals':>8} {'build':<6} {'executed':>10} {'load+run (ms)':>14}")
+    for size in sizes:
+        results = benchmark(size)
+        for build, (executed, seconds) in results.items():
+            print(f"{size:>8} {build:<6} {executed:>10} {seconds * 1000:>14.3f}")
+        before, after = results['code'], results['data']
+        print(f"{size:>8} {'gain':<6} {before[0] / after[0]:>9.2f}x {before[1] / after[1]:>13.2f}x")
+
+if __name__ == '__main__':
+    main()
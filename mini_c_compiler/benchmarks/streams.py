@@ -0,0 +1,90 @@
+"""Streaming I/O benchmark.
+
+Runs a program that read()s its input over many small records two ways:
+one `python -m mini_c_compiler.vm` process per record, and one JitVM that
+takes every record through run_io(). Then times a print-heavy program
+writing to a file under each flush policy:
+
+    python -m mini_c_compiler.benchmarks.streams
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mini_c_compiler.benchmarks import compile_asm, best_time
+from mini_c_compiler.jit import JitVM
+from mini_c_compiler.streams import InputReader, OutputSink, FLUSH_POLICIES
+
+# A record: n, then n numbers; prints their sum and largest
+RECORD_PROGRAM = """
+int main() {
+    int n = read();
+    int total = 0;
+    int largest = read();
+    total = largest;
+    int i = 1;
+    while (i < n) {
+        int x = read();
+        total = total + x;
+        if (x > largest) { largest = x; }
+        i = i + 1;
+    }
+    print(total);
+    print(largest);
+}
+"""
+
+PRINT_PROGRAM = """
+int main() {
+    int i = 0;
+    while (i < 200000) { print(i); i = i + 1; }
+}
+"""
+
+PROCESS_RECORDS = 20  # Records run one process each (slow, so fewer)
+RECORDS = 2000
+
+def make_records(count):
+    return ["50 " + " ".join(str((r * 7 + k * 13) % 101) for k in range(50)) for r in range(count)]
+
+def main():
+    code = compile_asm(RECORD_PROGRAM)
+    records = make_records(RECORDS)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'records.asm')
+        with open(path, 'w') as f:
+            f.write(code)
+        start = time.perf_counter()
+        expected = [subprocess.run([sys.executable, '-m', 'mini_c_compiler.vm', path], input=record.encode(),
+                                   capture_output=True, check=True).stdout.decode()
+                    for record in records[:PROCESS_RECORDS]]
+        per_process = (time.perf_counter() - start) / PROCESS_RECORDS
+
+    vm = JitVM()
+    vm.load_program(code)
+    start = time.perf_counter()
+    outputs = [vm.run_io(record) for record in records]
+    in_process = (time.perf_counter() - start) / RECORDS
+    if outputs[:PROCESS_RECORDS] != expected:
+        raise RuntimeError("run_io printed different output")
+    print(f"{'records':<22} {'ms/record':>10}")
+    print(f"{'process per record':<22} {per_process * 1000:>10.3f}")
+    print(f"{'run_io, one VM':<22} {in_process * 1000:>10.3f}   ({per_process / in_process:.0f}x)")
+
+    print()
+    code = compile_asm(PRINT_PROGRAM)
+    print(f"{'flush policy':<22} {'ms':>10}")
+    with open(os.devnull, 'w') as target:
+        for policy in FLUSH_POLICIES:
+            vm = JitVM()
+            vm.load_program(code)
+            def run():
+                start = time.perf_counter()
+                vm.run_program(InputReader(""), OutputSink(target, policy))
+                return time.perf_counter() - start
+            print(f"{policy:<22} {best_time(run, repeat=3) * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Superinstruction benchmark.
+
+Lists the most frequently executed opcode sequences of the plain assembly
+(the data the rules in peephole.py were chosen from), then compares the
+plain build with the build using superinstructions:
+
+    python -m mini_c_compiler.benchmarks.superinstructions [-O<n>] [-n<length>] [program.c ...]
+"""
+import contextlib
+import io
+import sys
+
+from mini_c_compiler.benchmarks import (
+    load_program, program_names, build_ir, count_run, run_vm, best_time, CountingVM,
+)
+from mini_c_compiler.codegen import AssemblyCodeGenerator
+
+class SequenceVM(CountingVM):
+    """CountingVM that also tallies executed opcode sequences up to `length` long."""
+
+    def __init__(self, length=4, **kwargs):
+        super().__init__(**kwargs)
+        self.length = length
+        self.recent = []
+        self.sequences = {}
+
+    def execute(self, instr):
+        if self.ip - 1 in self.label_at:
+            self.recent = [] # A jump target starts a new sequence
+        self.recent = (self.recent + [instr[0].name])[-self.length:]
+        for start in range(len(self.recent) - 1):
+            sequence = tuple(self.recent[start:])
+            self.sequences[sequence] = self.sequences.get(sequence, 0) + 1
+        super().execute(instr)
+
+def sequence_counts(names, opt_level, length):
+    counts = {}
+    for name in names:
+        ir = build_ir(load_program(name), opt_level=opt_level)
+        vm = SequenceVM(length)
+        vm.load_program(AssemblyCodeGenerator(ir, superinstructions=False).generate())
+        with contextlib.redirect_stdout(io.StringIO()):
+            vm.run()
+        for sequence, count in vm.sequences.items():
+            counts[sequence] = counts.get(sequence, 0) + count
+    return counts
+
+def benchmark(name, opt_level):
+    ir = build_ir(load_program(name), opt_level=opt_level)
+    results = {}
+    expected = None
+    for build, fused in (('plain', False), ('fused', True)):
+        code = AssemblyCodeGenerator(ir, superinstructions=fused).generate()
+        vm, output = count_run(code)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise RuntimeError(f"{name}: the {build} build printed different output")
+        seconds = best_time(lambda: run_vm(code)[2])
+        results[build] = (vm.executed, seconds)
+    return results
+
+def main():
+    opt_level = 2
+    length = 4
+    names = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        elif arg.startswith('-n'):
+            length = int(arg[2:])
+        else:
+            names.append(arg)
+    names = names or program_names()
+
+    counts = sequence_counts(names, opt_level, length)
+    print(f"{'count':>10}  sequence")
+    for sequence, count in sorted(counts.items(), key=lambda item: -item[1])[:15]:
+        print(f"{count:>10}  {' '.join(sequence)}")
+    print()
+
+    print(f"{'program':<20} {'build':<6} {'executed':>10} {'time (ms)':>10}")
+    for name in names:
+        results = benchmark(name, opt_level)
+        for build, (executed, seconds) in results.items():
+            print(f"{name:<20} {build:<6} {executed:>10} {seconds * 1000:>10.2f}")
+        before, after = results['plain'], results['fused']
+        print(f"{name:<20} {'gain':<6} {before[0] / after[0]:>9.2f}x {before[1] / after[1]:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Batch evaluation benchmark.
+
+Evaluates mini-C functions over many argument tuples: once per tuple
+with IRInterpreter.call (the VM's semantics, straight from the IR), and
+once per batch with the NumPy kernel from compile_vectorized. Checks both
+give the same results:
+
+    python -m mini_c_compiler.benchmarks.vectorize [tuples]
+"""
+import sys
+import time
+
+from mini_c_compiler.benchmarks import build_ir, best_time
+from mini_c_compiler.ir_interpreter import IRInterpreter
+from mini_c_compiler.vectorize import compile_vectorized, np
+
+SOURCE = """
+float score(int age, float income, int visits) {
+    float s = income * 0.02 + visits * 3;
+    if (age < 25) { s = s - 10; } else { if (age > 60) { s = s + 5; } }
+    if (visits > 10) { s = s * 1.5; }
+    return s;
+}
+int digits(int n) {
+    int count = 1;
+    while (n >= 10) { n = n / 10; count = count + 1; }
+    return count;
+}
+int collatz(int n) {
+    int steps = 0;
+    while (n != 1) {
+        if (n - n / 2 * 2 == 0) { n = n / 2; } else { n = 3 * n + 1; }
+        steps = steps + 1;
+    }
+    return steps;
+}
+"""
+
+def workloads(count):
+    rng = np.random.default_rng(0)
+    yield 'score', (rng.integers(18, 90, count), rng.uniform(0, 200000, count), rng.integers(0, 30, count))
+    yield 'digits', (rng.integers(0, 10 ** 12, count),)
+    yield 'collatz', (rng.integers(1, 10000, count),)
+
+def per_call(interpreter, func, columns):
+    start = time.perf_counter()
+    results = [interpreter.call(func, row) for row in zip(*(column.tolist() for column in columns))]
+    return results, time.perf_counter() - start
+
+def batch(vectorized, columns):
+    start = time.perf_counter()
+    results = vectorized(*columns)
+    return results, time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    interpreter = IRInterpreter(build_ir(SOURCE, opt_level=0), max_steps=10 ** 9) # -O0 keeps every function
+    print(f"{'function':<10} {'tuples':>8} {'per call (ms)':>14} {'batch (ms)':>11} {'speedup':>8}")
+    for func, columns in workloads(count):
+        vectorized = compile_vectorized(SOURCE, func)
+        expected, slow = per_call(interpreter, func, columns) # Slow enough to time once
+        results, _ = batch(vectorized, columns)
+        if results.tolist() != expected:
+            raise RuntimeError(f"{func}: the kernel computed different results")
+        fast = best_time(lambda: batch(vectorized, columns)[1], repeat=3)
+        print(f"{func:<10} {count:>8} {slow * 1000:>14.1f} {fast * 1000:>11.1f} {slow / fast:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Native backend benchmark.
+
+Runs the benchmark programs on the VM and as executables built by the x86
+backend, checks they print the same output, and times both. Native times
+include starting the process; building it is timed separately:
+
+    python -m mini_c_compiler.benchmarks.x86 [-O<n>] [file.c ...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mini_c_compiler.benchmarks import build_ir, compile_asm, load_program, program_names, run_vm, best_time
+from mini_c_compiler.x86 import X86CodeGenerator, build_executable
+
+def run_native(executable):
+    """Run a built executable: returns (output, seconds)."""
+    start = time.perf_counter()
+    result = subprocess.run([executable], capture_output=True, text=True, check=True)
+    return result.stdout, time.perf_counter() - start
+
+def main():
+    opt_level = 2
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('-O'):
+            opt_level = int(arg[2:])
+        else:
+            paths.append(arg)
+    workloads = [(name, load_program(name)) for name in program_names()]
+    if paths:
+        workloads = []
+        for path in paths:
+            with open(path, 'r') as f:
+                workloads.append((os.path.basename(path), f.read()))
+
+    print(f"{'program':<16} {'vm (ms)':>10} {'build (ms)':>11} {'native (ms)':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in workloads:
+            _, expected, slow = run_vm(compile_asm(source, opt_level=opt_level))
+            start = time.perf_counter()
+            assembly = X86CodeGenerator(build_ir(source, opt_level=opt_level)).generate()
+            executable = build_executable(assembly, os.path.join(directory, 'program'))
+            build = time.perf_counter() - start
+            output, _ = run_native(executable)
+            if output != expected:
+                raise RuntimeError(f"{name}: the executable printed different output")
+            fast = best_time(lambda: run_native(executable)[1])
+            print(f"{name:<16} {slow * 1000:>10.1f} {build * 1000:>11.1f} {fast * 1000:>12.2f} {slow / fast:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
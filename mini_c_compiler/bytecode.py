@@ -0,0 +1,251 @@
+import mmap
+import struct
+import sys
+
+from mini_c_compiler.core.opcodes import (
+    Opcode, CONSTANT_OPERAND, NAME_OPERAND, JUMP_OPERAND, FUNCTION_OPERAND, INTEGER_OPERAND,
+    TAKES_OPERAND,
+)
+from mini_c_compiler.ir import is_literal, parse_literal
+
+# File layout (little-endian):
+#   header     MAGIC, u16 version, u16 flags, u32 counts of constants, names,
+#              functions, labels and instructions
+#   constants  u8 tag (0 int, 1 float) + i64 / f64
+#   data       only with FLAG_DATA: u32 count + u32 constant index per global
+#              slot, giving the initial values of globals 0..count-1
+#   names      u16 byte length + UTF-8 bytes
+#   functions  u32 name index + u32 code offset (CALL operands index this table)
+#   labels     u32 name index + u32 code offset (every label, for profiles and disassembly)
+#   code       u8 opcode + i32 operand per instruction, so offsets are instruction indexes
+MAGIC = b'MCBC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIIII')
+FLAG_DATA = 1
+CONSTANT_TAG = struct.Struct('<B')
+INT_CONSTANT = struct.Struct('<q')
+FLOAT_CONSTANT = struct.Struct('<d')
+NAME_LENGTH = struct.Struct('<H')
+TABLE_ENTRY = struct.Struct('<II')
+DATA_ENTRY = struct.Struct('<I')
+INSTRUCTION = struct.Struct('<Bi')
+
+class BytecodeError(Exception):
+    pass
+
+class Program:
+    """An assembled program: code plus the tables its operands index."""
+
+    def __init__(self, code=None, constants=None, names=None, functions=None, labels=None, data=None):
+        self.code = code or []           # (Opcode, operand) pairs
+        self.constants = constants or [] # int/float values
+        self.data = data or []           # Constant index of the initial value of global slots 0, 1, ...
+        self.names = names or []         # Variable, function and label names
+        self.functions = functions or [] # (name index, code offset)
+        self.labels = labels or []       # (name index, code offset)
+
+    def label_offsets(self):
+        return {self.names[name]: offset for name, offset in self.labels}
+
+    def function_offsets(self):
+        return {self.names[name]: offset for name, offset in self.functions}
+
+    def to_bytes(self):
+        flags = FLAG_DATA if self.data else 0
+        parts = [HEADER.pack(MAGIC, VERSION, flags, len(self.constants), len(self.names),
+                             len(self.functions), len(self.labels), len(self.code))]
+        for value in self.constants:
+            if isinstance(value, float):
+                parts.append(CONSTANT_TAG.pack(1) + FLOAT_CONSTANT.pack(value))
+            else:
+                parts.append(CONSTANT_TAG.pack(0) + INT_CONSTANT.pack(value))
+        if self.data:
+            parts.append(DATA_ENTRY.pack(len(self.data)))
+            parts.extend(DATA_ENTRY.pack(index) for index in self.data)
+        for name in self.names:
+            encoded = name.encode('utf-8')
+            parts.append(NAME_LENGTH.pack(len(encoded)) + encoded)
+        for entry in self.functions + self.labels:
+            parts.append(TABLE_ENTRY.pack(*entry))
+        for op, operand in self.code:
+            parts.append(INSTRUCTION.pack(op, operand))
+        return b''.join(parts)
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """Decode a program from any buffer (bytes, or an mmap of a bytecode file)."""
+        if len(buffer) < HEADER.size:
+            raise BytecodeError("File too short for a bytecode header")
+        magic, version, flags, n_constants, n_names, n_functions, n_labels, n_code = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise BytecodeError("Not a bytecode file")
+        if version != VERSION:
+            raise BytecodeError(f"Unsupported bytecode version {version}")
+
+        try:
+            offset = HEADER.size
+            constants = []
+            for _ in range(n_constants):
+                tag, = CONSTANT_TAG.unpack_from(buffer, offset)
+                kind = FLOAT_CONSTANT if tag == 1 else INT_CONSTANT
+                constants.append(kind.unpack_from(buffer, offset + 1)[0])
+                offset += 1 + kind.size
+
+            data = []
+            if flags & FLAG_DATA:
+                n_data, = DATA_ENTRY.unpack_from(buffer, offset)
+                offset += DATA_ENTRY.size
+                data = [DATA_ENTRY.unpack_from(buffer, offset + i * DATA_ENTRY.size)[0] for i in range(n_data)]
+                offset += n_data * DATA_ENTRY.size
+                if any(index >= len(constants) for index in data):
+                    raise BytecodeError("Corrupt bytecode: data refers to a missing constant")
+
+            names = []
+            for _ in range(n_names):
+                length, = NAME_LENGTH.unpack_from(buffer, offset)
+                offset += NAME_LENGTH.size
+                names.append(bytes(buffer[offset:offset + length]).decode('utf-8'))
+                offset += length
+
+            tables = []
+            for count in (n_functions, n_labels):
+                tables.append([TABLE_ENTRY.unpack_from(buffer, offset + i * TABLE_ENTRY.size)
+                               for i in range(count)])
+                offset += count * TABLE_ENTRY.size
+
+            code = [(Opcode(op), operand) for op, operand in INSTRUCTION.iter_unpack(
+                buffer[offset:offset + n_code * INSTRUCTION.size])]
+        except (struct.error, ValueError) as e:
+            raise BytecodeError(f"Corrupt bytecode: {e}")
+        if len(code) != n_code:
+            raise BytecodeError("Corrupt bytecode: truncated code section")
+        return cls(code, constants, names, tables[0], tables[1], data)
+
+def assemble(text):
+    """Assemble text assembly (as emitted by AssemblyCodeGenerator) into a Program."""
+    program = Program()
+    name_index = {}
+    constant_index = {}
+
+    def intern_name(name):
+        if name not in name_index:
+            name_index[name] = len(program.names)
+            program.names.append(name)
+        return name_index[name]
+
+    def intern_constant(value):
+        key = (type(value), value)
+        if key not in constant_index:
+            constant_index[key] = len(program.constants)
+            program.constants.append(value)
+        return constant_index[key]
+
+    labels = {}
+    pending = [] # (opcode, symbolic operand, line)
+    for line in text.split('\n'):
+        line = line.split(';', 1)[0].strip()
+        if not line:
+            continue
+        if line.endswith(':'):
+            labels[line[:-1]] = len(pending)
+            continue
+        parts = line.split()
+        if parts[0] == 'DATA':
+            # DATA <global slot> <literal>: slots must come in order from 0
+            if len(parts) != 3 or parts[1] != str(len(program.data)) or not is_literal(parts[2]):
+                raise BytecodeError(f"Bad data directive '{line}'")
+            program.data.append(intern_constant(parse_literal(parts[2])))
+            continue
+        try:
+            op = Opcode[parts[0]]
+        except KeyError:
+            raise BytecodeError(f"Unknown instruction '{line}'")
+        if op == Opcode.PUSH and len(parts) > 1 and is_literal(parts[1]):
+            op = Opcode.PUSH_CONST
+        takes_operand = op in TAKES_OPERAND
+        if takes_operand != (len(parts) == 2) or len(parts) > 2:
+            raise BytecodeError(f"Wrong number of operands in '{line}'")
+        if op in INTEGER_OPERAND and not parts[1].isdigit():
+            raise BytecodeError(f"Expected a slot number in '{line}'")
+        if op in CONSTANT_OPERAND and not is_literal(parts[1]):
+            raise BytecodeError(f"Expected a constant in '{line}'")
+        pending.append((op, parts[1] if takes_operand else None, line))
+
+    functions = {}
+    for op, operand, line in pending:
+        if op in JUMP_OPERAND | FUNCTION_OPERAND and operand not in labels:
+            raise BytecodeError(f"Unknown label in '{line}'")
+        if op in CONSTANT_OPERAND:
+            value = intern_constant(parse_literal(operand))
+        elif op in NAME_OPERAND:
+            value = intern_name(operand)
+        elif op in JUMP_OPERAND:
+            value = labels[operand]
+        elif op in FUNCTION_OPERAND:
+            if operand not in functions:
+                functions[operand] = len(program.functions)
+                program.functions.append((intern_name(operand), labels[operand]))
+            value = functions[operand]
+        elif op in INTEGER_OPERAND:
+            value = int(operand)
+        else:
+            value = 0
+        program.code.append((op, value))
+
+    program.labels = [(intern_name(label), offset) for label, offset in labels.items()]
+    return program
+
+def disassemble(program):
+    """Text assembly for a Program; assembling it again gives the same program."""
+    label_at = {}
+    for name, offset in program.labels:
+        label_at.setdefault(offset, []).append(program.names[name])
+    targets = {offset: name for name, offset in program.label_offsets().items()}
+
+    lines = [f"DATA {slot} {program.constants[index]!r}" for slot, index in enumerate(program.data)]
+    for index, (op, operand) in enumerate(program.code):
+        lines.extend(f"{label}:" for label in label_at.get(index, []))
+        if op in CONSTANT_OPERAND:
+            name = 'PUSH' if op == Opcode.PUSH_CONST else op.name
+            lines.append(f"{name} {program.constants[operand]!r}")
+        elif op in NAME_OPERAND:
+            lines.append(f"{op.name} {program.names[operand]}")
+        elif op in JUMP_OPERAND:
+            lines.append(f"{op.name} {targets[operand]}")
+        elif op in FUNCTION_OPERAND:
+            lines.append(f"{op.name} {program.names[program.functions[operand][0]]}")
+        elif op in INTEGER_OPERAND:
+            lines.append(f"{op.name} {operand}")
+        else:
+            lines.append(op.name)
+    lines.extend(f"{label}:" for label in label_at.get(len(program.code), []))
+    return "\n".join(lines)
+
+def is_bytecode_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def load_bytecode_file(path):
+    """Load a bytecode file through a read-only mmap.
+
+    The pages are shared with every other process mapping the same file,
+    and only the tables and code are copied out of them.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return Program.from_buffer(mapped)
+
+def write_bytecode_file(path, program):
+    with open(path, 'wb') as f:
+        f.write(program.to_bytes())
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python bytecode.py <file.asm> <file.mcbc> | --dis <file.mcbc>")
+        sys.exit(1)
+
+    if sys.argv[1] == '--dis':
+        print(disassemble(load_bytecode_file(sys.argv[2])))
+    else:
+        with open(sys.argv[1], 'r') as f:
+            write_bytecode_file(sys.argv[2], assemble(f.read()))
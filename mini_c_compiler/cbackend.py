@@ -0,0 +1,417 @@
+"""C backend: mini-C functions as a shared library called through ctypes.
+
+CCodeGenerator lowers the optimized IR to portable C99 (plus _Thread_local),
+which the local C compiler builds into a shared library. NativeModule loads
+it and exposes each function of the program with the ctypes signature the
+semantic analyzer gives it:
+
+    module = NativeModule.from_source(source, cache=LibraryCache())
+    module.score(31, 52000.0) # Runs native code
+
+Libraries are cached by a hash of the generated C, so loading a program
+again only runs the front end. Types work as in the x86 backend
+(ProgramTypes): every IR name gets int64_t or double for the whole program.
+Arguments and results are converted to and from the declared types at the
+boundary, so an int function whose result is a float truncates it.
+
+print calls back into Python and writes to sys.stdout. A division by zero
+unwinds to the Python call, which raises ZeroDivisionError.
+"""
+import ctypes
+import hashlib
+import os
+import sys
+import tempfile
+import subprocess
+
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.semantic import SemanticAnalyzer
+from mini_c_compiler.ir import (
+    IRGenerator, parse_instruction, split_functions, split_data, is_literal, parse_literal, reads_input,
+)
+from mini_c_compiler.optimizer import Optimizer, DEFAULT_OPT_LEVEL
+from mini_c_compiler.inprocess import DEFAULT_CACHE_DIR
+from mini_c_compiler.x86 import ProgramTypes, NativeBuildError, FORMAT_FLOAT, find_compiler
+
+C_TYPES = {'int': 'int64_t', 'float': 'double'}
+CTYPES = {'int': ctypes.c_int64, 'float': ctypes.c_double}
+LIBRARY_SUFFIX = '.dll' if sys.platform == 'win32' else '.so'
+COMPILE_FLAGS = ['-O2', '-shared', '-fPIC']
+
+# Printing and errors, compiled into every library
+RUNTIME = r"""
+#include <inttypes.h>
+#include <math.h>
+#include <setjmp.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#ifdef _MSC_VER
+#define MC_EXPORT __declspec(dllexport)
+#define MC_THREAD __declspec(thread)
+#else
+#define MC_EXPORT
+#define MC_THREAD _Thread_local
+#endif
+
+/* Calls from several threads each unwind to their own entry point */
+static MC_THREAD jmp_buf mc_error;
+static MC_THREAD int mc_error_set;
+static void (*mc_write)(const char *);
+""" + FORMAT_FLOAT + r"""
+MC_EXPORT void mc_set_output(void (*write)(const char *))
+{
+    mc_write = write;
+}
+
+MC_EXPORT int mc_failed(void)
+{
+    return mc_error_set;
+}
+
+static void mc_fail(void)
+{
+    mc_error_set = 1;
+    longjmp(mc_error, 1);
+}
+
+static void mc_print_int(int64_t value)
+{
+    char line[24];
+
+    snprintf(line, sizeof line, "%" PRId64 "\n", value);
+    mc_write(line);
+}
+
+static void mc_print_float(double value)
+{
+    char line[48];
+
+    mc_format_float(line, value);
+    strcat(line, "\n");
+    mc_write(line);
+}
+
+/* Truncating division, as the VM's int(a / b) */
+static int64_t mc_div_int(int64_t a, int64_t b)
+{
+    if (b == 0)
+        mc_fail();
+    if (b == -1)
+        return (int64_t)(0 - (uint64_t)a);
+    return a / b;
+}
+
+static int64_t mc_div_float(double a, double b)
+{
+    if (b == 0)
+        mc_fail();
+    return (int64_t)(a / b);
+}
+"""
+
+def c_literal(token):
+    value = parse_literal(token)
+    if isinstance(value, float):
+        text = repr(value)
+    elif -2 ** 31 < value < 2 ** 31:
+        text = str(value)
+    else:
+        text = f"INT64_C({value})"
+    return f"({text})" if text.startswith('-') else text
+
+class CCodeGenerator:
+    """Lowers the optimized IR to C, exporting `signatures` as mc_<name>.
+
+    `signatures` maps function names to (parameter types, return type) as
+    declared in the source.
+    """
+
+    def __init__(self, instructions, signatures):
+        self.instructions = instructions
+        self.signatures = signatures
+        self.types = None
+        self.global_names = set() # Globals the code refers to
+
+    def generate(self):
+        if reads_input(self.instructions):
+            raise NativeBuildError("read() is not supported by the C backend")
+        global_code, functions = split_functions(self.instructions)
+        data, global_code = split_data(global_code)
+        floats = []
+        for name, (params, _) in self.signatures.items():
+            ir_params = [parse_instruction(instr)[1] for instr in functions[name] if instr.startswith("PARAM ")]
+            floats += [(name, param) for param, kind in zip(ir_params, params) if kind == 'float']
+        self.types = ProgramTypes(list(global_code) + [f"{name} = {value}" for name, value in data.items()],
+                                  functions, floats)
+
+        code = []
+        for name, body in functions.items():
+            code.append("")
+            code += self.function(name, body)
+        code.append("")
+        code += self.function(None, global_code)
+
+        output = ["/* -- Mini C -- */", RUNTIME]
+        for name in sorted(self.global_names | set(data)):
+            value = c_literal(data[name]) if name in data else '0'
+            output.append(f"static {C_TYPES[self.types.globals.get(name, 'int')]} g_{name} = {value};")
+        output.append("")
+        for name in functions:
+            output.append(self.prototype(name) + ";")
+        output += code
+        output += ["", "MC_EXPORT int mc_init(void)", "{",
+                   "    mc_error_set = 0;",
+                   "    if (setjmp(mc_error))",
+                   "        return 1;",
+                   "    mc_init_globals();",
+                   "    return 0;", "}"]
+        for name, (params, return_type) in self.signatures.items():
+            output.append("")
+            output += self.export(name, params, return_type)
+        return "\n".join(output) + "\n"
+
+    def prototype(self, name):
+        params = ", ".join(f"{C_TYPES[self.types.locals[name].get(param, 'int')]} v_{param}"
+                           for param in self.types.params[name])
+        return f"static {C_TYPES[self.types.returns[name]]} f_{name}({params or 'void'})"
+
+    def export(self, name, params, return_type):
+        # The entry point Python calls: declared types, and the unwinding target
+        c_params = ", ".join(f"{C_TYPES[kind]} a{index}" for index, kind in enumerate(params))
+        args = ", ".join(f"a{index}" for index in range(len(params)))
+        return [f"MC_EXPORT {C_TYPES[return_type]} mc_{name}({c_params or 'void'})", "{",
+                "    mc_error_set = 0;",
+                "    if (setjmp(mc_error))",
+                "        return 0;",
+                f"    return ({C_TYPES[return_type]})f_{name}({args});", "}"]
+
+    # Function bodies
+
+    def function(self, name, body):
+        self.name = name
+        params = set(self.types.params[name]) if name is not None else set()
+        scope = self.types.locals[name] if name is not None else {}
+        lines = [(self.prototype(name) if name is not None else "static void mc_init_globals(void)"), "{"]
+        if name is not None:
+            inherited = self.types.inherited[name] # Read as the global until assigned
+            self.global_names.update(inherited)
+            for local in sorted(self.types.local_names[name] - params):
+                initial = f"g_{local}" if local in inherited else "0"
+                lines.append(f"    {C_TYPES[scope.get(local, 'int')]} v_{local} = {initial};")
+        args = []
+        for instr in body:
+            decoded = parse_instruction(instr)
+            kind = decoded[0]
+            if kind == 'param':
+                continue
+            if kind == 'arg':
+                args.append(self.operand(decoded[1]))
+                continue
+            if kind == 'label':
+                lines.append(f"L_{decoded[1]}: ;")
+            elif kind == 'call':
+                call = f"f_{decoded[2]}({', '.join(args)})"
+                args = []
+                lines.append(f"    {self.operand(decoded[1])} = {call};" if decoded[1] is not None else f"    {call};")
+            else:
+                lines.append(f"    {self.statement(decoded)}")
+        if name is not None:
+            lines.append("    return 0;") # Falling off the end returns 0, as in the VM
+        lines.append("}")
+        return lines
+
+    def type_of(self, token):
+        return self.types.type_of(self.name, token)
+
+    def operand(self, token):
+        if is_literal(token):
+            return c_literal(token)
+        if self.name is not None and token in self.types.local_names[self.name]:
+            return f"v_{token}"
+        self.global_names.add(token)
+        return f"g_{token}"
+
+    def statement(self, decoded):
+        kind = decoded[0]
+        if kind == 'goto':
+            return f"goto L_{decoded[1]};"
+        if kind == 'if_false':
+            return f"if (!{self.operand(decoded[1])}) goto L_{decoded[2]};"
+        if kind == 'return':
+            return f"return {self.operand(decoded[1]) if decoded[1] is not None else 0};"
+        if kind == 'print':
+            function = 'mc_print_float' if self.type_of(decoded[1]) == 'float' else 'mc_print_int'
+            return f"{function}({self.operand(decoded[1])});"
+        if kind in ('copy', 'unary', 'binary'):
+            return f"{self.operand(decoded[1])} = {self.expression(decoded)};"
+        raise ValueError(f"Cannot translate '{decoded}' to C")
+
+    def expression(self, decoded):
+        kind = decoded[0]
+        if kind == 'copy':
+            return self.operand(decoded[2])
+        if kind == 'unary':
+            if decoded[2] != '-':
+                raise ValueError(f"Unsupported unary operator '{decoded[2]}'")
+            operand = self.operand(decoded[3])
+            return f"-{operand}" if self.type_of(decoded[3]) == 'float' else f"(int64_t)(0 - (uint64_t){operand})"
+        _, _, a, op, b = decoded
+        floating = 'float' in (self.type_of(a), self.type_of(b))
+        a, b = self.operand(a), self.operand(b)
+        if op == '/':
+            return f"mc_div_{'float' if floating else 'int'}({a}, {b})"
+        if op in ('+', '-', '*') and not floating:
+            # Unsigned arithmetic wraps instead of being undefined on overflow
+            return f"(int64_t)((uint64_t){a} {op} (uint64_t){b})"
+        return f"({a} {op} {b})"
+
+def build_library(c_source, output_path, compiler=None):
+    """Compile generated C into a shared library at `output_path`."""
+    compiler = compiler or find_compiler()
+    if not compiler:
+        raise NativeBuildError("No C compiler found (set CC)")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'program.c')
+        with open(source, 'w') as f:
+            f.write(c_source)
+        try:
+            result = subprocess.run([compiler, *COMPILE_FLAGS, '-o', output_path, source, '-lm'],
+                                    capture_output=True, text=True)
+        except OSError as e:
+            raise NativeBuildError(f"Cannot run {compiler}: {e}")
+    if result.returncode != 0:
+        raise NativeBuildError(result.stderr.strip())
+    return output_path
+
+class LibraryCache:
+    """Built libraries, one `<key>.so` file each in `directory`.
+
+    The key hashes the generated C and the compiler command, so any change
+    to the program, the options or this backend builds a new library.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+
+    def key(self, c_source, compiler):
+        digest = hashlib.sha256()
+        for part in (c_source, compiler, " ".join(COMPILE_FLAGS), sys.platform):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + LIBRARY_SUFFIX)
+
+    def build(self, c_source, compiler=None):
+        """Path of the library for `c_source`, built unless already cached: returns (path, cached)."""
+        compiler = compiler or find_compiler()
+        if not compiler:
+            raise NativeBuildError("No C compiler found (set CC)")
+        path = self.path(self.key(c_source, compiler))
+        if os.path.exists(path):
+            return path, True
+        os.makedirs(self.directory, exist_ok=True)
+        # Built next to its final name and renamed, so no one loads half a file
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            build_library(c_source, temp, compiler)
+            os.replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        return path, False
+
+def write_output(text):
+    sys.stdout.write(text.decode())
+
+OUTPUT_CALLBACK = ctypes.CFUNCTYPE(None, ctypes.c_char_p)
+
+class NativeFunction:
+    """One exported function: converts arguments and reports division by zero."""
+
+    def __init__(self, name, function, failed):
+        self.name = name
+        self.function = function
+        self.failed = failed
+        self.arity = len(function.argtypes)
+
+    def __call__(self, *args):
+        if len(args) != self.arity:
+            raise TypeError(f"{self.name}() takes {self.arity} argument(s), got {len(args)}")
+        result = self.function(*args)
+        if not result and self.failed(): # Failed calls return 0
+            raise ZeroDivisionError("division by zero")
+        return result
+
+    def __repr__(self):
+        return f"<native function {self.name}>"
+
+class NativeModule:
+    """A mini-C program loaded as a shared library.
+
+    Its functions are attributes (`module.score(...)`) and entries of
+    `functions`. Loading runs the program's global initializers, not main.
+    """
+
+    def __init__(self, path, signatures, cached=False):
+        self.path = path
+        self.cached = cached # Library came from a LibraryCache rather than the compiler
+        self.library = ctypes.CDLL(path)
+        self.output = OUTPUT_CALLBACK(write_output) # Kept alive as long as the library
+        self.library.mc_set_output(self.output)
+        self.library.mc_failed.restype = ctypes.c_int
+        self.functions = {}
+        for name, (params, return_type) in signatures.items():
+            function = getattr(self.library, f"mc_{name}")
+            function.argtypes = [CTYPES[kind] for kind in params]
+            function.restype = CTYPES[return_type]
+            self.functions[name] = NativeFunction(name, function, self.library.mc_failed)
+        if self.library.mc_init():
+            raise ZeroDivisionError("division by zero")
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['functions'][name]
+        except KeyError:
+            raise AttributeError(f"No function '{name}' in the program") from None
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self.functions))
+
+    @classmethod
+    def from_source(cls, source, opt_level=DEFAULT_OPT_LEVEL, cache=None, compiler=None):
+        """Compile `source` to a library and load it.
+
+        With a LibraryCache, the library is only built if it isn't cached;
+        without one it is built in a temporary directory. Raises
+        CompilerError for invalid programs and NativeBuildError when the C
+        compiler is missing or fails.
+        """
+        c_source, signatures = generate_c(source, opt_level)
+        if cache is not None:
+            path, cached = cache.build(c_source, compiler)
+            return cls(path, signatures, cached=cached)
+        directory = tempfile.TemporaryDirectory()
+        module = cls(build_library(c_source, os.path.join(directory.name, 'program' + LIBRARY_SUFFIX), compiler),
+                     signatures)
+        module.directory = directory # Removed along with the module
+        return module
+
+def generate_c(source, opt_level=DEFAULT_OPT_LEVEL):
+    """C source for a mini-C program: returns (C source, exported signatures)."""
+    ast = Parser(Lexer(source).tokenize()).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    signatures = {symbol.name: (symbol.params or [], symbol.type_name)
+                  for symbol in analyzer.global_scope.symbols.values()
+                  if symbol.category == 'func' and symbol.type_name in CTYPES
+                  and all(kind in CTYPES for kind in symbol.params or [])}
+    ir = IRGenerator().generate(ast)
+    # Every function can be called from Python, so all of them are entry points
+    ir = Optimizer(ir, entry_points=list(signatures)).optimize(level=opt_level)
+    return CCodeGenerator(ir, signatures).generate(), signatures
@@ -0,0 +1,123 @@
+from mini_c_compiler.ir import parse_instruction, instruction_uses, instruction_def
+
+class BasicBlock:
+    def __init__(self, index, label=None):
+        self.index = index
+        self.label = label       # Label that starts the block, if any
+        self.instructions = []   # Block body, without the label
+        self.successors = []     # Indexes of successor blocks
+        self.predecessors = []   # Indexes of predecessor blocks
+
+    def terminator(self):
+        if self.instructions:
+            return parse_instruction(self.instructions[-1])
+        return None
+
+    def __repr__(self):
+        return f"BasicBlock({self.index}, {self.label!r}, {len(self.instructions)} instrs)"
+
+def build_cfg(body):
+    """Split a function body into basic blocks linked by successor edges.
+
+    Leaders are the first instruction, every label, and every instruction
+    following a jump or RETURN. Block 0 is the entry block.
+    """
+    blocks = [BasicBlock(0)]
+    for instr in body:
+        current = blocks[-1]
+        if instr.endswith(':'):
+            if current.instructions or current.label is not None:
+                current = BasicBlock(len(blocks))
+                blocks.append(current)
+            current.label = instr[:-1]
+            continue
+
+        if current.instructions and current.terminator()[0] in ('goto', 'if_false', 'return'):
+            current = BasicBlock(len(blocks))
+            blocks.append(current)
+        current.instructions.append(instr)
+
+    by_label = {block.label: block.index for block in blocks if block.label is not None}
+    for block in blocks:
+        term = block.terminator()
+        follows = [block.index + 1] if block.index + 1 < len(blocks) else []
+        if term is None:
+            block.successors = follows
+        elif term[0] == 'goto':
+            block.successors = [by_label[term[1]]]
+        elif term[0] == 'if_false':
+            # Fall-through first, then the taken branch
+            block.successors = follows + [by_label[term[2]]]
+        elif term[0] == 'return':
+            block.successors = []
+        else:
+            block.successors = follows
+
+    for block in blocks:
+        for succ in block.successors:
+            if block.index not in blocks[succ].predecessors:
+                blocks[succ].predecessors.append(block.index)
+    return blocks
+
+def flatten_cfg(blocks):
+    """Turn blocks back into a flat instruction list, in list order."""
+    instructions = []
+    for block in blocks:
+        if block.label is not None:
+            instructions.append(f"{block.label}:")
+        instructions.extend(block.instructions)
+    return instructions
+
+def reachable_blocks(blocks):
+    seen = set()
+    worklist = [0] if blocks else []
+    while worklist:
+        index = worklist.pop()
+        if index in seen:
+            continue
+        seen.add(index)
+        worklist.extend(blocks[index].successors)
+    return seen
+
+def unassigned_reads(body, params, names):
+    """Names in `names` that some path through `body` reads before assigning them.
+
+    `params` are assigned on entry.
+    """
+    blocks = build_cfg(body)
+    assigned_in = [set(params)] + [set(names) for _ in blocks[1:]]
+    changed = True
+    while changed:
+        changed = False
+        for block in blocks:
+            assigned = set(assigned_in[block.index])
+            for instr in block.instructions:
+                assigned.add(instruction_def(parse_instruction(instr)))
+            for succ in block.successors:
+                if not assigned_in[succ] <= assigned:
+                    assigned_in[succ] &= assigned
+                    changed = True
+    found = set()
+    for index in reachable_blocks(blocks):
+        assigned = set(assigned_in[index])
+        for instr in blocks[index].instructions:
+            decoded = parse_instruction(instr)
+            found.update(name for name in instruction_uses(decoded)
+                         if name in names and name not in assigned)
+            assigned.add(instruction_def(decoded))
+    return found
+
+def inherited_globals(body, global_names):
+    """Globals a function body may read before it assigns them, sorted.
+
+    A name a function assigns is its own variable, but until the assignment
+    a read finds the global of that name. So backends start such a variable
+    with the global's value.
+    """
+    decoded = [parse_instruction(instr) for instr in body]
+    params = [d[1] for d in decoded if d[0] == 'param']
+    assigned = {instruction_def(d) for d in decoded} - {None}
+    candidates = (assigned & set(global_names)) - set(params)
+    if not candidates:
+        return []
+    return sorted(unassigned_reads(body, params, candidates))
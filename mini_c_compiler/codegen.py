@@ -1,3 +1,15 @@
+import ast
+
+from mini_c_compiler.ir import (
+    parse_instruction, instruction_uses, instruction_def, is_temp, is_literal, parse_literal,
+    split_data, split_functions, reads_input,
+)
+from mini_c_compiler.cfg import build_cfg, reachable_blocks, unassigned_reads, inherited_globals
+from mini_c_compiler import structure
+from mini_c_compiler.structure import StructureError
+from mini_c_compiler.bytecode import assemble
+from mini_c_compiler.peephole import PeepholeOptimizer, select_superinstructions
+
 class CodeGenerator:
     def __init__(self, instructions):
         self.instructions = instructions
@@ -119,9 +131,89 @@ class CodeGenerator:
         # Let's handle FUNC/END_FUNC by splitting the IR into functions.
         pass
 
-class PythonCodeGenerator:
-    def __init__(self, instructions):
+PYTHON_COMPARISONS = ('==', '!=', '>', '<', '>=', '<=')
+
+class Structurer(structure.Structurer):
+    """Rebuilds while/if/else statements from a body's control-flow graph.
+
+    The structuring is shared with the JIT (structure.py); this side turns
+    IR blocks into statements with the code generator passed in (its
+    translate_statement, condition, jump_statement, final_jump,
+    if_statement and while_statement), as lines of text or as ast nodes.
+    """
+
+    def __init__(self, codegen, body, in_function=True):
+        self.codegen = codegen
+        self.blocks = build_cfg(body)
+        self.uses = {}
+        for instr in body:
+            for operand in instruction_uses(parse_instruction(instr)):
+                self.uses[operand] = self.uses.get(operand, 0) + 1
+        super().__init__(0, self.find_successors(), codegen, in_function)
+
+    def find_successors(self):
+        # Fall-through first; None is the end of the body
+        by_label = {block.label: block.index for block in self.blocks if block.label is not None}
+        successors = {}
+        for index in sorted(reachable_blocks(self.blocks)):
+            term = self.blocks[index].terminator()
+            follows = index + 1 if index + 1 < len(self.blocks) else None
+            if term is not None and term[0] == 'goto':
+                successors[index] = [by_label[term[1]]]
+            elif term is not None and term[0] == 'if_false':
+                successors[index] = [follows, by_label[term[2]]]
+            elif term is not None and term[0] == 'return':
+                successors[index] = []
+            else:
+                successors[index] = [follows]
+        return successors
+
+    def emit_block(self, block):
+        instructions = self.blocks[block].instructions
+        term = self.blocks[block].terminator()
+        body = instructions[:-1] if term is not None and term[0] in ('goto', 'if_false', 'return') else instructions
+        if term is not None and term[0] == 'if_false':
+            compare = None
+            last = parse_instruction(body[-1]) if body else None
+            if (last is not None and last[0] == 'binary' and last[1] == term[1] and last[3] in PYTHON_COMPARISONS
+                    and is_temp(term[1]) and self.uses.get(term[1]) == 1):
+                # A comparison only the jump reads is tested directly
+                compare = last[2:]
+                body = body[:-1]
+            test, negated = self.codegen.condition(term[1], compare)
+        statements = []
+        for instr in body:
+            statements += self.codegen.translate_statement(instr)
+        if self.codegen.args_buffer:
+            raise StructureError("Call arguments in another block than the call")
+        if term is not None and term[0] == 'return':
+            return 'return', self.codegen.translate_statement(instructions[-1]), statements
+        if term is not None and term[0] == 'if_false':
+            fall, taken = self.successors[block]
+            return 'branch', ((negated, test), taken, fall), statements
+        return 'goto', self.successors[block][0], statements
+
+# read() for generated scripts: stdin is read and split once, on the first call
+READ_FUNCTION = """_input = None
+
+def read():
+    global _input
+    if _input is None:
+        _input = iter(sys.stdin.buffer.read().split())
+    token = next(_input, None)
+    if token is None:
+        raise EOFError("end of input")
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+"""
+
+class PythonCodeGenerator(structure.TextStatements):
+    def __init__(self, instructions, structured=True):
         self.instructions = instructions
+        self.structured = structured # Rebuild while/if statements; False always uses the state machine
+        self.args_buffer = []        # ARG values waiting for their CALL
 
     def generate(self):
         # Split instructions by functions
@@ -164,6 +256,7 @@ class PythonCodeGenerator:
 
         # We need to handle functions.
         # Each function will have its own state machine if it has labels/jumps.
+        global_names = {instruction_def(parse_instruction(instr)) for instr in functions['global']}
         
         for func_name, instrs in functions.items():
             if func_name == 'global':
@@ -186,8 +279,10 @@ class PythonCodeGenerator:
             # Rewrite def line with params
             output[-1] = f"def {func_name}({', '.join(params)}):"
             
-            # Generate body
-            output.append(self.generate_body(body_instrs))
+            # Generate body; a local named after a global starts with the global's value
+            inherited = "".join(f"    {name} = globals()['{name}']\n"
+                                for name in inherited_globals(instrs, global_names))
+            output.append(inherited + self.generate_body(body_instrs))
             output.append("")
 
         # Generate entry point
@@ -199,30 +294,47 @@ class PythonCodeGenerator:
         # Let's just put global code before `if __name__`.
         
         # Actually, let's insert global code at top level.
-        global_code = self.generate_body(functions.get('global', []), indent="")
+        data, global_instrs = split_data(functions.get('global', []))
+        global_code = self.generate_body(global_instrs, indent="", in_function=False)
         # Insert after imports
         output.insert(2, global_code)
+        if data:
+            # Constant globals, all bound by one assignment from a constant tuple
+            output.insert(2, f"{', '.join(data)} = {', '.join(data.values())}")
+        if reads_input(self.instructions):
+            output.insert(2, READ_FUNCTION)
         
         output.append("    if 'main' in globals():")
         output.append("        main()")
         
         return "\n".join(output)
 
-    def generate_body(self, instructions, indent="    "):
+    def generate_body(self, instructions, indent="    ", in_function=True):
+        self.args_buffer = []
+        if self.structured:
+            try:
+                lines = Structurer(self, instructions, in_function).generate()
+                if in_function and not lines:
+                    lines = ["pass"]
+                return "\n".join(indent + line for line in lines)
+            except StructureError:
+                self.args_buffer = [] # The state machine handles any control flow
         # Check if we need a state machine (labels present)
         labels = [instr[:-1] for instr in instructions if instr.endswith(':')]
         
         if not labels:
             # Straight line code
             lines = []
-            lines.append(f"{indent}_args = []") # Initialize _args
             for instr in instructions:
-                lines.append(indent + self.translate_simple(instr))
+                trans = self.translate_simple(instr)
+                if trans:
+                    lines.append(indent + trans)
+            if in_function and not lines:
+                lines.append(f"{indent}pass")
             return "\n".join(lines)
         
         # State machine
         lines = []
-        lines.append(f"{indent}_args = []") # Initialize _args
         lines.append(f"{indent}label = 'start'")
         lines.append(f"{indent}while True:")
         
@@ -256,8 +368,9 @@ class PythonCodeGenerator:
                 if trans:
                     lines.append(f"{indent}        {trans}")
                 
-                if "GOTO" in instr or "RETURN" in instr:
-                    has_jump = True
+                # Only an unconditional jump or return ends the block; a
+                # trailing IF_FALSE still falls through when not taken
+                has_jump = instr.startswith("GOTO ") or instr.startswith("RETURN")
             
             if not has_jump:
                 if i + 1 < len(all_labels):
@@ -268,6 +381,19 @@ class PythonCodeGenerator:
                     
         return "\n".join(lines)
 
+    # Statements for Structurer: lines of text (the rest come from TextStatements)
+
+    def translate_statement(self, instr):
+        line = self.translate_simple(instr)
+        return [line] if line else []
+
+    def condition(self, cond, compare=None):
+        # (test, negated test) for a jump on `cond`, or on the comparison (a, op, b) that set it
+        if compare is not None:
+            test = " ".join(compare)
+            return test, f"not ({test})"
+        return cond, f"not {cond}"
+
     def translate_simple(self, instr):
         # Handle simple instructions
         if instr.startswith("PRINT "):
@@ -295,51 +421,175 @@ class PythonCodeGenerator:
         if " = CALL " in instr:
             # t1 = CALL func
             lhs, rhs = instr.split(" = CALL ")
-            # We need to handle arguments.
-            # In IR: ARG x ... t1 = CALL func
-            # My IR generator emits ARG instructions before CALL.
-            # But in Python we need `func(arg1, arg2)`.
-            # We need to collect ARGs.
-            # This is tricky in a single pass line-by-line translation.
-            # We need to buffer ARGs.
-            pass 
-            # Since we are doing line-by-line, we can't easily look back.
-            # But we can use a stack for args in the generated code?
-            # Or we can change IR to include args in CALL?
-            # `t1 = CALL func(a, b)`
-            # My IR generator:
-            # visit_FunctionCall:
-            #   emit ARG ...
-            #   emit CALL ...
-            
-            # Let's modify IR generator to emit `CALL func arg1 arg2 ...`?
-            # Or in `translate_simple`, we can assume `ARG` pushes to a python list `_args`.
-            # `_args.append(x)`
-            # `func(*_args)`
-            # `_args = []`
-            return f"{lhs} = {rhs}(*_args); _args = []"
+            # In IR: ARG x ... t1 = CALL func. The ARGs were buffered, so
+            # the call gets its arguments directly: func(a, b)
+            args, self.args_buffer = self.args_buffer, []
+            return f"{lhs} = {rhs}({', '.join(args)})"
+
+        if instr.startswith("CALL "):
+            args, self.args_buffer = self.args_buffer, []
+            return f"{instr.split()[1]}({', '.join(args)})"
 
         if instr.startswith("ARG "):
-            val = instr.split()[1]
-            # We need `_args` to be defined.
-            # We can init `_args = []` at start of function.
-            return f"_args.append({val})"
+            self.args_buffer.append(instr.split()[1])
+            return ""
 
         if " = " in instr:
+            parts = instr.split()
+            if len(parts) == 5 and parts[3] in ('==', '!=', '>', '<', '>=', '<='):
+                # C comparisons yield 1/0, not Python's True/False
+                return f"{parts[0]} = int({parts[2]} {parts[3]} {parts[4]})"
+            if len(parts) == 5 and parts[3] == '/':
+                # Division truncates toward zero, as on the VM and in the optimizer's folding
+                return f"{parts[0]} = int({parts[2]} / {parts[4]})"
             return instr
             
         return "" # Skip unknown or empty
 
+AST_BINARY_OPS = {'+': ast.Add, '-': ast.Sub, '*': ast.Mult, '/': ast.Div}
+AST_COMPARISONS = {
+    '==': ast.Eq, '!=': ast.NotEq, '>': ast.Gt, '<': ast.Lt, '>=': ast.GtE, '<=': ast.LtE,
+}
+
+class PythonAstGenerator(PythonCodeGenerator):
+    """PythonCodeGenerator's program as an ast.Module, built without source text.
+
+    The module defines the functions, then binds the globals and runs the
+    global code; calling main() is left to whoever runs it (inprocess.py).
+    Bodies the Structurer can't handle get the state machine, generated as
+    text and parsed.
+    """
+
+    def generate(self):
+        global_code, functions = split_functions(self.instructions)
+        global_names = {instruction_def(parse_instruction(instr)) for instr in global_code}
+        body = []
+        for name, instrs in functions.items():
+            params = [parse_instruction(instr)[1] for instr in instrs if instr.startswith("PARAM ")]
+            code = [instr for instr in instrs if not instr.startswith("PARAM ")]
+            args = ast.arguments(posonlyargs=[], args=[ast.arg(param) for param in params],
+                                 kwonlyargs=[], kw_defaults=[], defaults=[])
+            inherited = [ast.parse(f"{var} = globals()['{var}']").body[0]
+                         for var in inherited_globals(instrs, global_names)]
+            body.append(ast.FunctionDef(name=name, args=args, body=inherited + self.generate_body(code),
+                                        decorator_list=[]))
+        data, global_instrs = split_data(global_code)
+        if data:
+            # Constant globals, all bound by one assignment from a constant tuple
+            names = ast.Tuple([ast.Name(name, ast.Store()) for name in data], ast.Store())
+            body.append(ast.Assign([names], ast.Constant(tuple(parse_literal(v) for v in data.values()))))
+        body += self.generate_body(global_instrs, in_function=False)
+        return ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+
+    def generate_body(self, instructions, indent="", in_function=True):
+        self.args_buffer = []
+        if self.structured:
+            try:
+                body = Structurer(self, instructions, in_function).generate()
+                if in_function and not body:
+                    body = [ast.Pass()]
+                return body
+            except StructureError:
+                pass
+        text = PythonCodeGenerator(instructions, structured=False).generate_body(
+            instructions, indent="", in_function=in_function)
+        return ast.parse(text).body
+
+    # Statements for Structurer, as ast nodes
+
+    def operand(self, value):
+        if is_literal(value):
+            return ast.Constant(parse_literal(value))
+        return ast.Name(value, ast.Load())
+
+    def translate_statement(self, instr):
+        decoded = parse_instruction(instr)
+        kind = decoded[0]
+        if kind == 'arg':
+            self.args_buffer.append(self.operand(decoded[1]))
+            return []
+        if kind == 'call':
+            args, self.args_buffer = self.args_buffer, []
+            call = ast.Call(ast.Name(decoded[2], ast.Load()), args, [])
+            if decoded[1] is None:
+                return [ast.Expr(call)]
+            value = call
+        elif kind == 'copy':
+            value = self.operand(decoded[2])
+        elif kind == 'binary':
+            _, _, a, op, b = decoded
+            if op in AST_COMPARISONS:
+                # C comparisons yield 1/0, not Python's True/False
+                compare = ast.Compare(self.operand(a), [AST_COMPARISONS[op]()], [self.operand(b)])
+                value = ast.Call(ast.Name('int', ast.Load()), [compare], [])
+            else:
+                value = ast.BinOp(self.operand(a), AST_BINARY_OPS[op](), self.operand(b))
+                if op == '/':
+                    # Division truncates toward zero, as on the VM
+                    value = ast.Call(ast.Name('int', ast.Load()), [value], [])
+        elif kind == 'unary' and decoded[2] == '-':
+            value = ast.UnaryOp(ast.USub(), self.operand(decoded[3]))
+        elif kind == 'print':
+            call = ast.Call(ast.Name('print', ast.Load()), [self.operand(decoded[1])], [])
+            return [ast.Expr(call)]
+        elif kind == 'return':
+            return [ast.Return(None if decoded[1] is None else self.operand(decoded[1]))]
+        else:
+            return [] # Skip unknown or empty, like translate_simple
+        return [ast.Assign([ast.Name(decoded[1], ast.Store())], value)]
+
+    def condition(self, cond, compare=None):
+        if compare is not None:
+            a, op, b = compare
+            test = ast.Compare(self.operand(a), [AST_COMPARISONS[op]()], [self.operand(b)])
+        else:
+            test = self.operand(cond)
+        return test, ast.UnaryOp(ast.Not(), test)
+
+    def jump_statement(self, kind):
+        return [{'return': ast.Return, 'break': ast.Break, 'continue': ast.Continue}[kind]()]
+
+    def final_jump(self, nodes):
+        if nodes:
+            for kind, node_type in (('return', ast.Return), ('break', ast.Break), ('continue', ast.Continue)):
+                if isinstance(nodes[-1], node_type):
+                    return kind
+        return None
+
+    def if_statement(self, test, then, other):
+        return [ast.If(test, then, other)]
+
+    def while_statement(self, test, body):
+        return [ast.While(ast.Constant(True) if test is None else test, body or [ast.Pass()], [])]
+
+ASM_BINARY_OPS = {
+    '+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV',
+    '==': 'EQ', '!=': 'NEQ', '>': 'GT', '<': 'LT', '>=': 'GTE', '<=': 'LTE'
+}
+
 class AssemblyCodeGenerator:
-    def __init__(self, instructions):
+    def __init__(self, instructions, stack_temps=True, superinstructions=True, peephole=True,
+                 comments=True):
         self.instructions = instructions
+        # Keep single-use temps on the operand stack instead of STORE/PUSH pairs
+        self.stack_temps = stack_temps
+        # Clean up the emitted code and fuse frequent sequences (see peephole.py)
+        self.superinstructions = superinstructions
+        self.peephole = peephole
+        # One `; ...` line per IR instruction; release builds leave them out
+        self.comments = comments
+        self.peephole_counts = {} # Rewrites made by each peephole rule
+        # Variables resolved to slots: globals program-wide, locals per function.
+        # Local slots are handed out on first use, so temps kept on the stack get none.
+        self.global_slots = {}
+        self.local_names = set()
+        self.local_slots = {}
+        self.inherited = [] # Locals that start with the value of the global they're named after
 
     def generate(self):
         output = []
         output.append("; -- Mini C Assembly --")
         
-        output.append("JMP __init_globals")
-        
         functions = {}
         current_func = 'global'
         functions[current_func] = []
@@ -353,17 +603,44 @@ class AssemblyCodeGenerator:
             else:
                 functions[current_func].append(instr)
 
+        # Static data takes the first global slots, so the VM can load it in one go
+        data, functions['global'] = split_data(functions['global'])
+        for name, value in data.items():
+            output.append(f"; DATA {name} {value}")
+            output.append(f"DATA {self.global_slot(name)} {value}")
+        output.append("JMP __init_globals")
+
+        # Whatever the global code assigns is global
+        for instr in functions['global']:
+            target = instruction_def(parse_instruction(instr))
+            if target:
+                self.global_slot(target)
+
         # Code for functions
         for func_name, instrs in functions.items():
             if func_name == 'global': continue
-            
+
+            # Parameters and anything the function assigns are locals, as
+            # assignments inside a function always created locals. Until it
+            # is assigned, a local named after a global reads the global, so
+            # it starts with the global's value (after the parameters, which
+            # CALL may store itself).
+            self.local_names = {instruction_def(parse_instruction(instr)) for instr in instrs} - {None}
+            self.inherited = inherited_globals(instrs, self.global_slots)
+            block = self.generate_block(instrs)
+            self.inherited = []
+
             output.append(f"{func_name}:")
-            output.append(self.generate_block(instrs))
-            # Ensure RET if missing (e.g. void)
+            output.append(f"ENTER {len(self.local_slots)}")
+            output.append(block)
+            # Falling off the end returns 0, like a bare RETURN, so callers
+            # always find a result (the peephole pass drops it when unreachable)
+            output.append("PUSH 0")
             output.append("RET")
             output.append("")
 
         # Code for globals and entry
+        self.local_names = set()
         output.append("__init_globals:")
         if 'global' in functions:
             output.append(self.generate_block(functions['global']))
@@ -371,128 +648,334 @@ class AssemblyCodeGenerator:
         output.append("CALL main")
         output.append("HALT")
         
-        return "\n".join(output)
+        code = "\n".join(output)
+        optimizer = PeepholeOptimizer(None if self.peephole else [], strip_comments=not self.comments)
+        code = optimizer.optimize(code)
+        self.peephole_counts = optimizer.counts
+        if self.superinstructions:
+            code = select_superinstructions(code, counts=self.peephole_counts)
+        return code
+
+    def global_slot(self, name):
+        if name not in self.global_slots:
+            self.global_slots[name] = len(self.global_slots)
+        return self.global_slots[name]
+
+    def local_slot(self, name):
+        if name not in self.local_slots:
+            self.local_slots[name] = len(self.local_slots)
+        return self.local_slots[name]
+
+    def push(self, operand):
+        if is_literal(operand):
+            return f"PUSH {operand}"
+        if operand in self.local_names:
+            return f"LOAD_LOCAL {self.local_slot(operand)}"
+        return f"LOAD_GLOBAL {self.global_slot(operand)}"
+
+    def store(self, name):
+        if name in self.local_names:
+            return f"STORE_LOCAL {self.local_slot(name)}"
+        return f"STORE_GLOBAL {self.global_slot(name)}"
 
     def generate_block(self, instructions):
+        instructions = [instr for instr in instructions if instr and not instr.startswith(';')]
+        uses = {}
+        for instr in instructions:
+            for operand in instruction_uses(parse_instruction(instr)):
+                uses[operand] = uses.get(operand, 0) + 1
+
+        # Temps used exactly once can stay on the operand stack between their
+        # definition and their use. Those whose use doesn't find them on top
+        # of the stack are spilled, and the block is emitted again without them.
+        resident = set()
+        if self.stack_temps:
+            resident = {name for name, count in uses.items() if count == 1 and is_temp(name)}
+        while True:
+            self.local_slots = {}
+            lines, spilled = self.emit_block(instructions, resident, uses)
+            if not spilled:
+                return "\n".join(lines)
+            resident -= spilled
+
+    def emit_block(self, instructions, resident, uses):
         lines = []
+        spilled = set()
+        pending = []     # Values left on the stack for a later instruction, bottom first
         args_buffer = []
 
-        for instr in instructions:
-            if not instr or instr.startswith(';'): 
-                continue
-                
+        def settle():
+            # Nothing may stay on the stack across a jump, a label or a call
+            spilled.update(name for name in pending if name in resident)
+            pending.clear()
+
+        # Inherited globals are copied in after the parameters, so CALL can
+        # still store those itself
+        entry = 0
+        while entry < len(instructions) and instructions[entry].startswith("PARAM "):
+            entry += 1
+        for index, instr in enumerate(instructions + [None]):
+            if index == entry:
+                for name in self.inherited:
+                    lines += [f"LOAD_GLOBAL {self.global_slot(name)}", f"STORE_LOCAL {self.local_slot(name)}"]
+            if instr is None:
+                break
+            decoded = parse_instruction(instr)
+            kind = decoded[0]
+
             # Handle Labels
-            if instr.endswith(':'):
+            if kind == 'label':
+                settle()
                 lines.append(instr)
                 continue
-            
+
             # Handle Comments
             lines.append(f"; {instr}")
 
-            # 1. Function Call args buffering
-            if instr.startswith("ARG "):
-                val = instr.split()[1]
-                args_buffer.append(val)
-                continue
-            
-            if " = CALL " in instr:
-                # t1 = CALL func
-                lhs, rhs = instr.split(" = CALL ")
-                func_name = rhs
-                
-                # Push args in REVERSE order
-                for arg in reversed(args_buffer):
-                    lines.append(f"PUSH {arg}")
-                args_buffer = [] # Clear buffer
-                
-                lines.append(f"CALL {func_name}")
-                lines.append(f"STORE {lhs}")
-                continue
-                
-            if "CALL " in instr: # Standalone call (ignore result)
-                # Should match if no assignment? My parser might not produce this for expressions.
-                # But assume `CALL func` exists.
-                if args_buffer: # If any args pending
-                     for arg in reversed(args_buffer):
-                        lines.append(f"PUSH {arg}")
-                     args_buffer = []
-                # Check for "CALL func"
-                parts = instr.split()
-                if parts[0] == "CALL":
-                    lines.append(f"CALL {parts[1]}")
-                    continue
-
-            # 2. Assignment & Arithmetic
-            # Format: t1 = op1 OP op2
-            if " = " in instr:
-                parts = instr.split(" = ")
-                lhs = parts[0]
-                rhs = parts[1]
-                
-                # Binary Ops
-                ops = {
-                    '+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV',
-                    '==': 'EQ', '!=': 'NEQ', '>': 'GT', '<': 'LT', '>=': 'GTE', '<=': 'LTE'
-                }
-                
-                match = None
-                parsed_op = False
-                
-                # Check for "a OP b"
-                # Need careful spacing check as vars can be 'a', 'b'
-                # Assumption: IR puts spaces around ops: "a + b"
-                for sym, asm_op in ops.items():
-                    fsym = f" {sym} "
-                    if fsym in rhs:
-                        op1, op2 = rhs.split(fsym, 1)
-                        lines.append(f"PUSH {op1}")
-                        lines.append(f"PUSH {op2}")
-                        lines.append(asm_op)
-                        lines.append(f"STORE {lhs}")
-                        parsed_op = True
-                        break
-                
-                if parsed_op: continue
-                
-                # Unary / Simple Assignment
-                # "t1 = 5" or "t1 = x"
-                lines.append(f"PUSH {rhs}")
-                lines.append(f"STORE {lhs}")
+            # Function call args are pushed by the CALL itself
+            if kind == 'arg':
+                args_buffer.append(decoded[1])
                 continue
 
-            # 3. Control Flow
-            if instr.startswith("IF_FALSE"):
-                # IF_FALSE t1 GOTO L1
-                _, cond, _, label = instr.split()
-                lines.append(f"PUSH {cond}")
-                lines.append(f"JZ {label}")
-                continue
-                
-            if instr.startswith("GOTO"):
-                label = instr.split()[1]
-                lines.append(f"JMP {label}")
-                continue
-                
-            if instr.startswith("RETURN"):
-                parts = instr.split()
-                if len(parts) > 1:
-                    val = parts[1]
-                    lines.append(f"PUSH {val}")
-                else:
+            # Leading operands may already be on the stack
+            operands = self.stack_operands(decoded, args_buffer)
+            matched = 0
+            for count in range(min(len(pending), len(operands)), 0, -1):
+                if pending[len(pending) - count:] == operands[:count]:
+                    matched = count
+                    break
+            del pending[len(pending) - matched:]
+            for operand in operands[matched:]:
+                if operand in resident:
+                    spilled.add(operand)
+                lines.append(self.push(operand))
+
+            if kind == 'binary':
+                lines.append(ASM_BINARY_OPS[decoded[3]])
+            elif kind == 'unary':
+                lines.append("NEG")
+            elif kind == 'call':
+                args_buffer = []
+                settle()
+                lines.append("READ" if decoded[2] == 'read' else f"CALL {decoded[2]}")
+            elif kind == 'if_false':
+                lines.append(f"JZ {decoded[2]}")
+                settle()
+            elif kind == 'goto':
+                lines.append(f"JMP {decoded[1]}")
+                settle()
+            elif kind == 'return':
+                if decoded[1] is None:
                     lines.append("PUSH 0") # Void return default?
                 lines.append("RET")
+                settle()
+            elif kind == 'print':
+                lines.append("PRINT")
+            elif kind == 'param':
+                lines.append(self.store(decoded[1]))
+
+            if kind in ('binary', 'unary', 'copy', 'call') and decoded[1] is not None:
+                dest = decoded[1]
+                if dest in resident:
+                    pending.append(dest)
+                elif self.stack_temps and is_temp(dest) and dest not in uses:
+                    lines.append("POP")
+                elif self.stack_temps and not pending and self.next_operand(instructions, index) == dest:
+                    # The next instruction reads what we just stored
+                    lines.append("DUP")
+                    lines.append(self.store(dest))
+                    pending.append(dest)
+                else:
+                    lines.append(self.store(dest))
+
+        settle()
+        return lines, spilled
+
+    def stack_operands(self, decoded, args_buffer):
+        # Values an instruction pushes, in push order
+        kind = decoded[0]
+        if kind == 'binary':
+            return [decoded[2], decoded[4]]
+        if kind == 'unary':
+            return [decoded[3]]
+        if kind == 'copy':
+            return [decoded[2]]
+        if kind == 'call':
+            return list(reversed(args_buffer)) # Args are pushed in REVERSE order
+        if kind in ('if_false', 'print'):
+            return [decoded[1]]
+        if kind == 'return' and decoded[1] is not None:
+            return [decoded[1]]
+        return []
+
+    def next_operand(self, instructions, index):
+        if index + 1 >= len(instructions):
+            return None
+        decoded = parse_instruction(instructions[index + 1])
+        if decoded[0] in ('label', 'arg', 'call'):
+            return None
+        operands = self.stack_operands(decoded, [])
+        return operands[0] if operands else None
+
+class BytecodeGenerator:
+    """Binary bytecode (see bytecode.py): the assembly backend's output, assembled."""
+
+    def __init__(self, instructions):
+        self.instructions = instructions
+
+    def generate(self):
+        code = AssemblyCodeGenerator(self.instructions, comments=False).generate()
+        return assemble(code).to_bytes()
+
+# Compare-and-jump for `t = a < b; IF_FALSE t GOTO L`: jumps when the comparison fails
+REG_JUMP_UNLESS = {'==': 'JNE', '!=': 'JEQ', '>': 'JLE', '<': 'JGE', '>=': 'JLT', '<=': 'JGT'}
+
+class RegisterCodeGenerator:
+    """Three-address code for the register VM (see regvm.py).
+
+    Every variable and temp of a function gets a frame register `rN`, the
+    parameters first, in order. Literals are written inline and globals go
+    through GET_GLOBAL/SET_GLOBAL. A temp that is only copied into a
+    variable by the next instruction is computed straight into it, and a
+    comparison only tested by the next IF_FALSE becomes a compare-and-jump.
+    """
+
+    def __init__(self, instructions):
+        self.instructions = instructions
+        self.global_slots = {}
+        self.local_names = set() # Names that are registers in the current function
+        self.registers = {}      # Name -> register, per function
+        self.checked = set()     # Locals that may be read before they are assigned
+
+    def generate(self):
+        global_code, functions = split_functions(self.instructions)
+        data, global_code = split_data(global_code)
+        output = ["; -- Mini C Register Code --"]
+        for name, value in data.items():
+            output.append(f"DATA g{self.global_slot(name)} {value}")
+
+        # The global code runs first, in a frame of its own for its temps
+        decoded = [parse_instruction(instr) for instr in global_code]
+        self.local_names = {instruction_def(d) for d in decoded if d[0] != 'data'} - {None}
+        self.local_names = {name for name in self.local_names if is_temp(name)}
+        for name in {instruction_def(d) for d in decoded} - self.local_names - {None}:
+            self.global_slot(name)
+        self.registers = {}
+        self.checked = set()
+        body = self.generate_body(global_code)
+        body.append(f"CALL {self.scratch()}, main")
+        body.append("HALT")
+        output.append(f"ENTER {len(self.registers)}")
+        output.extend(body)
+
+        for func_name, instrs in functions.items():
+            decoded = [parse_instruction(instr) for instr in instrs]
+            params = [d[1] for d in decoded if d[0] == 'param']
+            self.local_names = {instruction_def(d) for d in decoded} - {None}
+            self.registers = {}
+            for param in params:
+                self.register(param)
+            # Locals some path reads before assigning them (`int x; print(x);`)
+            # are checked at every read, so they fail like in the stack VM;
+            # those named after a global start with its value instead
+            inherited = inherited_globals(instrs, self.global_slots)
+            self.checked = unassigned_reads(instrs, params, self.local_names) - set(inherited)
+            body = [f"GET_GLOBAL {self.register(name)}, g{self.global_slot(name)}" for name in inherited]
+            body += self.generate_body(instrs)
+            if not decoded or decoded[-1][0] != 'return':
+                body.append("RET 0") # Falling off the end returns 0
+            output.append("")
+            output.append(f"{func_name}:")
+            output.append(f"ENTER {len(self.registers)}")
+            output.extend(body)
+        return "\n".join(output)
+
+    def global_slot(self, name):
+        if name not in self.global_slots:
+            self.global_slots[name] = len(self.global_slots)
+        return self.global_slots[name]
+
+    def register(self, name):
+        if name not in self.registers:
+            self.registers[name] = len(self.registers)
+        return f"r{self.registers[name]}"
+
+    def scratch(self):
+        # Register for results nobody reads; `None` is never a variable name
+        return self.register(None)
+
+    def generate_body(self, instructions):
+        decoded = [parse_instruction(instr) for instr in instructions]
+        uses = {}
+        for d in decoded:
+            for operand in instruction_uses(d):
+                uses[operand] = uses.get(operand, 0) + 1
+
+        lines = []
+        args_buffer = []
+        skip = False
+        for index, d in enumerate(decoded):
+            if skip:
+                skip = False
+                continue
+            kind = d[0]
+            following = decoded[index + 1] if index + 1 < len(decoded) else ('end',)
+            if kind == 'label':
+                lines.append(f"{d[1]}:")
+                continue
+            if kind == 'param':
+                continue
+            sources = [self.read(operand, lines) for operand in instruction_uses(d)]
+            if kind == 'arg':
+                args_buffer.extend(sources)
                 continue
 
-            # 4. Other
-            if instr.startswith("PRINT"):
-                val = instr.split()[1]
-                lines.append(f"PUSH {val}")
-                lines.append("PRINT")
+            dest = instruction_def(d)
+            single_use = dest is not None and is_temp(dest) and uses.get(dest) == 1
+            if (kind == 'binary' and d[3] in REG_JUMP_UNLESS and single_use
+                    and following[0] == 'if_false' and following[1] == dest):
+                lines.append(f"{REG_JUMP_UNLESS[d[3]]} {sources[0]}, {sources[1]}, {following[2]}")
+                skip = True
                 continue
-                
-            if instr.startswith("PARAM"):
-                val = instr.split()[1]
-                lines.append(f"PARAM {val}")
+            if single_use and following[0] == 'copy' and following[2] == dest:
+                dest = following[1]
+                skip = True
+
+            if kind == 'copy' and dest not in self.local_names:
+                lines.append(f"SET_GLOBAL g{self.global_slot(dest)}, {sources[0]}")
                 continue
+            if kind in ('binary', 'unary', 'copy', 'call'):
+                target = self.scratch() if dest is None else self.register(dest)
+            if kind == 'binary':
+                lines.append(f"{ASM_BINARY_OPS[d[3]]} {target}, {sources[0]}, {sources[1]}")
+            elif kind == 'unary':
+                lines.append(f"NEG {target}, {sources[0]}")
+            elif kind == 'copy':
+                lines.append(f"MOVE {target}, {sources[0]}")
+            elif kind == 'call' and d[2] == 'read':
+                lines.append(f"READ {target}")
+            elif kind == 'call':
+                lines.append(f"CALL {', '.join([target, d[2]] + args_buffer)}")
+                args_buffer = []
+            elif kind == 'if_false':
+                lines.append(f"JZ {sources[0]}, {d[2]}")
+            elif kind == 'goto':
+                lines.append(f"JMP {d[1]}")
+            elif kind == 'return':
+                lines.append(f"RET {sources[0] if sources else 0}")
+            elif kind == 'print':
+                lines.append(f"PRINT {sources[0]}")
+            if dest is not None and dest not in self.local_names:
+                lines.append(f"SET_GLOBAL g{self.global_slot(dest)}, {target}")
+        return lines
 
-        return "\n".join(lines)
+    def read(self, operand, lines):
+        # Register or literal holding `operand`, loading globals first
+        if is_literal(operand):
+            return operand
+        register = self.register(operand)
+        if operand not in self.local_names:
+            lines.append(f"GET_GLOBAL {register}, g{self.global_slot(operand)}")
+        elif operand in self.checked:
+            lines.append(f"CHECK {register}")
+        return register
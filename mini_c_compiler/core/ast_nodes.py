@@ -80,6 +80,7 @@ class VarDecl(Statement):
     type_name: str
     name: str
     initializer: Optional[Expression]
+    constant_value: Optional[Union[int, float]] = None # Set by semantic analysis for constant global initializers
 
 # Declarations
 @dataclass
@@ -0,0 +1,70 @@
+from enum import IntEnum
+
+class Opcode(IntEnum):
+    # Values are part of the bytecode file format: never renumber, only add.
+
+    # Stack and variables
+    PUSH_CONST = 1  # Push constant pool entry
+    PUSH = 2        # Push variable (locals, then globals)
+    LOAD = 3        # Same as PUSH, kept for hand-written assembly
+    STORE = 4
+    POP = 5
+    DUP = 6
+    PARAM = 7       # Pop an argument into a local
+
+    # Slot-resolved variables (operands are slot indexes)
+    LOAD_LOCAL = 50
+    STORE_LOCAL = 51
+    LOAD_GLOBAL = 52
+    STORE_GLOBAL = 53
+    ENTER = 54      # Allocate the function's frame: operand is its number of slots
+
+    # Arithmetic
+    ADD = 10
+    SUB = 11
+    MUL = 12
+    DIV = 13
+    NEG = 14
+
+    # Comparison
+    EQ = 20
+    NEQ = 21
+    GT = 22
+    LT = 23
+    GTE = 24
+    LTE = 25
+
+    # Control flow
+    JMP = 30
+    JZ = 31
+    JNZ = 32
+    CALL = 33
+    RET = 34
+    HALT = 35
+
+    # IO
+    PRINT = 40
+    READ = 41       # Push the next number from the input
+
+    # Superinstructions (chosen by the peephole selector in peephole.py)
+    JEQ = 60        # Pop b, pop a, jump if a == b
+    JNE = 61
+    JGT = 62
+    JLT = 63
+    JGE = 64
+    JLE = 65
+    ADD_CONST = 70  # Add a constant pool entry to the top of the stack
+    SUB_CONST = 71
+    MUL_CONST = 72
+    ADD_LOCAL = 73  # Add a local slot to the top of the stack
+    INC_LOCAL = 74  # Increment a local slot in place
+
+# Operand kinds, by opcode. Opcodes not listed take no operand.
+CONSTANT_OPERAND = {Opcode.PUSH_CONST, Opcode.ADD_CONST, Opcode.SUB_CONST, Opcode.MUL_CONST}
+NAME_OPERAND = {Opcode.PUSH, Opcode.LOAD, Opcode.STORE, Opcode.PARAM}
+JUMP_OPERAND = {Opcode.JMP, Opcode.JZ, Opcode.JNZ,
+                Opcode.JEQ, Opcode.JNE, Opcode.JGT, Opcode.JLT, Opcode.JGE, Opcode.JLE}
+FUNCTION_OPERAND = {Opcode.CALL}
+INTEGER_OPERAND = {Opcode.LOAD_LOCAL, Opcode.STORE_LOCAL, Opcode.LOAD_GLOBAL, Opcode.STORE_GLOBAL,
+                   Opcode.ENTER, Opcode.ADD_LOCAL, Opcode.INC_LOCAL}
+TAKES_OPERAND = CONSTANT_OPERAND | NAME_OPERAND | JUMP_OPERAND | FUNCTION_OPERAND | INTEGER_OPERAND
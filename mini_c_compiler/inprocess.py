@@ -0,0 +1,154 @@
+"""Compile mini-C to a Python code object and run it in-process.
+
+PythonAstGenerator (codegen.py) builds the Python backend's program as an
+ast tree, which compile() turns straight into a code object: no source text,
+no Python parser, no separate process. CodeCache keeps those code objects on
+disk with marshal, keyed by a hash of the mini-C source, the compile options,
+the compiler's own code and the Python version, so running a program again
+skips both compilers.
+"""
+import builtins
+import functools
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import types
+
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.semantic import SemanticAnalyzer, BUILTINS
+from mini_c_compiler.ir import IRGenerator
+from mini_c_compiler.optimizer import Optimizer, DEFAULT_OPT_LEVEL
+from mini_c_compiler.codegen import PythonAstGenerator
+from mini_c_compiler.streams import InputReader, OutputSink
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'mini_c_compiler')
+
+@functools.lru_cache(maxsize=None)
+def compiler_version():
+    """Hash of the compiler's modules: cached code is stale once any of them changes."""
+    package = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for directory in (package, os.path.join(package, 'core')):
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                with open(os.path.join(directory, name), 'rb') as f:
+                    digest.update(name.encode())
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+class CodeCache:
+    """Marshalled code objects, one `<key>.mcpyc` file each in `directory`."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+
+    def key(self, source, options):
+        digest = hashlib.sha256()
+        for part in (source, json.dumps(options, sort_keys=True), compiler_version(),
+                     importlib.util.MAGIC_NUMBER.hex()):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.mcpyc')
+
+    def load(self, key):
+        """The code object stored under `key`, or None if it is missing or unreadable."""
+        try:
+            with open(self.path(key), 'rb') as f:
+                code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, types.CodeType) else None
+
+    def store(self, key, code):
+        # Written next to its final name and renamed, so readers never see
+        # half a file; the cache is only an optimization, so failures are ignored
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp = f"{self.path(key)}.{os.getpid()}.tmp"
+            with open(temp, 'wb') as f:
+                marshal.dump(code, f)
+            os.replace(temp, self.path(key))
+        except OSError:
+            pass
+
+def compile_ir(source, opt_level=DEFAULT_OPT_LEVEL, passes=None, profile=None):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    ir = IRGenerator().generate(ast)
+    # call() can reach every function, so all of them are entry points
+    functions = [symbol.name for symbol in analyzer.global_scope.symbols.values()
+                 if symbol.category == 'func' and symbol not in BUILTINS]
+    return Optimizer(ir, entry_points=functions, profile=profile).optimize(level=opt_level, passes=passes)
+
+class CompiledProgram:
+    """A mini-C program compiled to a Python code object."""
+
+    def __init__(self, code, cached=False):
+        self.code = code
+        self.cached = cached   # Loaded from a CodeCache rather than compiled
+        self.namespace = None  # Globals of the last load()
+        self.output = None     # OutputSink of the last load()
+
+    @classmethod
+    def from_source(cls, source, opt_level=DEFAULT_OPT_LEVEL, passes=None, profile=None,
+                    cache=None, filename='<mini-c>'):
+        """Compile `source`, or load it from `cache` if it was compiled the same way before.
+
+        Raises CompilerError for invalid programs.
+        """
+        key = None
+        if cache is not None:
+            options = {'opt_level': opt_level, 'passes': passes,
+                       'profile': profile.as_dict() if profile is not None else None}
+            key = cache.key(source, options)
+            code = cache.load(key)
+            if code is not None:
+                return cls(code, cached=True)
+        ir = compile_ir(source, opt_level=opt_level, passes=passes, profile=profile)
+        code = compile(PythonAstGenerator(ir).generate(), filename, 'exec')
+        if cache is not None:
+            cache.store(key, code)
+        return cls(code)
+
+    def load(self, stdin=None, stdout=None, flush_policy=None):
+        """Run the module in a fresh namespace: defines the functions and sets up the globals.
+
+        The program's read() and print go to an InputReader on `stdin` and
+        an OutputSink on `stdout` (see streams.py).
+        """
+        self.output = OutputSink(stdout, flush_policy)
+        self.namespace = {'__name__': '__mini_c__', '__builtins__': builtins,
+                          'print': self.output.write_value, 'read': InputReader(stdin).read_value}
+        try:
+            exec(self.code, self.namespace)
+        finally:
+            self.output.flush()
+        return self.namespace
+
+    def run(self, stdin=None, stdout=None, flush_policy=None):
+        """Run the program from the start: its global code, then main() if there is one."""
+        namespace = self.load(stdin, stdout, flush_policy)
+        if 'main' in namespace:
+            try:
+                namespace['main']()
+            finally:
+                self.output.flush()
+
+    def call(self, name, *args):
+        """Call one of the program's functions, loading the program first if needed."""
+        if self.namespace is None:
+            self.load()
+        function = self.namespace.get(name)
+        if not isinstance(function, types.FunctionType):
+            raise NameError(f"No function '{name}' in the program")
+        try:
+            return function(*args)
+        finally:
+            self.output.flush()
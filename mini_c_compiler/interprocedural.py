@@ -0,0 +1,214 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+from mini_c_compiler.cfg import build_cfg, reachable_blocks
+from mini_c_compiler.ir import (
+    parse_instruction, format_instruction, split_functions, is_temp, is_literal,
+    instruction_uses, instruction_def, replace_uses,
+)
+
+@dataclass
+class FunctionSummary:
+    name: str
+    params: List[str]
+    calls: Set[str] = field(default_factory=set)
+    reads_globals: Set[str] = field(default_factory=set)
+    writes_globals: Set[str] = field(default_factory=set)
+    has_io: bool = False
+    return_value: Optional[str] = None # Literal returned on every path, if any
+    pure: bool = False  # No I/O, no global writes, only calls to pure functions
+    const: bool = False # Pure and never reads globals: result depends only on the arguments
+
+class CallGraph:
+    """Who calls whom, built from the CALL instructions in the IR.
+
+    Calls made by global initializers are recorded under `root_calls`, since
+    they run before `main`.
+    """
+
+    def __init__(self, instructions):
+        global_code, functions = split_functions(instructions)
+        self.edges = {name: set() for name in functions}
+        self.root_calls = set()
+        for instr in global_code:
+            decoded = parse_instruction(instr)
+            if decoded[0] == 'call':
+                self.root_calls.add(decoded[2])
+        for name, body in functions.items():
+            for instr in body:
+                decoded = parse_instruction(instr)
+                if decoded[0] == 'call':
+                    self.edges[name].add(decoded[2])
+
+    def callers(self, name):
+        return {caller for caller, callees in self.edges.items() if name in callees}
+
+    def is_recursive(self, name):
+        # True if `name` can reach itself through calls
+        seen = set()
+        worklist = list(self.edges.get(name, ()))
+        while worklist:
+            callee = worklist.pop()
+            if callee == name:
+                return True
+            if callee in seen or callee not in self.edges:
+                continue
+            seen.add(callee)
+            worklist.extend(self.edges[callee])
+        return False
+
+    def reachable(self, entry_points):
+        seen = set()
+        worklist = [f for f in set(entry_points) | self.root_calls if f in self.edges]
+        while worklist:
+            name = worklist.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            worklist.extend(callee for callee in self.edges[name] if callee in self.edges)
+        return seen
+
+def global_names(global_code):
+    names = set()
+    for instr in global_code:
+        decoded = parse_instruction(instr)
+        if decoded[0] in ('binary', 'unary', 'copy', 'call', 'data') and decoded[1] and not is_temp(decoded[1]):
+            names.add(decoded[1])
+    return names
+
+def summarize_function(name, body, globals_):
+    params = [instr.split()[1] for instr in body if instr.startswith("PARAM ")]
+    summary = FunctionSummary(name, params)
+    decoded_body = [parse_instruction(instr) for instr in body]
+
+    local_names = set(params)
+    for decoded in decoded_body:
+        target = instruction_def(decoded)
+        if target:
+            local_names.add(target)
+
+    for decoded in decoded_body:
+        if decoded[0] == 'print':
+            summary.has_io = True
+        elif decoded[0] == 'call':
+            summary.calls.add(decoded[2])
+        elif decoded[0] == 'unknown':
+            summary.has_io = True # Be conservative about anything we don't understand
+
+        target = instruction_def(decoded)
+        if target and target in globals_ and target not in params:
+            summary.writes_globals.add(target)
+        for operand in instruction_uses(decoded):
+            if is_literal(operand):
+                continue
+            if operand in globals_ or operand not in local_names:
+                summary.reads_globals.add(operand)
+
+    summary.return_value = constant_return_value(body)
+    return summary
+
+def constant_return_value(body):
+    # Every reachable exit must be a RETURN of the same literal
+    blocks = build_cfg(body)
+    value = None
+    for index in reachable_blocks(blocks):
+        block = blocks[index]
+        if block.successors:
+            continue
+        term = block.terminator()
+        if term is None or term[0] != 'return' or term[1] is None or not is_literal(term[1]):
+            return None
+        if value is not None and term[1] != value:
+            return None
+        value = term[1]
+    return value
+
+def summarize_functions(instructions):
+    """Compute a FunctionSummary for every function in the IR.
+
+    Purity is the greatest fixed point over the call graph: every function
+    starts out pure and is demoted when it performs I/O, writes a global, or
+    calls an impure (or undefined) function.
+    """
+    global_code, functions = split_functions(instructions)
+    globals_ = global_names(global_code)
+    summaries = {name: summarize_function(name, body, globals_) for name, body in functions.items()}
+
+    for summary in summaries.values():
+        summary.pure = not summary.has_io and not summary.writes_globals
+        summary.const = summary.pure and not summary.reads_globals
+
+    changed = True
+    while changed:
+        changed = False
+        for summary in summaries.values():
+            for callee in summary.calls:
+                callee_summary = summaries.get(callee)
+                if summary.pure and (callee_summary is None or not callee_summary.pure):
+                    summary.pure = False
+                    changed = True
+                if summary.const and (callee_summary is None or not callee_summary.const):
+                    summary.const = False
+                    changed = True
+            if summary.const and not summary.pure:
+                summary.const = False
+                changed = True
+    return summaries
+
+class NameAllocator:
+    """Hands out temps and labels that do not clash with any in `instructions`."""
+
+    def __init__(self, instructions):
+        self.temp_counter = 0
+        self.label_counter = 0
+        for instr in instructions:
+            for token in instr.replace(':', ' ').split():
+                if is_temp(token):
+                    self.temp_counter = max(self.temp_counter, int(token[1:]))
+                elif len(token) > 1 and token[0] == 'L' and token[1:].isdigit():
+                    self.label_counter = max(self.label_counter, int(token[1:]))
+
+    def new_temp(self):
+        self.temp_counter += 1
+        return f"t{self.temp_counter}"
+
+    def new_label(self):
+        self.label_counter += 1
+        return f"L{self.label_counter}"
+
+def rename_instruction(decoded, temps, labels):
+    decoded = replace_uses(decoded, temps)
+    kind = decoded[0]
+    if kind == 'label':
+        return ('label', labels.get(decoded[1], decoded[1]))
+    if kind == 'goto':
+        return ('goto', labels.get(decoded[1], decoded[1]))
+    if kind == 'if_false':
+        return ('if_false', decoded[1], labels.get(decoded[2], decoded[2]))
+    if kind in ('binary', 'unary', 'copy', 'call') and decoded[1] in temps:
+        return (kind, temps[decoded[1]]) + decoded[2:]
+    return decoded
+
+def clone_function(body, signature, names):
+    """Copy a function body with fresh temps and labels.
+
+    `signature` has one entry per parameter: a literal binds that parameter
+    to a constant (its PARAM becomes an assignment), None keeps it a parameter.
+    """
+    decoded_body = [parse_instruction(instr) for instr in body]
+    temps = {}
+    labels = {}
+    for decoded in decoded_body:
+        if decoded[0] == 'label':
+            labels[decoded[1]] = names.new_label()
+        for name in instruction_uses(decoded) + [instruction_def(decoded)]:
+            if name and is_temp(name) and name not in temps:
+                temps[name] = names.new_temp()
+
+    params = [d[1] for d in decoded_body if d[0] == 'param']
+    clone = [f"PARAM {p}" for p, const in zip(params, signature) if const is None]
+    clone += [f"{p} = {const}" for p, const in zip(params, signature) if const is not None]
+    for decoded in decoded_body:
+        if decoded[0] != 'param':
+            clone.append(format_instruction(rename_instruction(decoded, temps, labels)))
+    return clone
@@ -1,3 +1,4 @@
+import re
 from mini_c_compiler.core import ast_nodes as ast
 
 class IRGenerator:
@@ -34,7 +35,10 @@ class IRGenerator:
             self.visit(decl)
 
     def visit_VarDecl(self, node):
-        if node.initializer:
+        if node.constant_value is not None:
+            # Static data: the backends set it up before any code runs
+            self.emit(f"DATA {node.name} {node.constant_value}")
+        elif node.initializer:
             temp = self.visit(node.initializer)
             self.emit(f"{node.name} = {temp}")
 
@@ -126,3 +130,176 @@ class IRGenerator:
 
     def visit_FloatNumber(self, node):
         return str(node.value)
+
+# Helpers shared by the passes and backends that consume the textual IR
+
+BINARY_OPS = ('+', '-', '*', '/', '==', '!=', '>', '<', '>=', '<=')
+
+def is_temp(name):
+    return len(name) > 1 and name[0] == 't' and name[1:].isdigit()
+
+LITERAL_PATTERN = re.compile(r"-?\d+(\.\d+)?$")
+
+def is_literal(token):
+    # Strict: `inf`, `nan` etc. are valid identifiers, not numbers
+    return LITERAL_PATTERN.match(token) is not None
+
+def parse_literal(token):
+    return float(token) if '.' in token else int(token)
+
+def parse_instruction(instr):
+    """Decode one IR instruction into a (kind, operands...) tuple."""
+    if instr.endswith(':'):
+        return ('label', instr[:-1])
+    parts = instr.split()
+    op = parts[0]
+    if op == 'FUNC':
+        return ('func', parts[1])
+    if op == 'END_FUNC':
+        return ('end_func',)
+    if op == 'PARAM':
+        return ('param', parts[1])
+    if op == 'ARG':
+        return ('arg', parts[1])
+    if op == 'PRINT':
+        return ('print', parts[1])
+    if op == 'GOTO':
+        return ('goto', parts[1])
+    if op == 'IF_FALSE':
+        # IF_FALSE cond GOTO label
+        return ('if_false', parts[1], parts[3])
+    if op == 'RETURN':
+        return ('return', parts[1] if len(parts) > 1 else None)
+    if op == 'CALL':
+        return ('call', None, parts[1])
+    if op == 'DATA':
+        return ('data', parts[1], parts[2])
+    if len(parts) >= 3 and parts[1] == '=':
+        dest, rhs = parts[0], parts[2:]
+        if rhs[0] == 'CALL':
+            return ('call', dest, rhs[1])
+        if len(rhs) == 3 and rhs[1] in BINARY_OPS:
+            return ('binary', dest, rhs[0], rhs[1], rhs[2])
+        if len(rhs) == 2:
+            return ('unary', dest, rhs[0], rhs[1])
+        if len(rhs) == 1:
+            return ('copy', dest, rhs[0])
+    return ('unknown', instr)
+
+def format_instruction(decoded):
+    """Inverse of parse_instruction."""
+    kind = decoded[0]
+    if kind == 'label':
+        return f"{decoded[1]}:"
+    if kind == 'func':
+        return f"FUNC {decoded[1]}"
+    if kind == 'end_func':
+        return "END_FUNC"
+    if kind == 'param':
+        return f"PARAM {decoded[1]}"
+    if kind == 'arg':
+        return f"ARG {decoded[1]}"
+    if kind == 'print':
+        return f"PRINT {decoded[1]}"
+    if kind == 'goto':
+        return f"GOTO {decoded[1]}"
+    if kind == 'if_false':
+        return f"IF_FALSE {decoded[1]} GOTO {decoded[2]}"
+    if kind == 'return':
+        return "RETURN" if decoded[1] is None else f"RETURN {decoded[1]}"
+    if kind == 'data':
+        return f"DATA {decoded[1]} {decoded[2]}"
+    if kind == 'call':
+        return f"CALL {decoded[2]}" if decoded[1] is None else f"{decoded[1]} = CALL {decoded[2]}"
+    if kind == 'binary':
+        return f"{decoded[1]} = {decoded[2]} {decoded[3]} {decoded[4]}"
+    if kind == 'unary':
+        return f"{decoded[1]} = {decoded[2]} {decoded[3]}"
+    if kind == 'copy':
+        return f"{decoded[1]} = {decoded[2]}"
+    return decoded[1]
+
+def instruction_uses(decoded):
+    """Operands read by a decoded instruction (variables and literals)."""
+    kind = decoded[0]
+    if kind == 'binary':
+        return [decoded[2], decoded[4]]
+    if kind == 'unary':
+        return [decoded[3]]
+    if kind in ('copy', 'arg', 'print'):
+        return [decoded[-1]]
+    if kind == 'if_false':
+        return [decoded[1]]
+    if kind == 'return' and decoded[1] is not None:
+        return [decoded[1]]
+    return []
+
+def instruction_def(decoded):
+    """Variable written by a decoded instruction, if any."""
+    if decoded[0] in ('binary', 'unary', 'copy', 'call', 'param', 'data'):
+        return decoded[1]
+    return None
+
+def reads_input(instructions):
+    """True if the IR calls the read() builtin."""
+    return any(instr.endswith("CALL read") for instr in instructions)
+
+def replace_uses(decoded, mapping):
+    """Return `decoded` with every operand found in `mapping` substituted."""
+    kind = decoded[0]
+    sub = lambda operand: mapping.get(operand, operand)
+    if kind == 'binary':
+        return ('binary', decoded[1], sub(decoded[2]), decoded[3], sub(decoded[4]))
+    if kind == 'unary':
+        return ('unary', decoded[1], decoded[2], sub(decoded[3]))
+    if kind == 'copy':
+        return ('copy', decoded[1], sub(decoded[2]))
+    if kind in ('arg', 'print'):
+        return (kind, sub(decoded[1]))
+    if kind == 'if_false':
+        return ('if_false', sub(decoded[1]), decoded[2])
+    if kind == 'return' and decoded[1] is not None:
+        return ('return', sub(decoded[1]))
+    return decoded
+
+def split_data(global_code):
+    """Split global code into ({name: literal} from DATA, the remaining code)."""
+    data = {}
+    code = []
+    for instr in global_code:
+        decoded = parse_instruction(instr)
+        if decoded[0] == 'data':
+            data[decoded[1]] = decoded[2]
+        else:
+            code.append(instr)
+    return data, code
+
+def split_functions(instructions):
+    """Split flat IR into (global instructions, {function name: body}).
+
+    Function bodies keep their PARAM instructions but drop FUNC/END_FUNC;
+    functions are returned in definition order.
+    """
+    global_code = []
+    functions = {}
+    current = None
+    for instr in instructions:
+        if instr.startswith("FUNC "):
+            current = instr.split()[1]
+            functions[current] = []
+        elif instr == "END_FUNC":
+            current = None
+        elif current is None:
+            global_code.append(instr)
+        else:
+            functions[current].append(instr)
+    return global_code, functions
+
+def join_functions(global_code, functions):
+    """Inverse of split_functions: global code first, then each function."""
+    instructions = list(global_code)
+    for name, body in functions.items():
+        instructions.append(f"FUNC {name}")
+        instructions.extend(body)
+        instructions.append("END_FUNC")
+    return instructions
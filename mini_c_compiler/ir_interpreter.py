@@ -0,0 +1,391 @@
+from mini_c_compiler.ir import (
+    parse_instruction, split_functions, split_data, is_literal, parse_literal, instruction_uses,
+    instruction_def,
+)
+from mini_c_compiler.streams import InputReader, OutputSink
+from mini_c_compiler.cfg import inherited_globals
+
+class EvaluationError(Exception):
+    pass
+
+class BudgetExceeded(EvaluationError):
+    pass
+
+def evaluate_binary(op, a, b):
+    """Apply an IR binary operator with the VM's semantics (comparisons yield 1/0)."""
+    if op == '+': return a + b
+    if op == '-': return a - b
+    if op == '*': return a * b
+    if op == '/':
+        # Only integer division is evaluated: backends disagree on float division
+        if isinstance(a, float) or isinstance(b, float):
+            raise EvaluationError("Float division is not evaluated at compile time")
+        if b == 0:
+            raise EvaluationError("Division by zero")
+        q = abs(a) // abs(b)
+        return q if (a < 0) == (b < 0) else -q # C truncates toward zero
+    if op == '==': return 1 if a == b else 0
+    if op == '!=': return 1 if a != b else 0
+    if op == '>': return 1 if a > b else 0
+    if op == '<': return 1 if a < b else 0
+    if op == '>=': return 1 if a >= b else 0
+    if op == '<=': return 1 if a <= b else 0
+    raise EvaluationError(f"Unsupported operator '{op}'")
+
+def format_value(value):
+    """IR spelling of a computed constant, or None if it has none (inf, nan, exponents)."""
+    text = repr(value)
+    try:
+        float(text)
+    except ValueError:
+        return None
+    if 'e' in text or 'n' in text:
+        return None
+    return text
+
+class IRInterpreter:
+    """Executes IR functions directly, without going through a backend.
+
+    Used by the optimizer to evaluate calls at compile time, so it refuses
+    anything with observable effects (PRINT, reading unknown variables) and
+    gives up after `max_steps` instructions or `max_depth` nested calls.
+    """
+
+    def __init__(self, instructions, max_steps=10000, max_depth=200):
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.steps = 0
+        _, functions = split_functions(instructions)
+        self.functions = {name: self.decode(body) for name, body in functions.items()}
+
+    def decode(self, body):
+        # Resolve labels to instruction indexes once, so jumps are a list assignment
+        params = []
+        code = []
+        labels = {}
+        for instr in body:
+            decoded = parse_instruction(instr)
+            if decoded[0] == 'label':
+                labels[decoded[1]] = len(code)
+            elif decoded[0] == 'param':
+                params.append(decoded[1])
+            else:
+                code.append(decoded)
+
+        resolved = []
+        for decoded in code:
+            if decoded[0] == 'goto':
+                decoded = ('goto', labels[decoded[1]])
+            elif decoded[0] == 'if_false':
+                decoded = ('if_false', decoded[1], labels[decoded[2]])
+            resolved.append(decoded)
+        return params, resolved
+
+    def call(self, name, args):
+        self.steps = 0
+        if name not in self.functions:
+            raise EvaluationError(f"Unknown function '{name}'")
+
+        params, code = self.functions[name]
+        env = dict(zip(params, args))
+        frames = [] # Suspended callers: (code, pc, env, pending args, result destination)
+        pending_args = []
+        pc = 0
+
+        while True:
+            if pc >= len(code):
+                raise EvaluationError("Function ended without RETURN")
+
+            self.steps += 1
+            if self.steps > self.max_steps:
+                raise BudgetExceeded(f"Evaluation budget of {self.max_steps} instructions exceeded")
+
+            instr = code[pc]
+            kind = instr[0]
+            pc += 1
+
+            if kind == 'binary':
+                env[instr[1]] = evaluate_binary(instr[3], self.value(instr[2], env), self.value(instr[4], env))
+            elif kind == 'copy':
+                env[instr[1]] = self.value(instr[2], env)
+            elif kind == 'unary':
+                if instr[2] != '-':
+                    raise EvaluationError(f"Unsupported unary operator '{instr[2]}'")
+                env[instr[1]] = -self.value(instr[3], env)
+            elif kind == 'if_false':
+                if self.value(instr[1], env) == 0:
+                    pc = instr[2]
+            elif kind == 'goto':
+                pc = instr[1]
+            elif kind == 'arg':
+                pending_args.append(self.value(instr[1], env))
+            elif kind == 'call':
+                callee = instr[2]
+                if callee not in self.functions:
+                    raise EvaluationError(f"Unknown function '{callee}'")
+                if len(frames) >= self.max_depth:
+                    raise BudgetExceeded(f"Call depth limit of {self.max_depth} exceeded")
+                callee_params, callee_code = self.functions[callee]
+                args = pending_args[len(pending_args) - len(callee_params):]
+                del pending_args[len(pending_args) - len(callee_params):]
+                frames.append((code, pc, env, pending_args, instr[1]))
+                code, pc, env, pending_args = callee_code, 0, dict(zip(callee_params, args)), []
+            elif kind == 'return':
+                # A bare RETURN yields 0, like the VM's `PUSH 0; RET`
+                result = self.value(instr[1], env) if instr[1] is not None else 0
+                if not frames:
+                    return result
+                code, pc, env, pending_args, dest = frames.pop()
+                if dest is not None:
+                    env[dest] = result
+            elif kind == 'print':
+                raise EvaluationError("PRINT has side effects")
+            else:
+                raise EvaluationError(f"Cannot evaluate '{instr}'")
+
+    def value(self, operand, env):
+        if operand in env:
+            return env[operand]
+        if is_literal(operand):
+            return parse_literal(operand)
+        raise EvaluationError(f"Undefined variable '{operand}'")
+
+class ProgramError(EvaluationError):
+    """Runtime error in a program run by IRProgram, with the failing instruction."""
+
+    def __init__(self, instruction, message):
+        super().__init__(message)
+        self.instruction = instruction
+
+# Binary operators with the VM's run-time semantics: DIV truncates any
+# quotient (floats too) and comparisons yield 1/0
+RUN_BINARY = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: int(a / b),
+    '==': lambda a, b: 1 if a == b else 0,
+    '!=': lambda a, b: 1 if a != b else 0,
+    '>': lambda a, b: 1 if a > b else 0,
+    '<': lambda a, b: 1 if a < b else 0,
+    '>=': lambda a, b: 1 if a >= b else 0,
+    '<=': lambda a, b: 1 if a <= b else 0,
+}
+
+class FunctionCode:
+    """A function decoded for IRProgram: operands are slots, jumps are indexes.
+
+    Slot n >= 0 is frame[n], with the parameters first and the literals
+    last, preset in `template`; slot ~n < 0 is global slot n.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.params = []
+        self.code = []     # Decoded instructions
+        self.source = []   # IR text of each decoded instruction, for errors
+        self.names = []    # Frame slot -> variable name
+        self.template = [] # Initial frame
+        self.inherited = () # (frame slot, global slot) copied in on entry
+
+class IRProgram:
+    """Runs a whole IR program: the global code, then `main`.
+
+    Backs `--run`, which executes the IR straight after optimization, so a
+    change can be tried without generating code or writing any file.
+    Labels and variables are resolved when the program is loaded, as the
+    backends do: names a function assigns are its locals (starting with the
+    global's value when there is a global of that name), and everything
+    else (including all names in the global code) is global.
+    """
+
+    def __init__(self, instructions):
+        global_code, functions = split_functions(instructions)
+        data, global_code = split_data(global_code)
+        self.global_slots = {}
+        self.global_values = {} # Global slot -> static data value
+        for name, value in data.items():
+            self.global_values[self.global_slot(name)] = parse_literal(value)
+        self.init = self.decode('<global>', global_code, local_names=set())
+        global_names = set(data) | {instruction_def(parse_instruction(instr)) for instr in global_code}
+        self.functions = {}
+        for name, body in functions.items():
+            local_names = {instruction_def(parse_instruction(instr)) for instr in body} - {None}
+            function = self.decode(name, body, local_names)
+            # Until a function assigns a global's name, reading it finds the global
+            names = dict(zip(function.names, range(len(function.names))))
+            function.inherited = tuple((names[n], self.global_slot(n)) for n in inherited_globals(body, global_names))
+            self.functions[name] = function
+        self.globals = []
+        self.input = None  # InputReader of the current run
+        self.output = None # OutputSink of the current run
+
+    def global_slot(self, name):
+        if name not in self.global_slots:
+            self.global_slots[name] = len(self.global_slots)
+        return self.global_slots[name]
+
+    def decode(self, name, body, local_names):
+        function = FunctionCode(name)
+        slots = {}
+        def slot(operand):
+            if operand not in slots:
+                if not is_literal(operand) and operand not in local_names:
+                    return ~self.global_slot(operand)
+                slots[operand] = len(function.names)
+                function.names.append(operand)
+            return slots[operand]
+
+        labels = {}
+        decoded_body = []
+        for instr in body:
+            decoded = parse_instruction(instr)
+            if decoded[0] == 'label':
+                labels[decoded[1]] = len(decoded_body)
+            elif decoded[0] == 'param':
+                function.params.append(slot(decoded[1]))
+            else:
+                decoded_body.append((decoded, instr))
+
+        # Literals go after the variables, so they are read like any slot
+        literals = []
+        for decoded, _ in decoded_body:
+            target = instruction_def(decoded)
+            if target is not None:
+                slot(target)
+            literals.extend(operand for operand in instruction_uses(decoded) if is_literal(operand))
+        frame_size = len(function.names)
+        for literal in literals:
+            slot(literal)
+        function.template = [None] * frame_size + [parse_literal(l) for l in function.names[frame_size:]]
+
+        for decoded, instr in decoded_body:
+            kind = decoded[0]
+            if kind == 'goto':
+                decoded = ('goto', labels[decoded[1]])
+            elif kind == 'if_false':
+                decoded = ('if_false', slot(decoded[1]), labels[decoded[2]])
+            elif kind == 'binary':
+                decoded = ('binary', slot(decoded[1]), RUN_BINARY[decoded[3]], slot(decoded[2]), slot(decoded[4]))
+            elif kind == 'call' and decoded[2] == 'read':
+                decoded = ('read', None if decoded[1] is None else slot(decoded[1]))
+            elif kind == 'call':
+                decoded = ('call', None if decoded[1] is None else slot(decoded[1]), decoded[2])
+            elif kind in ('copy', 'unary'):
+                if kind == 'unary' and decoded[2] != '-':
+                    raise EvaluationError(f"Unsupported unary operator '{decoded[2]}'")
+                decoded = (kind, slot(decoded[1]), slot(decoded[-1]))
+            elif kind in ('arg', 'print'):
+                decoded = (kind, slot(decoded[1]))
+            elif kind == 'return':
+                decoded = ('return', None if decoded[1] is None else slot(decoded[1]))
+            else:
+                raise EvaluationError(f"Cannot run '{instr}'")
+            function.code.append(decoded)
+            function.source.append(instr)
+        return function
+
+    def run(self, stdin=None, stdout=None, flush_policy=None):
+        """Run the global code, then `main` if there is one.
+
+        read() takes numbers from `stdin` and print writes to `stdout`
+        (see streams.py for what they can be); output printed before an
+        error is still written.
+        """
+        self.globals = [self.global_values.get(slot) for slot in range(len(self.global_slots))]
+        self.input = InputReader(stdin)
+        self.output = OutputSink(stdout, flush_policy)
+        try:
+            self.execute(self.init)
+            if 'main' in self.functions:
+                self.execute(self.functions['main'])
+        finally:
+            self.output.flush()
+
+    def execute(self, function):
+        globals_ = self.globals
+        write = self.output.write_value
+        read = self.input.read_value
+        frame = function.template[:]
+        for slot, global_slot in function.inherited:
+            frame[slot] = globals_[global_slot]
+        code = function.code
+        frames = [] # Suspended callers: (function, code, pc, frame, pending args, result slot)
+        pending_args = []
+        pc = 0
+
+        def load(slot):
+            value = frame[slot] if slot >= 0 else globals_[~slot]
+            if value is None:
+                raise EvaluationError(f"Undefined variable '{self.slot_name(function, slot)}'")
+            return value
+
+        while True:
+            if pc >= len(code):
+                if function is self.init:
+                    return
+                instr = ('return', None) # Falling off the end returns 0
+            else:
+                instr = code[pc]
+            kind = instr[0]
+            pc += 1
+            try:
+                if kind == 'binary':
+                    value = instr[2](load(instr[3]), load(instr[4]))
+                elif kind == 'copy':
+                    value = load(instr[2])
+                elif kind == 'unary':
+                    value = -load(instr[2])
+                elif kind == 'if_false':
+                    if load(instr[1]) == 0:
+                        pc = instr[2]
+                    continue
+                elif kind == 'goto':
+                    pc = instr[1]
+                    continue
+                elif kind == 'arg':
+                    pending_args.append(load(instr[1]))
+                    continue
+                elif kind == 'print':
+                    write(load(instr[1]))
+                    continue
+                elif kind == 'read':
+                    value = read()
+                    if instr[1] is None:
+                        continue
+                elif kind == 'call':
+                    callee = self.functions.get(instr[2])
+                    if callee is None:
+                        raise EvaluationError(f"Unknown function '{instr[2]}'")
+                    args = pending_args[len(pending_args) - len(callee.params):]
+                    del pending_args[len(pending_args) - len(callee.params):]
+                    frames.append((function, code, pc, frame, pending_args, instr[1]))
+                    function, code, pc, pending_args = callee, callee.code, 0, []
+                    frame = callee.template[:]
+                    for slot, value in zip(callee.params, args):
+                        frame[slot] = value
+                    for slot, global_slot in callee.inherited:
+                        frame[slot] = globals_[global_slot]
+                    continue
+                else: # return
+                    value = load(instr[1]) if instr[1] is not None else 0
+                    if not frames:
+                        return value
+                    function, code, pc, frame, pending_args, dest = frames.pop()
+                    if dest is None:
+                        continue
+                    instr = (kind, dest)
+            except EvaluationError as e:
+                raise ProgramError(function.source[pc - 1], str(e)) from None
+            except Exception as e:
+                raise ProgramError(function.source[pc - 1], str(e)) from e
+            # Store the result of an assignment, or of a call we just returned from
+            if instr[1] >= 0:
+                frame[instr[1]] = value
+            else:
+                globals_[~instr[1]] = value
+
+    def slot_name(self, function, slot):
+        if slot >= 0:
+            return function.names[slot]
+        return next(name for name, index in self.global_slots.items() if index == ~slot)
@@ -0,0 +1,510 @@
+"""Tiered JIT for the VM: hot functions are translated to Python functions.
+
+The interpreter counts calls to each function and backward jumps to each
+loop header. A function called `call_threshold` times is translated:
+its blocks are structured back into `while` and `if` statements, stack
+and frame slots become Python locals, and the source is compiled once
+with compile(). Later calls, from the interpreter or from other compiled
+functions, run the compiled version. A loop that jumps back
+`loop_threshold` times is compiled too, and entered halfway through its
+function with the interpreter's frame and stack (on-stack replacement).
+
+Compiled code checks what the interpreter would check (reads of unset
+variables, division by zero). When a check fails it deoptimizes: it hands
+its frame and stack to the interpreter, which finishes the call and
+reports any error at the right instruction.
+"""
+from mini_c_compiler.core.opcodes import Opcode, JUMP_OPERAND, NAME_OPERAND
+from mini_c_compiler.structure import Structurer, StructureError, TextStatements
+from mini_c_compiler.vm import VirtualMachine, DEFAULT_MAX_CALL_DEPTH
+
+CALL_THRESHOLD = 20  # Calls before a function is compiled
+LOOP_THRESHOLD = 200 # Backward jumps to a loop header before its loop is compiled
+MAX_DEPTH = 100      # Nested compiled calls before calls stay in the interpreter
+STOP = -1            # Return address that ends a nested interpreter loop
+
+class TranslationError(Exception):
+    """Code the JIT does not translate: it stays interpreted."""
+
+class Halted(Exception):
+    """HALT ran in an interpreter loop nested inside compiled code."""
+
+ARITHMETIC = {Opcode.ADD: '+', Opcode.SUB: '-', Opcode.MUL: '*'}
+CONSTANT_ARITHMETIC = {Opcode.ADD_CONST: '+', Opcode.SUB_CONST: '-', Opcode.MUL_CONST: '*'}
+COMPARISONS = {Opcode.EQ: '==', Opcode.NEQ: '!=', Opcode.GT: '>', Opcode.LT: '<',
+               Opcode.GTE: '>=', Opcode.LTE: '<='}
+JUMP_COMPARISONS = {Opcode.JEQ: '==', Opcode.JNE: '!=', Opcode.JGT: '>', Opcode.JLT: '<',
+                    Opcode.JGE: '>=', Opcode.JLE: '<='}
+CONDITIONAL_JUMPS = JUMP_OPERAND - {Opcode.JMP}
+LOCAL_SLOT = {Opcode.LOAD_LOCAL, Opcode.STORE_LOCAL, Opcode.ADD_LOCAL, Opcode.INC_LOCAL}
+
+class Value:
+    """Symbolic stack entry: Python expression text and what it reads."""
+    __slots__ = ('text', 'slots', 'reads_globals', 'atom', 'compare')
+
+    def __init__(self, text, slots=frozenset(), reads_globals=False, atom=True, compare=None):
+        self.text = text
+        self.slots = slots                 # Frame slots the expression reads
+        self.reads_globals = reads_globals
+        self.atom = atom                   # Cheap to evaluate twice: a name or a constant
+        self.compare = compare             # Comparison text, if this is 1/0 from a comparison
+
+def constant(value):
+    text = repr(value)
+    return Value(f"({text})" if text.startswith('-') else text)
+
+def combine(text, *values, compare=None):
+    slots = frozenset().union(*(v.slots for v in values))
+    return Value(text, slots, any(v.reads_globals for v in values), atom=False, compare=compare)
+
+def tuple_text(items):
+    return f"({items[0]},)" if len(items) == 1 else f"({', '.join(items)})"
+
+def indent(lines):
+    return ["    " + line for line in lines]
+
+class FunctionTranslator(Structurer):
+    """Turns one verified function into Python source.
+
+    Its blocks are structured into statements as the Python backend's are
+    (structure.py), which raises StructureError for control flow it can't
+    handle; other code the JIT doesn't translate raises TranslationError.
+    """
+
+    def __init__(self, vm, entry):
+        info = vm.function_infos[entry]
+        if info.arity is None:
+            raise TranslationError("Function never returns")
+        self.vm = vm
+        self.code = vm.instructions
+        self.entry = entry
+        self.arity = info.arity
+        self.frame_size = info.frame_size or 0
+        self.heights = info.heights
+        self.temps = 0
+        self.find_blocks()
+        super().__init__(entry, self.successors, TextStatements())
+        self.find_assigned_slots()
+
+    def find_blocks(self):
+        leaders = {self.entry}
+        for ip in self.heights:
+            op, operand = self.code[ip]
+            if op in NAME_OPERAND or op == Opcode.HALT:
+                raise TranslationError(f"{op.name} is not translated")
+            if op == Opcode.CALL and self.vm.function_infos[operand].arity is None:
+                raise TranslationError("Call to a function that never returns")
+            if op in JUMP_OPERAND:
+                leaders.add(operand)
+            if op in JUMP_OPERAND or op == Opcode.RET:
+                leaders.add(ip + 1)
+        self.starts = sorted(ip for ip in leaders if ip in self.heights)
+        self.ends = {}       # Block start -> IP after its last instruction
+        self.successors = {} # Block start -> successor starts (fall-through first)
+        for start in self.starts:
+            end = start + 1
+            while end in self.heights and end not in leaders:
+                end += 1
+            self.ends[start] = end
+            op, operand = self.code[end - 1]
+            if op == Opcode.JMP:
+                self.successors[start] = [operand]
+            elif op in CONDITIONAL_JUMPS:
+                self.successors[start] = [end, operand]
+            elif op == Opcode.RET:
+                self.successors[start] = []
+            else:
+                self.successors[start] = [end]
+
+    def find_assigned_slots(self):
+        # Frame slots certainly set on entry to each block: reading one needs no check
+        touched = {}
+        for start in self.starts:
+            touched[start] = {operand for op, operand in self.code[start:self.ends[start]] if op in LOCAL_SLOT}
+        everything = set(range(self.frame_size))
+        self.assigned = {block: set(everything) for block in self.starts}
+        self.assigned[self.entry] = set()
+        changed = True
+        while changed:
+            changed = False
+            for block in self.starts:
+                out = self.assigned[block] | touched[block]
+                for succ in self.successors[block]:
+                    new = self.assigned[succ] & out
+                    if succ != self.entry and new != self.assigned[succ]:
+                        self.assigned[succ] = new
+                        changed = True
+
+    def translate(self, start, recursive=False):
+        """Python source for a function running the code from `start`.
+
+        From the function's entry, it takes the arguments. From a loop
+        header (on-stack replacement), it takes the frame slots and then
+        the stack below the header.
+        """
+        height = self.heights[start] + self.arity
+        stack_params = [f"s{i}" for i in range(height)]
+        frame = [f"l{k}" for k in range(self.frame_size)]
+        if start == self.entry:
+            name = f"f_{self.entry}"
+            params = stack_params
+            prologue = [" = ".join(frame) + " = None"] if frame else []
+        else:
+            name = f"osr_{self.entry}_{start}"
+            params = frame + stack_params
+            prologue = []
+        body = prologue + self.generate(start)
+        if recursive and start == self.entry:
+            # Deep recursion continues in the interpreter, which has no Python recursion limit
+            body = [
+                "if _vm.jit_depth >= MAX_DEPTH:",
+                f"    return _resume({start}, (), {tuple_text(params) if params else '()'})",
+                "_vm.jit_depth += 1",
+                "try:",
+            ] + indent(body) + [
+                "finally:",
+                "    _vm.jit_depth -= 1",
+            ]
+        return name, "\n".join([f"def {name}({', '.join(params)}):"] + indent(body)) + "\n"
+
+    def new_temp(self):
+        self.temps += 1
+        return f"t{self.temps}"
+
+    def emit_block(self, start):
+        stack = [Value(f"s{i}") for i in range(self.heights[start] + self.arity)]
+        assigned = set(self.assigned[start])
+        statements = []
+        frame = tuple_text([f"l{k}" for k in range(self.frame_size)]) if self.frame_size else "()"
+
+        def materialize(index):
+            temp = self.new_temp()
+            statements.append(f"{temp} = {stack[index].text}")
+            stack[index] = Value(temp)
+
+        def materialize_where(test):
+            for index, value in enumerate(stack):
+                if test(value):
+                    materialize(index)
+
+        def deoptimize(ip, condition, values):
+            # Hand the frame and the stack before `ip` to the interpreter
+            state = tuple_text([v.text for v in values]) if values else "()"
+            statements.append(f"if {condition}: return _resume({ip}, {frame}, {state})")
+
+        def read_slot(ip, slot):
+            if slot not in assigned:
+                deoptimize(ip, f"l{slot} is None", stack)
+                assigned.add(slot)
+            return Value(f"l{slot}", frozenset([slot]))
+
+        for ip in range(start, self.ends[start]):
+            op, operand = self.code[ip]
+            if op == Opcode.PUSH_CONST:
+                stack.append(constant(operand))
+            elif op == Opcode.LOAD_LOCAL:
+                stack.append(read_slot(ip, operand))
+            elif op == Opcode.STORE_LOCAL:
+                value = stack.pop()
+                materialize_where(lambda v: operand in v.slots)
+                statements.append(f"l{operand} = {value.text}")
+                assigned.add(operand)
+            elif op == Opcode.LOAD_GLOBAL:
+                if self.vm.globals[operand] is None:
+                    deoptimize(ip, f"g[{operand}] is None", stack)
+                stack.append(Value(f"g[{operand}]", reads_globals=True, atom=False))
+            elif op == Opcode.STORE_GLOBAL:
+                value = stack.pop()
+                materialize_where(lambda v: v.reads_globals)
+                statements.append(f"g[{operand}] = {value.text}")
+            elif op == Opcode.POP:
+                stack.pop() # Pure, so it need not be evaluated
+            elif op == Opcode.DUP:
+                if not stack[-1].atom:
+                    materialize(len(stack) - 1)
+                stack.append(stack[-1])
+            elif op in ARITHMETIC:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(combine(f"({a.text} {ARITHMETIC[op]} {b.text})", a, b))
+            elif op == Opcode.DIV:
+                if not stack[-1].atom:
+                    materialize(len(stack) - 1)
+                deoptimize(ip, f"{stack[-1].text} == 0", stack)
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(combine(f"int({a.text} / {b.text})", a, b))
+            elif op == Opcode.NEG:
+                a = stack.pop()
+                stack.append(combine(f"(-{a.text})", a))
+            elif op in COMPARISONS:
+                b = stack.pop()
+                a = stack.pop()
+                test = f"{a.text} {COMPARISONS[op]} {b.text}"
+                stack.append(combine(f"(1 if {test} else 0)", a, b, compare=test))
+            elif op in CONSTANT_ARITHMETIC:
+                a = stack.pop()
+                stack.append(combine(f"({a.text} {CONSTANT_ARITHMETIC[op]} {constant(operand).text})", a))
+            elif op == Opcode.ADD_LOCAL:
+                local = read_slot(ip, operand)
+                a = stack.pop()
+                stack.append(combine(f"({a.text} + {local.text})", a, local))
+            elif op == Opcode.INC_LOCAL:
+                read_slot(ip, operand)
+                materialize_where(lambda v: operand in v.slots)
+                statements.append(f"l{operand} += 1")
+            elif op == Opcode.PRINT:
+                statements.append(f"_write({stack.pop().text})")
+            elif op == Opcode.READ:
+                # The interpreter reports the end of the input or a bad number
+                temp = self.new_temp()
+                statements.append(f"{temp} = _try_read()")
+                deoptimize(ip, f"{temp} is None", stack)
+                stack.append(Value(temp))
+            elif op == Opcode.CALL:
+                arity = self.vm.function_infos[operand].arity
+                args = stack[len(stack) - arity:]
+                del stack[len(stack) - arity:]
+                # The callee may write globals, so pending reads happen first
+                materialize_where(lambda v: v.reads_globals)
+                temp = self.new_temp()
+                statements.append(f"{temp} = f_{operand}({', '.join(v.text for v in args)})")
+                stack.append(Value(temp))
+            elif op == Opcode.ENTER:
+                pass # The prologue sets up the frame
+            elif op == Opcode.RET:
+                return 'return', [f"return {stack.pop().text}"], statements
+            elif op == Opcode.JMP:
+                self.flush(stack, statements)
+                return 'goto', operand, statements
+            elif op in CONDITIONAL_JUMPS:
+                if op in JUMP_COMPARISONS:
+                    b = stack.pop()
+                    a = stack.pop()
+                    test = f"{a.text} {JUMP_COMPARISONS[op]} {b.text}"
+                    tests = (test, f"not ({test})")
+                else:
+                    value = stack.pop()
+                    test = f"({value.compare})" if value.compare else value.text
+                    tests = (f"not {test}", test) if op == Opcode.JZ else (test, f"not {test}")
+                if any(v.text != f"s{i}" for i, v in enumerate(stack)):
+                    # Stack slots are reassigned below, so test what they held before
+                    temp = self.new_temp()
+                    statements.append(f"{temp} = {tests[0]}")
+                    tests = (temp, f"not {temp}")
+                self.flush(stack, statements)
+                return 'branch', (tests, operand, self.ends[start]), statements
+            else:
+                raise TranslationError(f"{op.name} is not translated")
+        self.flush(stack, statements)
+        return 'goto', self.ends[start], statements
+
+    def flush(self, stack, statements):
+        # Leave the block with the stack in s0, s1, ... as the next block expects
+        changed = [(f"s{i}", v.text) for i, v in enumerate(stack) if v.text != f"s{i}"]
+        if changed:
+            statements.append(f"{', '.join(n for n, _ in changed)} = {', '.join(t for _, t in changed)}")
+
+class JitVM(VirtualMachine):
+    """VirtualMachine that compiles hot functions and loops to Python.
+
+    `jit=False` turns compilation off, leaving the plain interpreter; it is
+    also off when profiling, since a profile counts interpreted blocks.
+    `executed` only counts instructions the interpreter ran, and
+    `max_call_depth` only the calls it made: compiled code nests at most
+    MAX_DEPTH calls of its own before calling back into the interpreter.
+    """
+
+    def __init__(self, profile=False, quickening_stats=False, max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+                 stdin=None, stdout=None, flush_policy=None,
+                 jit=True, call_threshold=CALL_THRESHOLD, loop_threshold=LOOP_THRESHOLD):
+        super().__init__(profile=profile, quickening_stats=quickening_stats, max_call_depth=max_call_depth,
+                         stdin=stdin, stdout=stdout, flush_policy=flush_policy)
+        self.jit = jit and not profile
+        self.call_threshold = call_threshold
+        self.loop_threshold = loop_threshold
+        self.call_counts = {}  # Function entry IP -> calls so far
+        self.loop_counts = {}  # Loop header IP -> backward jumps to it so far
+        self.compiled = {}     # Function entry IP -> compiled function
+        self.loops = {}        # Loop header IP -> compiled rest of its function
+        self.failed = set()    # Entries and headers the translator gave up on
+        self.sources = {}      # Compiled function name -> Python source
+        self.translators = {}  # Function entry IP -> FunctionTranslator
+        self.owner = {}        # IP -> entry IP of the function it belongs to
+        self.namespace = {}    # Globals of the compiled code
+        self.jit_depth = 0     # Compiled calls and nested interpreter loops active
+
+    def load_bytecode(self, program):
+        super().load_bytecode(program)
+        self.call_counts, self.loop_counts = {}, {}
+        self.compiled, self.loops, self.failed, self.sources, self.translators = {}, {}, set(), {}, {}
+        self.owner = {}
+        for entry in self.function_at:
+            for ip in self.function_infos[entry].heights:
+                self.owner[ip] = entry
+        # Calls from compiled code go through f_<entry>, which starts out as
+        # a trampoline and is replaced when the callee is compiled
+        self.namespace = {'g': self.globals, '_vm': self, '_resume': self.interpret, 'MAX_DEPTH': MAX_DEPTH}
+        for entry in self.function_at:
+            self.namespace[f"f_{entry}"] = self.trampoline(entry)
+
+    def open_streams(self, reader, sink):
+        super().open_streams(reader, sink)
+        # Compiled code looks these up at each call, so they follow the current run
+        self.namespace['_write'] = sink.write_value
+        self.namespace['_try_read'] = reader.try_read
+
+    def trampoline(self, entry):
+        def call(*args):
+            return self.call_function(entry, args)
+        return call
+
+    def call_function(self, entry, args):
+        fn = self.compiled.get(entry) or self.count_call(entry)
+        if fn is not None and self.jit_depth < MAX_DEPTH:
+            return fn(*args)
+        return self.interpret(entry, (), args)
+
+    def count_call(self, entry):
+        count = self.call_counts[entry] = self.call_counts.get(entry, 0) + 1
+        if count == self.call_threshold and self.jit:
+            return self.compile_function(entry)
+        return None
+
+    def translator(self, entry):
+        if entry not in self.translators:
+            self.translators[entry] = FunctionTranslator(self, entry)
+        return self.translators[entry]
+
+    def compile_function(self, entry):
+        if entry in self.failed:
+            return None
+        try:
+            name, source = self.translator(entry).translate(entry, self.is_recursive(entry))
+        except (TranslationError, StructureError):
+            self.failed.add(entry)
+            return None
+        self.compiled[entry] = self.install(name, source)
+        return self.compiled[entry]
+
+    def compile_loop(self, header):
+        entry = self.owner[header]
+        try:
+            translator = self.translator(entry)
+            if header not in translator.loops:
+                raise TranslationError("Not a loop header")
+            name, source = translator.translate(header)
+        except (TranslationError, StructureError):
+            self.failed.add(header)
+            return None
+        self.loops[header] = self.install(name, source)
+        return self.loops[header]
+
+    def install(self, name, source):
+        exec(compile(source, f"<jit {name}>", 'exec'), self.namespace)
+        self.sources[name] = source
+        return self.namespace[name]
+
+    def is_recursive(self, entry):
+        # True if the function can reach itself through calls
+        seen = set()
+        worklist = [entry]
+        while worklist:
+            caller = worklist.pop()
+            for ip in self.function_infos[caller].heights:
+                op, operand = self.instructions[ip]
+                if op != Opcode.CALL:
+                    continue
+                if operand == entry:
+                    return True
+                if operand not in seen:
+                    seen.add(operand)
+                    worklist.append(operand)
+        return False
+
+    def interpret(self, ip, frame, values):
+        """Run a function in the interpreter from `ip` until it returns.
+
+        `frame` and `values` are its frame slots and stack (just the
+        arguments when starting at its entry). Returns its result; used for
+        calls from compiled code and when compiled code deoptimizes.
+        """
+        info = self.function_infos[self.owner[ip]]
+        stack = self.stack
+        needed = self.sp + len(values) + info.arity + info.max_depth
+        if needed > len(stack):
+            stack.extend([None] * max(needed - len(stack), len(stack)))
+        stack[self.sp:self.sp + len(values)] = values
+        self.sp += len(values)
+        return_ip = self.ip
+        # The values just pushed belong to the new frame, so its base is below them
+        self.frame = self.push_frame(STOP, list(frame), self.sp - len(values)).slots
+        self.ip = ip
+        self.jit_depth += 1
+        code = self.code
+        end = len(code)
+        executed = 0
+        try:
+            while 0 <= self.ip < end:
+                handler, arg = code[self.ip]
+                self.ip += 1
+                executed += 1
+                handler(arg)
+        finally:
+            self.executed += executed
+            self.jit_depth -= 1
+        if self.ip != STOP:
+            raise Halted()
+        self.ip = return_ip
+        self.sp -= 1
+        return self.stack[self.sp]
+
+    def run_fast(self):
+        code = self.code
+        end = len(code)
+        executed = 0
+        try:
+            while self.ip < end:
+                handler, arg = code[self.ip]
+                self.ip += 1
+                executed += 1
+                handler(arg)
+        except Halted:
+            self.ip = end
+        finally:
+            self.executed += executed
+
+    def op_call(self, arg):
+        fn = self.compiled.get(arg)
+        if fn is None and self.jit:
+            fn = self.count_call(arg)
+        if fn is None or self.jit_depth >= MAX_DEPTH:
+            return super().op_call(arg)
+        sp = self.sp - self.function_infos[arg].arity
+        result = fn(*self.stack[sp:self.sp])
+        self.stack[sp] = result
+        self.sp = sp + 1
+
+    def op_jmp(self, arg):
+        # A backward jump closes a loop iteration
+        if arg < self.ip and self.jit:
+            count = self.loop_counts[arg] = self.loop_counts.get(arg, 0) + 1
+            if count >= self.loop_threshold and self.enter_loop(arg):
+                return
+        self.ip = arg
+
+    def enter_loop(self, header):
+        # On-stack replacement: run the rest of the current call compiled
+        if header not in self.owner or header in self.failed or self.jit_depth >= MAX_DEPTH:
+            return False
+        fn = self.loops.get(header) or self.compile_loop(header)
+        if fn is None:
+            return False
+        # The function's values on the stack start at its frame's base
+        base = self.call_stack[self.depth].base
+        result = fn(*self.frame, *self.stack[base:self.sp])
+        # Return to the caller, as the function's RET would
+        self.stack[base] = result
+        self.sp = base + 1
+        self.op_ret(None)
+        return True
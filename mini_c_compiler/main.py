@@ -4,17 +4,38 @@ from mini_c_compiler.lexer import Lexer
 from mini_c_compiler.parser import Parser
 from mini_c_compiler.semantic import SemanticAnalyzer
 from mini_c_compiler.ir import IRGenerator
-from mini_c_compiler.optimizer import Optimizer
-from mini_c_compiler.codegen import PythonCodeGenerator, AssemblyCodeGenerator
+from mini_c_compiler.optimizer import Optimizer, PASS_REGISTRY, OPT_LEVELS, DEFAULT_OPT_LEVEL
+from mini_c_compiler.codegen import (
+    PythonCodeGenerator, AssemblyCodeGenerator, BytecodeGenerator, RegisterCodeGenerator,
+)
+from mini_c_compiler.bytecode import Program, disassemble
 from mini_c_compiler.visualizer import ASTVisualizer
+from mini_c_compiler.pgo import ExecutionProfile
+from mini_c_compiler.ir_interpreter import IRProgram, ProgramError
+from mini_c_compiler.inprocess import CompiledProgram, CodeCache
+from mini_c_compiler.x86 import X86CodeGenerator, NativeBuildError, build_executable
 from mini_c_compiler.core.errors import CompilerError
 
-def compile_file(filename, output_file=None, verbose=True, target='python', visualize=False):
+def compile_file(filename, output_file=None, verbose=True, target='python', visualize=False,
+                 opt_level=DEFAULT_OPT_LEVEL, passes=None, stats=False, stats_json=None, profile=None,
+                 release=False):
     try:
         # Read source code
         with open(filename, 'r') as f:
             source_code = f.read()
-        
+    except OSError as e:
+        print(f"Unexpected Error: {e}")
+        return None
+
+    dot_file = os.path.splitext(filename)[0] + ".dot"
+    return compile_source(source_code, output_file, verbose=verbose, target=target,
+                          visualize=visualize, dot_file=dot_file, opt_level=opt_level, passes=passes,
+                          stats=stats, stats_json=stats_json, profile=profile, release=release)
+
+def compile_source(source_code, output_file=None, verbose=True, target='python', visualize=False,
+                   dot_file='ast.dot', opt_level=DEFAULT_OPT_LEVEL, passes=None, stats=False,
+                   stats_json=None, profile=None, release=False):
+    try:
         if verbose:
             print("=" * 60)
             print("SOURCE CODE:")
@@ -48,7 +69,6 @@ def compile_file(filename, output_file=None, verbose=True, target='python', visu
         if visualize:
             viz = ASTVisualizer()
             dot_content = viz.visualize(ast)
-            dot_file = os.path.splitext(filename)[0] + ".dot"
             with open(dot_file, 'w') as f:
                 f.write(dot_content)
             print(f"AST Visualization saved to: {dot_file}")
@@ -77,8 +97,8 @@ def compile_file(filename, output_file=None, verbose=True, target='python', visu
             print()
         
         # Optimization
-        optimizer = Optimizer(ir)
-        optimized_ir = optimizer.optimize()
+        optimizer = Optimizer(ir, profile=profile)
+        optimized_ir = optimizer.optimize(level=opt_level, passes=passes)
         
         if verbose:
             print("=" * 60)
@@ -88,11 +108,50 @@ def compile_file(filename, output_file=None, verbose=True, target='python', visu
                 print(instr)
             print()
         
+        if stats:
+            print("=" * 60)
+            print(f"OPTIMIZATION STATISTICS (-O{opt_level}):")
+            print("=" * 60)
+            print(optimizer.stats.format())
+            print()
+        
+        if stats_json:
+            with open(stats_json, 'w') as f:
+                f.write(optimizer.stats.to_json())
+        
+        # `--run` executes the optimized IR in-process: no code generation, no files
+        if target == 'run':
+            if verbose:
+                print("=" * 60)
+                print("PROGRAM OUTPUT:")
+                print("=" * 60)
+            IRProgram(optimized_ir).run()
+            return optimized_ir
+
         # Code Generation
         if target == 'asm':
-            codegen = AssemblyCodeGenerator(optimized_ir)
+            codegen = AssemblyCodeGenerator(optimized_ir, comments=not release)
             generated_code = codegen.generate()
             target_name = "ASSEMBLY CODE"
+            if stats:
+                print("=" * 60)
+                print("PEEPHOLE STATISTICS:")
+                print("=" * 60)
+                for rule, count in sorted(codegen.peephole_counts.items()):
+                    print(f"{rule:<20} {count:>6}")
+                print()
+        elif target == 'bytecode':
+            codegen = BytecodeGenerator(optimized_ir)
+            generated_code = codegen.generate()
+            target_name = "BYTECODE (DISASSEMBLED)"
+        elif target == 'register':
+            codegen = RegisterCodeGenerator(optimized_ir)
+            generated_code = codegen.generate()
+            target_name = "REGISTER CODE"
+        elif target == 'x86':
+            codegen = X86CodeGenerator(optimized_ir)
+            generated_code = codegen.generate()
+            target_name = "X86-64 ASSEMBLY"
         else:
             codegen = PythonCodeGenerator(optimized_ir)
             generated_code = codegen.generate()
@@ -102,52 +161,136 @@ def compile_file(filename, output_file=None, verbose=True, target='python', visu
             print("=" * 60)
             print(f"{target_name}:")
             print("=" * 60)
-            print(generated_code)
+            if target == 'bytecode':
+                print(disassemble(Program.from_buffer(generated_code)))
+            else:
+                print(generated_code)
             print()
         
         # Write to output file
         if output_file:
-            with open(output_file, 'w') as f:
+            with open(output_file, 'wb' if target == 'bytecode' else 'w') as f:
                 f.write(generated_code)
             if verbose:
                 print(f"Generated code written to: {output_file}")
+            if target == 'x86':
+                # Assembled and linked next to the .s file, without its extension
+                executable = build_executable(generated_code, os.path.splitext(output_file)[0])
+                if verbose:
+                    print(f"Executable written to: {executable}")
         
         return generated_code
         
     except CompilerError as e:
         print(f"Compilation Error: {e}")
         return None
+    except NativeBuildError as e:
+        print(f"Build Error: {e}")
+        return None
+    except ProgramError as e:
+        print(f"Runtime Error at instruction '{e.instruction}': {e}")
+        return None
     except Exception as e:
         print(f"Unexpected Error: {e}")
         import traceback
         traceback.print_exc()
         return None
 
+def exec_file(filename, opt_level=DEFAULT_OPT_LEVEL, passes=None, profile=None, cache=True):
+    """Run a program in-process as a Python code object, cached between runs unless `cache` is False."""
+    try:
+        with open(filename, 'r') as f:
+            source_code = f.read()
+        program = CompiledProgram.from_source(source_code, opt_level=opt_level, passes=passes,
+                                              profile=profile, cache=CodeCache() if cache else None,
+                                              filename=os.path.abspath(filename))
+    except CompilerError as e:
+        print(f"Compilation Error: {e}")
+        return None
+    except OSError as e:
+        print(f"Unexpected Error: {e}")
+        return None
+    try:
+        program.run()
+    except Exception as e:
+        print(f"Runtime Error: {e}")
+        return None
+    return program
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python main.py <input_file.c> [output_file] [--asm] [--viz]")
+        print("Usage: python main.py <input_file.c> [output_file] [--asm] [--bytecode] [--reg] [--x86] [--run] [--exec] [--no-cache] [--viz] "
+              "[-O0|-O1|-O2|-O3] [--passes=p1,p2,...] [--stats] [--stats-json=file] "
+              "[--profile-use=profile.json] [--release]")
         sys.exit(1)
     
     input_file = sys.argv[1]
     output_file = None
     target = 'python'
     visualize = False
+    opt_level = DEFAULT_OPT_LEVEL
+    passes = None
+    stats = False
+    stats_json = None
+    profile = None
+    release = False
+    cache = True
     
     # Parse args
     args = sys.argv[2:]
     for arg in args:
         if arg == '--asm':
             target = 'asm'
+        elif arg == '--bytecode':
+            target = 'bytecode'
+        elif arg == '--reg':
+            target = 'register'
+        elif arg == '--x86':
+            target = 'x86'
+        elif arg == '--run':
+            target = 'run'
+        elif arg == '--exec':
+            target = 'exec'
+        elif arg == '--no-cache':
+            cache = False
         elif arg == '--viz':
             visualize = True
+        elif arg.startswith('-O'):
+            level = arg[2:]
+            if not level.isdigit() or int(level) not in OPT_LEVELS:
+                print(f"Unknown optimization level '{arg}'")
+                sys.exit(1)
+            opt_level = int(level)
+        elif arg.startswith('--passes='):
+            passes = [p for p in arg[len('--passes='):].split(',') if p]
+            unknown = [p for p in passes if p not in PASS_REGISTRY]
+            if unknown:
+                print(f"Unknown pass(es): {', '.join(unknown)}")
+                print(f"Available passes: {', '.join(sorted(PASS_REGISTRY))}")
+                sys.exit(1)
+        elif arg == '--stats':
+            stats = True
+        elif arg.startswith('--stats-json='):
+            stats_json = arg[len('--stats-json='):]
+        elif arg.startswith('--profile-use='):
+            profile = ExecutionProfile.load(arg[len('--profile-use='):])
+        elif arg == '--release':
+            release = True
         elif not arg.startswith('--'):
             output_file = arg
             
-    if not output_file:
-        ext = '.asm' if target == 'asm' else '.py'
+    if target == 'exec':
+        exec_file(input_file, opt_level=opt_level, passes=passes, profile=profile, cache=cache)
+        return
+
+    if not output_file and target != 'run':
+        ext = {'asm': '.asm', 'bytecode': '.mcbc', 'register': '.rasm', 'x86': '.s'}.get(target, '.py')
         output_file = os.path.splitext(input_file)[0] + ext
     
-    compile_file(input_file, output_file, target=target, visualize=visualize)
+    # A run prints only what the program prints
+    compile_file(input_file, output_file, verbose=target != 'run', target=target, visualize=visualize,
+                 opt_level=opt_level, passes=passes, stats=stats, stats_json=stats_json,
+                 profile=profile, release=release)
 
 if __name__ == '__main__':
     main()
@@ -1,19 +1,200 @@
+import json
 import re
+import time
 
-class Optimizer:
-    def __init__(self, instructions):
-        self.instructions = instructions
+from mini_c_compiler.ir import (
+    parse_instruction, format_instruction, is_literal, parse_literal, instruction_uses,
+    instruction_def, replace_uses, split_functions, join_functions,
+)
+from mini_c_compiler.cfg import build_cfg, flatten_cfg, reachable_blocks
+from mini_c_compiler.interprocedural import (
+    summarize_functions, global_names, clone_function, NameAllocator, CallGraph,
+)
+from mini_c_compiler.ir_interpreter import IRInterpreter, EvaluationError, evaluate_binary, format_value
+from mini_c_compiler.pgo import inline_call, find_simple_loops, unroll_loop, layout_blocks
+
+# Registered passes: name -> callable(optimizer) returning True if it changed the IR.
+PASS_REGISTRY = {}
+
+# Built-in pipelines per optimization level: (pass names in order, max fixed-point
+# iterations). Never modified: see level_pipelines() for passes registered later.
+# Order matters: Propagation reveals Folding constants, Folding creates new Propagation opportunities
+OPT_LEVELS = {
+    0: ([], 0),
+    1: (['constant_propagation', 'constant_folding', 'dead_code_elimination'], 1),
+    2: (['constant_propagation', 'constant_folding', 'dead_code_elimination', 'evaluate_pure_calls',
+         'interprocedural_propagation', 'dead_function_elimination', 'inline_functions',
+         'unroll_loops', 'block_layout'], 10),
+    3: (['constant_propagation', 'variable_propagation', 'constant_folding', 'branch_folding',
+         'unreachable_code_elimination', 'dead_code_elimination', 'dead_store_elimination',
+         'evaluate_pure_calls', 'specialize_functions', 'interprocedural_propagation',
+         'dead_function_elimination', 'inline_functions', 'unroll_loops', 'block_layout'], 10),
+}
+
+DEFAULT_OPT_LEVEL = 2
+
+# Instructions a single compile-time call evaluation may execute before giving up
+EVALUATION_BUDGET = 10000
+
+# Function specialization: clones per compilation, and the largest body worth cloning
+SPECIALIZATION_BUDGET = 8
+SPECIALIZATION_MAX_SIZE = 200
+
+# Profile-guided optimization: calls per call site that make inlining pay off,
+# the largest callee inlined, and header executions that make a loop hot
+INLINE_MIN_CALLS = 50
+INLINE_MAX_SIZE = 40
+UNROLL_MIN_ITERATIONS = 100
+UNROLL_MAX_SIZE = 30
+
+# Lattice value for variables that are not a single known constant
+NOT_CONSTANT = object()
+
+# Passes registered with `levels`: name -> levels whose pipelines they join
+LEVEL_EXTENSIONS = {}
+
+def register_pass(name, func=None, levels=()):
+    """Register an optimization pass under `name`.
+
+    `func(optimizer)` must rewrite `optimizer.instructions` in place and return
+    True if anything changed. Passing `levels` also appends the pass to those
+    optimization level pipelines, for Optimizers created from now on (until
+    unregister_pass). Usable as a decorator when `func` is omitted.
+    """
+    for level in levels:
+        if level not in OPT_LEVELS:
+            raise ValueError(f"Unknown optimization level {level}")
+
+    def decorator(f):
+        PASS_REGISTRY[name] = f
+        if levels:
+            LEVEL_EXTENSIONS[name] = tuple(levels)
+        return f
+
+    if func is None:
+        return decorator
+    return decorator(func)
+
+def unregister_pass(name):
+    """Remove a pass added with register_pass, along with its place in the pipelines."""
+    if any(name in passes for passes, _ in OPT_LEVELS.values()):
+        raise ValueError(f"'{name}' is a built-in pass")
+    if name not in PASS_REGISTRY:
+        raise ValueError(f"Unknown optimization pass '{name}'")
+    del PASS_REGISTRY[name]
+    LEVEL_EXTENSIONS.pop(name, None)
+
+def level_pipelines():
+    """A fresh copy of every level's pipeline, with the registered passes appended."""
+    table = {level: (list(passes), max_iterations) for level, (passes, max_iterations) in OPT_LEVELS.items()}
+    for name, levels in LEVEL_EXTENSIONS.items():
+        for level in levels:
+            passes, max_iterations = table[level]
+            if name not in passes:
+                table[level] = (passes + [name], max(max_iterations, 1))
+    return table
+
+class PassStatistics:
+    def __init__(self):
+        self.passes = {} # name -> counters, in first-run order
+        self.iterations = 0
+        self.total_time = 0.0
+
+    def record(self, name, elapsed, before, after, changed):
+        entry = self.passes.setdefault(name, {
+            'runs': 0, 'changed': 0, 'time': 0.0, 'delta': 0,
+        })
+        entry['runs'] += 1
+        entry['time'] += elapsed
+        entry['delta'] += after - before
+        if changed:
+            entry['changed'] += 1
+        self.total_time += elapsed
+
+    def as_dict(self):
+        return {
+            'iterations': self.iterations,
+            'total_time': self.total_time,
+            'passes': {name: dict(entry) for name, entry in self.passes.items()},
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def format(self):
+        lines = [f"{'pass':<28} {'runs':>5} {'changed':>8} {'time (ms)':>10} {'delta':>7}"]
+        for name, entry in self.passes.items():
+            lines.append(
+                f"{name:<28} {entry['runs']:>5} {entry['changed']:>8} "
+                f"{entry['time'] * 1000:>10.3f} {entry['delta']:>+7}"
+            )
+        lines.append(f"{self.iterations} iteration(s), {self.total_time * 1000:.3f} ms total")
+        return "\n".join(lines)
+
+class PassManager:
+    def __init__(self, passes, max_iterations=10):
+        for name in passes:
+            if name not in PASS_REGISTRY:
+                raise ValueError(f"Unknown optimization pass '{name}'")
+        self.passes = list(passes)
+        self.max_iterations = max_iterations
+        self.stats = PassStatistics()
 
-    def optimize(self):
+    @classmethod
+    def for_level(cls, level, pipelines=None):
+        # `pipelines` is a table like level_pipelines()'s; by default the current one
+        if pipelines is None:
+            pipelines = level_pipelines()
+        if level not in pipelines:
+            raise ValueError(f"Unknown optimization level {level}")
+        passes, max_iterations = pipelines[level]
+        return cls(passes, max_iterations)
+
+    def run(self, optimizer):
+        # Re-run the whole pipeline until it reaches a fixed point (or the iteration cap)
         modified = True
-        pass_count = 0
-        while modified and pass_count < 10: # Avoid infinite loops
+        while modified and self.stats.iterations < self.max_iterations:
             modified = False
-            # Order matters: Propagation reveals Folding constants, Folding creates new Propagation opportunities
-            if self.constant_propagation(): modified = True
-            if self.constant_folding(): modified = True
-            if self.dead_code_elimination(): modified = True
-            pass_count += 1
+            for name in self.passes:
+                before = len(optimizer.instructions)
+                start = time.perf_counter()
+                changed = PASS_REGISTRY[name](optimizer)
+                elapsed = time.perf_counter() - start
+                self.stats.record(name, elapsed, before, len(optimizer.instructions), changed)
+                if changed:
+                    modified = True
+            self.stats.iterations += 1
+        return optimizer.instructions
+
+class Optimizer:
+    def __init__(self, instructions, entry_points=None, profile=None, pipelines=None):
+        self.instructions = instructions
+        # Level -> (passes, max iterations), taken when the optimizer is created
+        self.pipelines = level_pipelines() if pipelines is None else pipelines
+        # Functions callable from outside the program. Defaults to `main` when
+        # there is one; otherwise every function is kept and its signature left alone.
+        self.entry_points = entry_points
+        self.stats = PassStatistics()
+        self.evaluation_budget = EVALUATION_BUDGET
+        self.failed_evaluations = set() # (func, args) calls known not to evaluate
+        self.specialization_budget = SPECIALIZATION_BUDGET
+        self.specializations = {} # (func, constant signature) -> clone name
+        # Execution profile from a previous run (pgo.ExecutionProfile). The
+        # profile-guided passes do nothing without one.
+        self.profile = profile
+        self.inlined_calls = 0
+        self.unrolled = set() # Loop headers already unrolled
+
+    def optimize(self, level=DEFAULT_OPT_LEVEL, passes=None, max_iterations=None):
+        # An explicit pass list overrides the level's pipeline
+        if passes is not None:
+            manager = PassManager(passes, self.pipelines[level][1] or 1)
+        else:
+            manager = PassManager.for_level(level, self.pipelines)
+        if max_iterations is not None:
+            manager.max_iterations = max_iterations
+        manager.run(self)
+        self.stats = manager.stats
         return self.instructions
 
     def constant_propagation(self):
@@ -83,32 +264,21 @@ class Optimizer:
         return changed
 
     def constant_folding(self):
-        # Simple constant folding for binary ops: t1 = 5 + 10 -> t1 = 15
+        # Simple constant folding for arithmetic: t1 = 5 + 10 -> t1 = 15
         new_instructions = []
         changed = False
 
         for instr in self.instructions:
-            # Check for binary op with constants
-            # Format: tX = A op B
-            match = re.match(r"(\w+) = (\d+) ([\+\-\*\/]) (\d+)", instr)
-            if match:
-                target = match.group(1)
-                left = int(match.group(2))
-                op = match.group(3)
-                right = int(match.group(4))
-                
-                val = 0
-                if op == '+': val = left + right
-                elif op == '-': val = left - right
-                elif op == '*': val = left * right
-                elif op == '/': val = int(left / right) # Integer division
-                
-                new_instr = f"{target} = {val}"
-                if new_instr != instr:
-                    new_instructions.append(new_instr)
-                    changed = True
-                else:
-                    new_instructions.append(instr)
+            decoded = parse_instruction(instr)
+            folded = None
+
+            if (decoded[0] == 'binary' and decoded[3] in ('+', '-', '*', '/')
+                    and is_literal(decoded[2]) and is_literal(decoded[4])):
+                folded = self.fold_binary(decoded)
+
+            if folded is not None and folded != instr:
+                new_instructions.append(folded)
+                changed = True
             else:
                 new_instructions.append(instr)
         
@@ -116,6 +286,48 @@ class Optimizer:
             self.instructions = new_instructions
         return changed
 
+    def fold_binary(self, decoded):
+        try:
+            value = evaluate_binary(decoded[3], parse_literal(decoded[2]), parse_literal(decoded[4]))
+        except EvaluationError:
+            return None # e.g. division by zero: leave it for runtime
+        text = format_value(value)
+        return f"{decoded[1]} = {text}" if text is not None else None
+
+    def branch_folding(self):
+        # Fold comparisons and negation of constants (t2 = 3 > 1 -> t2 = 1)
+        # and branches on constants (IF_FALSE 0 GOTO L1 -> GOTO L1)
+        new_instructions = []
+        changed = False
+
+        for instr in self.instructions:
+            decoded = parse_instruction(instr)
+            folded = None
+
+            if (decoded[0] == 'binary' and decoded[3] not in ('+', '-', '*', '/')
+                    and is_literal(decoded[2]) and is_literal(decoded[4])):
+                folded = self.fold_binary(decoded)
+            elif decoded[0] == 'unary' and decoded[2] == '-' and is_literal(decoded[3]):
+                text = format_value(-parse_literal(decoded[3]))
+                if text is not None:
+                    folded = f"{decoded[1]} = {text}"
+            elif decoded[0] == 'if_false' and is_literal(decoded[1]):
+                if parse_literal(decoded[1]) == 0:
+                    folded = f"GOTO {decoded[2]}"
+                else:
+                    changed = True # Never taken: drop the branch
+                    continue
+
+            if folded is not None and folded != instr:
+                new_instructions.append(folded)
+                changed = True
+            else:
+                new_instructions.append(instr)
+
+        if changed:
+            self.instructions = new_instructions
+        return changed
+
     def dead_code_elimination(self):
         # Remove assignments to temps that are never used
         changed_overall = False
@@ -163,3 +375,484 @@ class Optimizer:
                 self.instructions = new_instructions
 
         return changed_overall
+
+    def variable_propagation(self):
+        # Constant propagation for function-local variables, driven by a
+        # forward data-flow analysis over each function's CFG so it stays
+        # correct across loops and branches.
+        global_code, functions = split_functions(self.instructions)
+        globals_ = global_names(global_code)
+        changed = False
+
+        for name, body in functions.items():
+            new_body = self.propagate_in_function(body, globals_)
+            if new_body != body:
+                functions[name] = new_body
+                changed = True
+
+        if changed:
+            self.instructions = join_functions(global_code, functions)
+        return changed
+
+    def propagate_in_function(self, body, globals_):
+        blocks = build_cfg(body)
+        decoded = [[parse_instruction(instr) for instr in block.instructions] for block in blocks]
+        tracked = set()
+        for block in decoded:
+            for instr in block:
+                target = instruction_def(instr)
+                if target and target not in globals_:
+                    tracked.add(target)
+
+        # State: variable -> literal text or NOT_CONSTANT; absent means not yet assigned
+        def transfer(state, instr):
+            target = instruction_def(instr)
+            if target in tracked:
+                value = NOT_CONSTANT
+                if instr[0] == 'copy':
+                    source = instr[2]
+                    value = source if is_literal(source) else state.get(source, NOT_CONSTANT)
+                state[target] = value
+
+        def meet(states):
+            merged = {}
+            for state in states:
+                for var, value in state.items():
+                    if var not in merged:
+                        merged[var] = value
+                    elif merged[var] != value:
+                        merged[var] = NOT_CONSTANT
+            return merged
+
+        entry_state = {instr[1]: NOT_CONSTANT for instr in decoded[0] if instr[0] == 'param'} if decoded else {}
+        out_states = [None] * len(blocks)
+        worklist = list(range(len(blocks)))
+        while worklist:
+            index = worklist.pop(0)
+            inputs = [out_states[p] for p in blocks[index].predecessors if out_states[p] is not None]
+            state = meet(([entry_state] if index == 0 else []) + inputs)
+            for instr in decoded[index]:
+                transfer(state, instr)
+            if state != out_states[index]:
+                out_states[index] = state
+                worklist.extend(s for s in blocks[index].successors if s not in worklist)
+
+        for index, block in enumerate(blocks):
+            inputs = [out_states[p] for p in block.predecessors if out_states[p] is not None]
+            state = meet(([entry_state] if index == 0 else []) + inputs)
+            rewritten = []
+            for instr in decoded[index]:
+                mapping = {}
+                for operand in instruction_uses(instr):
+                    value = state.get(operand, NOT_CONSTANT) if operand in tracked else NOT_CONSTANT
+                    if value is not NOT_CONSTANT:
+                        mapping[operand] = value
+                if mapping:
+                    instr = replace_uses(instr, mapping)
+                transfer(state, instr)
+                rewritten.append(format_instruction(instr))
+            block.instructions = rewritten
+        return flatten_cfg(blocks)
+
+    def unreachable_code_elimination(self):
+        # Drop blocks no path reaches, jumps to the very next instruction,
+        # and labels nothing jumps to.
+        global_code, functions = split_functions(self.instructions)
+        changed = False
+
+        for name, body in functions.items():
+            blocks = build_cfg(body)
+            reachable = reachable_blocks(blocks)
+            new_body = flatten_cfg([b for b in blocks if b.index in reachable])
+
+            simplified = True
+            while simplified:
+                simplified = False
+                targets = set()
+                for instr in new_body:
+                    decoded = parse_instruction(instr)
+                    if decoded[0] == 'goto':
+                        targets.add(decoded[1])
+                    elif decoded[0] == 'if_false':
+                        targets.add(decoded[2])
+
+                result = []
+                for i, instr in enumerate(new_body):
+                    decoded = parse_instruction(instr)
+                    following = new_body[i + 1] if i + 1 < len(new_body) else None
+                    if decoded[0] == 'label' and decoded[1] not in targets:
+                        simplified = True
+                        continue
+                    if decoded[0] in ('goto', 'if_false') and following == f"{decoded[-1]}:":
+                        simplified = True
+                        continue
+                    result.append(instr)
+                new_body = result
+
+            if new_body != body:
+                functions[name] = new_body
+                changed = True
+
+        if changed:
+            self.instructions = join_functions(global_code, functions)
+        return changed
+
+    def dead_store_elimination(self):
+        # Remove assignments to function-local variables that the function never reads
+        global_code, functions = split_functions(self.instructions)
+        globals_ = global_names(global_code)
+        changed = False
+
+        for name, body in functions.items():
+            decoded = [parse_instruction(instr) for instr in body]
+            used = {operand for instr in decoded for operand in instruction_uses(instr)}
+            new_body = []
+            for instr, dec in zip(body, decoded):
+                target = instruction_def(dec)
+                if (dec[0] in ('binary', 'unary', 'copy') and target not in used
+                        and target not in globals_):
+                    continue
+                new_body.append(instr)
+            if new_body != body:
+                functions[name] = new_body
+                changed = True
+
+        if changed:
+            self.instructions = join_functions(global_code, functions)
+        return changed
+
+    def evaluate_pure_calls(self):
+        # Replace `ARG c1 ... tN = CALL f` with `tN = <result>` when f only
+        # depends on its (constant) arguments, by running f at compile time.
+        summaries = summarize_functions(self.instructions)
+        if not any(s.const for s in summaries.values()):
+            return False
+
+        interpreter = None
+        new_instructions = []
+        changed = False
+
+        for instr in self.instructions:
+            decoded = parse_instruction(instr)
+            summary = summaries.get(decoded[2]) if decoded[0] == 'call' else None
+            if summary is None or not summary.const or decoded[1] is None:
+                new_instructions.append(instr)
+                continue
+
+            # The call's arguments are the ARGs emitted directly before it
+            count = len(summary.params)
+            arg_instrs = new_instructions[len(new_instructions) - count:]
+            args = [a.split()[1] for a in arg_instrs if a.startswith("ARG ")]
+            if len(args) != count or not all(is_literal(a) for a in args):
+                new_instructions.append(instr)
+                continue
+
+            key = (summary.name, tuple(args))
+            if key in self.failed_evaluations:
+                new_instructions.append(instr)
+                continue
+
+            if interpreter is None:
+                interpreter = IRInterpreter(self.instructions, max_steps=self.evaluation_budget)
+            try:
+                result = interpreter.call(summary.name, [parse_literal(a) for a in args])
+            except EvaluationError:
+                self.failed_evaluations.add(key)
+                new_instructions.append(instr)
+                continue
+
+            text = format_value(result)
+            if text is None:
+                self.failed_evaluations.add(key)
+                new_instructions.append(instr)
+                continue
+
+            del new_instructions[len(new_instructions) - count:]
+            new_instructions.append(f"{decoded[1]} = {text}")
+            changed = True
+
+        if changed:
+            self.instructions = new_instructions
+        return changed
+
+    def specialize_functions(self):
+        # Clone a function for each distinct pattern of constant arguments at
+        # its call sites, so propagation and folding can work inside the clone.
+        global_code, functions = split_functions(self.instructions)
+        params = {name: [i.split()[1] for i in body if i.startswith("PARAM ")]
+                  for name, body in functions.items()}
+        names = NameAllocator(self.instructions)
+        clones = {} # original name -> [(clone name, body)]
+        changed = False
+
+        def rewrite(body):
+            nonlocal changed
+            out = []
+            for instr in body:
+                decoded = parse_instruction(instr)
+                callee = decoded[2] if decoded[0] == 'call' else None
+                count = len(params.get(callee, []))
+                if callee not in functions or callee == 'main' or count == 0:
+                    out.append(instr)
+                    continue
+
+                args = [a.split()[1] for a in out[len(out) - count:] if a.startswith("ARG ")]
+                if len(args) != count or not any(is_literal(a) for a in args):
+                    out.append(instr)
+                    continue
+
+                signature = tuple(a if is_literal(a) else None for a in args)
+                clone = self.specializations.get((callee, signature))
+                if clone is None or (clone not in functions and
+                                     all(clone != c for c, _ in clones.get(callee, []))):
+                    if clone is None and len(self.specializations) >= self.specialization_budget:
+                        out.append(instr)
+                        continue
+                    if len(functions[callee]) > SPECIALIZATION_MAX_SIZE:
+                        out.append(instr)
+                        continue
+                    if clone is None:
+                        clone = f"{callee}__spec{len(self.specializations) + 1}"
+                        while clone in functions:
+                            clone += "_"
+                        self.specializations[(callee, signature)] = clone
+                    body_copy = clone_function(functions[callee], signature, names)
+                    clones.setdefault(callee, []).append((clone, body_copy))
+
+                del out[len(out) - count:]
+                out.extend(f"ARG {a}" for a, const in zip(args, signature) if const is None)
+                out.append(format_instruction(('call', decoded[1], clone)))
+                changed = True
+            return out
+
+        global_code = rewrite(global_code)
+        for name in list(functions):
+            functions[name] = rewrite(functions[name])
+
+        if changed:
+            ordered = {}
+            for name, body in functions.items():
+                ordered[name] = body
+                for clone, clone_body in clones.get(name, []):
+                    ordered[clone] = clone_body
+            self.instructions = join_functions(global_code, ordered)
+        return changed
+
+    def program_entry_points(self, functions):
+        if self.entry_points is not None:
+            return set(self.entry_points)
+        if 'main' in functions:
+            return {'main'}
+        return set(functions)
+
+    def interprocedural_propagation(self):
+        # Use whole-program knowledge of call sites and callee summaries:
+        #  - a parameter that receives the same constant at every call site
+        #    becomes a local constant and stops being passed;
+        #  - a call to a function that always returns the same constant yields
+        #    that constant (the call itself is dropped if the callee is pure);
+        #  - a call to a pure function whose result is unused is dropped.
+        global_code, functions = split_functions(self.instructions)
+        entry_points = self.program_entry_points(functions)
+        summaries = summarize_functions(self.instructions)
+        params = {name: summary.params for name, summary in summaries.items()}
+        sections = [global_code] + list(functions.values())
+
+        # 1. Collect the arguments of every call site
+        sites = {name: [] for name in functions}
+        for body in sections:
+            for i, instr in enumerate(body):
+                decoded = parse_instruction(instr)
+                if decoded[0] != 'call' or decoded[2] not in functions:
+                    continue
+                count = len(params[decoded[2]])
+                args = [a.split()[1] for a in body[max(i - count, 0):i] if a.startswith("ARG ")]
+                sites[decoded[2]].append(args if len(args) == count else None)
+
+        constant_params = {} # function -> {param index: literal}
+        for name, calls in sites.items():
+            if name in entry_points or not calls or any(args is None for args in calls):
+                continue
+            bound = {}
+            for index in range(len(params[name])):
+                values = {args[index] for args in calls}
+                if len(values) == 1 and is_literal(next(iter(values))):
+                    bound[index] = values.pop()
+            if bound:
+                constant_params[name] = bound
+
+        # 2. Rewrite call sites
+        def rewrite(body):
+            out = []
+            substitutions = {}
+            for instr in body:
+                decoded = parse_instruction(instr)
+                callee = decoded[2] if decoded[0] == 'call' else None
+                if callee not in functions:
+                    out.append(instr)
+                    continue
+                summary = summaries[callee]
+                count = len(summary.params)
+
+                if summary.pure and summary.return_value is not None and decoded[1]:
+                    del out[len(out) - count:]
+                    out.append(f"{decoded[1]} = {summary.return_value}")
+                    continue
+                if summary.return_value is not None and decoded[1]:
+                    substitutions[decoded[1]] = summary.return_value
+
+                bound = constant_params.get(callee)
+                if bound:
+                    arg_instrs = out[len(out) - count:]
+                    del out[len(out) - count:]
+                    out.extend(a for i, a in enumerate(arg_instrs) if i not in bound)
+                out.append(instr)
+
+            if substitutions:
+                out = [format_instruction(replace_uses(parse_instruction(instr), substitutions)) for instr in out]
+
+            # Calls to pure functions whose result nobody reads
+            used = {operand for instr in out for operand in instruction_uses(parse_instruction(instr))}
+            result = []
+            for instr in out:
+                decoded = parse_instruction(instr)
+                if (decoded[0] == 'call' and decoded[2] in summaries and summaries[decoded[2]].pure
+                        and decoded[1] not in used):
+                    passed = len(params[decoded[2]]) - len(constant_params.get(decoded[2], {}))
+                    del result[len(result) - passed:]
+                    continue
+                result.append(instr)
+            return result
+
+        new_global_code = rewrite(global_code)
+        new_functions = {}
+        for name, body in functions.items():
+            body = rewrite(body)
+            bound = constant_params.get(name)
+            if bound:
+                # PARAM p -> p = <constant>, after the parameters that remain
+                remaining = [f"PARAM {p}" for i, p in enumerate(params[name]) if i not in bound]
+                assigned = [f"{params[name][i]} = {value}" for i, value in sorted(bound.items())]
+                body = remaining + assigned + [instr for instr in body if not instr.startswith("PARAM ")]
+            new_functions[name] = body
+
+        new_instructions = join_functions(new_global_code, new_functions)
+        if new_instructions != join_functions(global_code, functions):
+            self.instructions = new_instructions
+            return True
+        return False
+
+    def dead_function_elimination(self):
+        # Drop functions that neither an entry point nor a global initializer can reach
+        global_code, functions = split_functions(self.instructions)
+        live = CallGraph(self.instructions).reachable(self.program_entry_points(functions))
+        if all(name in live for name in functions):
+            return False
+        self.instructions = join_functions(global_code, {n: b for n, b in functions.items() if n in live})
+        return True
+
+    def inline_functions(self):
+        # Inline call sites the profile shows to be hot. Recursive callees,
+        # callees that write globals or read a name the caller assigns, and
+        # code outside functions are left alone.
+        if self.profile is None:
+            return False
+        global_code, functions = split_functions(self.instructions)
+        globals_ = global_names(global_code)
+        summaries = summarize_functions(self.instructions)
+        graph = CallGraph(self.instructions)
+        names = NameAllocator(self.instructions)
+        changed = False
+
+        for caller, body in list(functions.items()):
+            assigned = {instruction_def(parse_instruction(instr)) for instr in body}
+            out = []
+            for instr in body:
+                decoded = parse_instruction(instr)
+                callee = decoded[2] if decoded[0] == 'call' else None
+                if (callee not in functions or callee == caller
+                        or self.profile.call_count(caller, callee) < INLINE_MIN_CALLS):
+                    out.append(instr)
+                    continue
+                callee_body = functions[callee]
+                summary = summaries[callee]
+                if (len(callee_body) > INLINE_MAX_SIZE or graph.is_recursive(callee)
+                        or summary.writes_globals or summary.reads_globals & assigned
+                        or not callee_body or not callee_body[-1].startswith("RETURN")):
+                    out.append(instr)
+                    continue
+
+                count = len(summary.params)
+                args = [a.split()[1] for a in out[len(out) - count:] if a.startswith("ARG ")]
+                if len(args) != count:
+                    out.append(instr)
+                    continue
+                del out[len(out) - count:]
+                self.inlined_calls += 1
+                out.extend(inline_call(callee_body, args, decoded[1], globals_, names,
+                                       f"__i{self.inlined_calls}"))
+                changed = True
+            functions[caller] = out
+
+        if changed:
+            self.instructions = join_functions(global_code, functions)
+        return changed
+
+    def unroll_loops(self):
+        # Unroll small innermost loops whose header the profile shows to be hot
+        if self.profile is None:
+            return False
+        global_code, functions = split_functions(self.instructions)
+        names = NameAllocator(self.instructions)
+        changed = False
+
+        for name, body in functions.items():
+            # Last loop first, so the indexes of earlier loops stay valid
+            for loop in reversed(find_simple_loops(body)):
+                header = body[loop[0]][:-1]
+                if (header in self.unrolled or loop[2] - loop[0] > UNROLL_MAX_SIZE
+                        or self.profile.block_count(header) < UNROLL_MIN_ITERATIONS):
+                    continue
+                body = unroll_loop(body, loop, names)
+                self.unrolled.add(header)
+                changed = True
+            functions[name] = body
+
+        if changed:
+            self.instructions = join_functions(global_code, functions)
+        return changed
+
+    def block_layout(self):
+        # Move blocks the profile never reached out of the hot path
+        if self.profile is None:
+            return False
+        global_code, functions = split_functions(self.instructions)
+        names = NameAllocator(self.instructions)
+        changed = False
+
+        for name, body in functions.items():
+            if self.profile.function_count(name) == 0:
+                continue # No information about this function
+            new_body = layout_blocks(body, self.profile, names)
+            if new_body != body:
+                functions[name] = new_body
+                changed = True
+
+        if changed:
+            self.instructions = join_functions(global_code, functions)
+        return changed
+
+register_pass('constant_propagation', Optimizer.constant_propagation)
+register_pass('constant_folding', Optimizer.constant_folding)
+register_pass('branch_folding', Optimizer.branch_folding)
+register_pass('dead_code_elimination', Optimizer.dead_code_elimination)
+register_pass('evaluate_pure_calls', Optimizer.evaluate_pure_calls)
+register_pass('variable_propagation', Optimizer.variable_propagation)
+register_pass('unreachable_code_elimination', Optimizer.unreachable_code_elimination)
+register_pass('dead_store_elimination', Optimizer.dead_store_elimination)
+register_pass('specialize_functions', Optimizer.specialize_functions)
+register_pass('interprocedural_propagation', Optimizer.interprocedural_propagation)
+register_pass('dead_function_elimination', Optimizer.dead_function_elimination)
+register_pass('inline_functions', Optimizer.inline_functions)
+register_pass('unroll_loops', Optimizer.unroll_loops)
+register_pass('block_layout', Optimizer.block_layout)
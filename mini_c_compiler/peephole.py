@@ -0,0 +1,279 @@
+from mini_c_compiler.ir import is_literal
+
+class Rule:
+    """Rewrite a window of consecutive assembly instructions.
+
+    `pattern` lists the opcode (or set of opcodes) each instruction in the
+    window must have. `rewrite(window)` gets the matched (opcode, operand)
+    pairs and returns their replacement, or None to leave them alone.
+    """
+
+    def __init__(self, name, pattern, rewrite):
+        self.name = name
+        self.pattern = [{op} if isinstance(op, str) else set(op) for op in pattern]
+        self.rewrite = rewrite
+
+    def match(self, instructions, start):
+        if start + len(self.pattern) > len(instructions):
+            return None
+        window = instructions[start:start + len(self.pattern)]
+        if any(instr.op not in ops for instr, ops in zip(window, self.pattern)):
+            return None
+        return self.rewrite([(instr.op, instr.operand) for instr in window])
+
+class Instruction:
+    def __init__(self, op, operand=None, comments=None):
+        self.op = op
+        self.operand = operand
+        self.comments = comments or [] # `; ...` lines emitted before the instruction
+
+    def text(self):
+        return self.op if self.operand is None else f"{self.op} {self.operand}"
+
+def parse_assembly(code):
+    """Split assembly into blocks of instructions, one per label.
+
+    Returns [(label or None, [Instruction])]. Comments stick to the
+    instruction that follows them, so rules can see through them.
+    """
+    blocks = [(None, [])]
+    comments = []
+    for line in code.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith(';'):
+            comments.append(stripped)
+        elif stripped.endswith(':'):
+            blocks.append((stripped[:-1], []))
+        else:
+            parts = stripped.split(None, 1)
+            blocks[-1][1].append(Instruction(parts[0], parts[1] if len(parts) > 1 else None, comments))
+            comments = []
+    if comments:
+        blocks[-1][1].append(Instruction(None, None, comments)) # Trailing comments
+    return blocks
+
+def format_assembly(blocks):
+    lines = []
+    for label, instructions in blocks:
+        if label is not None:
+            lines.append(f"{label}:")
+        for instr in instructions:
+            lines.extend(instr.comments)
+            if instr.op is not None:
+                lines.append(instr.text())
+    return "\n".join(lines)
+
+def apply_rules(instructions, rules, counts=None):
+    """One left-to-right pass over a label-free run of instructions.
+
+    At each position the first matching rule wins, so longer patterns
+    should come first. `counts` (a dict) receives how often each rule fired.
+    """
+    out = []
+    i = 0
+    while i < len(instructions):
+        for rule in rules:
+            replacement = rule.match(instructions, i)
+            if replacement is None:
+                continue
+            window = instructions[i:i + len(rule.pattern)]
+            comments = [c for instr in window for c in instr.comments]
+            new = [Instruction(op, operand) for op, operand in replacement]
+            if new:
+                new[0].comments = comments
+            elif comments:
+                new = [Instruction(None, None, comments)]
+            out.extend(new)
+            i += len(rule.pattern)
+            if counts is not None:
+                counts[rule.name] = counts.get(rule.name, 0) + 1
+            break
+        else:
+            out.append(instructions[i])
+            i += 1
+    return out
+
+def optimize_assembly(code, rules, counts=None):
+    blocks = parse_assembly(code)
+    return format_assembly([(label, apply_rules(instrs, rules, counts)) for label, instrs in blocks])
+
+# Superinstructions. Chosen from executed-sequence counts over the benchmark
+# programs and examples at -O2 (`python -m mini_c_compiler.benchmarks.superinstructions`):
+# compare + JZ, LOAD_LOCAL/PUSH 1/ADD/STORE_LOCAL, PUSH c + ADD/SUB/MUL and
+# LOAD_LOCAL + ADD were the most frequent fusable sequences.
+
+COMPARISONS = {'EQ': '==', 'NEQ': '!=', 'GT': '>', 'LT': '<', 'GTE': '>=', 'LTE': '<='}
+# Jump taken when `a op b` holds, and when it doesn't
+JUMP_IF = {'EQ': 'JEQ', 'NEQ': 'JNE', 'GT': 'JGT', 'LT': 'JLT', 'GTE': 'JGE', 'LTE': 'JLE'}
+JUMP_UNLESS = {'EQ': 'JNE', 'NEQ': 'JEQ', 'GT': 'JLE', 'LT': 'JGE', 'GTE': 'JLT', 'LTE': 'JGT'}
+
+def fuse_compare_jump(window):
+    (compare, _), (jump, label) = window
+    table = JUMP_UNLESS if jump == 'JZ' else JUMP_IF
+    return [(table[compare], label)]
+
+def fuse_increment(window):
+    (_, slot), (_, value), _, (_, target) = window
+    if slot != target or value != '1':
+        return None
+    return [('INC_LOCAL', slot)]
+
+def fuse_increment_and_load(window):
+    # The incremented value is also used right away (DUP + STORE)
+    replacement = fuse_increment(window[:3] + window[4:])
+    return replacement and replacement + [('LOAD_LOCAL', window[0][1])]
+
+def fuse_constant_operand(window):
+    (_, value), (op, _) = window
+    if not is_literal(value):
+        return None
+    return [(f"{op}_CONST", value)]
+
+def fuse_local_operand(window):
+    (_, slot), _ = window
+    return [('ADD_LOCAL', slot)]
+
+SUPERINSTRUCTION_RULES = [
+    Rule('increment_local', ['LOAD_LOCAL', 'PUSH', 'ADD', 'STORE_LOCAL'], fuse_increment),
+    Rule('increment_local', ['LOAD_LOCAL', 'PUSH', 'ADD', 'DUP', 'STORE_LOCAL'], fuse_increment_and_load),
+    Rule('compare_and_jump', [COMPARISONS, ('JZ', 'JNZ')], fuse_compare_jump),
+    Rule('constant_operand', ['PUSH', ('ADD', 'SUB', 'MUL')], fuse_constant_operand),
+    Rule('local_operand', ['LOAD_LOCAL', 'ADD'], fuse_local_operand),
+]
+
+def select_superinstructions(code, rules=SUPERINSTRUCTION_RULES, counts=None):
+    return optimize_assembly(code, rules, counts)
+
+# Cleanup rules. Each takes the blocks from parse_assembly, rewrites them in
+# place and returns how many rewrites it made.
+
+STORE_LOAD = {'STORE_LOCAL': 'LOAD_LOCAL', 'STORE_GLOBAL': 'LOAD_GLOBAL', 'STORE': 'PUSH'}
+
+def fuse_store_load(window):
+    (store, name), (load, operand) = window
+    if STORE_LOAD[store] != load and not (store == 'STORE' and load == 'LOAD'):
+        return None
+    if operand != name:
+        return None
+    return [('DUP', None), (store, name)]
+
+STORE_LOAD_RULES = [Rule('store_load', [STORE_LOAD, ('LOAD_LOCAL', 'LOAD_GLOBAL', 'PUSH', 'LOAD')], fuse_store_load)]
+
+def store_then_load(blocks):
+    counts = {}
+    for index, (label, instructions) in enumerate(blocks):
+        blocks[index] = (label, apply_rules(instructions, STORE_LOAD_RULES, counts))
+    return counts.get('store_load', 0)
+
+UNCONDITIONAL = {'JMP', 'RET', 'HALT'}
+JUMP_POPS = {'JZ': 1, 'JNZ': 1, 'JEQ': 2, 'JNE': 2, 'JGT': 2, 'JLT': 2, 'JGE': 2, 'JLE': 2}
+
+def is_jump(instr):
+    return instr.op == 'JMP' or instr.op in JUMP_POPS
+
+def first_instruction(blocks, label):
+    # What runs first once control reaches `label`, looking through empty blocks
+    start = next(i for i, block in enumerate(blocks) if block[0] == label)
+    for _, instructions in blocks[start:]:
+        for instr in instructions:
+            if instr.op is not None:
+                return instr
+    return None
+
+def thread_jumps(blocks):
+    """Jumps to a JMP go straight to its target; a JMP to RET or HALT becomes it."""
+    labels = {label for label, _ in blocks}
+    rewrites = 0
+    for _, instructions in blocks:
+        for instr in instructions:
+            if not is_jump(instr) or instr.operand not in labels:
+                continue
+            seen = {instr.operand}
+            target = first_instruction(blocks, instr.operand)
+            while target is not None and target.op == 'JMP' and target.operand not in seen:
+                seen.add(target.operand)
+                instr.operand = target.operand
+                rewrites += 1
+                target = first_instruction(blocks, instr.operand)
+            if instr.op == 'JMP' and target is not None and target.op in ('RET', 'HALT'):
+                instr.op, instr.operand = target.op, None
+                rewrites += 1
+    return rewrites
+
+def remove_jumps_to_next(blocks):
+    """Drop jumps to the label that follows them (conditional ones still pop)."""
+    rewrites = 0
+    for index, (_, instructions) in enumerate(blocks):
+        real = [instr for instr in instructions if instr.op is not None]
+        if not real or not is_jump(real[-1]):
+            continue
+        following = set()
+        for label, next_instructions in blocks[index + 1:]:
+            following.add(label)
+            if any(instr.op is not None for instr in next_instructions):
+                break
+        jump = real[-1]
+        if jump.operand in following:
+            position = instructions.index(jump)
+            pops = [Instruction('POP') for _ in range(JUMP_POPS.get(jump.op, 0))]
+            if pops:
+                pops[0].comments = jump.comments
+            elif jump.comments:
+                pops = [Instruction(None, None, jump.comments)]
+            instructions[position:position + 1] = pops
+            rewrites += 1
+    return rewrites
+
+def remove_dead_code(blocks):
+    """Drop instructions after a JMP, RET or HALT up to the next label."""
+    rewrites = 0
+    for _, instructions in blocks:
+        for position, instr in enumerate(instructions):
+            if instr.op in UNCONDITIONAL:
+                rewrites += sum(1 for dead in instructions[position + 1:] if dead.op is not None)
+                del instructions[position + 1:]
+                break
+    return rewrites
+
+PEEPHOLE_RULES = {
+    'store_load': store_then_load,
+    'thread_jumps': thread_jumps,
+    'jump_to_next': remove_jumps_to_next,
+    'dead_code': remove_dead_code,
+}
+
+class PeepholeOptimizer:
+    """Runs the cleanup rules named in `rules` (all by default) over assembly
+    until none of them applies. `counts` records how often each one fired.
+
+    With `strip_comments` (release builds) the `; ...` lines are dropped too.
+    """
+
+    def __init__(self, rules=None, strip_comments=False, max_rounds=10):
+        self.rules = list(PEEPHOLE_RULES) if rules is None else list(rules)
+        unknown = [name for name in self.rules if name not in PEEPHOLE_RULES]
+        if unknown:
+            raise ValueError(f"Unknown peephole rule(s): {', '.join(unknown)}")
+        self.strip_comments = strip_comments
+        self.max_rounds = max_rounds
+        self.counts = {}
+
+    def optimize(self, code):
+        blocks = parse_assembly(code)
+        if self.strip_comments:
+            for _, instructions in blocks:
+                for instr in instructions:
+                    instr.comments = []
+                instructions[:] = [instr for instr in instructions if instr.op is not None]
+        for _ in range(self.max_rounds):
+            changed = False
+            for name in self.rules:
+                rewrites = PEEPHOLE_RULES[name](blocks)
+                if rewrites:
+                    self.counts[name] = self.counts.get(name, 0) + rewrites
+                    changed = True
+            if not changed:
+                break
+        return format_assembly(blocks)
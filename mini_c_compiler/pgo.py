@@ -0,0 +1,196 @@
+import json
+
+from mini_c_compiler.cfg import build_cfg, flatten_cfg
+from mini_c_compiler.ir import (
+    parse_instruction, format_instruction, is_temp, instruction_uses, instruction_def,
+)
+from mini_c_compiler.interprocedural import rename_instruction
+
+class ExecutionProfile:
+    """Execution counts recorded by the VM, keyed by assembly labels.
+
+    Assembly labels are the IR labels and function names, so a profile taken
+    from one build can steer the optimizer in the next build of the same
+    source at the same optimization level.
+    """
+
+    def __init__(self, blocks=None, calls=None, functions=None):
+        self.blocks = dict(blocks or {})       # label -> times control reached it (0 if never)
+        self.calls = dict(calls or {})         # "caller->callee" -> number of calls
+        self.functions = dict(functions or {}) # function -> number of invocations
+
+    def block_count(self, label):
+        return self.blocks.get(label, 0)
+
+    def call_count(self, caller, callee):
+        return self.calls.get(f"{caller}->{callee}", 0)
+
+    def function_count(self, name):
+        return self.functions.get(name, 0)
+
+    def merge(self, other):
+        for mine, theirs in ((self.blocks, other.blocks), (self.calls, other.calls),
+                             (self.functions, other.functions)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+
+    def as_dict(self):
+        return {'blocks': self.blocks, 'calls': self.calls, 'functions': self.functions}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(data.get('blocks'), data.get('calls'), data.get('functions'))
+
+def local_names(body, globals_):
+    names = set()
+    for instr in body:
+        target = instruction_def(parse_instruction(instr))
+        if target and target not in globals_:
+            names.add(target)
+    return names
+
+def inline_call(callee_body, args, dest, globals_, names, suffix):
+    """IR replacing `ARG args...; dest = CALL callee` with the callee's body.
+
+    Temps and labels are renamed fresh, and the callee's locals get `suffix`
+    appended so they cannot clash with the caller's variables. Each RETURN
+    becomes an assignment to `dest` and a jump past the inlined code, so the
+    callee must end with a RETURN (no path may fall off its end).
+    """
+    decoded_body = [parse_instruction(instr) for instr in callee_body]
+    params = [d[1] for d in decoded_body if d[0] == 'param']
+    assigned = {instruction_def(d) for d in decoded_body if d[0] != 'param'}
+
+    # A parameter the callee never assigns is just another name for its argument
+    renames = {}
+    code = []
+    for param, arg in zip(params, args):
+        if param in assigned:
+            renames[param] = f"{param}{suffix}"
+            code.append(f"{renames[param]} = {arg}")
+        else:
+            renames[param] = arg
+
+    # Temps are assigned once, so several RETURNs go through a variable, while
+    # a single returned temp can be computed straight into `dest`
+    returns = [d for d in decoded_body if d[0] == 'return']
+    result = dest
+    if dest is not None and len(returns) > 1:
+        result = f"ret{suffix}"
+    elif dest is not None and returns[0][1] is not None and is_temp(returns[0][1]):
+        renames[returns[0][1]] = dest
+
+    labels = {}
+    for name in local_names(callee_body, globals_):
+        if name not in renames:
+            renames[name] = names.new_temp() if is_temp(name) else f"{name}{suffix}"
+    for decoded in decoded_body:
+        if decoded[0] == 'label':
+            labels[decoded[1]] = names.new_label()
+        for operand in instruction_uses(decoded):
+            if is_temp(operand) and operand not in renames:
+                renames[operand] = names.new_temp()
+    end_label = names.new_label()
+
+    for index, decoded in enumerate(decoded_body):
+        if decoded[0] == 'param':
+            continue
+        if decoded[0] == 'return':
+            value = renames.get(decoded[1], decoded[1]) if decoded[1] is not None else '0'
+            if result is not None and value != result:
+                code.append(f"{result} = {value}")
+            if index + 1 < len(decoded_body):
+                code.append(f"GOTO {end_label}")
+            continue
+        code.append(format_instruction(rename_instruction(decoded, renames, labels)))
+    if len(returns) > 1:
+        code.append(f"{end_label}:")
+    if result != dest:
+        code.append(f"{dest} = {result}")
+    return code
+
+def find_simple_loops(body):
+    """Innermost `while` loops as (header index, exit test index, back jump index).
+
+    Only loops shaped like the IRGenerator's output with no labels inside
+    (so no nested control flow) qualify.
+    """
+    loops = []
+    for start, instr in enumerate(body):
+        if not instr.endswith(':'):
+            continue
+        header = instr[:-1]
+        test = None
+        for i in range(start + 1, len(body)):
+            decoded = parse_instruction(body[i])
+            if decoded[0] == 'label':
+                break
+            if decoded[0] == 'if_false':
+                if test is not None:
+                    break
+                test = i
+            elif decoded[0] == 'goto':
+                exit_label = parse_instruction(body[test])[2] if test is not None else None
+                if (decoded[1] == header and test is not None and i + 1 < len(body)
+                        and body[i + 1] == f"{exit_label}:"):
+                    loops.append((start, test, i))
+                break
+            elif decoded[0] == 'return':
+                break
+    return loops
+
+def unroll_loop(body, loop, names):
+    """Unroll a simple loop once: the test and body are duplicated in the
+    loop, halving the number of back jumps."""
+    start, test, back = loop
+    region = body[start + 1:back]
+    temps = {}
+    for instr in region:
+        decoded = parse_instruction(instr)
+        for name in instruction_uses(decoded) + [instruction_def(decoded)]:
+            if name and is_temp(name) and name not in temps:
+                temps[name] = names.new_temp()
+    copy = [format_instruction(rename_instruction(parse_instruction(i), temps, {})) for i in region]
+    return body[:back] + copy + body[back:]
+
+def layout_blocks(body, profile, names):
+    """Move blocks the profile never reached to the end of the function.
+
+    Labels the profile does not know (e.g. created by inlining) are not cold.
+    Blocks that lose their fall-through successor get an explicit GOTO, and
+    a GOTO whose target ends up right after it is dropped.
+    """
+    blocks = build_cfg(body)
+    cold = [b for b in blocks[1:] if b.label in profile.blocks and profile.blocks[b.label] == 0]
+    if not cold:
+        return body
+    cold_indexes = {b.index for b in cold}
+    order = [b for b in blocks if b.index not in cold_indexes] + cold
+    if [b.index for b in order] == [b.index for b in blocks]:
+        return body
+    last = blocks[-1].terminator()
+    if order[-1] is not blocks[-1] and (last is None or last[0] not in ('goto', 'return')):
+        return body # Code that falls off the end of the function must stay last
+
+    for position, block in enumerate(order):
+        following = order[position + 1] if position + 1 < len(order) else None
+        term = block.terminator()
+        if term is not None and term[0] == 'goto':
+            if following is not None and following.label == term[1]:
+                block.instructions.pop() # The jump target now comes next
+            continue
+        if (term is not None and term[0] == 'return') or block.index + 1 >= len(blocks):
+            continue
+        successor = blocks[block.index + 1]
+        if following is successor:
+            continue
+        if successor.label is None:
+            successor.label = names.new_label()
+        block.instructions.append(f"GOTO {successor.label}")
+    return flatten_cfg(order)
@@ -0,0 +1,378 @@
+"""Register-based virtual machine.
+
+Runs the three-address code emitted by RegisterCodeGenerator (codegen.py).
+Instructions name their operands, so `x = a + b` is a single `ADD r2, r0, r1`
+where the stack VM dispatches PUSH, PUSH, ADD and STORE.
+
+Registers are slots of the current function's frame. At load time every
+literal gets a register of its own after the function's variables, and each
+function gets a frame template with the constants already in place: a call
+copies the template, so no operand needs decoding at run time.
+"""
+import io
+import re
+import sys
+
+from mini_c_compiler.ir import is_literal, parse_literal
+from mini_c_compiler.ir_interpreter import ProgramError
+from mini_c_compiler.streams import InputReader, OutputSink
+
+# Operand kinds, by mnemonic: r = register, s = register or literal,
+# g = global slot, l = label, f = function, n = count. CALL's arguments
+# follow the function, one source per callee parameter.
+SIGNATURES = {
+    'ENTER': 'n', 'MOVE': 'rs', 'NEG': 'rs', 'CHECK': 'r',
+    'ADD': 'rss', 'SUB': 'rss', 'MUL': 'rss', 'DIV': 'rss',
+    'EQ': 'rss', 'NEQ': 'rss', 'GT': 'rss', 'LT': 'rss', 'GTE': 'rss', 'LTE': 'rss',
+    'GET_GLOBAL': 'rg', 'SET_GLOBAL': 'gs',
+    'JMP': 'l', 'JZ': 'sl',
+    'JEQ': 'ssl', 'JNE': 'ssl', 'JGT': 'ssl', 'JLT': 'ssl', 'JGE': 'ssl', 'JLE': 'ssl',
+    'CALL': 'rf', 'RET': 's', 'PRINT': 's', 'READ': 'r', 'HALT': '',
+}
+
+REGISTER = re.compile(r"r(\d+)$")
+GLOBAL = re.compile(r"g(\d+)$")
+
+class RegisterCodeError(Exception):
+    pass
+
+class FrameLayout:
+    """Registers of one function: its variables, then its constants."""
+
+    def __init__(self, entry, size):
+        self.entry = entry   # IP of the function's ENTER
+        self.size = size     # Variable registers
+        self.constants = {}  # Literal -> register
+        self.template = None # Initial frame: size Nones, then the constants
+
+    def constant(self, literal):
+        if literal not in self.constants:
+            self.constants[literal] = self.size + len(self.constants)
+        return self.constants[literal]
+
+class RegisterVM:
+    def __init__(self, stdin=None, stdout=None, flush_policy=None):
+        self.code = []          # (handler, operands) per instruction
+        self.source = []        # Instruction text, for error messages
+        self.labels = {}        # Label -> IP
+        self.layouts = []       # FrameLayout per function, the global code's first
+        self.data = {}          # Global slot -> initial value
+        self.globals = []       # Global slots
+        self.global_count = 0   # Slots the code refers to
+        self.frame = []         # Current function's registers
+        self.call_stack = []    # Return IP, caller frame and result register, per call
+        self.ip = 0
+        self.executed = 0       # Instructions executed by the last run()
+        # Where run() reads and prints (see streams.py), and the current run's reader and sink
+        self.stdin, self.stdout, self.flush_policy = stdin, stdout, flush_policy
+        self.input = None
+        self.output = None
+        self.handlers = {mnemonic: getattr(self, f"op_{mnemonic.lower()}") for mnemonic in SIGNATURES}
+
+    def load_file(self, path):
+        with open(path, 'r') as f:
+            self.load_program(f.read())
+
+    def load_program(self, text):
+        # First pass: labels, static data, and the instructions themselves
+        instructions = []
+        for line in text.splitlines():
+            line = line.split(';', 1)[0].strip()
+            if not line:
+                continue
+            if line.endswith(':'):
+                self.labels[line[:-1]] = len(instructions)
+                continue
+            mnemonic, _, rest = line.partition(' ')
+            operands = [operand.strip() for operand in rest.split(',')] if rest.strip() else []
+            if mnemonic == 'DATA':
+                slot, value = rest.split()
+                self.data[self.global_index(slot)] = parse_literal(value)
+                continue
+            if mnemonic not in SIGNATURES:
+                raise RegisterCodeError(f"Unknown instruction '{line}'")
+            signature = SIGNATURES[mnemonic]
+            if len(operands) != len(signature) and not (mnemonic == 'CALL' and len(operands) > 2):
+                raise RegisterCodeError(f"'{line}' expects {len(signature)} operand(s)")
+            instructions.append((mnemonic, operands, line))
+
+        # Second pass: split the code into functions at each ENTER, so every
+        # function knows its constants before any CALL refers to it
+        layout_at = []
+        layout = None
+        for ip, (mnemonic, operands, line) in enumerate(instructions):
+            if mnemonic == 'ENTER':
+                layout = FrameLayout(ip, int(operands[0]))
+                self.layouts.append(layout)
+            elif layout is None:
+                raise RegisterCodeError(f"'{line}' comes before the first ENTER")
+            signature = SIGNATURES[mnemonic] + 's' * (len(operands) - len(SIGNATURES[mnemonic]))
+            for kind, operand in zip(signature, operands):
+                if kind == 's' and is_literal(operand):
+                    layout.constant(operand)
+            layout_at.append(layout)
+        for layout in self.layouts:
+            layout.template = [None] * layout.size + [parse_literal(value) for value in layout.constants]
+
+        self.code = []
+        self.source = []
+        for (mnemonic, operands, line), layout in zip(instructions, layout_at):
+            decoded = self.decode(mnemonic, operands, line, layout)
+            self.code.append((self.handlers[mnemonic], decoded))
+            self.source.append(line)
+
+        self.globals = [self.data.get(slot) for slot in range(self.global_count)]
+
+    def decode(self, mnemonic, operands, line, layout):
+        # Operands become register indexes, slots and IPs; one operand is
+        # passed on its own, several as a tuple
+        signature = SIGNATURES[mnemonic] + 's' * (len(operands) - len(SIGNATURES[mnemonic]))
+        decoded = []
+        for kind, operand in zip(signature, operands):
+            if kind == 's' and is_literal(operand):
+                decoded.append(layout.constant(operand))
+            elif kind in 'rs':
+                match = REGISTER.match(operand)
+                if match is None or int(match.group(1)) >= layout.size:
+                    raise RegisterCodeError(f"Bad register '{operand}' in '{line}'")
+                decoded.append(int(match.group(1)))
+            elif kind == 'g':
+                decoded.append(self.global_index(operand))
+            elif kind == 'l':
+                if operand not in self.labels:
+                    raise RegisterCodeError(f"Unknown label '{operand}' in '{line}'")
+                decoded.append(self.labels[operand])
+            elif kind == 'f':
+                callee = self.layout_of(operand, line)
+                decoded.extend([callee.entry + 1, callee.template])
+            elif kind == 'n':
+                decoded.append(layout.template)
+        if mnemonic == 'CALL':
+            # (result register, entry IP, frame template, argument registers)
+            return tuple(decoded[:3]) + (tuple(decoded[3:]),)
+        if mnemonic == 'HALT':
+            return None
+        return decoded[0] if len(decoded) == 1 else tuple(decoded)
+
+    def global_index(self, operand):
+        match = GLOBAL.match(operand)
+        if match is None:
+            raise RegisterCodeError(f"Bad global slot '{operand}'")
+        slot = int(match.group(1))
+        self.global_count = max(self.global_count, slot + 1)
+        return slot
+
+    def layout_of(self, name, line):
+        entry = self.labels.get(name)
+        for layout in self.layouts:
+            if layout.entry == entry:
+                return layout
+        raise RegisterCodeError(f"Unknown function '{name}' in '{line}'")
+
+    def run(self):
+        try:
+            self.run_program(InputReader(self.stdin), OutputSink(self.stdout, self.flush_policy))
+        except ProgramError as e:
+            print(f"Runtime Error at instruction '{e.instruction}': {e}")
+            sys.exit(1)
+
+    def run_io(self, data):
+        """Run the program with `data` as its input; returns what it printed (see VirtualMachine.run_io)."""
+        output = io.StringIO()
+        self.run_program(InputReader(data), OutputSink(output, 'end'))
+        return output.getvalue()
+
+    def run_program(self, reader, sink):
+        self.input, self.output = reader, sink
+        self.ip = 0
+        self.executed = 0
+        self.call_stack = []
+        self.globals = [self.data.get(slot) for slot in range(self.global_count)]
+        try:
+            self.run_fast()
+        except Exception as e:
+            raise ProgramError(self.source[self.ip - 1], str(e)) from e
+        finally:
+            sink.flush()
+
+    def run_fast(self):
+        code = self.code
+        end = len(code)
+        executed = 0
+        try:
+            while self.ip < end:
+                handler, arg = code[self.ip]
+                self.ip += 1
+                executed += 1
+                handler(arg)
+        finally:
+            self.executed = executed
+
+    # Instruction handlers: `arg` holds the decoded operands
+
+    def op_enter(self, template):
+        # Only the global code runs its ENTER: calls jump past it
+        self.frame = template[:]
+
+    def op_move(self, arg):
+        dst, src = arg
+        frame = self.frame
+        frame[dst] = frame[src]
+
+    def op_check(self, reg):
+        if self.frame[reg] is None:
+            raise Exception(f"Undefined local variable in register {reg}")
+
+    def op_neg(self, arg):
+        dst, src = arg
+        frame = self.frame
+        frame[dst] = -frame[src]
+
+    def op_add(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = frame[a] + frame[b]
+
+    def op_sub(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = frame[a] - frame[b]
+
+    def op_mul(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = frame[a] * frame[b]
+
+    def op_div(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = int(frame[a] / frame[b]) # Integer division, like the stack VM
+
+    def op_eq(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = 1 if frame[a] == frame[b] else 0
+
+    def op_neq(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = 1 if frame[a] != frame[b] else 0
+
+    def op_gt(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = 1 if frame[a] > frame[b] else 0
+
+    def op_lt(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = 1 if frame[a] < frame[b] else 0
+
+    def op_gte(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = 1 if frame[a] >= frame[b] else 0
+
+    def op_lte(self, arg):
+        dst, a, b = arg
+        frame = self.frame
+        frame[dst] = 1 if frame[a] <= frame[b] else 0
+
+    def op_get_global(self, arg):
+        dst, slot = arg
+        val = self.globals[slot]
+        if val is None:
+            raise Exception(f"Undefined global variable in slot {slot}")
+        self.frame[dst] = val
+
+    def op_set_global(self, arg):
+        slot, src = arg
+        self.globals[slot] = self.frame[src]
+
+    # Jumps: label operands are instruction indexes
+
+    def op_jmp(self, target):
+        self.ip = target
+
+    def op_jz(self, arg):
+        src, target = arg
+        if self.frame[src] == 0:
+            self.ip = target
+
+    def op_jeq(self, arg):
+        a, b, target = arg
+        frame = self.frame
+        if frame[a] == frame[b]:
+            self.ip = target
+
+    def op_jne(self, arg):
+        a, b, target = arg
+        frame = self.frame
+        if frame[a] != frame[b]:
+            self.ip = target
+
+    def op_jgt(self, arg):
+        a, b, target = arg
+        frame = self.frame
+        if frame[a] > frame[b]:
+            self.ip = target
+
+    def op_jlt(self, arg):
+        a, b, target = arg
+        frame = self.frame
+        if frame[a] < frame[b]:
+            self.ip = target
+
+    def op_jge(self, arg):
+        a, b, target = arg
+        frame = self.frame
+        if frame[a] >= frame[b]:
+            self.ip = target
+
+    def op_jle(self, arg):
+        a, b, target = arg
+        frame = self.frame
+        if frame[a] <= frame[b]:
+            self.ip = target
+
+    # Functions: arguments are copied into the callee's first registers
+
+    def op_call(self, arg):
+        dst, entry, template, args = arg
+        caller = self.frame
+        frame = template[:]
+        for index, src in enumerate(args):
+            frame[index] = caller[src]
+        self.call_stack.append((self.ip, caller, dst))
+        self.frame = frame
+        self.ip = entry
+
+    def op_ret(self, src):
+        value = self.frame[src]
+        if not self.call_stack:
+            self.ip = len(self.code)
+            return
+        self.ip, self.frame, dst = self.call_stack.pop()
+        self.frame[dst] = value
+
+    def op_print(self, src):
+        self.output.write_value(self.frame[src])
+
+    def op_read(self, dst):
+        self.frame[dst] = self.input.read_value()
+
+    def op_halt(self, arg):
+        self.ip = len(self.code)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python regvm.py <file.rasm>")
+        sys.exit(1)
+
+    vm = RegisterVM()
+    try:
+        vm.load_file(sys.argv[1])
+    except RegisterCodeError as e:
+        print(f"Load Error: {e}")
+        sys.exit(1)
+    vm.run()
@@ -1,12 +1,22 @@
 from mini_c_compiler.core import ast_nodes as ast
 from mini_c_compiler.core.symbol_table import SymbolTable, Symbol
 from mini_c_compiler.core.errors import SemanticError
+from mini_c_compiler.ir_interpreter import evaluate_binary, format_value, EvaluationError
+
+# Functions the language provides. read() returns the next number in the input.
+BUILTINS = [Symbol('read', 'int', 'func', [])]
 
 class SemanticAnalyzer:
     def __init__(self):
-        self.global_scope = SymbolTable()
+        # Builtins sit in a scope of their own, outside the program's globals
+        self.builtin_scope = SymbolTable()
+        for symbol in BUILTINS:
+            self.builtin_scope.define(symbol)
+        self.global_scope = SymbolTable(parent=self.builtin_scope)
         self.current_scope = self.global_scope
         self.current_function_return_type = None
+        self.global_constants = {}          # Globals whose initializer is a compile-time constant
+        self.runtime_initializers = False   # Whether an earlier global needs code to initialize it
 
     def analyze(self, node):
         self.visit(node)
@@ -41,12 +51,48 @@ class SemanticAnalyzer:
         
         symbol = Symbol(node.name, node.type_name, 'var')
         self.current_scope.define(symbol)
+
+        if node.initializer and self.current_scope is self.global_scope:
+            node.constant_value = self.constant_value(node.initializer)
+            if node.constant_value is None:
+                self.runtime_initializers = True
+            else:
+                self.global_constants[node.name] = node.constant_value
         
         return node.type_name
 
+    def constant_value(self, node):
+        """Value of a global initializer known at compile time, or None.
+
+        Earlier constant globals can be read until an initializer that runs
+        code (a call) comes up, since that code could assign them.
+        """
+        if isinstance(node, (ast.Number, ast.FloatNumber)):
+            return node.value
+        if isinstance(node, ast.Identifier):
+            if self.runtime_initializers:
+                return None
+            return self.global_constants.get(node.name)
+        if isinstance(node, ast.UnaryOp) and node.op == '-':
+            operand = self.constant_value(node.operand)
+            return None if operand is None else -operand
+        if isinstance(node, ast.BinaryOp):
+            left = self.constant_value(node.left)
+            right = self.constant_value(node.right)
+            if left is None or right is None:
+                return None
+            try:
+                value = evaluate_binary(node.op, left, right)
+            except EvaluationError:
+                return None # Left for runtime, like the optimizer does
+            return value if format_value(value) is not None else None
+        return None
+
     def visit_FuncDecl(self, node):
         if self.current_scope.lookup(node.name, current_scope_only=True):
             raise SemanticError(f"[{node.name}] Function already declared", 0)
+        if self.builtin_scope.lookup(node.name):
+            raise SemanticError(f"[{node.name}] Cannot redefine a builtin function", 0)
         
         param_types = [p.type_name for p in node.params]
         symbol = Symbol(node.name, node.return_type, 'func', param_types)
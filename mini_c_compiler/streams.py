@@ -0,0 +1,137 @@
+"""Buffered input and output for running programs.
+
+`read()` in a program takes the next number from an InputReader, and
+`print` hands its value to an OutputSink. Both work in bulk. The reader
+pulls its source in large chunks and splits each chunk into tokens at once.
+The sink collects printed lines and writes them together, following its
+flush policy:
+
+- 'line': write each line as soon as it is printed (for interactive use);
+- 'block': write whenever `block_lines` lines have collected;
+- 'end': write only when the run finishes or flush() is called.
+
+The default is 'line' when the output is a terminal, 'block' otherwise.
+Both also take in-memory buffers, so one process can run a program over
+many inputs (VirtualMachine.run_io).
+"""
+import sys
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+DEFAULT_BLOCK_LINES = 4096
+FLUSH_POLICIES = ('line', 'block', 'end')
+
+class EndOfInput(Exception):
+    """read() found no numbers left."""
+
+def parse_number(token):
+    # Whole numbers are ints, anything else float() accepts is a float
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        if isinstance(token, bytes):
+            token = token.decode(errors='replace')
+        raise ValueError(f"Invalid number '{token}' in input") from None
+
+class InputReader:
+    """Whitespace-separated numbers, read from `source` in chunks.
+
+    `source` is a file object (text or binary), a str or bytes holding the
+    whole input, or None for sys.stdin as it is at the first read.
+    """
+
+    def __init__(self, source=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.tokens = []       # Tokens of the current chunk
+        self.position = 0      # Next token to read
+        self.partial = None    # Token the last chunk ended in the middle of
+        self.exhausted = False # Source read to the end
+        self.reader = None     # read(size) of the source, once chosen
+        if isinstance(source, (str, bytes)):
+            self.tokens = source.split()
+            self.exhausted = True
+
+    def read_value(self):
+        if self.position == len(self.tokens) and not self.fill():
+            raise EndOfInput("end of input")
+        value = parse_number(self.tokens[self.position])
+        self.position += 1
+        return value
+
+    def try_read(self):
+        """read_value(), or None where it would raise; the input is left as it was."""
+        try:
+            return self.read_value()
+        except (EndOfInput, ValueError):
+            return None
+
+    def at_end(self):
+        """True if no tokens are left: the next read_value() would fail."""
+        return self.position == len(self.tokens) and not self.fill()
+
+    def fill(self):
+        # Split the next chunk into tokens; False at the end of the input
+        while not self.exhausted:
+            chunk = self.read_chunk()
+            if chunk:
+                if self.partial:
+                    chunk = self.partial + chunk
+                tokens = chunk.split()
+                # The last token may go on in the next chunk
+                self.partial = tokens.pop() if tokens and not chunk[-1:].isspace() else None
+            else:
+                self.exhausted = True
+                tokens = [self.partial] if self.partial else []
+                self.partial = None
+            if tokens:
+                self.tokens, self.position = tokens, 0
+                return True
+        return False
+
+    def read_chunk(self):
+        if self.reader is None:
+            source = self.source
+            if source is None:
+                # Bytes parse as numbers too, so stdin's text layer is skipped
+                source = getattr(sys.stdin, 'buffer', sys.stdin)
+            # read1 returns what is available rather than waiting for a full chunk
+            self.reader = getattr(source, 'read1', source.read)
+        return self.reader(self.chunk_size)
+
+class OutputSink:
+    """Printed values, written to `target` a block at a time.
+
+    `target` is a text file object, or None for sys.stdout as it is when
+    the sink writes (so contextlib.redirect_stdout still captures it).
+    """
+
+    def __init__(self, target=None, policy=None, block_lines=DEFAULT_BLOCK_LINES):
+        if policy is None:
+            stream = target if target is not None else sys.stdout
+            isatty = getattr(stream, 'isatty', None)
+            policy = 'line' if isatty is not None and isatty() else 'block'
+        if policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy '{policy}' (expected 'line', 'block' or 'end')")
+        self.target = target
+        self.policy = policy
+        self.limit = {'line': 1, 'block': block_lines, 'end': float('inf')}[policy]
+        self.lines = []
+
+    def write_value(self, value):
+        lines = self.lines
+        lines.append(str(value)) # Formatted like print()
+        if len(lines) >= self.limit:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        target = self.target if self.target is not None else sys.stdout
+        target.write("\n".join(self.lines) + "\n")
+        self.lines = []
+        if self.policy == 'line':
+            target.flush()
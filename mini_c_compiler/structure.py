@@ -0,0 +1,287 @@
+"""Rebuilds while/if/else statements from a control-flow graph.
+
+Shared by the backends that produce Python: the JIT (jit.py) structures
+VM bytecode, and the Python code generators (codegen.py) structure IR.
+Each subclasses Structurer with its own blocks and statements.
+"""
+
+class StructureError(Exception):
+    """Control flow that can't be rebuilt as while/if/else statements."""
+
+class Loop:
+    def __init__(self, header, body, follow):
+        self.header = header # Block the back edges jump to
+        self.body = body     # Blocks in the loop, header included
+        self.follow = follow # Block run after the loop (None: it is only left by returning)
+
+class TextStatements:
+    """Statements as lines of text, indented by the enclosing statement."""
+
+    def jump_statement(self, kind):
+        return [kind]
+
+    def final_jump(self, lines):
+        # 'return', 'break' or 'continue' if the last statement is one
+        if lines and not lines[-1].startswith(' '):
+            word = lines[-1].split()[0]
+            if word in ('return', 'break', 'continue'):
+                return word
+        return None
+
+    def if_statement(self, test, then, other):
+        lines = [f"if {test}:"] + ["    " + line for line in then]
+        if other:
+            lines += ["else:"] + ["    " + line for line in other]
+        return lines
+
+    def while_statement(self, test, body):
+        return [f"while {test or 'True'}:"] + ["    " + line for line in body or ["pass"]]
+
+class Structurer:
+    """Structures the graph given by `successors`.
+
+    `successors` maps each reachable block to the blocks that can run
+    next, fall-through first, in block order. None stands for the end of
+    the body, and a block with no successors returns. Loops must be
+    reducible and leave through one block, apart from exits that go on to
+    return. Anything else raises StructureError.
+
+    Subclasses translate blocks (emit_block). `statements` builds the
+    statements around them: its jump_statement, final_jump, if_statement
+    and while_statement, as lines of text (TextStatements) or as ast nodes.
+    """
+
+    def __init__(self, entry, successors, statements, in_function=True):
+        self.entry = entry
+        self.successors = successors
+        self.order = list(successors)
+        self.statements = statements
+        self.in_function = in_function # False for top-level code, which can't return
+        self.find_loops()
+        self.find_post_dominators()
+
+    def following(self, block):
+        return [succ for succ in self.successors[block] if succ is not None]
+
+    def find_loops(self):
+        # Depth-first order, then dominators; every retreating edge must be
+        # a back edge to a block that dominates it
+        order = []
+        on_path = {self.entry}
+        retreating = []
+        seen = {self.entry}
+        stack = [(self.entry, iter(self.following(self.entry)))]
+        while stack:
+            block, successors = stack[-1]
+            for succ in successors:
+                if succ in on_path:
+                    retreating.append((block, succ))
+                elif succ not in seen:
+                    seen.add(succ)
+                    on_path.add(succ)
+                    stack.append((succ, iter(self.following(succ))))
+                    break
+            else:
+                stack.pop()
+                on_path.discard(block)
+                order.append(block)
+        order.reverse()
+
+        predecessors = {block: [] for block in order}
+        for block in order:
+            for succ in self.following(block):
+                predecessors[succ].append(block)
+        dominators = {block: set(order) for block in order}
+        dominators[self.entry] = {self.entry}
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new = set.intersection(*(dominators[p] for p in predecessors[block])) | {block}
+                if new != dominators[block]:
+                    dominators[block] = new
+                    changed = True
+
+        bodies = {}
+        for tail, header in retreating:
+            if header not in dominators[tail]:
+                raise StructureError("Irreducible control flow")
+            body = bodies.setdefault(header, {header})
+            worklist = [tail]
+            while worklist:
+                block = worklist.pop()
+                if block not in body:
+                    body.add(block)
+                    worklist.extend(predecessors[block])
+        self.loops = {} # Header -> Loop
+        for header, body in bodies.items():
+            exits = {succ for block in body for succ in self.successors[block] if succ not in body}
+            rejoining = {exit for exit in exits if not self.returns_from(exit, body, exits)}
+            if len(rejoining) > 1:
+                raise StructureError("Loop with several exits")
+            if rejoining:
+                follow = rejoining.pop()
+            else:
+                # Every exit returns: the loop is left where its header exits, if it does
+                header_exits = [succ for succ in self.successors[header] if succ in exits]
+                follow = header_exits[0] if header_exits else None
+            self.loops[header] = Loop(header, body, follow)
+
+    def returns_from(self, exit, body, exits):
+        # True if code from `exit` never reaches the loop or its other exits
+        if exit is None:
+            return False
+        seen = set()
+        worklist = [exit]
+        while worklist:
+            block = worklist.pop()
+            if block in seen:
+                continue
+            if block in body or (block != exit and block in exits):
+                return False
+            seen.add(block)
+            worklist.extend(self.following(block))
+        return True
+
+    def find_post_dominators(self):
+        # Every block must reach the end of the body, through a return or not
+        ending = {block for block in self.order if None in self.successors[block] or not self.successors[block]}
+        changed = True
+        while changed:
+            changed = False
+            for block in self.order:
+                if block not in ending and any(s in ending for s in self.successors[block]):
+                    ending.add(block)
+                    changed = True
+        if len(ending) < len(self.order):
+            raise StructureError("Loop that never ends")
+        self.merge = self.immediate(self.post_dominators(early=False))
+        # Branches whose paths only meet at the end may meet sooner on the
+        # paths that don't return: there a return post-dominates anything,
+        # and an iteration ends at its back edge
+        self.early_merge = self.immediate(self.post_dominators(early=True))
+
+    def post_dominators(self, early):
+        # Block -> blocks on every path from it to the end (None)
+        successors = {}
+        for block in self.order:
+            successors[block] = [('back', succ) if early and succ in self.loops and block in self.loops[succ].body
+                                 else succ for succ in self.successors[block]]
+        ends = {None} | {succ for succs in successors.values() for succ in succs if isinstance(succ, tuple)}
+        everything = set(self.order) | ends
+        post = {block: set(everything) for block in self.order}
+        for end in ends:
+            post[end] = {end}
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(self.order):
+                if early and not successors[block]:
+                    continue # A return
+                new = set.intersection(*(post[s] for s in successors[block] or [None])) | {block}
+                if new != post[block]:
+                    post[block] = new
+                    changed = True
+        return post
+
+    def immediate(self, post):
+        # Block -> its nearest strict post-dominator, if that is a block
+        result = {}
+        for block in self.order:
+            rest = post[block] - {block}
+            result[block] = next((p for p in rest if isinstance(p, int) and post[p] == rest), None)
+        return result
+
+    def generate(self, start=None):
+        """Statements for the code from `start` (by default the entry) to the end."""
+        self.budget = 20 * len(self.order) + 20 # Structuring duplicates code only so far
+        return self.walk(self.entry if start is None else start, None, None)
+
+    def walk(self, block, stop, loop, entering=False):
+        # Statements for the code from `block` until `stop`, inside `loop`
+        code = []
+        while True:
+            if block is None:
+                if loop is not None:
+                    # The end of the body, from inside a loop
+                    if not self.in_function:
+                        raise StructureError("Top-level loop left at the end")
+                    code += self.statements.jump_statement("return")
+                break
+            if block == stop:
+                break
+            if loop is not None and not entering:
+                if block == loop.header:
+                    code += self.statements.jump_statement("continue")
+                    break
+                if block == loop.follow:
+                    code += self.statements.jump_statement("break")
+                    break
+            if block in self.loops and not entering:
+                inner = self.loops[block]
+                code += self.emit_loop(inner)
+                if inner.follow is None:
+                    break
+                block = inner.follow
+                continue
+            entering = False
+            self.budget -= 1
+            if self.budget < 0:
+                raise StructureError("Control flow too tangled to structure")
+            kind, value, statements = self.emit_block(block)
+            code += statements
+            if kind == 'return':
+                code += value
+                break
+            if kind == 'goto':
+                block = value
+                continue
+            (taken_cond, fall_cond), taken, fall = value
+            merge = self.merge[block]
+            if merge is None:
+                merge = self.early_merge[block] # Where the paths that don't return meet
+            code += self.emit_if(fall_cond, self.walk(fall, merge, loop),
+                                  taken_cond, self.walk(taken, merge, loop))
+            if merge is None:
+                break # Both sides ran to the end
+            block = merge
+        return code
+
+    def emit_if(self, cond, then, other_cond, other):
+        # The fall-through side first, unless it is empty
+        if not then:
+            cond, then, other_cond, other = other_cond, other, cond, then
+        if not then:
+            return []
+        if other and self.statements.final_jump(then) is not None:
+            return self.statements.if_statement(cond, then, []) + other # No need for an else
+        return self.statements.if_statement(cond, then, other)
+
+    def emit_loop(self, loop):
+        kind, value, statements = self.emit_block(loop.header)
+        if kind == 'branch' and not statements:
+            (taken_cond, fall_cond), taken, fall = value
+            inside = None
+            if taken == loop.follow and fall in loop.body:
+                stay, inside = fall_cond, fall
+            elif fall == loop.follow and taken in loop.body:
+                stay, inside = taken_cond, taken
+            if inside is not None:
+                # The header only tests the condition: `while cond:`
+                body = self.walk(inside, None, loop)
+                if self.statements.final_jump(body) == "continue":
+                    body.pop()
+                return self.statements.while_statement(stay, body)
+        body = self.walk(loop.header, None, loop, entering=True)
+        if self.statements.final_jump(body) == "continue":
+            body.pop()
+        return self.statements.while_statement(None, body)
+
+    def emit_block(self, block):
+        """Statements for one block's body, and how the block ends.
+
+        Returns (kind, value, statements): ('return', return statements),
+        ('goto', next block) or ('branch', ((taken test, fall-through
+        test), taken, fall-through)).
+        """
+        raise NotImplementedError
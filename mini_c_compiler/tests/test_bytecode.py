@@ -0,0 +1,179 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from mini_c_compiler.bytecode import (
+    Program, BytecodeError, assemble, disassemble, load_bytecode_file, write_bytecode_file,
+)
+from mini_c_compiler.core.opcodes import Opcode
+from mini_c_compiler.main import compile_file, compile_source
+from mini_c_compiler.vm import VirtualMachine
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+SOURCE = """
+; -- Mini C Assembly --
+JMP __init_globals
+square:
+PARAM x
+PUSH x
+PUSH x
+MUL
+RET
+RET
+
+__init_globals:
+PUSH 2.5
+STORE scale
+CALL main
+HALT
+main:
+PUSH 7 ; inline comment
+CALL square
+PUSH 7
+ADD
+DUP
+PRINT
+PUSH 0
+JZ done
+NEG
+done:
+PUSH scale
+PRINT
+RET
+"""
+
+class TestBytecode(unittest.TestCase):
+    def run_vm(self, load):
+        vm = VirtualMachine()
+        load(vm)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        return output.getvalue()
+
+    def test_assemble(self):
+        program = assemble(SOURCE)
+        self.assertEqual(program.code[0], (Opcode.JMP, program.label_offsets()['__init_globals']))
+        self.assertIn((Opcode.PUSH_CONST, program.constants.index(7)), program.code)
+        self.assertIn((Opcode.PUSH, program.names.index('x')), program.code)
+        # Constants and names are pooled
+        self.assertEqual(program.constants.count(7), 1)
+        self.assertEqual(program.names.count('x'), 1)
+        self.assertEqual(program.function_offsets(), {
+            'main': program.label_offsets()['main'], 'square': program.label_offsets()['square'],
+        })
+
+    def test_disassemble_round_trip(self):
+        program = assemble(SOURCE)
+        text = disassemble(program)
+        self.assertNotIn(';', text)
+        again = assemble(text)
+        self.assertEqual(again.code, program.code)
+        self.assertEqual(disassemble(again), text)
+
+    def test_binary_round_trip(self):
+        program = assemble(SOURCE)
+        data = program.to_bytes()
+        self.assertEqual(data[:4], b'MCBC')
+        decoded = Program.from_buffer(data)
+        self.assertEqual(decoded.code, program.code)
+        self.assertEqual(decoded.constants, program.constants)
+        self.assertIsInstance(decoded.constants[program.constants.index(2.5)], float)
+        self.assertEqual(decoded.names, program.names)
+        self.assertEqual(decoded.functions, program.functions)
+        self.assertEqual(decoded.labels, program.labels)
+
+    def test_vm_runs_bytecode_file(self):
+        expected = self.run_vm(lambda vm: vm.load_program(SOURCE))
+        self.assertEqual(expected, "56\n2.5\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'prog.mcbc')
+            write_bytecode_file(path, assemble(SOURCE))
+            self.assertEqual(load_bytecode_file(path).code, assemble(SOURCE).code)
+            self.assertEqual(self.run_vm(lambda vm: vm.load_file(path)), expected)
+
+    def test_compile_to_bytecode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'test2.mcbc')
+            with contextlib.redirect_stdout(io.StringIO()):
+                compile_file(os.path.join(EXAMPLES, 'test2.c'), path, verbose=False, target='bytecode')
+            self.assertEqual(self.run_vm(lambda vm: vm.load_file(path)), "120\n")
+
+    def test_errors(self):
+        with self.assertRaises(BytecodeError):
+            assemble("FROB x")
+        with self.assertRaises(BytecodeError):
+            assemble("JMP nowhere")
+        with self.assertRaises(BytecodeError):
+            assemble("ADD 1")
+        with self.assertRaises(BytecodeError):
+            Program.from_buffer(b'NOPE' + bytes(40))
+        with self.assertRaises(BytecodeError):
+            Program.from_buffer(assemble(SOURCE).to_bytes()[:-3])
+
+    def test_data_section(self):
+        code = "DATA 0 7\nDATA 1 2.5\nLOAD_GLOBAL 0\nPRINT\nLOAD_GLOBAL 1\nPRINT\nLOAD_GLOBAL 2\nPRINT\nHALT"
+        program = assemble(code)
+        self.assertEqual(len(program.code), 7)
+        self.assertEqual([program.constants[i] for i in program.data], [7, 2.5])
+        decoded = Program.from_buffer(program.to_bytes())
+        self.assertEqual(decoded.data, program.data)
+        self.assertEqual(assemble(disassemble(decoded)).to_bytes(), program.to_bytes())
+
+        vm = VirtualMachine()
+        vm.load_bytecode(decoded)
+        self.assertEqual(vm.globals, [7, 2.5, None])
+        with self.assertRaises(BytecodeError):
+            assemble("DATA 1 7")
+        with self.assertRaises(BytecodeError):
+            assemble("DATA 0 x")
+
+    def test_constant_globals_need_no_code(self):
+        source = "int a = 6 * 7; float f = 0.5; int main() { print(a + 1); print(f); }"
+        code = compile_source(source, verbose=False, target='asm')
+        self.assertIn("DATA 0 42", code)
+        self.assertNotIn("STORE_GLOBAL", code)
+        self.assertEqual(self.run_vm(lambda vm: vm.load_program(code)), "43\n0.5\n")
+        # The Python backend binds them in one assignment
+        self.assertIn("a, f = 42, 0.5", compile_source(source, verbose=False, target='python'))
+
+    def test_slot_frames(self):
+        # Each call gets its own frame: count(3) prints 3 2 1 and the caller's n survives
+        code = """
+        JMP start
+        count:
+        ENTER 1
+        STORE_LOCAL 0
+        LOAD_LOCAL 0
+        JZ done
+        LOAD_LOCAL 0
+        PRINT
+        LOAD_LOCAL 0
+        PUSH 1
+        SUB
+        CALL count
+        POP
+        LOAD_LOCAL 0
+        STORE_GLOBAL 0
+        done:
+        PUSH 0
+        RET
+        start:
+        PUSH 3
+        CALL count
+        POP
+        LOAD_GLOBAL 0
+        PRINT
+        HALT
+        """
+        self.assertEqual(self.run_vm(lambda vm: vm.load_program(code)), "3\n2\n1\n3\n")
+
+    def test_only_numeric_literals_are_constants(self):
+        program = assemble("PUSH inf\nPUSH -3\nPUSH 1.5")
+        self.assertEqual([op for op, _ in program.code], [Opcode.PUSH, Opcode.PUSH_CONST, Opcode.PUSH_CONST])
+        self.assertEqual(program.constants, [-3, 1.5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+from mini_c_compiler.benchmarks import compile_asm, load_program, program_names, run_vm
+from mini_c_compiler.cbackend import NativeModule, LibraryCache, generate_c
+from mini_c_compiler.x86 import find_compiler
+
+LIBRARY = """
+int calls = 7;
+float rate = 0.5;
+int sq(int x) { return x * x; }
+int base = sq(3);
+float score(int age, float income) {
+    float s = income * rate + base;
+    if (age < 25) { s = s - 10; }
+    return s;
+}
+int ratio(int a, int b) { return a / b; }
+float halve(float x) { return x / 2; }
+int fib(int n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+int main() { print(sq(calls)); print(score(20, 3.0)); print(fib(10)); }
+"""
+
+@unittest.skipIf(find_compiler() is None, "needs a C compiler")
+class TestCBackend(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LibraryCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, source, **kwargs):
+        return NativeModule.from_source(source, cache=self.cache, **kwargs)
+
+    def test_signatures_come_from_the_declarations(self):
+        module = self.load(LIBRARY)
+        self.assertEqual(module.sq(12), 144)
+        self.assertEqual(module.score(20, 3.0), 0.5)
+        self.assertEqual(module.score(30, 3), 10.5) # int argument to a float parameter
+        self.assertIsInstance(module.score(30, 3), float)
+        self.assertEqual(module.ratio(-7, 2), -3)
+        self.assertEqual(module.halve(7.0), 3.0) # `/` truncates, as on the VM
+        self.assertEqual(module.fib(20), 6765)
+        with self.assertRaises(TypeError):
+            module.sq(1, 2)
+        with self.assertRaises(AttributeError):
+            module.missing
+
+    def test_division_by_zero_raises(self):
+        module = self.load(LIBRARY)
+        with self.assertRaises(ZeroDivisionError):
+            module.ratio(1, 0)
+        self.assertEqual(module.ratio(0, 5), 0) # A zero result is not an error
+
+    def test_print_writes_to_sys_stdout(self):
+        module = self.load(LIBRARY)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            module.main()
+        _, expected, _ = run_vm(compile_asm(LIBRARY))
+        self.assertEqual(output.getvalue(), expected)
+
+    def test_benchmark_programs_match_the_vm(self):
+        for name in program_names():
+            with self.subTest(name):
+                source = load_program(name)
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    self.load(source).main()
+                self.assertEqual(output.getvalue(), run_vm(compile_asm(source))[1])
+
+    def test_assigned_globals_are_read_until_assigned(self):
+        programs = [
+            "int g = 5; int bump() { g = g + 1; print(g); return 0; } int main() { bump(); print(g); }",
+            "int n = 3; int main() { int i = 0; while (i < n) { print(i); i = i + 1; } n = 10; print(n); }",
+            "float f = 1.5; float twice() { f = f * 2; return f; } int main() { print(twice()); print(f); }",
+        ]
+        for source in programs:
+            for level in range(4):
+                with self.subTest(source, level=level):
+                    output = io.StringIO()
+                    with contextlib.redirect_stdout(output):
+                        self.load(source, opt_level=level).main()
+                    self.assertEqual(output.getvalue(), run_vm(compile_asm(source, opt_level=level))[1])
+
+    def test_libraries_are_cached_by_content(self):
+        first = self.load(LIBRARY)
+        second = self.load(LIBRARY)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        changed = self.load(LIBRARY.replace("rate = 0.5", "rate = 0.25"))
+        self.assertFalse(changed.cached)
+        self.assertEqual(changed.score(30, 4.0), 10.0)
+
+    def test_without_a_cache(self):
+        module = NativeModule.from_source("int twice(int x) { return x + x; }")
+        self.assertEqual(module.twice(21), 42)
+
+    def test_threads_report_their_own_errors(self):
+        module = self.load(LIBRARY)
+        errors = []
+        def work(divisor):
+            for _ in range(2000):
+                try:
+                    module.ratio(10, divisor)
+                except ZeroDivisionError:
+                    errors.append(divisor)
+        threads = [threading.Thread(target=work, args=(divisor,)) for divisor in (0, 1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(set(errors), {0})
+        self.assertEqual(len(errors), 2000)
+
+    def test_generated_c(self):
+        c_source, signatures = generate_c(LIBRARY)
+        self.assertEqual(signatures['score'], (['int', 'float'], 'float'))
+        self.assertIn("MC_EXPORT double mc_score(int64_t a0, double a1)", c_source)
+        self.assertIn("mc_div_int(", c_source)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from mini_c_compiler.cfg import build_cfg, flatten_cfg, reachable_blocks
+
+class TestCFG(unittest.TestCase):
+    def test_while_loop(self):
+        body = [
+            "PARAM n",
+            "L1:",
+            "t1 = n > 1",
+            "IF_FALSE t1 GOTO L2",
+            "t2 = n - 1",
+            "n = t2",
+            "GOTO L1",
+            "L2:",
+            "RETURN n",
+        ]
+        blocks = build_cfg(body)
+
+        self.assertEqual([b.label for b in blocks], [None, 'L1', None, 'L2'])
+        self.assertEqual(blocks[0].successors, [1])
+        self.assertEqual(blocks[1].successors, [2, 3])
+        self.assertEqual(blocks[2].successors, [1])
+        self.assertEqual(blocks[3].successors, [])
+        self.assertEqual(sorted(blocks[1].predecessors), [0, 2])
+        self.assertEqual(flatten_cfg(blocks), body)
+
+    def test_unreachable_after_return(self):
+        blocks = build_cfg(["RETURN 1", "PRINT 2", "L1:", "RETURN 3"])
+
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual(reachable_blocks(blocks), {0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,9 @@
+import contextlib
+import io
 import unittest
-from mini_c_compiler.codegen import PythonCodeGenerator
+from mini_c_compiler.benchmarks import build_ir, load_program, program_names
+from mini_c_compiler.codegen import PythonCodeGenerator, AssemblyCodeGenerator, RegisterCodeGenerator
+from mini_c_compiler.vm import VirtualMachine
 
 class TestCodegen(unittest.TestCase):
     def test_simple_program(self):
@@ -31,13 +35,89 @@ class TestCodegen(unittest.TestCase):
         ]
         codegen = PythonCodeGenerator(instructions)
         code = codegen.generate()
-        
+
+        self.assertIn("    if t1:\n        print(1)\n    else:\n        print(0)", code)
+        self.assertNotIn("label", code)
+
+        code = PythonCodeGenerator(instructions, structured=False).generate()
         self.assertIn("while True:", code)
         self.assertIn("if label == 'start':", code)
         self.assertIn("elif label == 'L1':", code)
         self.assertIn("elif label == 'L2':", code)
         self.assertIn("if not t1: label = 'L1'; continue", code)
 
+    def run_python(self, code):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exec(code, {'__name__': '__main__'})
+        return output.getvalue()
+
+    def test_loops_are_structured(self):
+        instructions = [
+            "FUNC find",
+            "PARAM n",
+            "i = 0",
+            "L1:",
+            "t1 = i < 100",
+            "IF_FALSE t1 GOTO L2",
+            "t2 = i * i",
+            "t3 = t2 > n",
+            "IF_FALSE t3 GOTO L3",
+            "RETURN i",
+            "L3:",
+            "i = i + 1",
+            "GOTO L1",
+            "L2:",
+            "RETURN -1",
+            "END_FUNC",
+            "FUNC main",
+            "ARG 50",
+            "t4 = CALL find",
+            "PRINT t4",
+            "END_FUNC",
+        ]
+        code = PythonCodeGenerator(instructions).generate()
+
+        self.assertIn("\n".join([
+            "    while i < 100:",    # The comparison only the jump reads is tested directly
+            "        t2 = i * i",
+            "        if t2 > n:",
+            "            return i",  # No else: the rest of the body follows
+            "        i = i + 1",
+            "    return -1",
+        ]), code)
+        self.assertEqual(self.run_python(code), "8\n")
+
+    def test_structured_code_matches_the_state_machine(self):
+        for name in program_names():
+            for level in (0, 2):
+                with self.subTest(name, level=level):
+                    ir = build_ir(load_program(name), opt_level=level)
+                    code = PythonCodeGenerator(ir).generate()
+                    self.assertNotIn("label = ", code)
+                    self.assertEqual(self.run_python(code),
+                                     self.run_python(PythonCodeGenerator(ir, structured=False).generate()))
+
+    def test_irreducible_flow_uses_the_state_machine(self):
+        instructions = [
+            "FUNC main",
+            "x = 0",
+            "IF_FALSE x GOTO L2", # Jumps into the middle of the loop
+            "L1:",
+            "x = x + 1",
+            "PRINT x",
+            "L2:",
+            "t1 = x < 3",
+            "IF_FALSE t1 GOTO L3",
+            "GOTO L1",
+            "L3:",
+            "END_FUNC",
+        ]
+        code = PythonCodeGenerator(instructions).generate()
+
+        self.assertIn("elif label == 'L2':", code)
+        self.assertEqual(self.run_python(code), "1\n2\n3\n")
+
     def test_func_call(self):
         instructions = [
             "FUNC add",
@@ -58,8 +138,161 @@ class TestCodegen(unittest.TestCase):
         
         self.assertIn("def add(a, b):", code)
         self.assertIn("return t1", code)
-        self.assertIn("_args.append(1)", code)
-        self.assertIn("t2 = add(*_args); _args = []", code)
+        self.assertIn("t2 = add(1, 2)", code)
+        self.assertNotIn("_args", code)
+
+    def test_comparisons_yield_integers(self):
+        instructions = [
+            "FUNC main",
+            "t1 = 3 > 1",
+            "PRINT t1",
+            "END_FUNC"
+        ]
+        code = PythonCodeGenerator(instructions).generate()
+
+        self.assertIn("t1 = int(3 > 1)", code)
+
+    def asm_lines(self, code):
+        return [line for line in code.split("\n") if line and not line.startswith(';')]
+
+    def run_asm(self, code):
+        vm = VirtualMachine()
+        vm.load_program(code)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        return output.getvalue()
+
+    def stack_code(self, instructions, **kwargs):
+        # Assembly for a block, with slot numbers shown as the variable names
+        codegen = AssemblyCodeGenerator([], **kwargs)
+        lines = self.asm_lines(codegen.generate_block(instructions))
+        names = {slot: name for name, slot in codegen.global_slots.items()}
+        return [f"{line.split()[0]} {names[int(line.split()[1])]}" if "_GLOBAL " in line else line
+                for line in lines]
+
+    def test_single_use_temps_stay_on_stack(self):
+        self.assertEqual(self.stack_code(["t2 = result * n", "result = t2"]),
+                         ["LOAD_GLOBAL result", "LOAD_GLOBAL n", "MUL", "STORE_GLOBAL result"])
+
+        self.assertEqual(self.stack_code(["t2 = result * n", "result = t2"], stack_temps=False), [
+            "LOAD_GLOBAL result", "LOAD_GLOBAL n", "MUL", "STORE_GLOBAL t2", "LOAD_GLOBAL t2",
+            "STORE_GLOBAL result",
+        ])
+
+    def test_nested_expression(self):
+        self.assertEqual(self.stack_code(["t1 = a + b", "t2 = c * 2", "t3 = t1 - t2", "t4 = - t3", "PRINT t4"]), [
+            "LOAD_GLOBAL a", "LOAD_GLOBAL b", "ADD", "LOAD_GLOBAL c", "PUSH 2", "MUL", "SUB", "NEG", "PRINT",
+        ])
+
+    def test_dup_and_pop(self):
+        self.assertEqual(self.stack_code(["x = t1", "PRINT x", "t2 = CALL f"]),
+                         ["LOAD_GLOBAL t1", "DUP", "STORE_GLOBAL x", "PRINT", "CALL f", "POP"])
+
+    def test_temps_are_spilled_across_blocks(self):
+        lines = self.stack_code([
+            "t1 = a + 1", "L1:", "PRINT t1",    # Used after a label
+            "t2 = a + 2", "t3 = b + 3", "t4 = t3 - t2", "PRINT t4", # Operands in the wrong order
+        ])
+        self.assertIn("STORE_GLOBAL t1", lines)
+        self.assertIn("STORE_GLOBAL t2", lines)
+        self.assertNotIn("STORE_GLOBAL t3", lines)
+
+    def test_variables_resolve_to_slots(self):
+        code = AssemblyCodeGenerator([
+            "g = 5",
+            "FUNC f",
+            "PARAM a",
+            "t1 = a + g",
+            "b = t1",
+            "RETURN b",
+            "END_FUNC",
+        ], peephole=False).generate()
+        lines = self.asm_lines(code)
+        start = lines.index("f:")
+        self.assertEqual(lines[start + 1:start + 8], [
+            "ENTER 2",          # a and b: t1 stays on the stack
+            "STORE_LOCAL 0",    # PARAM a
+            "LOAD_LOCAL 0",
+            "LOAD_GLOBAL 0",    # g
+            "ADD",
+            "DUP",
+            "STORE_LOCAL 1",
+        ])
+        self.assertIn("STORE_GLOBAL 0", lines[lines.index("__init_globals:"):])
+
+    def test_stack_code_runs(self):
+        instructions = [
+            "FUNC scale",
+            "PARAM x",
+            "PARAM k",
+            "t1 = - x",
+            "t2 = t1 * k",
+            "RETURN t2",
+            "END_FUNC",
+            "FUNC main",
+            "a = 4",
+            "ARG a",
+            "ARG 3",
+            "t3 = CALL scale",
+            "t4 = t3 + a",
+            "PRINT t4",
+            "ARG 1",
+            "ARG 1",
+            "t5 = CALL scale",
+            "END_FUNC",
+        ]
+        for stack_temps in (False, True):
+            with self.subTest(stack_temps=stack_temps):
+                code = AssemblyCodeGenerator(instructions, stack_temps=stack_temps).generate()
+                self.assertEqual(self.run_asm(code), "-8\n")
+
+    def register_code(self, instructions):
+        lines = RegisterCodeGenerator(instructions).generate().split("\n")
+        return lines[lines.index("f:") + 1:]
+
+    def test_register_code_fuses_temps(self):
+        self.assertEqual(self.register_code([
+            "g = 2",
+            "FUNC f",
+            "PARAM a",
+            "total = 0",
+            "L1:",
+            "t1 = a < 10",
+            "IF_FALSE t1 GOTO L2",
+            "t2 = total + g",
+            "total = t2",
+            "t3 = a + 1",
+            "a = t3",
+            "GOTO L1",
+            "L2:",
+            "RETURN total",
+            "END_FUNC",
+        ]), [
+            "ENTER 3",          # a, total and g's loaded copy
+            "MOVE r1, 0",
+            "L1:",
+            "JGE r0, 10, L2",   # Compare and IF_FALSE
+            "GET_GLOBAL r2, g0",
+            "ADD r1, r1, r2",   # Computed straight into total
+            "ADD r0, r0, 1",
+            "JMP L1",
+            "L2:",
+            "RET r1",
+        ])
+
+    def test_register_code_checks_unassigned_locals(self):
+        lines = self.register_code([
+            "FUNC f",
+            "PARAM c",
+            "IF_FALSE c GOTO L1",
+            "x = 1",
+            "L1:",
+            "PRINT x",
+            "PRINT c",
+            "END_FUNC",
+        ])
+        self.assertEqual(lines[-4:], ["CHECK r1", "PRINT r1", "PRINT r0", "RET 0"])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+import ast
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from mini_c_compiler import inprocess
+from mini_c_compiler.benchmarks import build_ir, load_program, program_names
+from mini_c_compiler.codegen import PythonCodeGenerator, PythonAstGenerator
+from mini_c_compiler.core.errors import CompilerError
+from mini_c_compiler.inprocess import CompiledProgram, CodeCache
+from mini_c_compiler.main import exec_file
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+PROGRAM = """
+int square(int x) { return x * x; }
+int sum_to(int n) { int s = 0; int k = 1; while (k <= n) { s = s + k; k = k + 1; } return s; }
+int main() { print(square(7)); print(sum_to(10)); }
+"""
+
+def capture(run, *args):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        run(*args)
+    return output.getvalue()
+
+def run_text(code):
+    exec(compile(code, '<generated>', 'exec'), {'__name__': '__main__'})
+
+class TestPythonAstGenerator(unittest.TestCase):
+    def test_matches_the_text_backend(self):
+        sources = [(name, load_program(name)) for name in program_names()]
+        for name in ('test1.c', 'test2.c', 'test_opt.c'):
+            with open(os.path.join(EXAMPLES, name), 'r') as f:
+                sources.append((name, f.read()))
+        for name, source in sources:
+            for level in (0, 2):
+                with self.subTest(name, level=level):
+                    ir = build_ir(source, opt_level=level)
+                    expected = capture(run_text, PythonCodeGenerator(ir).generate())
+                    for structured in (True, False):
+                        module = PythonAstGenerator(ir, structured=structured).generate()
+                        program = CompiledProgram(compile(module, name, 'exec'))
+                        self.assertEqual(capture(program.run), expected)
+
+    def test_builds_structured_statements(self):
+        module = PythonAstGenerator(build_ir(PROGRAM, opt_level=0)).generate()
+        sum_to = next(node for node in module.body if isinstance(node, ast.FunctionDef) and node.name == 'sum_to')
+        self.assertEqual([arg.arg for arg in sum_to.args.args], ['n'])
+        self.assertTrue(any(isinstance(node, ast.While) for node in ast.walk(sum_to)))
+        self.assertNotIn('label', ast.unparse(sum_to))
+
+class TestCompiledProgram(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = CodeCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run_and_call(self):
+        program = CompiledProgram.from_source(PROGRAM) # Inlined calls still leave the functions callable
+        self.assertEqual(capture(program.run), "49\n55\n")
+        self.assertEqual(program.call('square', 12), 144)
+        self.assertEqual(program.call('sum_to', 100), 5050)
+        with self.assertRaises(NameError):
+            program.call('cube', 2)
+
+    def test_call_keeps_signatures(self):
+        # main only passes k = 4, which -O3 would otherwise fold into scale
+        source = "int scale(int x, int k) { return x * k; } int main() { print(scale(3, 4)); }"
+        for level in range(4):
+            with self.subTest(level=level):
+                program = CompiledProgram.from_source(source, opt_level=level)
+                self.assertEqual(capture(program.run), "12\n")
+                self.assertEqual(program.call('scale', 5, 2), 10)
+
+    def test_call_loads_the_program_first(self):
+        program = CompiledProgram.from_source("int g = 5; int add_g(int x) { return x + g; }")
+        self.assertEqual(program.call('add_g', 1), 6)
+
+    def test_second_compile_comes_from_the_cache(self):
+        first = CompiledProgram.from_source(PROGRAM, cache=self.cache)
+        second = CompiledProgram.from_source(PROGRAM, cache=self.cache)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(capture(second.run), "49\n55\n")
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+    def test_key_covers_source_options_and_compiler(self):
+        key = self.cache.key(PROGRAM, {'opt_level': 2})
+        self.assertNotEqual(key, self.cache.key(PROGRAM + " ", {'opt_level': 2}))
+        self.assertNotEqual(key, self.cache.key(PROGRAM, {'opt_level': 0}))
+        with mock.patch.object(inprocess, 'compiler_version', return_value='other'):
+            self.assertNotEqual(key, self.cache.key(PROGRAM, {'opt_level': 2}))
+        CompiledProgram.from_source(PROGRAM, cache=self.cache)
+        self.assertFalse(CompiledProgram.from_source(PROGRAM, opt_level=0, cache=self.cache).cached)
+
+    def test_unreadable_cache_entry_is_recompiled(self):
+        CompiledProgram.from_source(PROGRAM, cache=self.cache)
+        for name in os.listdir(self.directory.name):
+            with open(os.path.join(self.directory.name, name), 'wb') as f:
+                f.write(b'\x00garbage')
+        program = CompiledProgram.from_source(PROGRAM, cache=self.cache)
+        self.assertFalse(program.cached)
+        self.assertEqual(capture(program.run), "49\n55\n")
+        self.assertTrue(CompiledProgram.from_source(PROGRAM, cache=self.cache).cached)
+
+    def test_compile_errors_are_raised(self):
+        with self.assertRaises(CompilerError):
+            CompiledProgram.from_source("int main() { print(x); }", cache=self.cache)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_exec_file(self):
+        for name, expected in (('test1.c', "15\n"), ('test2.c', "120\n"), ('test_opt.c', "35\n")):
+            with self.subTest(name=name):
+                self.assertEqual(capture(exec_file, os.path.join(EXAMPLES, name), 2, None, None, False),
+                                 expected)
+
+if __name__ == '__main__':
+    unittest.main()
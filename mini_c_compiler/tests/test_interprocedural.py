@@ -0,0 +1,85 @@
+import unittest
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.ir import IRGenerator
+from mini_c_compiler.interprocedural import summarize_functions, CallGraph
+
+class TestInterprocedural(unittest.TestCase):
+    def generate_ir(self, code):
+        tokens = Lexer(code).tokenize()
+        ast = Parser(tokens).parse()
+        return IRGenerator().generate(ast)
+
+    def summarize(self, code):
+        return summarize_functions(self.generate_ir(code))
+
+    def test_pure_function(self):
+        summaries = self.summarize("""
+        int square(int x) { return x * x; }
+        int sum_squares(int a, int b) { return square(a) + square(b); }
+        """)
+        self.assertTrue(summaries['square'].pure)
+        self.assertTrue(summaries['square'].const)
+        self.assertEqual(summaries['sum_squares'].calls, {'square'})
+        self.assertTrue(summaries['sum_squares'].const)
+
+    def test_print_is_impure(self):
+        summaries = self.summarize("""
+        int noisy(int x) { print(x); return x; }
+        int caller(int x) { return noisy(x); }
+        """)
+        self.assertTrue(summaries['noisy'].has_io)
+        self.assertFalse(summaries['noisy'].pure)
+        # Impurity propagates to callers
+        self.assertFalse(summaries['caller'].pure)
+
+    def test_globals(self):
+        summaries = self.summarize("""
+        int g = 5;
+        int reader() { return g; }
+        int writer() { g = 1; return 0; }
+        """)
+        self.assertEqual(summaries['reader'].reads_globals, {'g'})
+        self.assertTrue(summaries['reader'].pure)
+        self.assertFalse(summaries['reader'].const)
+        self.assertEqual(summaries['writer'].writes_globals, {'g'})
+        self.assertFalse(summaries['writer'].pure)
+
+    def test_recursion_stays_pure(self):
+        summaries = self.summarize("""
+        int fact(int n) { if (n < 2) { return 1; } return n * fact(n - 1); }
+        """)
+        self.assertTrue(summaries['fact'].const)
+
+    def test_constant_return_value(self):
+        summaries = self.summarize("""
+        int flag(int x) { if (x > 0) { return 1; } return 1; }
+        int mixed(int x) { if (x > 0) { return 1; } return 2; }
+        """)
+        self.assertEqual(summaries['flag'].return_value, '1')
+        self.assertIsNone(summaries['mixed'].return_value)
+
+    def test_call_graph(self):
+        graph = CallGraph(self.generate_ir("""
+        int leaf() { return 1; }
+        int mid() { return leaf(); }
+        int orphan() { return mid(); }
+        int seed() { return 2; }
+        int g = seed();
+        int main() { print(mid()); }
+        """))
+        self.assertEqual(graph.edges['mid'], {'leaf'})
+        self.assertEqual(graph.callers('mid'), {'orphan', 'main'})
+        self.assertEqual(graph.root_calls, {'seed'})
+        self.assertEqual(graph.reachable({'main'}), {'main', 'mid', 'leaf', 'seed'})
+
+    def test_global_named_like_a_float(self):
+        summaries = self.summarize("""
+        int inf = 4;
+        int get() { return inf; }
+        """)
+        self.assertEqual(summaries['get'].reads_globals, {'inf'})
+        self.assertFalse(summaries['get'].const)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 from mini_c_compiler.lexer import Lexer
 from mini_c_compiler.parser import Parser
-from mini_c_compiler.ir import IRGenerator
+from mini_c_compiler.ir import IRGenerator, is_literal
 
 class TestIR(unittest.TestCase):
     def generate_ir(self, code):
@@ -56,5 +56,12 @@ class TestIR(unittest.TestCase):
         self.assertTrue(any("ARG 2" in instr for instr in ir))
         self.assertTrue(any("CALL add" in instr for instr in ir))
 
+    def test_is_literal(self):
+        for token in ("5", "-3", "2.5", "-0.25"):
+            self.assertTrue(is_literal(token), token)
+        # Identifiers that float() would accept
+        for token in ("inf", "nan", "infinity", "x", "t1", "1e5"):
+            self.assertFalse(is_literal(token), token)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import unittest
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.ir import IRGenerator
+from mini_c_compiler.ir_interpreter import IRInterpreter, IRProgram, EvaluationError, BudgetExceeded, ProgramError
+
+class TestIRInterpreter(unittest.TestCase):
+    def interpreter(self, code, **kwargs):
+        tokens = Lexer(code).tokenize()
+        ast = Parser(tokens).parse()
+        ir = IRGenerator().generate(ast)
+        return IRInterpreter(ir, **kwargs)
+
+    def test_loop(self):
+        interp = self.interpreter("""
+        int factorial(int n) {
+            int result = 1;
+            while (n > 1) {
+                result = result * n;
+                n = n - 1;
+            }
+            return result;
+        }
+        """)
+        self.assertEqual(interp.call('factorial', [5]), 120)
+
+    def test_recursion_and_args(self):
+        interp = self.interpreter("""
+        int sub(int a, int b) { return a - b; }
+        int fib(int n) { if (n < 2) { return n; } return fib(sub(n, 1)) + fib(sub(n, 2)); }
+        """)
+        self.assertEqual(interp.call('sub', [10, 3]), 7)
+        self.assertEqual(interp.call('fib', [10]), 55)
+
+    def test_integer_division_truncates(self):
+        interp = self.interpreter("int div(int a, int b) { return a / b; }")
+        self.assertEqual(interp.call('div', [-7, 2]), -3)
+        with self.assertRaises(EvaluationError):
+            interp.call('div', [1, 0])
+
+    def test_print_rejected(self):
+        interp = self.interpreter("int f(int x) { print(x); return x; }")
+        with self.assertRaises(EvaluationError):
+            interp.call('f', [1])
+
+    def test_budget(self):
+        interp = self.interpreter("int spin(int n) { while (n > 0) { n = n + 1; } return n; }", max_steps=500)
+        with self.assertRaises(BudgetExceeded):
+            interp.call('spin', [1])
+
+class TestIRProgram(unittest.TestCase):
+    def program(self, code):
+        ast = Parser(Lexer(code).tokenize()).parse()
+        return IRProgram(IRGenerator().generate(ast))
+
+    def run_program(self, program):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            program.run()
+        return output.getvalue()
+
+    def test_globals_calls_and_output(self):
+        program = self.program("""
+        int base = 10;
+        int offset = base * 2;
+        int add(int a, int b) { return a + b; }
+        int none() { }
+        int main() {
+            int i = 0;
+            while (i < 3) {
+                print(add(i, offset));
+                i = i + 1;
+            }
+            print(none());
+            print(7 / 2);
+        }
+        """)
+        self.assertEqual(self.run_program(program), "20\n21\n22\n0\n3\n")
+
+    def test_operands_are_resolved_at_load(self):
+        program = self.program("int g = 1; int f(int n) { int k = n + 2; return k * g; } int main() { }")
+        f = program.functions['f']
+        self.assertEqual(f.names, ['n', 't1', 'k', 't2', '2'])
+        self.assertEqual(f.template, [None, None, None, None, 2])
+        binary = f.code[0] # t1 = n + 2
+        self.assertEqual((binary[0], binary[1], binary[3], binary[4]), ('binary', 1, 0, 4))
+        self.assertEqual(f.code[2][4], ~program.global_slots['g'])
+
+    def test_runtime_errors_name_the_instruction(self):
+        program = self.program("int main() { int x; int c = 0; if (c) { x = 1; } print(x); }")
+        with self.assertRaises(ProgramError) as cm:
+            self.run_program(program)
+        self.assertEqual(cm.exception.instruction, "PRINT x")
+        self.assertEqual(str(cm.exception), "Undefined variable 'x'")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import contextlib
+import io
+import unittest
+from mini_c_compiler.benchmarks import compile_asm, load_program, program_names
+from mini_c_compiler.jit import JitVM
+from mini_c_compiler.vm import VirtualMachine
+
+FACTORIAL = """
+int factorial(int n) {
+    int result = 1;
+    while (n > 1) {
+        result = result * n;
+        n = n - 1;
+    }
+    return result;
+}
+
+int main() {
+    int i = 0;
+    while (i < 30) {
+        print(factorial(i));
+        i = i + 1;
+    }
+}
+"""
+
+def run_vm(vm, code):
+    vm.load_program(code)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            vm.run()
+        except SystemExit:
+            pass
+    return output.getvalue()
+
+class TestJit(unittest.TestCase):
+    def assert_same_output(self, source, opt_level=2, **kwargs):
+        code = compile_asm(source, opt_level=opt_level)
+        vm = JitVM(**kwargs)
+        self.assertEqual(run_vm(vm, code), run_vm(VirtualMachine(), code))
+        return vm
+
+    def test_benchmark_programs(self):
+        for name in program_names():
+            for level in (0, 2):
+                with self.subTest(name, level=level):
+                    vm = self.assert_same_output(load_program(name), level,
+                                                 call_threshold=2, loop_threshold=2)
+                    self.assertTrue(vm.sources)
+
+    def test_hot_function_is_compiled_to_a_loop(self):
+        vm = self.assert_same_output(FACTORIAL, call_threshold=5)
+        entry = next(ip for ip, name in vm.function_at.items() if name == 'factorial')
+        self.assertIn(entry, vm.compiled)
+        source = vm.sources[f"f_{entry}"]
+        self.assertIn("while ", source)
+        self.assertNotIn("_resume", source) # Every variable is set before it is read
+        self.assertEqual(vm.call_counts[entry], 5) # Later calls skip the interpreter
+
+    def test_hot_loop_is_entered_halfway(self):
+        source = "int main() { int i = 0; int s = 0; while (i < 500) { s = s + i; i = i + 1; } print(s); }"
+        vm = self.assert_same_output(source, opt_level=0, loop_threshold=10)
+        self.assertEqual(len(vm.loops), 1)
+        self.assertLess(vm.executed, 200)
+
+    def test_loop_that_returns_from_inside_is_compiled(self):
+        # The Python backend's structuring: exits that go on to return don't count
+        source = """
+        int find(int limit) {
+            int i = 0;
+            while (i < limit) {
+                if (i * i > 50) { return i; }
+                i = i + 1;
+            }
+            return 0 - 1;
+        }
+        int main() { print(find(100)); print(find(3)); print(find(20)); }
+        """
+        vm = self.assert_same_output(source, opt_level=0, call_threshold=2)
+        entry = next(ip for ip, name in vm.function_at.items() if name == 'find')
+        self.assertIn(entry, vm.compiled)
+        self.assertIn("while ", vm.sources[f"f_{entry}"])
+
+    def test_disabled(self):
+        vm = self.assert_same_output(FACTORIAL, jit=False, call_threshold=1, loop_threshold=1)
+        self.assertEqual(vm.sources, {})
+        self.assertFalse(JitVM(profile=True).jit)
+
+    def test_unset_variable_deoptimizes(self):
+        source = """
+        int f(int a) {
+            int x;
+            if (a < 5) { x = 1; }
+            return x + a;
+        }
+        int main() { int i = 0; while (i < 10) { print(f(i)); i = i + 1; } }
+        """
+        vm = self.assert_same_output(source, call_threshold=2)
+        self.assertIn("_resume", vm.sources['f_1'])
+        self.assertIn("Runtime Error at instruction 'LOAD_LOCAL 1'", run_vm(vm, compile_asm(source)))
+
+    def test_division_by_zero_deoptimizes(self):
+        source = """
+        int f(int a, int b) { return a / b; }
+        int main() { int i = 5; while (i > -3) { print(f(10, i)); i = i - 1; } }
+        """
+        vm = self.assert_same_output(source, opt_level=0, call_threshold=2)
+        self.assertIn("'DIV': division by zero", run_vm(vm, compile_asm(source, opt_level=0)))
+
+    def test_deep_recursion_continues_in_the_interpreter(self):
+        source = """
+        int sum(int n) {
+            if (n == 0) { return 0; }
+            return n + sum(n - 1);
+        }
+        int main() { print(sum(2000)); print(sum(10)); }
+        """
+        vm = self.assert_same_output(source, call_threshold=3)
+        self.assertIn("_vm.jit_depth >= MAX_DEPTH", vm.sources['f_1'])
+        self.assertEqual(vm.jit_depth, 0)
+
+    def test_runaway_recursion_hits_the_call_depth_limit(self):
+        source = """
+        int sum(int n) {
+            if (n == 0) { return 0; }
+            return n + sum(n - 1);
+        }
+        int main() { print(sum(1000)); }
+        """
+        code = compile_asm(source, opt_level=0)
+        self.assertIn("Maximum call depth of 500 exceeded",
+                      run_vm(JitVM(call_threshold=3, max_call_depth=500), code))
+
+    def test_halt_in_an_interpreted_callee(self):
+        code = """
+        JMP start
+        check:
+        DUP
+        JZ quit
+        RET
+        quit:
+        PUSH 7
+        PRINT
+        HALT
+        caller:
+        CALL check
+        RET
+        start:
+        PUSH 3
+        CALL caller
+        PRINT
+        PUSH 0
+        CALL caller
+        PRINT
+        PUSH 1
+        PRINT
+        HALT
+        """
+        vm = JitVM(call_threshold=1)
+        self.assertEqual(run_vm(vm, code), "3\n7\n")
+        self.assertEqual(list(vm.compiled), [vm.labels['caller']])
+        self.assertIn(vm.labels['check'], vm.failed) # It halts, so it stays interpreted
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from mini_c_compiler.benchmarks import build_ir, compile_asm
+from mini_c_compiler.codegen import RegisterCodeGenerator
+from mini_c_compiler.inprocess import CompiledProgram
+from mini_c_compiler.ir_interpreter import IRProgram
+from mini_c_compiler.jit import JitVM
+from mini_c_compiler.main import compile_file
+from mini_c_compiler.regvm import RegisterVM
+from mini_c_compiler.threaded import ThreadedVM
+from mini_c_compiler.vm import VirtualMachine
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+class TestMain(unittest.TestCase):
+    def compile_quietly(self, name, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return compile_file(os.path.join(EXAMPLES, name), verbose=False, **kwargs)
+
+    def run_python(self, code):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exec(compile(code, '<generated>', 'exec'), {'__name__': '__main__'})
+        return output.getvalue()
+
+    def run_asm(self, code):
+        vm = VirtualMachine()
+        vm.load_program(code)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        return output.getvalue()
+
+    def test_python_backend_at_every_level(self):
+        for name, expected in (('test1.c', "15\n"), ('test2.c', "120\n"), ('test_opt.c', "35\n")):
+            for level in (0, 1, 2, 3):
+                with self.subTest(name=name, level=level):
+                    code = self.compile_quietly(name, opt_level=level)
+                    self.assertEqual(self.run_python(code), expected)
+
+    def test_asm_backend_at_every_level(self):
+        for name, expected in (('test1.c', "15\n"), ('test2.c', "120\n"), ('test_opt.c', "35\n")):
+            for level in (0, 1, 2, 3):
+                with self.subTest(name=name, level=level):
+                    code = self.compile_quietly(name, target='asm', opt_level=level)
+                    self.assertEqual(self.run_asm(code), expected)
+
+    def test_run_target(self):
+        for name, expected in (('test1.c', "15\n"), ('test2.c', "120\n"), ('test_opt.c', "35\n")):
+            with self.subTest(name=name):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    ir = compile_file(os.path.join(EXAMPLES, name), verbose=False, target='run')
+                self.assertEqual(output.getvalue(), expected)
+                self.assertIsInstance(ir, list)
+
+    def test_optimization_preserves_output(self):
+        # Every level must print exactly what the unoptimized program prints,
+        # on both backends
+        programs = [
+            """
+            int scale(int x, int k) { if (k == 0) { return 0; } return x * k; }
+            int main() {
+                int i = 0;
+                while (i < 3) { print(scale(i, 0)); print(scale(i, 4)); i = i + 1; }
+                print(3 > 1);
+                print(2 == 5);
+            }
+            """,
+            """
+            int sum_to(int n) { int s = 0; int k = 1; while (k < n + 1) { s = s + k; k = k + 1; } return s; }
+            int classify(int x) { if (x > 10) { return 2; } else { if (x == 10) { return 1; } } return 0; }
+            int main() { print(sum_to(100)); print(classify(3)); print(classify(10)); int d = 7 - 10; print(d * 2); }
+            """,
+            # -O3 propagates a and b and folds the division
+            """
+            int a = -7;
+            int b = 2;
+            int half(int x) { return x / 2; }
+            int main() { print(a / b); int c = -9; int d = 4; print(c / d); print(half(-5)); }
+            """,
+        ]
+        for source in programs:
+            with tempfile.NamedTemporaryFile('w', suffix='.c', delete=False) as f:
+                f.write(source)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    reference = self.run_asm(compile_file(f.name, verbose=False, target='asm', opt_level=0))
+                    python_reference = self.run_python(compile_file(f.name, verbose=False, opt_level=0))
+                self.assertEqual(reference, python_reference)
+                for level in (1, 2, 3):
+                    with self.subTest(level=level), contextlib.redirect_stdout(io.StringIO()):
+                        asm = compile_file(f.name, verbose=False, target='asm', opt_level=level)
+                        python = compile_file(f.name, verbose=False, opt_level=level)
+                    self.assertEqual(self.run_asm(asm), reference)
+                    self.assertEqual(self.run_python(python), reference)
+            finally:
+                os.unlink(f.name)
+
+    def test_pure_call_evaluation_keeps_python_output(self):
+        # -O2 evaluates avg(3, 4) at compile time with the VM's truncating
+        # division; the Python backends must truncate too
+        source = """
+        int avg(int a, int b) { return (a + b) / 2; }
+        int main() { print(avg(3, 4)); print(avg(-3, -4)); }
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.c', delete=False) as f:
+            f.write(source)
+        try:
+            outputs = {}
+            for level in (1, 2):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    code = compile_file(f.name, verbose=False, opt_level=level)
+                outputs[level] = self.run_python(code)
+                output = io.StringIO()
+                CompiledProgram.from_source(source, opt_level=level).run(stdout=output)
+                self.assertEqual(output.getvalue(), outputs[level])
+            self.assertEqual(outputs[1], outputs[2])
+            self.assertEqual(outputs[2], "3\n-3\n")
+        finally:
+            os.unlink(f.name)
+
+    def test_assigned_globals_are_read_until_assigned(self):
+        # A function that assigns a global's name gets its own variable, but
+        # reads before the assignment still see the global
+        programs = [
+            ("int g = 5; int bump() { g = g + 1; return 0; } int main() { bump(); print(g); }", "5\n"),
+            ("""
+            int n = 3;
+            int main() { int i = 0; while (i < n) { print(i); i = i + 1; } n = 10; print(n); }
+            """, "0\n1\n2\n10\n"),
+        ]
+        for source, expected in programs:
+            for level in range(4):
+                ir = build_ir(source, opt_level=level)
+                asm = compile_asm(source, opt_level=level)
+                for engine in (VirtualMachine(), ThreadedVM(), JitVM(call_threshold=1, loop_threshold=1)):
+                    with self.subTest(source=source, level=level, engine=type(engine).__name__):
+                        engine.load_program(asm)
+                        self.assertEqual(engine.run_io(""), expected)
+                with self.subTest(source=source, level=level, engine='others'):
+                    register_vm = RegisterVM()
+                    register_vm.load_program(RegisterCodeGenerator(ir).generate())
+                    self.assertEqual(register_vm.run_io(""), expected)
+                    output = io.StringIO()
+                    IRProgram(ir).run(stdout=output)
+                    self.assertEqual(output.getvalue(), expected)
+                    output = io.StringIO()
+                    CompiledProgram.from_source(source, opt_level=level).run(stdout=output)
+                    self.assertEqual(output.getvalue(), expected)
+                    with tempfile.NamedTemporaryFile('w', suffix='.c', delete=False) as f:
+                        f.write(source)
+                    try:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            code = compile_file(f.name, verbose=False, opt_level=level)
+                    finally:
+                        os.unlink(f.name)
+                    self.assertEqual(self.run_python(code), expected)
+
+if __name__ == '__main__':
+    unittest.main()
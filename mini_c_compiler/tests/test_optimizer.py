@@ -1,5 +1,8 @@
+import json
 import unittest
-from mini_c_compiler.optimizer import Optimizer
+from mini_c_compiler.optimizer import (
+    Optimizer, PassManager, PASS_REGISTRY, OPT_LEVELS, register_pass, unregister_pass,
+)
 
 class TestOptimizer(unittest.TestCase):
     def test_constant_folding(self):
@@ -42,5 +45,354 @@ class TestOptimizer(unittest.TestCase):
         self.assertTrue(any("CALL func" in instr for instr in optimized))
         self.assertIn("x = 10", optimized)
 
+    def test_opt_level_zero_is_identity(self):
+        instructions = [
+            "t1 = 5 + 10",
+            "x = t1"
+        ]
+        optimizer = Optimizer(list(instructions))
+        optimized = optimizer.optimize(level=0)
+
+        self.assertEqual(optimized, instructions)
+        self.assertEqual(optimizer.stats.passes, {})
+
+    def test_explicit_pass_list(self):
+        instructions = [
+            "t1 = 5 + 10",
+            "t2 = t1 + 5"
+        ]
+        optimizer = Optimizer(instructions)
+        optimized = optimizer.optimize(passes=['constant_folding'])
+
+        # Only folding ran: t1 folded, but nothing propagated or removed
+        self.assertEqual(optimized, ["t1 = 15", "t2 = t1 + 5"])
+        self.assertEqual(list(optimizer.stats.passes), ['constant_folding'])
+
+    def test_statistics(self):
+        instructions = [
+            "t1 = 5 + 10",
+            "t2 = t1 + 5",
+            "x = 10"
+        ]
+        optimizer = Optimizer(instructions)
+        optimizer.optimize(level=2)
+        stats = optimizer.stats.as_dict()
+
+        self.assertGreaterEqual(stats['iterations'], 1)
+        self.assertEqual(stats['passes']['dead_code_elimination']['delta'], -2)
+        self.assertEqual(json.loads(optimizer.stats.to_json())['iterations'], stats['iterations'])
+        self.assertIn('dead_code_elimination', optimizer.stats.format())
+
+    def test_register_custom_pass(self):
+        def drop_prints(optimizer):
+            kept = [i for i in optimizer.instructions if not i.startswith("PRINT")]
+            changed = len(kept) != len(optimizer.instructions)
+            optimizer.instructions = kept
+            return changed
+
+        register_pass('drop_prints', drop_prints)
+        try:
+            optimizer = Optimizer(["x = 1", "PRINT x"])
+            self.assertEqual(optimizer.optimize(passes=['drop_prints']), ["x = 1"])
+        finally:
+            unregister_pass('drop_prints')
+        self.assertNotIn('drop_prints', PASS_REGISTRY)
+
+    def test_registered_level_passes_can_be_removed(self):
+        def drop_prints(optimizer):
+            kept = [i for i in optimizer.instructions if not i.startswith("PRINT")]
+            changed = len(kept) != len(optimizer.instructions)
+            optimizer.instructions = kept
+            return changed
+
+        builtin = {level: (list(passes), n) for level, (passes, n) in OPT_LEVELS.items()}
+        before = Optimizer(["PRINT 1"]) # Created before the registration: unaffected
+        register_pass('drop_prints', drop_prints, levels=(2,))
+        try:
+            self.assertEqual(Optimizer(["PRINT 1"]).optimize(level=2), [])
+            self.assertEqual(Optimizer(["PRINT 1"]).optimize(level=1), ["PRINT 1"])
+            self.assertEqual(before.optimize(level=2), ["PRINT 1"])
+            self.assertEqual(OPT_LEVELS, builtin)
+        finally:
+            unregister_pass('drop_prints')
+        self.assertEqual(Optimizer(["PRINT 1"]).optimize(level=2), ["PRINT 1"])
+        with self.assertRaises(ValueError):
+            unregister_pass('constant_folding')
+        with self.assertRaises(ValueError):
+            register_pass('drop_prints', drop_prints, levels=(9,))
+
+    def test_unknown_pass(self):
+        with self.assertRaises(ValueError):
+            PassManager(['no_such_pass'])
+        with self.assertRaises(ValueError):
+            PassManager.for_level(7)
+
+    def test_evaluate_pure_calls(self):
+        instructions = [
+            "FUNC square",
+            "PARAM x",
+            "t1 = x * x",
+            "RETURN t1",
+            "END_FUNC",
+            "FUNC main",
+            "ARG 7",
+            "t2 = CALL square",
+            "PRINT t2",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(level=2)
+
+        self.assertIn("PRINT 49", optimized)
+        self.assertNotIn("t2 = CALL square", optimized)
+
+    def test_impure_calls_are_kept(self):
+        instructions = [
+            "FUNC show",
+            "PARAM x",
+            "PRINT x",
+            "RETURN x",
+            "END_FUNC",
+            "FUNC main",
+            "ARG 7",
+            "t1 = CALL show",
+            "END_FUNC"
+        ]
+        # Only the passes that existed alongside call evaluation: later
+        # interprocedural passes legitimately rewrite the ARG
+        optimized = Optimizer(instructions).optimize(passes=[
+            'constant_propagation', 'constant_folding', 'dead_code_elimination', 'evaluate_pure_calls'])
+
+        self.assertIn("ARG 7", optimized)
+        self.assertIn("t1 = CALL show", optimized)
+
+    def test_impure_call_with_constant_argument_at_o3(self):
+        instructions = [
+            "FUNC show",
+            "PARAM x",
+            "PRINT x",
+            "RETURN x",
+            "END_FUNC",
+            "FUNC main",
+            "ARG 7",
+            "t1 = CALL show",
+            "ARG 8",
+            "t2 = CALL show",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(level=3)
+
+        # Never evaluated away: each call still happens, on a specialized clone
+        calls = [instr for instr in optimized if " = CALL " in instr]
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(any("PRINT 7" == instr for instr in optimized))
+        self.assertTrue(any("PRINT 8" == instr for instr in optimized))
+
+    def test_fold_comparisons_and_branches(self):
+        instructions = [
+            "FUNC main",
+            "t1 = 3 > 1",
+            "IF_FALSE t1 GOTO L1",
+            "PRINT 1",
+            "L1:",
+            "t2 = 2.5 * 2",
+            "PRINT t2",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(level=3)
+
+        self.assertNotIn("IF_FALSE 1 GOTO L1", optimized)
+        self.assertFalse(any(instr.startswith("IF_FALSE") for instr in optimized))
+        self.assertIn("PRINT 5.0", optimized)
+
+    def test_variable_propagation_respects_loops(self):
+        instructions = [
+            "FUNC main",
+            "x = 5",
+            "n = 10",
+            "L1:",
+            "t1 = n > 0",
+            "IF_FALSE t1 GOTO L2",
+            "PRINT x",
+            "t2 = n - 1",
+            "n = t2",
+            "GOTO L1",
+            "L2:",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(level=3)
+
+        # x never changes and is propagated; n is reassigned in the loop
+        self.assertIn("PRINT 5", optimized)
+        self.assertIn("t1 = n > 0", optimized)
+
+    def test_unreachable_code_elimination(self):
+        instructions = [
+            "FUNC f",
+            "RETURN 1",
+            "PRINT 2",
+            "GOTO L1",
+            "L1:",
+            "RETURN 3",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(passes=['unreachable_code_elimination'])
+
+        self.assertEqual(optimized, ["FUNC f", "RETURN 1", "END_FUNC"])
+
+    def test_specialize_functions(self):
+        instructions = [
+            "FUNC scale",
+            "PARAM x",
+            "PARAM k",
+            "t1 = k == 0",
+            "IF_FALSE t1 GOTO L1",
+            "RETURN 0",
+            "L1:",
+            "t2 = x * k",
+            "RETURN t2",
+            "END_FUNC",
+            "FUNC main",
+            "PARAM y",
+            "ARG y",
+            "ARG 4",
+            "t3 = CALL scale",
+            "PRINT t3",
+            "END_FUNC"
+        ]
+        optimizer = Optimizer(instructions)
+        optimized = optimizer.optimize(level=3)
+
+        clone = optimizer.specializations[('scale', (None, '4'))]
+        self.assertIn(f"t3 = CALL {clone}", optimized)
+        self.assertNotIn("ARG 4", optimized)
+        # The constant argument was folded inside the clone
+        body = optimized[optimized.index(f"FUNC {clone}"):]
+        body = body[:body.index("END_FUNC")]
+        self.assertEqual(body[1], "PARAM x")
+        self.assertTrue(any(instr.endswith("= x * 4") for instr in body))
+        self.assertFalse(any(instr.startswith("IF_FALSE") for instr in body))
+
+    def test_specialization_budget(self):
+        instructions = ["FUNC id", "PARAM x", "RETURN x", "END_FUNC", "FUNC main"]
+        for i in range(5):
+            instructions += [f"ARG {i}", f"t{i + 1} = CALL id", f"PRINT t{i + 1}"]
+        instructions.append("END_FUNC")
+
+        optimizer = Optimizer(instructions)
+        optimizer.specialization_budget = 2
+        optimizer.optimize(passes=['specialize_functions'])
+
+        self.assertEqual(len(optimizer.specializations), 2)
+
+    def test_interprocedural_constant_arguments(self):
+        instructions = [
+            "FUNC area",
+            "PARAM w",
+            "PARAM h",
+            "t1 = w * h",
+            "PRINT t1",
+            "RETURN 0",
+            "END_FUNC",
+            "FUNC main",
+            "PARAM x",
+            "ARG x",
+            "ARG 3",
+            "t2 = CALL area",
+            "ARG 5",
+            "ARG 3",
+            "t3 = CALL area",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(passes=['interprocedural_propagation'])
+
+        # h is 3 at every call site: it is no longer passed
+        self.assertEqual(optimized[:4], ["FUNC area", "PARAM w", "h = 3", "t1 = w * h"])
+        self.assertEqual(optimized.count("ARG 3"), 0)
+        self.assertIn("ARG 5", optimized)
+
+    def test_interprocedural_return_values(self):
+        instructions = [
+            "FUNC zero",
+            "RETURN 0",
+            "END_FUNC",
+            "FUNC log",
+            "PARAM v",
+            "PRINT v",
+            "RETURN 1",
+            "END_FUNC",
+            "FUNC main",
+            "t1 = CALL zero",
+            "ARG t1",
+            "t2 = CALL log",
+            "PRINT t2",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(passes=['interprocedural_propagation'])
+
+        # zero() is pure: the call goes away; log() prints, so it is kept
+        self.assertIn("t1 = 0", optimized)
+        self.assertIn("t2 = CALL log", optimized)
+        self.assertIn("PRINT 1", optimized)
+
+    def test_unused_pure_call_removed(self):
+        instructions = [
+            "FUNC sq",
+            "PARAM x",
+            "t1 = x * x",
+            "RETURN t1",
+            "END_FUNC",
+            "FUNC main",
+            "PARAM y",
+            "ARG y",
+            "t2 = CALL sq",
+            "PRINT y",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(passes=['interprocedural_propagation'])
+
+        self.assertNotIn("t2 = CALL sq", optimized)
+        self.assertNotIn("ARG y", optimized)
+
+    def test_dead_function_elimination(self):
+        instructions = [
+            "t1 = CALL init",
+            "g = t1",
+            "FUNC init",
+            "RETURN 4",
+            "END_FUNC",
+            "FUNC unused",
+            "RETURN 1",
+            "END_FUNC",
+            "FUNC helper",
+            "PRINT g",
+            "RETURN",
+            "END_FUNC",
+            "FUNC main",
+            "t2 = CALL helper",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(passes=['dead_function_elimination'])
+
+        self.assertIn("FUNC init", optimized) # Called by a global initializer
+        self.assertIn("FUNC helper", optimized)
+        self.assertNotIn("FUNC unused", optimized)
+
+    def test_no_main_keeps_all_functions(self):
+        instructions = ["FUNC a", "RETURN 1", "END_FUNC", "FUNC b", "RETURN 2", "END_FUNC"]
+        optimized = Optimizer(instructions).optimize(passes=['dead_function_elimination'])
+
+        self.assertEqual(optimized, instructions)
+
+    def test_o2_leaves_comparisons_alone(self):
+        instructions = [
+            "FUNC main",
+            "t1 = 3 > 1",
+            "PRINT t1",
+            "END_FUNC"
+        ]
+        optimized = Optimizer(instructions).optimize(level=2)
+
+        self.assertIn("t1 = 3 > 1", optimized)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+import contextlib
+import io
+import unittest
+from mini_c_compiler.bytecode import assemble, disassemble
+from mini_c_compiler.codegen import AssemblyCodeGenerator
+from mini_c_compiler.peephole import PeepholeOptimizer, select_superinstructions
+from mini_c_compiler.vm import VirtualMachine
+
+class TestSuperinstructions(unittest.TestCase):
+    def run_asm(self, code):
+        vm = VirtualMachine()
+        vm.load_program(code)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        return vm, output.getvalue()
+
+    def test_compare_and_jump_is_fused(self):
+        code = select_superinstructions("LOAD_LOCAL 0\nPUSH 3\nLT\nJZ L1\nGTE\nJNZ L2")
+        self.assertEqual(code, "LOAD_LOCAL 0\nPUSH 3\nJGE L1\nJGE L2")
+
+    def test_all_comparisons_match_unfused_code(self):
+        for op in ('==', '!=', '>', '<', '>=', '<='):
+            with self.subTest(op=op):
+                ir = [
+                    "FUNC main",
+                    "i = 0",
+                    "L1:",
+                    "t1 = i < 5",
+                    "IF_FALSE t1 GOTO L2",
+                    f"t2 = i {op} 2",
+                    "IF_FALSE t2 GOTO L3",
+                    "PRINT i",
+                    "L3:",
+                    "t3 = i + 1",
+                    "i = t3",
+                    "GOTO L1",
+                    "L2:",
+                    "END_FUNC",
+                ]
+                plain = AssemblyCodeGenerator(ir, superinstructions=False).generate()
+                fused = AssemblyCodeGenerator(ir).generate()
+                self.assertNotIn("JZ", fused)
+                self.assertEqual(self.run_asm(fused)[1], self.run_asm(plain)[1])
+
+    def test_increment_and_constant_operands(self):
+        code = select_superinstructions(
+            "LOAD_LOCAL 1\nPUSH 1\nADD\nSTORE_LOCAL 1\n"
+            "LOAD_LOCAL 1\nPUSH 1\nADD\nSTORE_LOCAL 2\n"
+            "PUSH 2\nMUL\nPUSH 3\nSUB\nLOAD_LOCAL 0\nADD"
+        )
+        self.assertEqual(code, "INC_LOCAL 1\nLOAD_LOCAL 1\nADD_CONST 1\nSTORE_LOCAL 2\n"
+                               "MUL_CONST 2\nSUB_CONST 3\nADD_LOCAL 0")
+
+    def test_increment_whose_value_is_reused(self):
+        code = select_superinstructions("LOAD_LOCAL 0\nPUSH 1\nADD\nDUP\nSTORE_LOCAL 0\nPRINT")
+        self.assertEqual(code, "INC_LOCAL 0\nLOAD_LOCAL 0\nPRINT")
+
+    def test_labels_split_sequences_and_comments_are_kept(self):
+        code = select_superinstructions("LT\n; IF_FALSE t1 GOTO L2\nJZ L2\nPUSH 1\nL1:\nADD")
+        self.assertEqual(code, "; IF_FALSE t1 GOTO L2\nJGE L2\nPUSH 1\nL1:\nADD")
+
+    def test_superinstructions_survive_bytecode_round_trip(self):
+        code = "PUSH 1\nPUSH 2\nJLT L1\nPUSH 0\nPOP\nL1:\nPUSH 4\nADD_CONST 2.5\nMUL_CONST 2\nPRINT\nHALT"
+        program = assemble(code)
+        self.assertEqual(assemble(disassemble(program)).to_bytes(), program.to_bytes())
+        self.assertEqual(self.run_asm(code)[1], "13.0\n")
+
+class TestPeepholeOptimizer(unittest.TestCase):
+    def optimize(self, code, **kwargs):
+        optimizer = PeepholeOptimizer(**kwargs)
+        return optimizer.optimize(code), optimizer.counts
+
+    def test_store_then_load_becomes_dup(self):
+        code, counts = self.optimize("STORE_LOCAL 1\nLOAD_LOCAL 1\nSTORE_GLOBAL 0\nLOAD_GLOBAL 1")
+        self.assertEqual(code, "DUP\nSTORE_LOCAL 1\nSTORE_GLOBAL 0\nLOAD_GLOBAL 1")
+        self.assertEqual(counts, {'store_load': 1})
+
+    def test_jumps_are_threaded(self):
+        code, _ = self.optimize("JZ L1\nJMP L3\nL1:\nL2:\nJMP L3\nL3:\nRET", rules=['thread_jumps'])
+        self.assertEqual(code, "JZ L3\nRET\nL1:\nL2:\nRET\nL3:\nRET")
+        # A cycle of jumps is left as a loop
+        code, _ = self.optimize("L4:\nJMP L5\nL5:\nJMP L4", rules=['thread_jumps'])
+        self.assertEqual([line for line in code.split("\n") if line.startswith("JMP")], ["JMP L4", "JMP L4"])
+
+    def test_jumps_to_the_next_instruction_are_dropped(self):
+        code, _ = self.optimize("PUSH 1\nJZ L1\nL1:\nPUSH 1\nPUSH 2\nJLT L2\nL2:\nJMP L3\nL3:\nHALT",
+                                rules=['jump_to_next'])
+        self.assertEqual(code, "PUSH 1\nPOP\nL1:\nPUSH 1\nPUSH 2\nPOP\nPOP\nL2:\nL3:\nHALT")
+
+    def test_dead_code_after_unconditional_jumps(self):
+        code, counts = self.optimize("f:\nPUSH 0\nRET\nRET\nL1:\nJMP f\nPRINT\nL2:\nHALT", rules=['dead_code'])
+        self.assertEqual(code, "f:\nPUSH 0\nRET\nL1:\nJMP f\nL2:\nHALT")
+        self.assertEqual(counts, {'dead_code': 2})
+
+    def test_release_mode_strips_comments(self):
+        code, _ = self.optimize("; -- header --\n; t1 = 1\nPUSH 1\nPRINT\n; end", strip_comments=True)
+        self.assertEqual(code, "PUSH 1\nPRINT")
+        code, _ = self.optimize("; t1 = 1\nPUSH 1\nPRINT")
+        self.assertEqual(code, "; t1 = 1\nPUSH 1\nPRINT")
+
+    def test_unknown_rule(self):
+        with self.assertRaises(ValueError):
+            PeepholeOptimizer(rules=['no_such_rule'])
+
+    def test_generated_code_keeps_its_output(self):
+        ir = [
+            "FUNC main",
+            "i = 0",
+            "L1:",
+            "t1 = i < 3",
+            "IF_FALSE t1 GOTO L2",
+            "GOTO L3",
+            "L3:",
+            "PRINT i",
+            "t2 = i + 1",
+            "i = t2",
+            "GOTO L1",
+            "L2:",
+            "RETURN",
+            "END_FUNC",
+        ]
+        plain = AssemblyCodeGenerator(ir, peephole=False, superinstructions=False)
+        optimized = AssemblyCodeGenerator(ir, comments=False)
+        code = optimized.generate()
+        self.assertNotIn(";", code)
+        self.assertNotIn("RET\nRET", code)
+        self.assertIn('jump_to_next', optimized.peephole_counts)
+
+        vm = VirtualMachine()
+        vm.load_program(code)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        plain_vm = VirtualMachine()
+        plain_vm.load_program(plain.generate())
+        with contextlib.redirect_stdout(io.StringIO()):
+            plain_vm.run()
+        self.assertEqual(output.getvalue(), "0\n1\n2\n")
+        self.assertLess(vm.executed, plain_vm.executed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.ir import IRGenerator
+from mini_c_compiler.codegen import AssemblyCodeGenerator
+from mini_c_compiler.optimizer import Optimizer
+from mini_c_compiler.pgo import ExecutionProfile
+from mini_c_compiler.vm import VirtualMachine
+
+PROGRAM = """
+int square(int x) { return x * x; }
+int clamp(int v, int limit) { if (v > limit) { return limit; } return v; }
+int main() {
+    int i = 0;
+    int total = 0;
+    while (i < 200) {
+        total = total + clamp(square(i), 900);
+        if (total < 1000000) { i = i + 1; } else { print(0); i = 200; }
+    }
+    print(total);
+}
+"""
+
+class TestPGO(unittest.TestCase):
+    def generate_ir(self, code):
+        tokens = Lexer(code).tokenize()
+        ast = Parser(tokens).parse()
+        return IRGenerator().generate(ast)
+
+    def run_ir(self, ir, profile=False):
+        vm = VirtualMachine(profile=profile)
+        vm.load_program(AssemblyCodeGenerator(ir).generate())
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        return vm, output.getvalue()
+
+    def profile_program(self, code, level=2):
+        ir = Optimizer(self.generate_ir(code)).optimize(level=level)
+        vm, output = self.run_ir(ir, profile=True)
+        return vm.profile, output
+
+    def test_vm_records_profile(self):
+        profile, _ = self.profile_program(PROGRAM)
+        self.assertEqual(profile.call_count('main', 'square'), 200)
+        self.assertEqual(profile.call_count('main', 'clamp'), 200)
+        self.assertEqual(profile.call_count('<global>', 'main'), 1)
+        self.assertEqual(profile.function_count('clamp'), 200)
+        # Labels control never reached are recorded with a zero count
+        self.assertIn(0, profile.blocks.values())
+
+    def test_profile_round_trip(self):
+        profile, _ = self.profile_program(PROGRAM)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profile.json')
+            profile.save(path)
+            loaded = ExecutionProfile.load(path)
+        self.assertEqual(loaded.as_dict(), profile.as_dict())
+
+    def test_merge(self):
+        first = ExecutionProfile({'L1': 2}, {'main->f': 1}, {'f': 1})
+        first.merge(ExecutionProfile({'L1': 3, 'L2': 0}, {'main->f': 4}, {'f': 4}))
+        self.assertEqual(first.block_count('L1'), 5)
+        self.assertEqual(first.block_count('L2'), 0)
+        self.assertEqual(first.call_count('main', 'f'), 5)
+
+    def test_passes_need_a_profile(self):
+        ir = self.generate_ir(PROGRAM)
+        expected = Optimizer(list(ir)).optimize(level=2)
+        optimizer = Optimizer(list(ir))
+        self.assertEqual(optimizer.optimize(level=2, passes=['inline_functions', 'unroll_loops',
+                                                             'block_layout']), ir)
+        self.assertEqual(Optimizer(list(ir), profile=None).optimize(level=2), expected)
+
+    def test_hot_calls_are_inlined(self):
+        profile, expected = self.profile_program(PROGRAM)
+        optimized = Optimizer(self.generate_ir(PROGRAM), profile=profile).optimize(level=2)
+        self.assertFalse(any("CALL square" in instr or "CALL clamp" in instr for instr in optimized))
+        # The inlined callees are no longer needed
+        self.assertNotIn("FUNC square", optimized)
+
+        vm, output = self.run_ir(optimized)
+        self.assertEqual(output, expected)
+
+    def test_cold_calls_are_kept(self):
+        profile = ExecutionProfile(calls={'main->square': 1})
+        optimized = Optimizer(self.generate_ir(PROGRAM), profile=profile).optimize(level=2)
+        self.assertTrue(any("CALL square" in instr for instr in optimized))
+
+    def test_recursive_calls_are_not_inlined(self):
+        code = """
+        int fact(int n) { if (n < 2) { return 1; } return n * fact(n - 1); }
+        int main() { int i = 0; while (i < 100) { print(fact(5)); i = i + 1; } }
+        """
+        ir = self.generate_ir(code)
+        profile = ExecutionProfile(calls={'main->fact': 1000, 'fact->fact': 1000})
+        optimized = Optimizer(ir, profile=profile).optimize(level=2, passes=['inline_functions'])
+        self.assertEqual(optimized, ir)
+
+    def test_hot_loop_is_unrolled(self):
+        code = """
+        int sum(int n) { int s = 0; int k = 0; while (k < n) { s = s + k; k = k + 1; } return s; }
+        int main() { int i = 0; while (i < 3) { print(sum(100 + i)); i = i + 1; } }
+        """
+        ir = Optimizer(self.generate_ir(code)).optimize(level=2)
+        vm, expected = self.run_ir(ir, profile=True)
+        optimized = Optimizer(list(ir), profile=vm.profile).optimize(level=2)
+        # The hot loop's test now appears twice per iteration; main's loop is cold
+        self.assertEqual(sum(1 for instr in optimized if instr.startswith("IF_FALSE")), 3)
+
+        unrolled_vm, output = self.run_ir(optimized)
+        self.assertEqual(output, expected)
+        self.assertLess(unrolled_vm.executed, vm.executed)
+
+    def test_cold_blocks_move_to_the_end(self):
+        ir = [
+            "FUNC main",
+            "t1 = x > 0",
+            "IF_FALSE t1 GOTO L1",
+            "PRINT 1",
+            "GOTO L2",
+            "L1:",
+            "PRINT 2",
+            "L2:",
+            "RETURN 0",
+            "END_FUNC",
+        ]
+        # The else branch never ran: it moves out of line, and the then
+        # branch falls straight through to L2
+        profile = ExecutionProfile(blocks={'L1': 0, 'L2': 10}, functions={'main': 10})
+        optimized = Optimizer(list(ir), profile=profile).optimize(level=2, passes=['block_layout'])
+        self.assertEqual(optimized, [
+            "FUNC main",
+            "t1 = x > 0",
+            "IF_FALSE t1 GOTO L1",
+            "PRINT 1",
+            "L2:",
+            "RETURN 0",
+            "L1:",
+            "PRINT 2",
+            "GOTO L2",
+            "END_FUNC",
+        ])
+
+    def test_pgo_build_preserves_output(self):
+        profile, expected = self.profile_program(PROGRAM, level=3)
+        optimized = Optimizer(self.generate_ir(PROGRAM), profile=profile).optimize(level=3)
+        vm, output = self.run_ir(optimized)
+        self.assertEqual(output, expected)
+
+if __name__ == '__main__':
+    unittest.main()
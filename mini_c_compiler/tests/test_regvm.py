@@ -0,0 +1,79 @@
+import contextlib
+import io
+import unittest
+from mini_c_compiler.benchmarks import build_ir, compile_asm, load_program, program_names
+from mini_c_compiler.codegen import RegisterCodeGenerator
+from mini_c_compiler.regvm import RegisterVM, RegisterCodeError
+from mini_c_compiler.vm import VirtualMachine
+
+def run(vm, code):
+    vm.load_program(code)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            vm.run()
+        except SystemExit:
+            pass
+    return output.getvalue()
+
+def run_source(source, opt_level=2):
+    # (stack VM output, register VM output, register VM)
+    vm = RegisterVM()
+    output = run(vm, RegisterCodeGenerator(build_ir(source, opt_level=opt_level)).generate())
+    return run(VirtualMachine(), compile_asm(source, opt_level=opt_level)), output, vm
+
+class TestRegisterVM(unittest.TestCase):
+    def test_compiled_programs(self):
+        for name in program_names():
+            for level in (0, 2):
+                with self.subTest(name, level=level):
+                    expected, output, _ = run_source(load_program(name), level)
+                    self.assertEqual(output, expected)
+
+    def test_one_instruction_per_operation(self):
+        vm = RegisterVM()
+        output = run(vm, "ENTER 2\nMOVE r0, 6\nMUL r1, r0, 7\nPRINT r1\nHALT")
+        self.assertEqual(output, "42\n")
+        self.assertEqual(vm.executed, 5)
+
+    def test_constants_live_in_the_frame_template(self):
+        vm = RegisterVM()
+        vm.load_program("ENTER 1\nADD r0, 2, 3\nPRINT r0\nCALL r0, f, 2\nHALT\nf:\nENTER 1\nRET 0")
+        main, f = vm.layouts
+        self.assertEqual(main.template, [None, 2, 3])
+        self.assertEqual(f.template, [None, 0])
+        self.assertEqual(vm.code[1][1], (0, 1, 2))       # ADD r0, r1, r2
+        self.assertEqual(vm.code[3][1], (0, 6, f.template, (1,)))
+
+    def test_recursion_and_globals(self):
+        expected, output, vm = run_source("""
+            int calls = 0;
+            int fib(int n) {
+                if (n < 2) { return n; }
+                return fib(n - 1) + fib(n - 2);
+            }
+            int main() {
+                print(fib(15));
+                print(calls - 1);
+            }
+        """)
+        self.assertEqual(output, expected)
+        self.assertEqual(output, "610\n-1\n")
+
+    def test_runtime_errors(self):
+        for source in ("int main() { int z = 0; print(5 / z); }",
+                       "int main() { int x; int c = 0; if (c) { x = 1; } print(x); }"):
+            with self.subTest(source):
+                expected, output, _ = run_source(source, opt_level=0)
+                self.assertTrue(output.startswith("Runtime Error at instruction"))
+                self.assertEqual(output.split(':')[-1], expected.split(':')[-1].replace('slot', 'register'))
+
+    def test_malformed_code_is_rejected_at_load(self):
+        for code in ("ENTER 1\nADD r0, r0\nHALT", "ENTER 1\nMOVE r1, 0\nHALT",
+                     "ENTER 1\nJMP nowhere", "MOVE r0, 1", "ENTER 0\nCALL r0, f\nHALT"):
+            with self.subTest(code):
+                with self.assertRaises(RegisterCodeError):
+                    RegisterVM().load_program(code)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,7 @@ class TestSemantic(unittest.TestCase):
         ast = parser.parse()
         analyzer = SemanticAnalyzer()
         analyzer.analyze(ast)
+        return ast
 
     def test_valid_program(self):
         code = """
@@ -81,5 +82,21 @@ class TestSemantic(unittest.TestCase):
         with self.assertRaises(SemanticError):
             self.analyze(code)
 
+    def test_constant_global_initializers(self):
+        code = """
+        int a = 2 * 3 + 1;
+        float f = -1.5;
+        int b = a * 2;
+        int q = 7 / 0;
+        int sq(int x) { return x * x; }
+        int c = sq(3);
+        int d = a + 1;
+        int main() { int local = 5; }
+        """
+        ast = self.analyze(code)
+        values = {decl.name: decl.constant_value for decl in ast.declarations if hasattr(decl, 'constant_value')}
+        # Division by zero is left for runtime, and once sq() has run `a` may have changed
+        self.assertEqual(values, {'a': 7, 'f': -1.5, 'b': 14, 'q': None, 'c': None, 'd': None})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,193 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from mini_c_compiler.benchmarks import build_ir, compile_asm
+from mini_c_compiler.codegen import PythonCodeGenerator, RegisterCodeGenerator
+from mini_c_compiler.inprocess import CompiledProgram
+from mini_c_compiler.ir_interpreter import IRProgram, ProgramError
+from mini_c_compiler.jit import JitVM
+from mini_c_compiler.regvm import RegisterVM
+from mini_c_compiler.semantic import SemanticAnalyzer
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.core.errors import CompilerError
+from mini_c_compiler.streams import InputReader, OutputSink, EndOfInput
+from mini_c_compiler.threaded import ThreadedVM
+from mini_c_compiler.vm import VirtualMachine
+from mini_c_compiler.x86 import X86CodeGenerator, NativeBuildError
+
+# Sums the squares of n numbers, then doubles one more
+SUM_SQUARES = """
+int sq(int x) { return x * x; }
+int main() {
+    int total = 0;
+    int n = read();
+    int i = 0;
+    while (i < n) {
+        total = total + sq(read());
+        i = i + 1;
+    }
+    print(total);
+    float f = read();
+    print(f * 2);
+}
+"""
+
+RECORDS = ["3 1 2 3 1.5", "0\n-2", "2\n10\n-10\n0.25\n"]
+EXPECTED = ["14\n3.0\n", "0\n-4\n", "200\n0.5\n"]
+
+class TestInputReader(unittest.TestCase):
+    def test_tokens_split_across_chunks(self):
+        source = io.BytesIO(b"12 345\n6789  -5 2.5\n\n  77")
+        reader = InputReader(source, chunk_size=3)
+        values = []
+        while not reader.at_end():
+            values.append(reader.read_value())
+        self.assertEqual(values, [12, 345, 6789, -5, 2.5, 77])
+        with self.assertRaises(EndOfInput):
+            reader.read_value()
+
+    def test_text_and_in_memory_sources(self):
+        self.assertEqual(InputReader(io.StringIO("1 2")).read_value(), 1)
+        self.assertEqual(InputReader(b" 7 ").read_value(), 7)
+        reader = InputReader("4.0 x")
+        self.assertIsInstance(reader.read_value(), float)
+        with self.assertRaises(ValueError):
+            reader.read_value()
+        self.assertIsNone(reader.try_read())
+        self.assertFalse(reader.at_end()) # The bad token is still there
+
+    def test_stdin_is_the_default(self):
+        stdin = sys.stdin
+        sys.stdin = io.StringIO("5 6")
+        try:
+            reader = InputReader()
+            self.assertEqual([reader.read_value(), reader.read_value()], [5, 6])
+        finally:
+            sys.stdin = stdin
+
+class TestOutputSink(unittest.TestCase):
+    def test_flush_policies(self):
+        target = io.StringIO()
+        sink = OutputSink(target, 'block', block_lines=2)
+        sink.write_value(1)
+        self.assertEqual(target.getvalue(), "")
+        sink.write_value(2.5)
+        self.assertEqual(target.getvalue(), "1\n2.5\n")
+        line = io.StringIO()
+        OutputSink(line, 'line').write_value(3)
+        self.assertEqual(line.getvalue(), "3\n")
+        end = OutputSink(io.StringIO(), 'end')
+        for value in range(10000):
+            end.write_value(value)
+        self.assertEqual(end.target.getvalue(), "")
+        end.flush()
+        self.assertEqual(end.target.getvalue().split(), [str(value) for value in range(10000)])
+        with self.assertRaises(ValueError):
+            OutputSink(target, 'never')
+
+    def test_default_target_follows_redirection(self):
+        sink = OutputSink()
+        self.assertEqual(sink.policy, 'block') # Not a terminal under the test runner
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            sink.write_value(9)
+            sink.flush()
+        self.assertEqual(output.getvalue(), "9\n")
+
+class TestVirtualMachineIO(unittest.TestCase):
+    ENGINES = [
+        ('table', lambda: VirtualMachine()),
+        ('threaded', lambda: ThreadedVM()),
+        ('jit', lambda: JitVM(call_threshold=1, loop_threshold=1)),
+    ]
+
+    def test_run_io_streams_many_records(self):
+        code = compile_asm(SUM_SQUARES)
+        for name, make in self.ENGINES:
+            with self.subTest(name):
+                vm = make()
+                vm.load_program(code)
+                for _ in range(3):
+                    self.assertEqual([vm.run_io(record) for record in RECORDS], EXPECTED)
+
+    def test_reading_past_the_end_is_a_runtime_error(self):
+        code = compile_asm(SUM_SQUARES)
+        for name, make in self.ENGINES:
+            with self.subTest(name):
+                vm = make()
+                vm.load_program(code)
+                vm.run_io(RECORDS[0]) # Compiles main under the JIT
+                with self.assertRaises(ProgramError) as raised:
+                    vm.run_io("3 1 2")
+                self.assertEqual(raised.exception.instruction, "READ")
+                with self.assertRaisesRegex(ProgramError, "Invalid number 'x'"):
+                    vm.run_io("1 x")
+                self.assertEqual(vm.run_io(RECORDS[1]), EXPECTED[1])
+
+    def test_global_initializers_run_each_time(self):
+        vm = JitVM(call_threshold=1)
+        vm.load_program(compile_asm("int scale = 3; int first = read(); int main() { print(first * scale); }"))
+        self.assertEqual(vm.run_io("5"), "15\n")
+        self.assertEqual(vm.run_io("6"), "18\n")
+
+    def test_run_reports_errors_after_the_output(self):
+        vm = VirtualMachine(stdin=io.BytesIO(b"1 4"))
+        vm.load_program(compile_asm(SUM_SQUARES))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with self.assertRaises(SystemExit):
+                vm.run()
+        self.assertEqual(output.getvalue(), "16\nRuntime Error at instruction 'READ': end of input\n")
+
+class TestOtherRunners(unittest.TestCase):
+    def test_register_vm(self):
+        vm = RegisterVM()
+        vm.load_program(RegisterCodeGenerator(build_ir(SUM_SQUARES)).generate())
+        self.assertEqual([vm.run_io(record) for record in RECORDS], EXPECTED)
+        with self.assertRaises(ProgramError):
+            vm.run_io("")
+
+    def test_ir_program(self):
+        program = IRProgram(build_ir(SUM_SQUARES))
+        for record, expected in zip(RECORDS, EXPECTED):
+            output = io.StringIO()
+            program.run(stdin=record, stdout=output)
+            self.assertEqual(output.getvalue(), expected)
+        with self.assertRaisesRegex(ProgramError, "end of input"):
+            program.run(stdin="1", stdout=io.StringIO())
+
+    def test_compiled_program(self):
+        program = CompiledProgram.from_source(SUM_SQUARES)
+        for record, expected in zip(RECORDS, EXPECTED):
+            output = io.StringIO()
+            program.run(stdin=record, stdout=output)
+            self.assertEqual(output.getvalue(), expected)
+
+    def test_generated_script_reads_stdin(self):
+        code = PythonCodeGenerator(build_ir(SUM_SQUARES)).generate()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.py')
+            with open(path, 'w') as f:
+                f.write(code)
+            result = subprocess.run([sys.executable, path], input=RECORDS[0].encode(),
+                                    capture_output=True, check=True)
+        self.assertEqual(result.stdout.decode(), EXPECTED[0])
+        self.assertNotIn("def read", PythonCodeGenerator(build_ir("int main() { print(1); }")).generate())
+
+    def test_native_backend_rejects_read(self):
+        with self.assertRaises(NativeBuildError):
+            X86CodeGenerator(build_ir(SUM_SQUARES)).generate()
+
+    def test_read_is_a_builtin(self):
+        for source in ("int read() { return 1; }", "int main() { int x = read(1); }"):
+            with self.subTest(source):
+                with self.assertRaises(CompilerError):
+                    SemanticAnalyzer().analyze(Parser(Lexer(source).tokenize()).parse())
+
+if __name__ == '__main__':
+    unittest.main()
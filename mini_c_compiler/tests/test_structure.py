@@ -0,0 +1,68 @@
+import unittest
+from mini_c_compiler.structure import Structurer, StructureError, TextStatements
+
+class GraphStructurer(Structurer):
+    """Structures a hand-written graph: block -> (statement, how it ends)."""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        successors = {}
+        for block, (_, end) in blocks.items():
+            if end[0] == 'goto':
+                successors[block] = [end[1]]
+            elif end[0] == 'branch':
+                successors[block] = [end[2], end[1]] # Fall-through first
+            else:
+                successors[block] = []
+        super().__init__(0, successors, TextStatements())
+
+    def emit_block(self, block):
+        statement, end = self.blocks[block]
+        statements = [statement] if statement else []
+        if end[0] == 'return':
+            return 'return', [f"return {end[1]}"], statements
+        if end[0] == 'branch':
+            test = end[3]
+            return 'branch', ((test, f"not {test}"), end[1], end[2]), statements
+        return 'goto', end[1], statements
+
+class TestStructurer(unittest.TestCase):
+    def test_while_loop(self):
+        structurer = GraphStructurer({
+            0: ("i = 0", ('goto', 1)),
+            1: (None, ('branch', 3, 2, "i >= n")),
+            2: ("i += 1", ('goto', 1)),
+            3: (None, ('return', "i")),
+        })
+        self.assertEqual(list(structurer.loops), [1])
+        self.assertEqual(structurer.generate(), ["i = 0", "while not i >= n:", "    i += 1", "return i"])
+        self.assertEqual(structurer.generate(start=1)[0], "while not i >= n:") # From the header
+
+    def test_exit_that_returns_is_not_a_second_exit(self):
+        structurer = GraphStructurer({
+            0: (None, ('branch', 3, 1, "i >= n")),
+            1: (None, ('branch', 4, 2, "i == k")),
+            2: ("i += 1", ('goto', 0)),
+            3: (None, ('return', "0")),
+            4: (None, ('return', "i")),
+        })
+        self.assertEqual(structurer.loops[0].follow, 3)
+        self.assertEqual(structurer.generate(), [
+            "while not i >= n:",
+            "    if i == k:",
+            "        return i",
+            "    i += 1",
+            "return 0",
+        ])
+
+    def test_irreducible_control_flow(self):
+        with self.assertRaises(StructureError):
+            GraphStructurer({
+                0: (None, ('branch', 2, 1, "c")),
+                1: ("a", ('goto', 2)),
+                2: ("b", ('branch', 1, 3, "d")),
+                3: (None, ('return', "0")),
+            })
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from mini_c_compiler.benchmarks import compile_asm, run_vm
+from mini_c_compiler.vectorize import compile_vectorized, VectorizeError, np
+
+FUNCTIONS = """
+int collatz(int n) {
+    int steps = 0;
+    while (n != 1) {
+        if (n - n / 2 * 2 == 0) { n = n / 2; } else { n = 3 * n + 1; }
+        steps = steps + 1;
+    }
+    return steps;
+}
+float score(int a, float b) {
+    float s = b * 2.5;
+    if (a > 3) { s = s - a; } else { s = s + a * 2; }
+    return s / 2 + b;
+}
+int fact(int n) { if (n < 2) { return 1; } return n * fact(n - 1); }
+int mix(int n, int d) { return fact(n) / d - collatz(n + 1) + (n >= d); }
+"""
+
+def vm_results(source, func, rows):
+    # One call per row, printed by a generated main
+    calls = " ".join(f"print({func}({', '.join(repr(value) for value in row)}));" for row in rows)
+    _, output, _ = run_vm(compile_asm(f"{source}\nint main() {{ {calls} }}"))
+    return [float(line) for line in output.split()]
+
+@unittest.skipIf(np is None, "needs NumPy")
+class TestVectorize(unittest.TestCase):
+    def assert_matches_vm(self, func, *columns):
+        vectorized = compile_vectorized(FUNCTIONS, func)
+        result = vectorized(*columns)
+        rows = list(zip(*(np.broadcast_arrays(*columns))))
+        rows = [[value.item() for value in row] for row in rows]
+        self.assertEqual(result.tolist(), vm_results(FUNCTIONS, func, rows))
+        return result
+
+    def test_loops_run_until_every_lane_is_done(self):
+        result = self.assert_matches_vm('collatz', np.arange(1, 40))
+        self.assertEqual(result.dtype, np.int64)
+
+    def test_branches_and_floats(self):
+        result = self.assert_matches_vm('score', np.arange(-6, 9), np.linspace(-2.0, 3.0, 15))
+        self.assertEqual(result.dtype, np.float64)
+
+    def test_calls_and_truncating_division(self):
+        self.assert_matches_vm('mix', np.arange(0, 12), np.array([1, -2, 3, -4, 5, 7] * 2))
+
+    def test_scalars_broadcast(self):
+        vectorized = compile_vectorized(FUNCTIONS, 'score')
+        self.assertEqual(vectorized(np.array([[1, 5], [2, 6]]), 1.0).shape, (2, 2))
+        self.assertEqual(vectorized(4, 2.0).shape, ())
+
+    def test_division_by_zero_in_a_running_lane(self):
+        vectorized = compile_vectorized(FUNCTIONS, 'mix')
+        with self.assertRaises(ZeroDivisionError):
+            vectorized(np.array([1, 2, 3]), np.array([1, 0, 1]))
+
+    def test_rejects_impure_functions(self):
+        source = """
+        int g = 3;
+        int noisy(int x) { print(x); return x; }
+        int global_read(int x) { return x + g; }
+        int calls_noisy(int x) { return noisy(x) + 1; }
+        int main() { g = 4; print(noisy(1) + global_read(2) + calls_noisy(3)); }
+        """
+        for func in ('noisy', 'global_read', 'calls_noisy', 'missing'):
+            with self.subTest(func):
+                with self.assertRaises(VectorizeError):
+                    compile_vectorized(source, func)
+
+if __name__ == '__main__':
+    unittest.main()
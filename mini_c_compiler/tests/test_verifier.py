@@ -0,0 +1,100 @@
+import contextlib
+import io
+import unittest
+from mini_c_compiler.bytecode import Program, assemble
+from mini_c_compiler.core.opcodes import Opcode
+from mini_c_compiler.verifier import verify, VerificationError
+from mini_c_compiler.vm import VirtualMachine
+
+PROGRAM = """
+JMP start
+add3:
+ENTER 3
+STORE_LOCAL 0
+STORE_LOCAL 1
+STORE_LOCAL 2
+LOAD_LOCAL 0
+LOAD_LOCAL 1
+LOAD_LOCAL 2
+ADD
+ADD
+RET
+start:
+PUSH 1
+PUSH 2
+PUSH 3
+CALL add3
+PRINT
+HALT
+"""
+
+class TestVerifier(unittest.TestCase):
+    def test_arity_and_depth(self):
+        program = assemble(PROGRAM)
+        infos = verify(program)
+        add3 = infos[program.label_offsets()['add3']]
+        self.assertEqual(add3.arity, 3)
+        self.assertEqual(add3.max_depth, 0) # Its loads reuse the space of its arguments
+        self.assertEqual(add3.frame_size, 3)
+        self.assertEqual(infos[0].max_depth, 3)
+
+    def test_recursive_function(self):
+        code = """
+        JMP start
+        down:
+        ENTER 1
+        DUP
+        STORE_LOCAL 0
+        JZ base
+        LOAD_LOCAL 0
+        SUB_CONST 1
+        CALL down
+        ADD_LOCAL 0
+        RET
+        base:
+        PUSH 0
+        RET
+        start:
+        PUSH 300
+        CALL down
+        PRINT
+        HALT
+        """
+        program = assemble(code)
+        self.assertEqual(verify(program)[program.label_offsets()['down']].arity, 1)
+        # Deep recursion grows the preallocated stack at calls
+        vm = VirtualMachine()
+        vm.load_program(code)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            vm.run()
+        self.assertEqual(output.getvalue(), f"{sum(range(301))}\n")
+        self.assertEqual(vm.sp, 0)
+
+    def test_rejects_malformed_code(self):
+        cases = {
+            "inconsistent merge": "PUSH 1\nJZ L1\nPUSH 2\nL1:\nHALT",
+            "underflow": "PUSH 1\nADD\nHALT",
+            "frame": "JMP s\nf:\nENTER 1\nLOAD_LOCAL 1\nRET\ns:\nCALL f\nHALT",
+            "no frame": "JMP s\nf:\nLOAD_LOCAL 0\nRET\ns:\nCALL f\nHALT",
+            "inconsistent return": "JMP s\nf:\nENTER 0\nJZ L1\nPUSH 1\nRET\nL1:\nRET\ns:\nPUSH 0\nCALL f\nHALT",
+            "missing arguments": "JMP s\nf:\nENTER 1\nSTORE_LOCAL 0\nPUSH 1\nRET\ns:\nCALL f\nHALT",
+            "runs off the end": "JMP s\ns:\nCALL f\nHALT\nf:\nPUSH 1",
+        }
+        for name, code in cases.items():
+            with self.subTest(name):
+                with self.assertRaises(VerificationError):
+                    verify(assemble(code))
+
+    def test_rejects_bad_operands(self):
+        with self.assertRaises(VerificationError):
+            verify(Program([(Opcode.JMP, 5), (Opcode.HALT, 0)]))
+        with self.assertRaises(VerificationError):
+            verify(Program([(Opcode.PUSH_CONST, 0), (Opcode.HALT, 0)]))
+
+    def test_vm_rejects_at_load_time(self):
+        with self.assertRaises(VerificationError):
+            VirtualMachine().load_program("PUSH 1\nADD\nPRINT")
+
+if __name__ == '__main__':
+    unittest.main()
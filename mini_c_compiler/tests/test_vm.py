@@ -0,0 +1,223 @@
+import contextlib
+import io
+import unittest
+from mini_c_compiler.benchmarks import compile_asm, load_program, program_names
+from mini_c_compiler.benchmarks.dispatch import BODIES, counted_loop
+from mini_c_compiler.core.opcodes import Opcode
+from mini_c_compiler.threaded import ThreadedVM
+from mini_c_compiler.vm import VirtualMachine
+
+# The dispatch micro-benchmarks, with short loops
+PROGRAMS = {name: counted_loop(body, iterations=50) for name, body in BODIES.items()}
+
+class TracingVM(VirtualMachine):
+    # Overriding execute() makes run() go through the instrumented loop
+    def __init__(self):
+        super().__init__()
+        self.trace = []
+
+    def execute(self, instr):
+        self.trace.append(instr[0])
+        super().execute(instr)
+
+def run_vm(vm, code):
+    vm.load_program(code)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            vm.run()
+        except SystemExit:
+            pass
+    return output.getvalue()
+
+class TestVirtualMachine(unittest.TestCase):
+
+    def test_every_opcode_has_a_handler(self):
+        handlers = VirtualMachine().handlers
+        for op in Opcode:
+            self.assertTrue(callable(handlers[op]), op.name)
+
+    def test_instructions_are_decoded_once(self):
+        vm = VirtualMachine()
+        vm.load_program("JMP end\nPUSH 2.5\nend:\nPUSH 7\nPRINT\nHALT")
+        self.assertEqual(vm.instructions[0], (Opcode.JMP, 2))
+        self.assertEqual(vm.instructions[1], (Opcode.PUSH_CONST, 2.5))
+        self.assertEqual(vm.code[2], (vm.handlers[Opcode.PUSH_CONST], 7))
+
+    def test_fast_and_instrumented_loops_agree(self):
+        for name, code in PROGRAMS.items():
+            with self.subTest(name):
+                fast = VirtualMachine()
+                traced = TracingVM()
+                self.assertEqual(run_vm(fast, code), run_vm(traced, code))
+                self.assertEqual(fast.executed, traced.executed)
+                self.assertEqual(len(traced.trace), traced.executed)
+                self.assertEqual(fast.globals, traced.globals)
+
+class TestQuickening(unittest.TestCase):
+    SOURCE = """
+    PUSH 1
+    STORE total
+    JMP start
+    bump:
+    PUSH total
+    PUSH 1
+    ADD
+    STORE total
+    PUSH total
+    RET
+    start:
+    PUSH 5
+    STORE_GLOBAL 0
+    LOAD_GLOBAL 0
+    PRINT
+    CALL bump
+    PRINT
+    PUSH total
+    PRINT
+    HALT
+    """
+
+    def test_instructions_are_rewritten_after_first_execution(self):
+        vm = VirtualMachine()
+        vm.load_program(self.SOURCE)
+        load_global = next(ip for ip, (op, _) in enumerate(vm.instructions) if op == Opcode.LOAD_GLOBAL)
+        self.assertEqual(vm.code[load_global][0], vm.quicken_load_global)
+        self.assertEqual(run_vm(vm, self.SOURCE), "5\n2\n1\n")
+        self.assertEqual(vm.code[load_global][0], vm.op_load_global_set)
+        # Name lookups are only in hand-written code, and stay generic
+        pushes = [ip for ip, (op, arg) in enumerate(vm.instructions) if op == Opcode.PUSH and arg == 'total']
+        self.assertEqual({vm.code[ip][0] for ip in pushes}, {vm.op_push})
+
+    def test_stats(self):
+        code = """
+        PUSH 0
+        STORE y
+        JMP start
+        bench:
+        ENTER 1
+        PUSH 0
+        STORE_LOCAL 0
+        loop:
+        LOAD_LOCAL 0
+        PUSH 10
+        JGE done
+        LOAD_LOCAL 0
+        STORE x
+        PUSH x
+        PUSH y
+        ADD
+        STORE y
+        LOAD_GLOBAL 0
+        POP
+        INC_LOCAL 0
+        JMP loop
+        done:
+        PUSH 0
+        RET
+        start:
+        PUSH 5
+        STORE_GLOBAL 0
+        CALL bench
+        POP
+        HALT
+        """
+        vm = VirtualMachine(quickening_stats=True)
+        run_vm(vm, code)
+        self.assertEqual(list(vm.quickening), ['load_global_set'])
+        load = vm.quickening['load_global_set']
+        # The first execution quickens; the other nine run the variant
+        self.assertEqual((load.quickened, load.executed), (1, 9))
+
+class TestThreadedVM(unittest.TestCase):
+    def assert_same_run(self, code):
+        table = VirtualMachine()
+        threaded = ThreadedVM()
+        self.assertEqual(run_vm(table, code), run_vm(threaded, code))
+        self.assertEqual(table.executed, threaded.executed)
+        self.assertEqual(table.globals, threaded.globals)
+
+    def test_micro_benchmarks(self):
+        for name, code in PROGRAMS.items():
+            with self.subTest(name):
+                self.assert_same_run(code)
+
+    def test_compiled_programs(self):
+        for name in program_names():
+            for level in (0, 2):
+                with self.subTest(name, level=level):
+                    self.assert_same_run(compile_asm(load_program(name), opt_level=level))
+
+    def test_blocks_are_compiled_at_load(self):
+        vm = ThreadedVM()
+        vm.load_program("PUSH 1\nJZ end\nPUSH 2\nPRINT\nend:\nHALT")
+        block = vm.entry_block
+        self.assertEqual((block.start, block.count, len(block.ops)), (0, 2, 1))
+        self.assertEqual((block.next.start, block.next.count), (2, 2))
+        self.assertEqual(block.exit([0]).start, 4)
+        self.assertIs(block.exit([1]), block.next)
+
+    def test_runtime_error_names_the_failing_instruction(self):
+        code = "PUSH 1\nPUSH 2\nADD\nPUSH 0\nDIV\nPRINT\nHALT"
+        table = VirtualMachine()
+        threaded = ThreadedVM()
+        self.assertEqual(run_vm(table, code), run_vm(threaded, code))
+        self.assertIn("'DIV'", run_vm(ThreadedVM(), code))
+        self.assertEqual(threaded.executed, table.executed)
+
+    def test_named_variables_use_table_dispatch(self):
+        vm = ThreadedVM()
+        self.assertEqual(run_vm(vm, "PUSH 5\nSTORE x\nPUSH x\nPRINT\nHALT"), "5\n")
+        self.assertIsNone(vm.entry_block)
+
+class PrologueVM(VirtualMachine):
+    direct_calls = False
+
+class TestCalls(unittest.TestCase):
+    # Keeps its argument on the stack: the prologue is ENTER, DUP, STORE_LOCAL
+    TWICE = "PUSH 4\nCALL twice\nPRINT\nPUSH 5\nCALL twice\nPRINT\nHALT\n" \
+            "twice:\nENTER 1\nDUP\nSTORE_LOCAL 0\nLOAD_LOCAL 0\nADD\nRET"
+    DOWN = """
+    int down(int n) {
+        if (n == 0) {
+            return 0;
+        }
+        return down(n - 1) + 1;
+    }
+    int main() {
+        print(down(50));
+    }
+    """
+
+    def test_arguments_go_straight_into_the_frame(self):
+        vm = VirtualMachine()
+        prologue = PrologueVM()
+        self.assertEqual(run_vm(vm, self.TWICE), "8\n10\n")
+        self.assertEqual(run_vm(prologue, self.TWICE), "8\n10\n")
+        self.assertTrue(vm.callees[7].keep)
+        self.assertEqual(vm.executed, prologue.executed - 6) # ENTER, DUP and STORE_LOCAL per call
+
+    def test_frames_are_reused(self):
+        vm = VirtualMachine()
+        run_vm(vm, self.TWICE)
+        self.assertEqual(len(vm.call_stack), 2) # The top level's Frame and one for both calls
+        self.assertEqual(vm.depth, 0)
+
+    def test_engines_agree(self):
+        code = compile_asm(self.DOWN, opt_level=0)
+        for vm_class in (ThreadedVM, PrologueVM):
+            with self.subTest(vm_class.__name__):
+                table = VirtualMachine()
+                vm = vm_class()
+                self.assertEqual(run_vm(vm, code), run_vm(table, code))
+                self.assertEqual(run_vm(table, code), "50\n")
+
+    def test_maximum_call_depth(self):
+        code = compile_asm(self.DOWN, opt_level=0)
+        for vm_class in (VirtualMachine, ThreadedVM, PrologueVM):
+            with self.subTest(vm_class.__name__):
+                self.assertEqual(run_vm(vm_class(max_call_depth=52), code), "50\n") # main, then down(50) .. down(0)
+                self.assertIn("Maximum call depth of 51 exceeded", run_vm(vm_class(max_call_depth=51), code))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os
+import subprocess
+import tempfile
+import unittest
+from mini_c_compiler.benchmarks import build_ir, compile_asm, load_program, program_names
+from mini_c_compiler.vm import VirtualMachine
+from mini_c_compiler.x86 import X86CodeGenerator, build_executable, find_compiler, linear_scan
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'examples')
+
+FLOATS = """
+float half(float x) { return x / 2.0 * 1.0 + 0.25; }
+float mix(int a, float b, int c, float d, int e, float f, int g, float h, int i, float j,
+          int k, float l, int m, float n, int o, float p, float q, float r, int s) {
+    return a + b + c + d + e + f + g + h + i + j + k + l + m + n + o + p + q + r + s;
+}
+float g = 1.5;
+
+int main() {
+    float x = 0.1;
+    print(x);
+    print(x + 0.2);
+    print(1.0 / 3.0);
+    print(-7 / 2);
+    print(-7.5 / 2.0);
+    print(half(3.0));
+    print(10000000000.0 * 1000000.0);
+    print(0.0001);
+    print(-x);
+    print(g * 2);
+    print(mix(1, 2.5, 3, 4.5, 5, 6.5, 7, 8.5, 9, 10.5, 11, 12.5, 13, 14.5, 15, 16.5, 17.5, 18.5, 19));
+    print(3.0 < 4);
+    print(2.5 != 2.5);
+    float acc = 0.5;
+    while (acc < 100.0) { acc = acc * 3; }
+    print(acc);
+    print(100000000000 * 3);
+}
+"""
+
+SPILLS = """
+int f(int n) { return n + 1; }
+int main() {
+    int a = f(1); int b = f(2); int c = f(3); int d = f(4); int e = f(5); int g = f(6);
+    int h = f(7); int i = f(8); int j = f(9); int k = f(10); int l = f(11); int m = f(12);
+    float x = a * 0.5; float y = b * 0.25; float z = c * 1.5;
+    int s = 0;
+    int n = 0;
+    while (n < 10) {
+        s = s + a * b - c + d * e - g + h * i - j + k * l - m + f(n);
+        x = x + y * z;
+        n = n + 1;
+    }
+    print(s); print(a + b + c + d + e + g + h + i + j + k + l + m); print(x); print(y + z);
+}
+"""
+
+def vm_output(source, opt_level):
+    vm = VirtualMachine()
+    vm.load_program(compile_asm(source, opt_level=opt_level))
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            vm.run()
+        except SystemExit:
+            pass
+    return output.getvalue()
+
+def native_run(source, opt_level):
+    with tempfile.TemporaryDirectory() as directory:
+        assembly = X86CodeGenerator(build_ir(source, opt_level=opt_level)).generate()
+        executable = build_executable(assembly, os.path.join(directory, 'program'))
+        return subprocess.run([executable], capture_output=True, text=True, timeout=60)
+
+@unittest.skipIf(find_compiler() is None, "needs a C compiler")
+class TestX86(unittest.TestCase):
+    def assert_same_output(self, source, levels=(0, 2)):
+        for opt_level in levels:
+            with self.subTest(opt_level=opt_level):
+                result = native_run(source, opt_level)
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertEqual(result.stdout, vm_output(source, opt_level))
+
+    def test_example_programs(self):
+        for name in ('test1.c', 'test2.c', 'test_opt.c'):
+            with self.subTest(name):
+                with open(os.path.join(EXAMPLES, name), 'r') as f:
+                    self.assert_same_output(f.read())
+
+    def test_benchmark_programs(self):
+        for name in program_names():
+            with self.subTest(name):
+                self.assert_same_output(load_program(name))
+
+    def test_floats_and_stack_arguments(self):
+        self.assert_same_output(FLOATS)
+
+    def test_spilled_values_survive_calls(self):
+        self.assert_same_output(SPILLS)
+
+    def test_assigned_globals_are_read_until_assigned(self):
+        # A function that assigns a global's name reads the global until then, as in the VM
+        programs = [
+            "int g = 5; int bump() { g = g + 1; print(g); return 0; } int main() { bump(); print(g); }",
+            "int n = 3; int main() { int i = 0; while (i < n) { print(i); i = i + 1; } n = 10; print(n); }",
+            "float f = 1.5; float twice() { f = f * 2; return f; } int main() { print(twice()); print(f); }",
+        ]
+        for source in programs:
+            self.assert_same_output(source, levels=(0, 1, 2, 3))
+
+    def test_division_by_zero(self):
+        result = native_run("int main() { int a = 5; int b = 0; print(a); print(a / b); print(2); }", 0)
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout.splitlines(), ["5", "Runtime Error: division by zero"])
+
+    def test_generated_assembly(self):
+        assembly = X86CodeGenerator(build_ir("int sq(int x) { return x * x; } int main() { print(sq(7)); }", 0)).generate()
+        self.assertIn("mc_f_sq:", assembly)
+        self.assertIn("imulq", assembly)
+        self.assertIn(".globl mc_program", assembly)
+
+class TestLinearScan(unittest.TestCase):
+    def test_spills_the_interval_that_ends_last(self):
+        intervals = {'a': (0, 10), 'b': (1, 3), 'c': (2, 4)}
+        assignment, spilled = linear_scan(intervals, [], ['r1', 'r2'], [])
+        self.assertEqual(spilled, ['a'])
+        self.assertEqual(set(assignment), {'b', 'c'})
+
+    def test_reuses_registers_of_expired_intervals(self):
+        intervals = {'a': (0, 1), 'b': (2, 3)}
+        assignment, spilled = linear_scan(intervals, [], ['r1'], [])
+        self.assertEqual(assignment, {'a': 'r1', 'b': 'r1'})
+        self.assertEqual(spilled, [])
+
+    def test_caller_saved_registers_never_cross_calls(self):
+        intervals = {'across': (0, 10), 'short': (6, 8)}
+        assignment, spilled = linear_scan(intervals, [5], ['callee'], ['caller'])
+        self.assertEqual(assignment, {'across': 'callee', 'short': 'caller'})
+        assignment, spilled = linear_scan(intervals, [5], [], ['caller'])
+        self.assertEqual(spilled, ['across'])
+        self.assertEqual(assignment, {'short': 'caller'})
+
+if __name__ == '__main__':
+    unittest.main()
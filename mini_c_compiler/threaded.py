@@ -0,0 +1,280 @@
+"""Closure-threaded execution engine for the VM.
+
+Loaded code is split into basic blocks, and each instruction is compiled
+into a small Python closure with its operand (constant, slot, jump target)
+already bound. Running a block calls its closures in order and then its
+exit, which picks the next block, so there is no opcode dispatch and no
+operand decoding left at run time.
+"""
+from operator import length_hint
+
+from mini_c_compiler.core.opcodes import Opcode, JUMP_OPERAND, NAME_OPERAND
+from mini_c_compiler.vm import VirtualMachine, DEFAULT_MAX_CALL_DEPTH
+
+# How control leaves a block, other than through its exit closure
+CALL, RET, ENTER, HALT = range(4)
+
+BLOCK_ENDS = JUMP_OPERAND | {Opcode.CALL, Opcode.RET, Opcode.ENTER, Opcode.HALT}
+
+class Block:
+    __slots__ = ('start', 'ops', 'count', 'exit', 'kind', 'operand', 'target', 'callee', 'next')
+
+    def __init__(self, start):
+        self.start = start   # IP of the first instruction
+        self.ops = ()        # Closures for the body, called as op(stack, frame)
+        self.count = 0       # Instructions in the block, terminator included
+        self.exit = None     # exit(stack) -> next block, for jumps and fall-through
+        self.kind = None     # CALL, RET, ENTER or HALT when `exit` is None
+        self.operand = None  # Frame size, for ENTER
+        self.target = None   # Called block, for CALL: its body if CALL builds the frame
+        self.callee = None   # The called function's Callee, for CALL
+        self.next = None     # Block that follows in the code, if any
+
+def compile_op(op, arg, globals_, vm):
+    """Closure running one non-terminating instruction on (stack, frame)."""
+    if op == Opcode.PUSH_CONST:
+        def push_const(stack, frame):
+            stack.append(arg)
+        return push_const
+    if op == Opcode.LOAD_LOCAL:
+        def load_local(stack, frame):
+            val = frame[arg]
+            if val is None:
+                raise Exception(f"Undefined local variable in slot {arg}")
+            stack.append(val)
+        return load_local
+    if op == Opcode.STORE_LOCAL:
+        def store_local(stack, frame):
+            frame[arg] = stack.pop()
+        return store_local
+    if op == Opcode.LOAD_GLOBAL:
+        def load_global(stack, frame):
+            val = globals_[arg]
+            if val is None:
+                raise Exception(f"Undefined global variable in slot {arg}")
+            stack.append(val)
+        return load_global
+    if op == Opcode.STORE_GLOBAL:
+        def store_global(stack, frame):
+            globals_[arg] = stack.pop()
+        return store_global
+    if op == Opcode.POP:
+        def pop(stack, frame):
+            stack.pop()
+        return pop
+    if op == Opcode.DUP:
+        def dup(stack, frame):
+            stack.append(stack[-1])
+        return dup
+    if op == Opcode.ADD:
+        def add(stack, frame):
+            b = stack.pop()
+            stack[-1] = stack[-1] + b
+        return add
+    if op == Opcode.SUB:
+        def sub(stack, frame):
+            b = stack.pop()
+            stack[-1] = stack[-1] - b
+        return sub
+    if op == Opcode.MUL:
+        def mul(stack, frame):
+            b = stack.pop()
+            stack[-1] = stack[-1] * b
+        return mul
+    if op == Opcode.DIV:
+        def div(stack, frame):
+            b = stack.pop()
+            stack[-1] = int(stack[-1] / b) # Integer division, like the VM
+        return div
+    if op == Opcode.NEG:
+        def neg(stack, frame):
+            stack[-1] = -stack[-1]
+        return neg
+    if op in COMPARISONS:
+        compare = COMPARISONS[op]
+        def comparison(stack, frame):
+            b = stack.pop()
+            stack[-1] = 1 if compare(stack[-1], b) else 0
+        return comparison
+    if op == Opcode.ADD_CONST:
+        def add_const(stack, frame):
+            stack[-1] += arg
+        return add_const
+    if op == Opcode.SUB_CONST:
+        def sub_const(stack, frame):
+            stack[-1] -= arg
+        return sub_const
+    if op == Opcode.MUL_CONST:
+        def mul_const(stack, frame):
+            stack[-1] *= arg
+        return mul_const
+    if op == Opcode.ADD_LOCAL:
+        def add_local(stack, frame):
+            val = frame[arg]
+            if val is None:
+                raise Exception(f"Undefined local variable in slot {arg}")
+            stack[-1] += val
+        return add_local
+    if op == Opcode.INC_LOCAL:
+        def inc_local(stack, frame):
+            val = frame[arg]
+            if val is None:
+                raise Exception(f"Undefined local variable in slot {arg}")
+            frame[arg] = val + 1
+        return inc_local
+    if op == Opcode.PRINT:
+        def print_(stack, frame):
+            vm.output.write_value(stack.pop())
+        return print_
+    if op == Opcode.READ:
+        def read(stack, frame):
+            stack.append(vm.input.read_value())
+        return read
+    raise ValueError(f"No threaded code for {op.name}")
+
+COMPARISONS = {
+    Opcode.EQ: lambda a, b: a == b,
+    Opcode.NEQ: lambda a, b: a != b,
+    Opcode.GT: lambda a, b: a > b,
+    Opcode.LT: lambda a, b: a < b,
+    Opcode.GTE: lambda a, b: a >= b,
+    Opcode.LTE: lambda a, b: a <= b,
+}
+
+# Fused compare-and-jump opcodes, by the comparison they jump on
+JUMP_COMPARISONS = {
+    Opcode.JEQ: Opcode.EQ, Opcode.JNE: Opcode.NEQ, Opcode.JGT: Opcode.GT,
+    Opcode.JLT: Opcode.LT, Opcode.JGE: Opcode.GTE, Opcode.JLE: Opcode.LTE,
+}
+
+def compile_exit(op, taken, following):
+    """Exit closure for a jump: returns the block control goes to next.
+
+    Fall-through is compiled as a JMP to the following block.
+    """
+    if op == Opcode.JMP:
+        return lambda stack: taken
+    if op == Opcode.JZ:
+        return lambda stack: taken if stack.pop() == 0 else following
+    if op == Opcode.JNZ:
+        return lambda stack: taken if stack.pop() != 0 else following
+    compare = COMPARISONS[JUMP_COMPARISONS[op]]
+    def compare_and_jump(stack):
+        b = stack.pop()
+        return taken if compare(stack.pop(), b) else following
+    return compare_and_jump
+
+def find_leaders(instructions, callees):
+    # Blocks start at the entry, at jump and call targets (and where CALL
+    # enters the callee, past its prologue), and after any instruction that
+    # can transfer control
+    leaders = {0} | {callee.body for callee in callees.values() if callee.body is not None}
+    for ip, (op, operand) in enumerate(instructions):
+        if op in JUMP_OPERAND or op == Opcode.CALL:
+            leaders.add(operand)
+        if op in BLOCK_ENDS:
+            leaders.add(ip + 1)
+    return sorted(ip for ip in leaders if ip < len(instructions))
+
+class ThreadedVM(VirtualMachine):
+    """VirtualMachine that runs closure-compiled basic blocks.
+
+    Output, globals and the executed instruction count match
+    VirtualMachine.run. Code using name-addressed variables (PUSH/STORE
+    by name, PARAM) and profiled runs use the table-dispatch loop.
+    """
+
+    def __init__(self, profile=False, quickening_stats=False, max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+                 stdin=None, stdout=None, flush_policy=None):
+        super().__init__(profile=profile, quickening_stats=quickening_stats, max_call_depth=max_call_depth,
+                         stdin=stdin, stdout=stdout, flush_policy=flush_policy)
+        self.entry_block = None # First block, or None to use table dispatch
+
+    def load_bytecode(self, program):
+        super().load_bytecode(program)
+        if any(op in NAME_OPERAND for op, _ in self.instructions):
+            self.entry_block = None
+        else:
+            self.entry_block = self.compile_blocks()
+
+    def compile_blocks(self):
+        instructions = self.instructions
+        if not instructions:
+            return None
+        leaders = find_leaders(instructions, self.callees)
+        blocks = {ip: Block(ip) for ip in leaders}
+        for start, end in zip(leaders, leaders[1:] + [len(instructions)]):
+            block = blocks[start]
+            block.next = blocks.get(end)
+            last_op, last_arg = instructions[end - 1]
+            body_end = end - 1 if last_op in BLOCK_ENDS else end
+            block.ops = tuple(compile_op(op, arg, self.globals, self) for op, arg in instructions[start:body_end])
+            block.count = end - start
+            if last_op in JUMP_OPERAND:
+                block.exit = compile_exit(last_op, blocks.get(last_arg), block.next)
+            elif last_op == Opcode.CALL:
+                block.kind, block.callee = CALL, self.callees[last_arg]
+                block.target = blocks.get(last_arg if block.callee.body is None else block.callee.body)
+            elif last_op == Opcode.RET:
+                block.kind = RET
+            elif last_op == Opcode.ENTER:
+                block.kind, block.operand = ENTER, last_arg
+            elif last_op == Opcode.HALT:
+                block.kind = HALT
+            else:
+                block.exit = compile_exit(Opcode.JMP, block.next, None)
+        return blocks[0]
+
+    def run_fast(self):
+        if self.entry_block is None:
+            return super().run_fast()
+        stack = []
+        frame = self.frame
+        calls = [] # Return block and caller frame, per active call
+        max_depth = self.max_call_depth
+        block = self.entry_block
+        executed = 0
+        body = iter(())
+        try:
+            while block is not None:
+                executed += block.count
+                body = iter(block.ops)
+                for op in body:
+                    op(stack, frame)
+                exit = block.exit
+                if exit is not None:
+                    block = exit(stack)
+                    continue
+                kind = block.kind
+                if kind == CALL:
+                    if len(calls) >= max_depth:
+                        raise Exception(f"Maximum call depth of {max_depth} exceeded")
+                    calls.append((block.next, frame))
+                    callee = block.callee
+                    if callee.body is not None:
+                        # Arguments go straight into the callee's slots
+                        frame = [None] * callee.size
+                        for slot in callee.params:
+                            frame[slot] = stack.pop()
+                        if callee.keep:
+                            stack.append(frame[callee.params[-1]])
+                    block = block.target
+                elif kind == ENTER:
+                    frame = [None] * block.operand
+                    block = block.next
+                elif kind == RET and calls:
+                    # The return value stays on the stack for the caller
+                    block, frame = calls.pop()
+                else:
+                    break # HALT, or RET from the top level
+            self.ip = len(self.instructions)
+        except Exception:
+            # Point ip and the count at the failing instruction, for run()'s
+            # error message; an exit that fails is the block's terminator
+            failed = len(block.ops) - length_hint(body) - 1
+            self.ip = block.start + failed + 1
+            executed -= block.count - failed - 1
+            raise
+        finally:
+            self.executed = executed
+            self.frame = frame
@@ -0,0 +1,264 @@
+"""NumPy batch execution of pure numeric functions.
+
+compile_vectorized(source, name) turns one mini-C function into a kernel
+that evaluates it for every element of its argument arrays at once:
+
+    score = compile_vectorized(source, 'score')
+    results = score(xs, ys) # One result per (x, y) pair
+
+The function must be const in the interprocedural sense (interprocedural.py):
+no print, no global variables, and calls only to other such functions.
+
+Each element is a lane with its own position in the function's control-flow
+graph. The kernel repeatedly picks the earliest block that some lanes are
+waiting at and runs it for those lanes only: every statement is computed
+over the whole array and stored through the lanes' mask, and the block's
+jump moves each lane on. Branches split lanes between blocks and loops keep
+iterating until their last lane leaves, so lanes only run the code the VM
+would run for them. Calls run the callee's kernel on just the calling lanes.
+
+ints are 64-bit here: results match the VM as long as they fit.
+"""
+from math import prod
+
+try:
+    import numpy as np
+except ImportError: # Only needed to run kernels
+    np = None
+
+from mini_c_compiler.lexer import Lexer
+from mini_c_compiler.parser import Parser
+from mini_c_compiler.semantic import SemanticAnalyzer
+from mini_c_compiler.ir import (
+    IRGenerator, parse_instruction, split_functions, instruction_uses, is_temp, is_literal, parse_literal,
+)
+from mini_c_compiler.optimizer import Optimizer, DEFAULT_OPT_LEVEL
+from mini_c_compiler.interprocedural import CallGraph, summarize_functions
+from mini_c_compiler.cfg import build_cfg
+
+ARITHMETIC = ('+', '-', '*')
+COMPARISONS = ('==', '!=', '>', '<', '>=', '<=')
+
+class VectorizeError(Exception):
+    """A function that can't be turned into a kernel."""
+
+# Run-time helpers the kernels call. `mask` is a boolean array of the lanes
+# running the current block, or None when every lane is.
+
+def select(mask, value, old):
+    # `value` in the masked lanes, `old` in the others
+    return value if mask is None else np.where(mask, value, old)
+
+def jump(mask, pc, target):
+    # Move the masked lanes to block `target` (an array, for branches)
+    return np.broadcast_to(target, pc.shape) if mask is None else np.where(mask, target, pc)
+
+def divide(mask, a, b):
+    # Division truncating toward zero, as the VM's int(a / b); only the
+    # masked lanes can fail, the others compute garbage that is discarded
+    a, b = np.asarray(a), np.asarray(b)
+    zero = b == 0
+    if np.any(zero if mask is None else zero & mask):
+        raise ZeroDivisionError("division by zero")
+    if a.dtype.kind == 'f' or b.dtype.kind == 'f':
+        return np.trunc(a / b).astype(np.int64)
+    quotient = a // b # Floors: one too low when inexact and negative
+    return quotient + ((quotient < 0) & (quotient * b != a))
+
+def call(kernel, size, mask, old, *args):
+    # Run a callee's kernel on the masked lanes only
+    if mask is None:
+        return kernel(size, *args)
+    lanes = np.flatnonzero(mask)
+    result = kernel(lanes.size, *(arg[lanes] if np.ndim(arg) else arg for arg in args))
+    out = np.array(np.broadcast_to(old, (size,)), dtype=np.result_type(old, result))
+    out[lanes] = result
+    return out
+
+def constant(token):
+    text = repr(parse_literal(token))
+    return f"({text})" if text.startswith('-') else text
+
+class KernelTranslator:
+    """Turns one function's IR into the Python source of its kernel.
+
+    Kernels take the lane count and one argument per parameter (arrays of
+    that length, or scalars) and return an array of results. IR names
+    become `v_<name>` so they can't clash with the helpers.
+    """
+
+    def __init__(self, name, body):
+        self.name = name
+        self.params = [parse_instruction(instr)[1] for instr in body if instr.startswith("PARAM ")]
+        self.blocks = build_cfg([instr for instr in body if not instr.startswith("PARAM ")])
+        self.exit = len(self.blocks)
+        # Temps only read in the block that sets them need no masking: other
+        # lanes' values are never looked at
+        used_in = {}
+        for block in self.blocks:
+            for instr in block.instructions:
+                for name in instruction_uses(parse_instruction(instr)):
+                    used_in.setdefault(name, set()).add(block.index)
+        self.block_temps = [set() for _ in self.blocks]
+        for block in self.blocks:
+            read = set() # Read before being set here: carried around a loop
+            for instr in block.instructions:
+                decoded = parse_instruction(instr)
+                read.update(instruction_uses(decoded))
+                dest = decoded[1] if decoded[0] in ('copy', 'binary', 'unary') else None
+                if (dest is not None and is_temp(dest) and dest not in read
+                        and used_in.get(dest, set()) <= {block.index}):
+                    self.block_temps[block.index].add(dest)
+
+    def operand(self, token):
+        return constant(token) if is_literal(token) else f"v_{token}"
+
+    def generate(self):
+        names = set()
+        for block in self.blocks:
+            for instr in block.instructions:
+                decoded = parse_instruction(instr)
+                if decoded[0] in ('copy', 'binary', 'unary', 'call') and decoded[1] is not None:
+                    names.add(decoded[1])
+        params = ", ".join(f"v_{param}" for param in self.params)
+        lines = [f"def kernel_{self.name}(size{', ' if params else ''}{params}):"]
+        locals_ = sorted(names - set(self.params))
+        lines.append(f"    result = {' = '.join(f'v_{name}' for name in locals_)}{' = ' if locals_ else ''}0")
+        lines.append("    pc = np.zeros(size, dtype=np.intp)")
+        lines.append("    while True:")
+        lines.append(f"        waiting = pc[pc < {self.exit}]")
+        lines.append("        if not waiting.size:")
+        lines.append("            break")
+        lines.append("        block = waiting.min()")
+        lines.append("        m = pc == block")
+        lines.append("        if m.all():")
+        lines.append("            m = None")
+        for block in self.blocks:
+            check = "if" if block.index == 0 else "elif"
+            lines.append(f"        {check} block == {block.index}:")
+            lines.extend("            " + line for line in self.translate_block(block))
+        lines.append("    return np.broadcast_to(result, (size,))")
+        return "\n".join(lines)
+
+    def translate_block(self, block):
+        lines = []
+        args = []
+        fall = block.index + 1 if block.index + 1 < len(self.blocks) else self.exit
+        term = block.terminator()
+        for instr in block.instructions:
+            decoded = parse_instruction(instr)
+            kind = decoded[0]
+            if kind == 'arg':
+                args.append(self.operand(decoded[1]))
+            elif kind == 'call':
+                if decoded[1] is not None: # Callees are pure: an unused result needs no call
+                    dest = self.operand(decoded[1])
+                    lines.append(f"{dest} = call(kernel_{decoded[2]}, size, m, {dest}{''.join(', ' + a for a in args)})")
+                args = []
+            elif kind in ('copy', 'unary', 'binary'):
+                dest = self.operand(decoded[1])
+                if decoded[1] in self.block_temps[block.index]:
+                    lines.append(f"{dest} = {self.expression(decoded)}")
+                else:
+                    lines.append(f"{dest} = select(m, {self.expression(decoded)}, {dest})")
+            elif kind == 'return':
+                if decoded[1] is None:
+                    raise VectorizeError(f"'{self.name}' returns without a value")
+                lines.append(f"result = select(m, {self.operand(decoded[1])}, result)")
+            elif kind not in ('goto', 'if_false'):
+                raise VectorizeError(f"Cannot vectorize '{instr}' in '{self.name}'")
+        if args:
+            raise VectorizeError(f"Call arguments in another block than the call in '{self.name}'")
+        if term is not None and term[0] == 'return':
+            target = str(self.exit)
+        elif term is not None and term[0] == 'goto':
+            target = str(block.successors[0])
+        elif term is not None and term[0] == 'if_false':
+            taken = block.successors[-1]
+            target = f"np.where({self.operand(term[1])} == 0, {taken}, {fall})"
+        else:
+            target = str(fall)
+        lines.append(f"pc = jump(m, pc, {target})")
+        return lines
+
+    def expression(self, decoded):
+        kind = decoded[0]
+        if kind == 'copy':
+            return self.operand(decoded[2])
+        if kind == 'unary':
+            if decoded[2] != '-':
+                raise VectorizeError(f"Unsupported unary operator '{decoded[2]}'")
+            return f"-{self.operand(decoded[3])}"
+        _, _, a, op, b = decoded
+        a, b = self.operand(a), self.operand(b)
+        if op in ARITHMETIC:
+            return f"{a} {op} {b}"
+        if op in COMPARISONS:
+            return f"np.where({a} {op} {b}, 1, 0)" # 1/0 like the VM
+        return f"divide(m, {a}, {b})"
+
+class VectorizedFunction:
+    """A mini-C function evaluated over whole arrays of arguments.
+
+    Arguments are broadcast against each other like NumPy operands, so
+    scalars can stand for constant arguments. Calling returns an array of
+    the broadcast shape: int64 for int functions, float64 for float ones.
+    """
+
+    def __init__(self, name, param_types, return_type, source):
+        self.name = name
+        self.param_types = param_types
+        self.return_type = return_type
+        self.source = source # Python source of the kernels
+        namespace = {'np': np, 'select': select, 'jump': jump, 'divide': divide, 'call': call}
+        exec(compile(source, f"<vectorized {name}>", 'exec'), namespace)
+        self.kernel = namespace[f"kernel_{name}"]
+
+    def __call__(self, *args):
+        if len(args) != len(self.param_types):
+            raise TypeError(f"{self.name}() takes {len(self.param_types)} argument(s), got {len(args)}")
+        arrays = [np.asarray(arg, dtype=dtype_of(kind)) for arg, kind in zip(args, self.param_types)]
+        shape = np.broadcast_shapes(*(array.shape for array in arrays))
+        flat = [np.broadcast_to(array, shape).ravel() for array in arrays]
+        with np.errstate(all='ignore'): # Lanes outside the mask may divide by zero or overflow
+            result = self.kernel(prod(shape), *flat)
+        return result.astype(dtype_of(self.return_type)).reshape(shape)
+
+def dtype_of(type_name):
+    return np.float64 if type_name == 'float' else np.int64
+
+def compile_vectorized(source, func, opt_level=DEFAULT_OPT_LEVEL):
+    """Compile function `func` of a mini-C program into a VectorizedFunction.
+
+    Raises CompilerError for invalid programs and VectorizeError for
+    functions that aren't pure numeric code.
+    """
+    if np is None:
+        raise ImportError("compile_vectorized needs NumPy")
+    ast = Parser(Lexer(source).tokenize()).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    symbol = analyzer.global_scope.lookup(func, current_scope_only=True)
+    if symbol is None or symbol.category != 'func':
+        raise VectorizeError(f"No function '{func}' in the program")
+    if symbol.type_name not in ('int', 'float'):
+        raise VectorizeError(f"'{func}' must return int or float")
+
+    ir = IRGenerator().generate(ast)
+    ir = Optimizer(ir, entry_points=[func]).optimize(level=opt_level)
+    _, functions = split_functions(ir)
+    summaries = summarize_functions(ir)
+    needed = CallGraph(ir).reachable([func])
+    for name in sorted(needed):
+        summary = summaries[name]
+        if summary.has_io:
+            raise VectorizeError(f"'{name}' has side effects (print)")
+        if summary.writes_globals or summary.reads_globals:
+            names = sorted(summary.writes_globals | summary.reads_globals)
+            raise VectorizeError(f"'{name}' uses global variables ({', '.join(names)})")
+        missing = sorted(callee for callee in summary.calls if callee not in functions)
+        if missing:
+            raise VectorizeError(f"'{name}' calls undefined function(s): {', '.join(missing)}")
+
+    kernels = [KernelTranslator(name, functions[name]).generate() for name in functions if name in needed]
+    return VectorizedFunction(func, symbol.params, symbol.type_name, "\n\n".join(kernels))
@@ -0,0 +1,171 @@
+from mini_c_compiler.bytecode import BytecodeError
+from mini_c_compiler.core.opcodes import (
+    Opcode, CONSTANT_OPERAND, NAME_OPERAND, JUMP_OPERAND, FUNCTION_OPERAND,
+)
+
+class VerificationError(BytecodeError):
+    pass
+
+# (values popped, values pushed). CALL and RET depend on the callee and are
+# handled separately; an opcode missing here fails verification.
+STACK_EFFECTS = {
+    Opcode.PUSH_CONST: (0, 1), Opcode.PUSH: (0, 1), Opcode.LOAD: (0, 1),
+    Opcode.STORE: (1, 0), Opcode.POP: (1, 0), Opcode.DUP: (1, 2), Opcode.PARAM: (1, 0),
+    Opcode.LOAD_LOCAL: (0, 1), Opcode.STORE_LOCAL: (1, 0),
+    Opcode.LOAD_GLOBAL: (0, 1), Opcode.STORE_GLOBAL: (1, 0), Opcode.ENTER: (0, 0),
+    Opcode.ADD: (2, 1), Opcode.SUB: (2, 1), Opcode.MUL: (2, 1), Opcode.DIV: (2, 1), Opcode.NEG: (1, 1),
+    Opcode.EQ: (2, 1), Opcode.NEQ: (2, 1), Opcode.GT: (2, 1), Opcode.LT: (2, 1),
+    Opcode.GTE: (2, 1), Opcode.LTE: (2, 1),
+    Opcode.JMP: (0, 0), Opcode.JZ: (1, 0), Opcode.JNZ: (1, 0), Opcode.HALT: (0, 0),
+    Opcode.PRINT: (1, 0),
+    Opcode.READ: (0, 1),
+    Opcode.JEQ: (2, 0), Opcode.JNE: (2, 0), Opcode.JGT: (2, 0), Opcode.JLT: (2, 0),
+    Opcode.JGE: (2, 0), Opcode.JLE: (2, 0),
+    Opcode.ADD_CONST: (1, 1), Opcode.SUB_CONST: (1, 1), Opcode.MUL_CONST: (1, 1),
+    Opcode.ADD_LOCAL: (1, 1), Opcode.INC_LOCAL: (0, 0),
+}
+
+LOCAL_OPERAND = {Opcode.LOAD_LOCAL, Opcode.STORE_LOCAL, Opcode.ADD_LOCAL, Opcode.INC_LOCAL}
+NO_FALL_THROUGH = {Opcode.JMP, Opcode.RET, Opcode.HALT}
+
+class FunctionInfo:
+    """What verification learned about the code reached from one entry point.
+
+    Heights are relative to the stack height on entry, so a function's
+    arguments sit below 0 and `max_depth` is what it needs above them.
+    """
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.arity = None    # Values taken off the caller's stack (None: never returns)
+        self.max_depth = 0
+        self.min_height = 0
+        self.frame_size = None # Operand of ENTER, if the function has one
+        self.heights = {}      # Instruction index -> stack height before it
+
+def check_operands(program, index, op, operand):
+    size = len(program.code)
+    if op in CONSTANT_OPERAND and not 0 <= operand < len(program.constants):
+        raise VerificationError(f"Instruction {index}: constant {operand} is out of range")
+    if op in NAME_OPERAND and not 0 <= operand < len(program.names):
+        raise VerificationError(f"Instruction {index}: name {operand} is out of range")
+    if op in JUMP_OPERAND and not 0 <= operand <= size:
+        raise VerificationError(f"Instruction {index}: jump target {operand} is out of range")
+    if op in FUNCTION_OPERAND:
+        if not 0 <= operand < len(program.functions):
+            raise VerificationError(f"Instruction {index}: function {operand} is out of range")
+        if not 0 <= program.functions[operand][1] < size:
+            raise VerificationError(f"Instruction {index}: function entry is out of range")
+    if (op in LOCAL_OPERAND or op in (Opcode.LOAD_GLOBAL, Opcode.STORE_GLOBAL, Opcode.ENTER)) and operand < 0:
+        raise VerificationError(f"Instruction {index}: negative slot {operand}")
+
+def verify(program):
+    """Check a Program before the VM runs it.
+
+    Every opcode must have a known stack effect, every operand must index
+    its table, and each instruction must be reached with the same stack
+    height on every path, never taking more values than are there. Returns
+    {entry offset: FunctionInfo} for the program start (offset 0) and every
+    called function; raises VerificationError otherwise.
+    """
+    code = program.code
+    for index, (op, operand) in enumerate(code):
+        if op not in STACK_EFFECTS and op not in (Opcode.CALL, Opcode.RET):
+            raise VerificationError(f"Instruction {index}: no stack effect known for {op.name}")
+        check_operands(program, index, op, operand)
+    for _, offset in program.labels:
+        if not 0 <= offset <= len(code):
+            raise VerificationError(f"Label offset {offset} is out of range")
+
+    entries = [0] + sorted({offset for _, offset in program.functions} - {0})
+    infos = {entry: FunctionInfo(entry) for entry in entries}
+    owner = {}   # Instruction index -> entry of the code it belongs to
+    heights = {} # Instruction index -> stack height before it
+    worklist = [(entry, entry, 0) for entry in entries]
+    waiting = [] # Paths stopped at a call to a function whose arity isn't known yet
+
+    def reach(entry, index, height):
+        if index in heights:
+            if owner[index] != entry:
+                raise VerificationError(f"Instruction {index} is reachable from two functions")
+            if heights[index] != height:
+                raise VerificationError(
+                    f"Instruction {index}: stack height {height} here but {heights[index]} on another path")
+            return
+        worklist.append((entry, index, height))
+
+    def return_from(entry, index, height, callee):
+        info = infos[entry]
+        arity = infos[callee].arity
+        if entry == 0 and height < arity:
+            raise VerificationError(f"Instruction {index}: call needs {arity} arguments, stack has {height}")
+        info.min_height = min(info.min_height, height - arity)
+        info.max_depth = max(info.max_depth, height - arity + 1)
+        reach(entry, index + 1, height - arity + 1)
+
+    while worklist or waiting:
+        if not worklist:
+            # Resume calls whose callee turned out to return
+            ready = [w for w in waiting if infos[w[3]].arity is not None]
+            if not ready:
+                break # The rest call functions that never return
+            waiting = [w for w in waiting if infos[w[3]].arity is None]
+            for entry, index, height, callee in ready:
+                return_from(entry, index, height, callee)
+            continue
+
+        entry, index, height = worklist.pop()
+        if index in heights:
+            reach(entry, index, height)
+            continue
+        if index == len(code):
+            if entry != 0:
+                raise VerificationError(f"Function at {entry} runs off the end of the code")
+            continue
+        owner[index] = entry
+        heights[index] = height
+        info = infos[entry]
+        info.heights[index] = height
+        op, operand = code[index]
+
+        if op == Opcode.CALL:
+            callee = program.functions[operand][1]
+            if infos[callee].arity is None:
+                waiting.append((entry, index, height, callee))
+            else:
+                return_from(entry, index, height, callee)
+            continue
+
+        if op == Opcode.RET:
+            if entry == 0:
+                continue # Returning from the top level ends the program
+            arity = 1 - height # The return value stays on the stack
+            if arity < 0 or (info.arity is not None and info.arity != arity):
+                raise VerificationError(f"Instruction {index}: RET with inconsistent stack height {height}")
+            info.arity = arity
+            continue
+
+        pops, pushes = STACK_EFFECTS[op]
+        info.min_height = min(info.min_height, height - pops)
+        if entry == 0 and height < pops:
+            raise VerificationError(f"Instruction {index}: {op.name} needs {pops} values, stack has {height}")
+        after = height - pops + pushes
+        info.max_depth = max(info.max_depth, after)
+        if op == Opcode.ENTER:
+            info.frame_size = max(info.frame_size or 0, operand)
+        if op in JUMP_OPERAND:
+            reach(entry, operand, after)
+        if op not in NO_FALL_THROUGH:
+            reach(entry, index + 1, after)
+
+    for info in infos.values():
+        # A function that never returns is only known to take what it reads
+        if info.arity is not None and info.min_height < -info.arity:
+            raise VerificationError(f"Function at {info.entry} takes more values than it is given")
+    for index, entry in owner.items():
+        op, operand = code[index]
+        if op in LOCAL_OPERAND:
+            frame = infos[entry].frame_size
+            if frame is None or operand >= frame:
+                raise VerificationError(f"Instruction {index}: local slot {operand} outside the frame")
+    return infos
@@ -1,217 +1,673 @@
+import io
 import sys
-import re
 
-class VirtualMachine:
+from mini_c_compiler.bytecode import BytecodeError, assemble, is_bytecode_file, load_bytecode_file
+from mini_c_compiler.core.opcodes import (
+    Opcode, CONSTANT_OPERAND, NAME_OPERAND, JUMP_OPERAND, FUNCTION_OPERAND, INTEGER_OPERAND,
+)
+from mini_c_compiler.ir_interpreter import ProgramError
+from mini_c_compiler.pgo import ExecutionProfile
+from mini_c_compiler.streams import InputReader, OutputSink, FLUSH_POLICIES
+from mini_c_compiler.verifier import verify
+
+# Calls nested deeper than this fail with a runtime error, unless the VM is told otherwise
+DEFAULT_MAX_CALL_DEPTH = 10000
+
+# Specialized variants that quickening rewrites instructions into. Only
+# LOAD_GLOBAL has one: compiled code addresses everything else by slot.
+VARIANTS = ('load_global_set',)
+
+class QuickeningStats:
+    """How one specialized variant fared (collected with quickening_stats=True)."""
+
+    def __init__(self):
+        self.quickened = 0 # Instructions rewritten into the variant
+        self.executed = 0  # Executions of the variant
+
+class Frame:
+    """Activation record of a call.
+
+    `return_ip` is where the caller resumes, `slots` the callee's local
+    slots, and `base` the stack pointer below its arguments: the callee's
+    values start there on the shared stack, and its result ends up there.
+    `locals` holds the variables of name-addressed code (STORE by name).
+    The VM keeps one Frame per call depth and reuses it for every call made
+    at that depth, so calls allocate nothing but the slots.
+    """
+    __slots__ = ('return_ip', 'slots', 'base', 'locals')
+
     def __init__(self):
-        self.stack = []        # Data stack
-        self.call_stack = []   # Return addresses and locals
-        self.memory = {}       # Global variables
-        self.locals = {}       # Current local variables
-        self.instructions = [] # Code memory
+        self.return_ip = None
+        self.slots = []
+        self.base = 0
+        self.locals = {}
+
+class Callee:
+    """How CALL starts one function (worked out at load time).
+
+    Compiled functions begin with ENTER and a STORE_LOCAL per argument (the
+    last one may be DUP; STORE_LOCAL, which leaves it on the stack). CALL
+    does that itself: it builds the frame with the arguments in their slots
+    and jumps to `body`. Anything else (`body` is None) is entered at its
+    first instruction.
+    """
+    __slots__ = ('entry', 'arity', 'depth', 'body', 'size', 'params', 'keep')
+
+    def __init__(self, entry, arity, depth):
+        self.entry = entry
+        self.arity = arity or 0 # Arguments taken off the caller's stack
+        self.depth = depth      # Stack the function needs, from the verifier
+        self.body = None        # First IP after the prologue
+        self.size = 0           # Frame slots
+        self.params = ()        # Slot of each argument, top of the stack first
+        self.keep = False       # The last argument stays on the stack
+
+def find_prologue(instructions, callee, arity):
+    # Fills in callee.body etc. if the function starts with the standard prologue
+    entry = callee.entry
+    if arity is None or instructions[entry][0] != Opcode.ENTER:
+        return
+    ip = entry + 1
+    params = []
+    keep = False
+    while len(params) < arity and ip < len(instructions):
+        op, operand = instructions[ip]
+        if op == Opcode.STORE_LOCAL:
+            params.append(operand)
+            ip += 1
+        elif (op == Opcode.DUP and len(params) == arity - 1 and ip + 1 < len(instructions)
+              and instructions[ip + 1][0] == Opcode.STORE_LOCAL):
+            params.append(instructions[ip + 1][1])
+            keep = True
+            ip += 2
+        else:
+            return
+    if len(params) < arity or len(set(params)) < len(params):
+        return
+    callee.body, callee.size, callee.params, callee.keep = ip, instructions[entry][1], tuple(params), keep
+
+class VirtualMachine:
+    direct_calls = True # CALL fills in the callee's frame itself when it can, skipping the prologue
+
+    def __init__(self, profile=False, quickening_stats=False, max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+                 stdin=None, stdout=None, flush_policy=None):
+        self.stack = []        # Data stack, preallocated to the depth the verifier computed
+        self.sp = 0            # Stack pointer: index of the first free stack entry
+        self.stack_depths = {} # Entry IP (0 for the program) -> stack depth its code needs
+        self.function_infos = {} # Entry IP -> what the verifier learned about its code
+        self.call_stack = [Frame()] # Frame per call depth: the top-level code's, then one per call
+        self.depth = 0         # Active calls: call_stack[depth] is the current Frame
+        self.max_call_depth = max_call_depth
+        self.callees = {}      # Function entry IP -> Callee
+        self.memory = {}       # Global variables, by name
+        self.locals = {}       # Current local variables, by name (the current Frame's)
+        self.globals = []      # Global variable slots
+        self.initial_globals = [] # Global slots as loaded: each run starts from them
+        self.frame = []        # Current function's local variable slots (the current Frame's)
+        self.instructions = [] # Code memory: (Opcode, operand) with operands resolved
+        self.handlers = self.build_handler_table() # Opcode value -> handler method
+        self.code = []         # Instructions as (handler, operand), for run_fast(); quickened in place
+        # Variant name -> QuickeningStats, if collected
+        self.quickening = {name: QuickeningStats() for name in VARIANTS} if quickening_stats else None
+        self.variants = self.build_variant_table() # Variant name -> handler
+        # Opcode -> handler for its first execution, which quickens it
+        self.quickeners = {Opcode.LOAD_GLOBAL: self.quicken_load_global}
         self.labels = {}       # Label to IP mapping
         self.ip = 0            # Instruction Pointer
         self.func_meta = {}    # Metadata about functions (param count, etc, if needed)
+        self.executed = 0      # Instructions executed by the last run()
+        # Optional execution profile: block entry counts and call-site frequencies
+        self.profile = ExecutionProfile() if profile else None
+        self.label_at = {}     # IP -> labels starting there (used when profiling)
+        self.function_at = {}  # IP -> function name (used when profiling)
+        self.frames = ['<global>'] # Function being executed, per call depth (used when profiling)
+        # Where run() reads and prints (see streams.py); run_io() passes its own
+        self.stdin = stdin
+        self.stdout = stdout
+        self.flush_policy = flush_policy
+        self.input = None      # InputReader of the current run
+        self.output = None     # OutputSink of the current run
 
     def load_program(self, program_code):
-        lines = program_code.strip().split('\n')
+        # Text assembly goes through the assembler, so it runs from the same
+        # pre-decoded form as a bytecode file
+        self.load_bytecode(assemble(program_code))
+
+    def load_file(self, path):
+        if is_bytecode_file(path):
+            self.load_bytecode(load_bytecode_file(path))
+        else:
+            with open(path, 'r') as f:
+                self.load_program(f.read())
+
+    def load_bytecode(self, program):
+        # Malformed code is rejected here rather than failing halfway through a run
+        infos = verify(program)
+        self.function_infos = infos
+        self.stack_depths = {entry: info.max_depth for entry, info in infos.items()}
+
+        # Resolve operands once: constants to values, names to strings, and
+        # calls to the IP of the function
+        function_ips = [offset for _, offset in program.functions]
         self.instructions = []
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith(';'):
-                continue
-            
-            # Remove inline comments
-            if ';' in line:
-                line = line.split(';', 1)[0].strip()
-            
-            if line.endswith(':'):
-                label = line[:-1]
-                self.labels[label] = len(self.instructions)
-            else:
-                self.instructions.append(line)
+        for op, operand in program.code:
+            if op in CONSTANT_OPERAND:
+                operand = program.constants[operand]
+            elif op in NAME_OPERAND:
+                operand = program.names[operand]
+            elif op in FUNCTION_OPERAND:
+                operand = function_ips[operand]
+            elif op not in JUMP_OPERAND and op not in INTEGER_OPERAND:
+                operand = None
+            self.instructions.append((op, operand))
+        self.callees = {}
+        for entry, info in infos.items():
+            self.callees[entry] = Callee(entry, info.arity, info.max_depth)
+            if self.direct_calls:
+                find_prologue(self.instructions, self.callees[entry], info.arity)
+        # What run() dispatches on: handlers looked up once, not per instruction
+        self.code = [(self.quickeners.get(op) or self.handlers[op], operand)
+                     for op, operand in self.instructions]
+
+        self.labels = program.label_offsets()
+        for label, ip in self.labels.items():
+            self.label_at.setdefault(ip, []).append(label)
+            if self.profile is not None:
+                self.profile.blocks.setdefault(label, 0) # Never reached is still a count
+        self.function_at = {ip: name for name, ip in program.function_offsets().items()}
+
+        # Static data initializes the first global slots in one step
+        global_ops = (Opcode.LOAD_GLOBAL, Opcode.STORE_GLOBAL)
+        size = max((operand + 1 for op, operand in program.code if op in global_ops), default=0)
+        self.globals = [program.constants[index] for index in program.data]
+        self.globals.extend([None] * (size - len(self.globals)))
+        self.initial_globals = self.globals[:]
 
     def run(self):
+        """Run the program on stdin/stdout; a runtime error is reported and exits."""
+        try:
+            self.run_program(InputReader(self.stdin), OutputSink(self.stdout, self.flush_policy))
+        except ProgramError as e:
+            print(f"Runtime Error at instruction '{e.instruction}': {e}")
+            sys.exit(1)
+
+    def run_io(self, data):
+        """Run the program with `data` (str or bytes) as its input; returns what it printed.
+
+        Every run starts from the loaded globals, so a VM can run one
+        record after another while keeping its quickened and compiled code.
+        Raises ProgramError for runtime errors.
+        """
+        output = io.StringIO()
+        self.run_program(InputReader(data), OutputSink(output, 'end'))
+        return output.getvalue()
+
+    def open_streams(self, reader, sink):
+        self.input = reader
+        self.output = sink
+
+    def run_program(self, reader, sink):
+        # Runs from the start with read() on `reader` and PRINT to `sink`,
+        # which is flushed even if the program fails
+        self.open_streams(reader, sink)
+        self.globals[:] = self.initial_globals # In place: compiled code holds the list
+        self.memory.clear()
+        self.frame, self.locals = [], {}
         self.ip = 0
+        self.executed = 0
+        self.sp = 0
+        self.stack = [None] * self.stack_depths.get(0, 0)
+        self.depth = 0
+        root = self.call_stack[0]
+        root.slots, root.locals = self.frame, self.locals
+        # Verified code can't underflow the stack or jump out of the code,
+        # so errors are caught once around the loop, not per instruction
+        try:
+            if self.profile is not None or type(self).execute is not VirtualMachine.execute:
+                self.run_instrumented()
+            else:
+                self.run_fast()
+        except Exception as e:
+            instr = self.instructions[self.ip - 1]
+            raise ProgramError(self.format_instruction(instr), str(e)) from e
+        finally:
+            sink.flush()
+
+    def run_fast(self):
+        # Table dispatch on the pre-decoded (handler, operand) pairs
+        code = self.code
+        end = len(code)
+        executed = 0
+        try:
+            while self.ip < end:
+                handler, arg = code[self.ip]
+                self.ip += 1
+                executed += 1
+                handler(arg)
+        finally:
+            self.executed = executed
+
+    def run_instrumented(self):
+        # One execute() call per instruction, so profiling and subclasses see each one
+        profile = self.profile
         while self.ip < len(self.instructions):
+            if profile is not None and self.ip in self.label_at:
+                for label in self.label_at[self.ip]:
+                    profile.blocks[label] += 1
             instr = self.instructions[self.ip]
             self.ip += 1
-            
-            try:
-                self.execute(instr)
-            except Exception as e:
-                print(f"Runtime Error at instruction '{instr}': {e}")
-                sys.exit(1)
+            self.executed += 1
+            self.execute(instr)
+
+    def format_instruction(self, instr):
+        op, operand = instr
+        if op == Opcode.PUSH_CONST:
+            return f"PUSH {operand!r}"
+        return op.name if operand is None else f"{op.name} {operand}"
 
     def execute(self, instr):
-        parts = instr.split()
-        op = parts[0]
-        args = parts[1:]
-
-        if op == 'PUSH':
-            # Try parsing as number, else load var
-            val = args[0]
-            if self.is_number(val):
-                self.stack.append(float(val) if '.' in val else int(val))
-            else:
-                # Load from locals, then globals
-                if val in self.locals:
-                    self.stack.append(self.locals[val])
-                elif val in self.memory:
-                    self.stack.append(self.memory[val])
-                else:
-                    raise Exception(f"Undefined variable '{val}'")
-
-        elif op == 'POP':
-            # Discard top
-            self.stack.pop()
-
-        elif op == 'STORE':
-            var = args[0]
-            val = self.stack.pop()
-            # If variable exists in locals, update it. Else if in globals, update it.
-            # If new, defaults to local (unless outside function? we don't know scope depth here easily)
-            # Default: write to local if we are in a function (call_stack not empty), else global
-            if self.call_stack:
-                self.locals[var] = val
-            else:
-                self.memory[var] = val
-
-        elif op == 'LOAD':
-            # explicit load
-            var = args[0]
-            if var in self.locals:
-                self.stack.append(self.locals[var])
-            elif var in self.memory:
-                self.stack.append(self.memory[var])
-            else:
-                raise Exception(f"Undefined variable '{var}'")
-
-        # Arithmetic
-        elif op == 'ADD':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(a + b)
-        elif op == 'SUB':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(a - b)
-        elif op == 'MUL':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(a * b)
-        elif op == 'DIV':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(int(a / b)) # Integer division for simplicity
-
-        # Comparison
-        elif op == 'EQ':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(1 if a == b else 0)
-        elif op == 'NEQ':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(1 if a != b else 0)
-        elif op == 'GT':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(1 if a > b else 0)
-        elif op == 'LT':
-            b = self.stack.pop()
-            a = self.stack.pop()
-            self.stack.append(1 if a < b else 0)
-        
-        # Jumps
-        elif op == 'JMP':
-            label = args[0]
-            self.jump_to(label)
-        elif op == 'JZ': # Jump if Zero (stack top)
-            label = args[0]
-            val = self.stack.pop()
-            if val == 0:
-                self.jump_to(label)
-        elif op == 'JNZ':
-            label = args[0]
-            val = self.stack.pop()
-            if val != 0:
-                self.jump_to(label)
-
-        # IO
-        elif op == 'PRINT':
-            val = self.stack.pop()
-            print(val)
-        
-        # Functions
-        elif op == 'CALL':
-            label = args[0]
-            # Save return IP and current locals
-            self.call_stack.append((self.ip, self.locals.copy()))
-            # Clear locals for new scope (arguments will be popped into it)
-            self.locals = {} 
-            self.jump_to(label)
-
-        elif op == 'RET':
-            # Restore
-            if not self.call_stack:
-                # Return from main/global - End program
-                self.ip = len(self.instructions)
-                return
-            
-            return_ip, old_locals = self.call_stack.pop()
-            self.ip = return_ip
-            # We don't fully restore locals because we want to keep the return value?
-            # Return value is on stack.
-            # Local vars of the called function are gone.
-            # We restore the caller's environment.
-            self.locals = old_locals
-
-        elif op == 'HALT':
-            self.ip = len(self.instructions)
+        op, arg = instr
+        self.handlers[op](arg)
+
+    # Instruction handlers, one per opcode (see build_handler_table). The
+    # stack is preallocated: `sp` is the index of its first free entry.
 
+    def op_push_const(self, arg):
+        self.stack[self.sp] = arg
+        self.sp += 1
+
+    def op_push(self, arg):
+        # Load from locals, then globals
+        if arg in self.locals:
+            self.stack[self.sp] = self.locals[arg]
+        elif arg in self.memory:
+            self.stack[self.sp] = self.memory[arg]
         else:
-            # Special case for PARAM parsing (pseudo-instruction logic moved to ASM)
-            # But here `PARAM x` means "pop from stack into local x"
-            # Since strict stack machine:
-            # Caller: PUSH b, PUSH a, CALL func
-            # Func: PARAM a (pop), PARAM b (pop)
-            # This means Func gets 'a' from top (which was pushed last).
-            # So Caller must push args in REVERSE order if we want standard A, B mapping?
-            # OR we match:
-            # Function `add(a, b)` -> IR `PARAM a`, `PARAM b`.
-            # If we EXECUTE `PARAM a`: a = pop().
-            # If Stack is `[..., arg1, arg2]`. Top is arg2.
-            # `PARAM a` gets arg2. `PARAM b` gets arg1.
-            # So `a` gets `b`'s value. 
-            # To fix: Caller must PUSH args in REVERSE order (Last arg first).
-            if op == 'PARAM':
-                var = args[0]
-                val = self.stack.pop()
-                self.locals[var] = val
-            
-            else:
-                pass # Ignore unknown
+            raise Exception(f"Undefined variable '{arg}'")
+        self.sp += 1
 
-    def jump_to(self, label):
-        if label not in self.labels:
-            raise Exception(f"Unknown label '{label}'")
-        self.ip = self.labels[label]
+    def op_load_local(self, arg):
+        val = self.frame[arg]
+        if val is None:
+            raise Exception(f"Undefined local variable in slot {arg}")
+        self.stack[self.sp] = val
+        self.sp += 1
 
-    def is_number(self, s):
-        try:
-            float(s)
-            return True
-        except ValueError:
-            return False
+    def op_store_local(self, arg):
+        self.sp -= 1
+        self.frame[arg] = self.stack[self.sp]
+
+    def op_load_global(self, arg):
+        val = self.globals[arg]
+        if val is None:
+            raise Exception(f"Undefined global variable in slot {arg}")
+        self.stack[self.sp] = val
+        self.sp += 1
+
+    def op_store_global(self, arg):
+        self.sp -= 1
+        self.globals[arg] = self.stack[self.sp]
+
+    def op_pop(self, arg):
+        self.sp -= 1
+
+    def op_dup(self, arg):
+        self.stack[self.sp] = self.stack[self.sp - 1]
+        self.sp += 1
+
+    def op_store(self, arg):
+        self.sp -= 1
+        val = self.stack[self.sp]
+        # Inside a function names are local, at the top level global
+        if self.depth:
+            self.locals[arg] = val
+        else:
+            self.memory[arg] = val
+
+    def op_param(self, arg):
+        # `PARAM x` pops an argument into local x. The callee's first PARAM
+        # gets the top of the stack, so callers push arguments in reverse.
+        self.sp -= 1
+        self.locals[arg] = self.stack[self.sp]
+
+    # Arithmetic: pop b, then a, and put the result where a was
+
+    def op_add(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] + stack[sp]
+
+    def op_sub(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] - stack[sp]
+
+    def op_mul(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] * stack[sp]
+
+    def op_div(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = int(stack[sp - 1] / stack[sp]) # Integer division for simplicity
+
+    def op_neg(self, arg):
+        self.stack[self.sp - 1] = -self.stack[self.sp - 1]
+
+    # Comparison
+
+    def op_eq(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = 1 if stack[sp - 1] == stack[sp] else 0
+
+    def op_neq(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = 1 if stack[sp - 1] != stack[sp] else 0
+
+    def op_gt(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = 1 if stack[sp - 1] > stack[sp] else 0
+
+    def op_lt(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = 1 if stack[sp - 1] < stack[sp] else 0
+
+    def op_gte(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = 1 if stack[sp - 1] >= stack[sp] else 0
+
+    def op_lte(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 1
+        stack[sp - 1] = 1 if stack[sp - 1] <= stack[sp] else 0
+
+    # Jumps: operands are instruction indexes
+
+    def op_jmp(self, arg):
+        self.ip = arg
+
+    def op_jz(self, arg):
+        self.sp -= 1
+        if self.stack[self.sp] == 0:
+            self.ip = arg
+
+    def op_jnz(self, arg):
+        self.sp -= 1
+        if self.stack[self.sp] != 0:
+            self.ip = arg
+
+    # Superinstructions
+
+    def op_jeq(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 2
+        if stack[sp] == stack[sp + 1]:
+            self.ip = arg
+
+    def op_jne(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 2
+        if stack[sp] != stack[sp + 1]:
+            self.ip = arg
+
+    def op_jgt(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 2
+        if stack[sp] > stack[sp + 1]:
+            self.ip = arg
+
+    def op_jlt(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 2
+        if stack[sp] < stack[sp + 1]:
+            self.ip = arg
+
+    def op_jge(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 2
+        if stack[sp] >= stack[sp + 1]:
+            self.ip = arg
+
+    def op_jle(self, arg):
+        stack = self.stack
+        sp = self.sp = self.sp - 2
+        if stack[sp] <= stack[sp + 1]:
+            self.ip = arg
+
+    def op_add_const(self, arg):
+        self.stack[self.sp - 1] += arg
+
+    def op_sub_const(self, arg):
+        self.stack[self.sp - 1] -= arg
+
+    def op_mul_const(self, arg):
+        self.stack[self.sp - 1] *= arg
+
+    def op_add_local(self, arg):
+        val = self.frame[arg]
+        if val is None:
+            raise Exception(f"Undefined local variable in slot {arg}")
+        self.stack[self.sp - 1] += val
+
+    def op_inc_local(self, arg):
+        val = self.frame[arg]
+        if val is None:
+            raise Exception(f"Undefined local variable in slot {arg}")
+        self.frame[arg] = val + 1
+
+    # IO
+
+    def op_print(self, arg):
+        self.sp -= 1
+        self.output.write_value(self.stack[self.sp])
+
+    def op_read(self, arg):
+        self.stack[self.sp] = self.input.read_value()
+        self.sp += 1
+
+    # Functions
+
+    def op_call(self, arg):
+        if self.profile is not None:
+            name = self.function_at[arg]
+            key = f"{self.frames[-1]}->{name}"
+            self.profile.calls[key] = self.profile.calls.get(key, 0) + 1
+            self.profile.functions[name] = self.profile.functions.get(name, 0) + 1
+            self.frames.append(name)
+        callee = self.callees[arg]
+        if callee.body is None:
+            # The callee's ENTER allocates its slots
+            self.push_frame(self.ip, self.frame, self.sp - callee.arity, self.sp + callee.depth)
+            self.ip = arg
+            return
+        # Same as push_frame, inline since calls are frequent
+        depth = self.depth + 1
+        if depth > self.max_call_depth:
+            raise Exception(f"Maximum call depth of {self.max_call_depth} exceeded")
+        stack = self.stack
+        top = self.sp
+        if top + callee.depth > len(stack):
+            self.grow_stack(top + callee.depth)
+        call_stack = self.call_stack
+        if depth == len(call_stack):
+            call_stack.append(Frame())
+        frame = call_stack[depth]
+        frame.return_ip = self.ip
+        frame.slots = slots = self.frame = [None] * callee.size
+        for slot in callee.params:
+            top -= 1
+            slots[slot] = stack[top]
+        frame.base = top
+        self.sp = top + 1 if callee.keep else top
+        if frame.locals:
+            frame.locals = {} # Left over from an earlier call at this depth
+        self.locals = frame.locals
+        self.depth = depth
+        self.ip = callee.body
+
+    def push_frame(self, return_ip, slots, base, needed=0):
+        # Start a call whose values start at `base`; the stack must hold `needed` entries
+        depth = self.depth + 1
+        if depth > self.max_call_depth:
+            raise Exception(f"Maximum call depth of {self.max_call_depth} exceeded")
+        if needed > len(self.stack):
+            self.grow_stack(needed)
+        if depth == len(self.call_stack):
+            self.call_stack.append(Frame())
+        frame = self.call_stack[depth]
+        frame.return_ip = return_ip
+        frame.slots = slots
+        frame.base = base
+        if frame.locals:
+            frame.locals = {} # Left over from an earlier call at this depth
+        self.locals = frame.locals
+        self.depth = depth
+        return frame
+
+    def grow_stack(self, needed):
+        # The verifier worked out how deep each function's stack gets
+        stack = self.stack
+        stack.extend([None] * max(needed - len(stack), len(stack)))
+
+    def op_enter(self, arg):
+        self.frame = self.call_stack[self.depth].slots = [None] * arg
+
+    def op_ret(self, arg):
+        depth = self.depth
+        if not depth:
+            # Return from main/global - End program
+            self.ip = len(self.instructions)
+            return
+        # The return value is on top of the stack, where the arguments were
+        frame = self.call_stack[depth]
+        self.sp = frame.base + 1
+        self.ip = frame.return_ip
+        caller = self.call_stack[depth - 1]
+        self.frame = caller.slots
+        self.locals = caller.locals
+        self.depth = depth - 1
+        if self.profile is not None:
+            self.frames.pop()
+
+    def op_halt(self, arg):
+        self.ip = len(self.instructions)
+
+    # Quickening: run_fast() starts some instructions on a handler that, on
+    # first execution, rewrites their self.code entry into a variant
+    # specialized for what it found. Only run_fast() quickens: the
+    # instrumented loop always uses the generic handlers.
+
+    def quicken(self, variant, arg):
+        # The running instruction is the one before ip
+        self.code[self.ip - 1] = (self.variants[variant], arg)
+        if self.quickening is not None:
+            self.quickening[variant].quickened += 1
+
+    def quicken_load_global(self, arg):
+        # Stores never write None, so once a global is set it stays set
+        self.op_load_global(arg)
+        self.quicken('load_global_set', arg)
+
+    def op_load_global_set(self, arg):
+        self.stack[self.sp] = self.globals[arg]
+        self.sp += 1
+
+    def build_variant_table(self):
+        variants = {}
+        for name in VARIANTS:
+            handler = getattr(self, f"op_{name}")
+            if self.quickening is not None:
+                handler = self.count_variant(handler, self.quickening[name])
+            variants[name] = handler
+        return variants
+
+    def count_variant(self, handler, stats):
+        def counted(arg):
+            stats.executed += 1
+            handler(arg)
+        return counted
+
+    def print_quickening_stats(self):
+        print("=" * 60)
+        print("QUICKENING STATISTICS:")
+        print("=" * 60)
+        print(f"{'variant':<18} {'quickened':>9} {'executed':>10}")
+        for name, stats in self.quickening.items():
+            print(f"{name:<18} {stats.quickened:>9} {stats.executed:>10}")
+
+    def build_handler_table(self):
+        # Opcode value -> bound handler; PUSH and LOAD are the same instruction
+        handlers = [None] * (max(Opcode) + 1)
+        for op in Opcode:
+            name = 'op_push' if op == Opcode.LOAD else f"op_{op.name.lower()}"
+            handlers[op] = getattr(self, name)
+        return handlers
+
+    def save_profile(self, path):
+        if self.profile is None:
+            raise Exception("Profiling was not enabled for this VM")
+        self.profile.save(path)
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python vm.py <file.asm>")
+        print("Usage: python vm.py <file.asm|file.mcbc> [--profile=profile.json] "
+              "[--engine=jit|table|threaded] [--no-jit] [--quickening-stats] [--max-call-depth=n] "
+              "[--flush=line|block|end]")
+        sys.exit(1)
+
+    profile_file = None
+    engine = 'jit'
+    quickening_stats = False
+    max_call_depth = DEFAULT_MAX_CALL_DEPTH
+    flush_policy = None
+    for arg in sys.argv[2:]:
+        if arg.startswith('--profile='):
+            profile_file = arg[len('--profile='):]
+        elif arg.startswith('--engine='):
+            engine = arg[len('--engine='):]
+        elif arg == '--no-jit':
+            engine = 'table'
+        elif arg == '--quickening-stats':
+            quickening_stats = True
+        elif arg.startswith('--max-call-depth='):
+            depth = arg[len('--max-call-depth='):]
+            if not depth.isdigit() or int(depth) < 1:
+                print(f"Invalid call depth '{depth}'")
+                sys.exit(1)
+            max_call_depth = int(depth)
+        elif arg.startswith('--flush='):
+            flush_policy = arg[len('--flush='):]
+            if flush_policy not in FLUSH_POLICIES:
+                print(f"Unknown flush policy '{flush_policy}' (expected 'line', 'block' or 'end')")
+                sys.exit(1)
+
+    if engine == 'jit':
+        from mini_c_compiler.jit import JitVM
+        vm_class = JitVM
+    elif engine == 'table':
+        vm_class = VirtualMachine
+    elif engine == 'threaded':
+        from mini_c_compiler.threaded import ThreadedVM
+        vm_class = ThreadedVM
+    else:
+        print(f"Unknown engine '{engine}' (expected 'jit', 'table' or 'threaded')")
+        sys.exit(1)
+
+    vm = vm_class(profile=profile_file is not None, quickening_stats=quickening_stats,
+                  max_call_depth=max_call_depth, flush_policy=flush_policy)
+    try:
+        vm.load_file(sys.argv[1])
+    except BytecodeError as e:
+        print(f"Load Error: {e}")
         sys.exit(1)
-    
-    with open(sys.argv[1], 'r') as f:
-        code = f.read()
-    
-    vm = VirtualMachine()
-    vm.load_program(code)
     vm.run()
+    if profile_file:
+        vm.save_profile(profile_file)
+    if quickening_stats:
+        vm.print_quickening_stats()
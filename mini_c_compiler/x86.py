@@ -0,0 +1,750 @@
+"""Native x86-64 backend.
+
+X86CodeGenerator turns the optimized IR into GNU as (AT&T syntax) for
+Linux and the System V AMD64 calling convention; build_executable
+assembles it with a small C runtime (printing, division by zero) using the
+local C compiler.
+
+The VM is dynamically typed, machine code is not: every IR name gets one
+type for the whole program, float if any value it can hold is a float
+(ProgramTypes). ints live in general-purpose registers, floats in SSE
+registers, and a linear-scan allocator decides which names get one: values
+live across a call take callee-saved registers or go to the stack, since
+the ABI preserves no SSE register. ints are 64-bit, so results match the
+VM as long as they fit.
+"""
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+
+from mini_c_compiler.ir import (
+    parse_instruction, instruction_uses, instruction_def, split_functions, split_data,
+    is_literal, is_temp, parse_literal, reads_input,
+)
+from mini_c_compiler.cfg import build_cfg, inherited_globals
+
+class NativeBuildError(Exception):
+    """No C compiler, or it failed to assemble and link the program."""
+
+INT_ARG_REGISTERS = ('%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9')
+FLOAT_ARG_REGISTERS = tuple(f'%xmm{i}' for i in range(8))
+# Allocatable registers. rax, rcx, rdx and xmm0-xmm1 are scratch inside one
+# IR instruction, and argument registers are only used around calls.
+CALLEE_SAVED = ('%rbx', '%r12', '%r13', '%r14', '%r15')
+CALLER_SAVED = ('%r10', '%r11')
+FLOAT_REGISTERS = tuple(f'%xmm{i}' for i in range(8, 16)) # All caller-saved
+
+INT_ARITHMETIC = {'+': 'addq', '-': 'subq', '*': 'imulq'}
+FLOAT_ARITHMETIC = {'+': 'addsd', '-': 'subsd', '*': 'mulsd'}
+COMPARISONS = ('==', '!=', '>', '<', '>=', '<=')
+SETCC = {'==': 'sete', '!=': 'setne', '>': 'setg', '<': 'setl', '>=': 'setge', '<=': 'setle'}
+JUMP_UNLESS = {'==': 'jne', '!=': 'je', '>': 'jle', '<': 'jge', '>=': 'jl', '<=': 'jg'}
+
+def literal_type(token):
+    return 'float' if isinstance(parse_literal(token), float) else 'int'
+
+def fits_imm32(value):
+    return -2 ** 31 <= value < 2 ** 31
+
+def float_bits(value):
+    return struct.unpack('<q', struct.pack('<d', value))[0]
+
+class ProgramTypes:
+    """int or float for every variable, parameter and function result.
+
+    A name is float if any of its definitions can produce a float:
+    arithmetic with a float operand, a float argument, a float result. `/`
+    yields an int, as in the VM. Computed as a fixed point over the whole
+    program, since parameter and result types flow between functions.
+    `floats` names (function, parameter) pairs that must be float anyway,
+    such as the declared parameters of functions called from outside.
+    """
+
+    def __init__(self, global_code, functions, floats=()):
+        self.params = {name: [parse_instruction(instr)[1] for instr in body if instr.startswith("PARAM ")]
+                       for name, body in functions.items()}
+        # Parameters and anything a function assigns are its locals, as in the VM
+        self.local_names = {name: {instruction_def(parse_instruction(instr)) for instr in body} - {None}
+                            for name, body in functions.items()}
+        self.local_names[None] = set() # Everything the global code touches is global
+        # Locals that start with the value of the global they're named after
+        global_names = {instruction_def(parse_instruction(instr)) for instr in global_code}
+        self.inherited = {name: inherited_globals(body, global_names) for name, body in functions.items()}
+        self.inherited[None] = []
+        self.locals = {name: {} for name in self.local_names}
+        self.globals = {}
+        self.returns = {name: 'int' for name in functions}
+        for function, param in floats:
+            self.widen(self.locals[function], param, 'float')
+        scopes = [(None, global_code)] + list(functions.items())
+        while any([self.infer(function, body) for function, body in scopes]):
+            pass
+
+    def type_of(self, function, token):
+        if is_literal(token):
+            return literal_type(token)
+        return self.scope(function, token).get(token, 'int')
+
+    def scope(self, function, name):
+        return self.locals[function] if name in self.local_names[function] else self.globals
+
+    def widen(self, scope, name, kind):
+        if kind == 'float' and scope.get(name) != 'float':
+            scope[name] = 'float'
+            return True
+        return False
+
+    def infer(self, function, body):
+        changed = False
+        for name in self.inherited[function]:
+            changed |= self.widen(self.locals[function], name, self.globals.get(name, 'int'))
+        args = []
+        for instr in body:
+            decoded = parse_instruction(instr)
+            kind = decoded[0]
+            result = None
+            if kind == 'arg':
+                args.append(self.type_of(function, decoded[1]))
+            elif kind == 'call':
+                callee = decoded[2]
+                for param, arg in zip(self.params.get(callee, []), args):
+                    changed |= self.widen(self.locals[callee], param, arg)
+                args = []
+                result = self.returns.get(callee, 'int')
+            elif kind in ('copy', 'unary'):
+                result = self.type_of(function, decoded[-1])
+            elif kind == 'binary':
+                _, _, a, op, b = decoded
+                if op in INT_ARITHMETIC:
+                    result = 'float' if 'float' in (self.type_of(function, a), self.type_of(function, b)) else 'int'
+                else:
+                    result = 'int' # Comparisons, and `/`, which truncates like the VM
+            elif kind == 'data':
+                result = literal_type(decoded[2])
+            elif kind == 'return' and decoded[1] is not None and function is not None:
+                if self.type_of(function, decoded[1]) == 'float' and self.returns[function] != 'float':
+                    self.returns[function] = 'float'
+                    changed = True
+            if result is not None and decoded[1] is not None:
+                changed |= self.widen(self.scope(function, decoded[1]), decoded[1], result)
+        return changed
+
+def linear_scan(intervals, calls, anywhere, between_calls):
+    """Assign registers to live intervals (Poletto and Sarkar's linear scan).
+
+    `intervals` maps names to (start, end) positions; `anywhere` registers
+    survive calls, `between_calls` ones only go to intervals that no call
+    position falls strictly inside. Returns ({name: register}, spilled names).
+    """
+    assignment = {}
+    spilled = []
+    active = []
+    free = list(between_calls) + list(anywhere) # Cheapest first: caller-saved need no saving
+    for name, (start, end) in sorted(intervals.items(), key=lambda item: (item[1][0], item[0])):
+        for other in list(active):
+            if intervals[other][1] < start:
+                active.remove(other)
+                free.append(assignment[other])
+        crosses = any(start < position < end for position in calls)
+        usable = [reg for reg in free if reg in anywhere or not crosses]
+        if usable:
+            register = min(usable, key=(list(between_calls) + list(anywhere)).index)
+            free.remove(register)
+            assignment[name] = register
+            active.append(name)
+            continue
+        # Spill whichever ends last: this interval or one holding a usable register
+        candidates = [other for other in active if assignment[other] in anywhere or not crosses]
+        victim = max(candidates, key=lambda other: intervals[other][1], default=None)
+        if victim is not None and intervals[victim][1] > end:
+            assignment[name] = assignment.pop(victim)
+            spilled.append(victim)
+            active.remove(victim)
+            active.append(name)
+        else:
+            spilled.append(name)
+    return assignment, spilled
+
+class FunctionCompiler:
+    """Machine code for one function, or for the global code (name None)."""
+
+    def __init__(self, generator, name, body, index):
+        self.generator = generator
+        self.types = generator.types
+        self.name = name
+        self.params = self.types.params.get(name, [])
+        self.code = [instr for instr in body if not instr.startswith("PARAM ")]
+        self.local_names = self.types.local_names[name]
+        self.inherited = self.types.inherited[name]
+        self.prefix = f".L{index}_"
+        self.lines = []
+        self.registers = {} # Local name -> register
+        self.slots = {}     # Spilled local name -> stack slot
+        self.saved = []     # Callee-saved registers in use
+        self.use_counts = {}
+        for instr in self.code:
+            for operand in instruction_uses(parse_instruction(instr)):
+                self.use_counts[operand] = self.use_counts.get(operand, 0) + 1
+
+    def emit(self, line):
+        self.lines.append(f"    {line}")
+
+    # Register allocation
+
+    def live_intervals(self, blocks):
+        # Positions: one per block (its label) and one per instruction
+        positions = []
+        position = 0
+        for block in blocks:
+            start = position
+            position += 1
+            decoded = []
+            for instr in block.instructions:
+                decoded.append((position, parse_instruction(instr)))
+                position += 1
+            positions.append((start, position - 1, decoded))
+
+        # Liveness over the CFG, for locals only
+        uses, defs = [], []
+        for _, _, decoded in positions:
+            used, defined = set(), set()
+            for _, instr in decoded:
+                used.update(name for name in instruction_uses(instr)
+                            if name in self.local_names and name not in defined)
+                target = instruction_def(instr)
+                if target is not None:
+                    defined.add(target)
+            uses.append(used)
+            defs.append(defined)
+        live_in = [set() for _ in blocks]
+        live_out = [set() for _ in blocks]
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(blocks):
+                out = set().union(*(live_in[succ] for succ in block.successors))
+                new_in = uses[block.index] | (out - defs[block.index])
+                if out != live_out[block.index] or new_in != live_in[block.index]:
+                    live_out[block.index], live_in[block.index] = out, new_in
+                    changed = True
+
+        intervals = {name: [-1, -1] for name in self.params + self.inherited}
+        calls = []
+        def extend(name, position):
+            if name in self.local_names:
+                interval = intervals.setdefault(name, [position, position])
+                interval[0] = min(interval[0], position)
+                interval[1] = max(interval[1], position)
+        for block, (start, end, decoded) in zip(blocks, positions):
+            for name in live_in[block.index]:
+                extend(name, start)
+            for name in live_out[block.index]:
+                extend(name, end)
+            for position, instr in decoded:
+                for name in instruction_uses(instr):
+                    extend(name, position)
+                target = instruction_def(instr)
+                if target is not None:
+                    extend(target, position)
+                if instr[0] in ('call', 'print'):
+                    calls.append(position)
+        return {name: tuple(interval) for name, interval in intervals.items()}, calls
+
+    def allocate(self, blocks):
+        intervals, calls = self.live_intervals(blocks)
+        ints = {name: span for name, span in intervals.items() if self.local_type(name) == 'int'}
+        floats = {name: span for name, span in intervals.items() if self.local_type(name) == 'float'}
+        int_registers, int_spilled = linear_scan(ints, calls, CALLEE_SAVED, CALLER_SAVED)
+        float_registers, float_spilled = linear_scan(floats, calls, (), FLOAT_REGISTERS)
+        self.registers = {**int_registers, **float_registers}
+        self.saved = [reg for reg in CALLEE_SAVED if reg in int_registers.values()]
+        for name in sorted(int_spilled) + sorted(float_spilled):
+            self.slots[name] = f"{-8 * (len(self.saved) + len(self.slots) + 1)}(%rbp)"
+
+    # Operands
+
+    def local_type(self, name):
+        return self.types.locals[self.name].get(name, 'int')
+
+    def type_of(self, token):
+        return self.types.type_of(self.name, token)
+
+    def location(self, name):
+        if name in self.local_names:
+            return self.registers.get(name) or self.slots[name]
+        self.generator.global_names.add(name)
+        return f"mc_g_{name}(%rip)"
+
+    def load_int(self, token, register):
+        if is_literal(token):
+            value = parse_literal(token)
+            self.emit(f"movq ${value}, {register}" if fits_imm32(value) else f"movabsq ${value}, {register}")
+        elif self.location(token) != register:
+            self.emit(f"movq {self.location(token)}, {register}")
+
+    def int_operand(self, token):
+        # Source operand for an int instruction: immediate, register or memory
+        if is_literal(token):
+            value = parse_literal(token)
+            if fits_imm32(value):
+                return f"${value}"
+            self.emit(f"movabsq ${value}, %rcx")
+            return "%rcx"
+        return self.location(token)
+
+    def int_source_in_register(self, token):
+        return not is_literal(token) and self.location(token).startswith('%')
+
+    def load_float(self, token, register):
+        # Any value as a double: int literals and int names are converted
+        if is_literal(token):
+            self.emit(f"movsd {self.generator.constant(float(parse_literal(token)))}(%rip), {register}")
+        elif self.type_of(token) == 'int':
+            self.emit(f"cvtsi2sdq {self.location(token)}, {register}")
+        elif self.location(token) != register:
+            move = 'movapd' if self.location(token).startswith('%xmm') else 'movsd'
+            self.emit(f"{move} {self.location(token)}, {register}")
+
+    def store(self, name, kind):
+        # Store a result of `kind`, in %rax or %xmm0, into `name`
+        location = self.location(name)
+        if self.type_of(name) == 'float':
+            if kind == 'int':
+                self.emit("cvtsi2sdq %rax, %xmm0")
+            self.emit(f"{'movapd' if location.startswith('%xmm') else 'movsd'} %xmm0, {location}")
+        else:
+            self.emit(f"movq %rax, {location}")
+
+    # Code
+
+    def compile(self):
+        blocks = build_cfg(self.code)
+        if self.name is not None:
+            self.allocate(blocks)
+        body = self.lines
+        self.lines = []
+        for block in blocks:
+            if block.label is not None:
+                self.lines.append(f"{self.prefix}{block.label}:")
+            self.compile_block(block)
+        if self.name is None:
+            if 'main' in self.types.params:
+                self.emit("call mc_f_main")
+        else:
+            # Falling off the end returns 0, as in the VM
+            self.emit("xorl %eax, %eax")
+            self.emit("pxor %xmm0, %xmm0")
+        code, self.lines = self.lines, body
+
+        symbol = 'mc_program' if self.name is None else f"mc_f_{self.name}"
+        self.lines.append(f"{symbol}:")
+        self.emit("pushq %rbp")
+        self.emit("movq %rsp, %rbp")
+        for register in self.saved:
+            self.emit(f"pushq {register}")
+        frame = 8 * len(self.slots)
+        if (frame + 8 * len(self.saved)) % 16:
+            frame += 8 # Calls need a 16-byte aligned stack
+        if frame:
+            self.emit(f"subq ${frame}, %rsp")
+        self.move_params()
+        self.lines += code
+        self.lines.append(f"{self.prefix}return:")
+        if self.saved:
+            self.emit(f"leaq {-8 * len(self.saved)}(%rbp), %rsp")
+            for register in reversed(self.saved):
+                self.emit(f"popq {register}")
+        else:
+            self.emit("movq %rbp, %rsp")
+        self.emit("popq %rbp")
+        self.emit("ret")
+        return self.lines
+
+    def classify(self, names, types):
+        # Split arguments between int registers, SSE registers and the stack
+        ints, floats, stack = [], [], []
+        for name, kind in zip(names, types):
+            if kind == 'float':
+                (floats if len(floats) < len(FLOAT_ARG_REGISTERS) else stack).append((name, kind))
+            else:
+                (ints if len(ints) < len(INT_ARG_REGISTERS) else stack).append((name, kind))
+        return ints, floats, stack
+
+    def move_params(self):
+        types = [self.local_type(param) for param in self.params]
+        ints, floats, stack = self.classify(self.params, types)
+        for register, (param, _) in zip(INT_ARG_REGISTERS, ints):
+            self.emit(f"movq {register}, {self.location(param)}")
+        for register, (param, _) in zip(FLOAT_ARG_REGISTERS, floats):
+            location = self.location(param)
+            self.emit(f"{'movapd' if location.startswith('%xmm') else 'movsd'} {register}, {location}")
+        for offset, (param, kind) in enumerate(stack):
+            if kind == 'float':
+                self.emit(f"movsd {16 + 8 * offset}(%rbp), %xmm0")
+            else:
+                self.emit(f"movq {16 + 8 * offset}(%rbp), %rax")
+            self.store(param, kind)
+        for name in self.inherited: # Until assigned, these hold the global's value
+            self.generator.global_names.add(name)
+            if self.types.globals.get(name) == 'float':
+                self.emit(f"movsd mc_g_{name}(%rip), %xmm0")
+                self.store(name, 'float')
+            else:
+                self.emit(f"movq mc_g_{name}(%rip), %rax")
+                self.store(name, 'int')
+
+    def compile_block(self, block):
+        args = []
+        instructions = [parse_instruction(instr) for instr in block.instructions]
+        index = 0
+        while index < len(instructions):
+            decoded = instructions[index]
+            following = instructions[index + 1] if index + 1 < len(instructions) else None
+            index += 1
+            kind = decoded[0]
+            if kind == 'arg':
+                args.append(decoded[1])
+            elif kind == 'call':
+                self.compile_call(decoded[2], args, decoded[1])
+                args = []
+            elif (kind == 'binary' and decoded[3] in COMPARISONS and following is not None
+                  and following[0] == 'if_false' and following[1] == decoded[1] and is_temp(decoded[1])
+                  and self.use_counts.get(decoded[1]) == 1
+                  and self.type_of(decoded[2]) == self.type_of(decoded[4]) == 'int'):
+                # A comparison only the jump reads: compare and branch on the flags
+                _, _, a, op, b = decoded
+                self.compare_ints(a, b)
+                self.emit(f"{JUMP_UNLESS[op]} {self.prefix}{following[2]}")
+                index += 1
+            elif kind in ('copy', 'unary', 'binary'):
+                self.compile_assignment(decoded)
+            elif kind == 'print':
+                if self.type_of(decoded[1]) == 'float':
+                    self.load_float(decoded[1], '%xmm0')
+                    self.emit("call mc_print_float")
+                else:
+                    self.load_int(decoded[1], '%rdi')
+                    self.emit("call mc_print_int")
+            elif kind == 'goto':
+                self.emit(f"jmp {self.prefix}{decoded[1]}")
+            elif kind == 'if_false':
+                self.compile_if_false(decoded[1], f"{self.prefix}{decoded[2]}")
+            elif kind == 'return':
+                self.compile_return(decoded[1])
+            else:
+                raise ValueError(f"No x86-64 code for '{block.instructions[index - 1]}'")
+
+    def compare_ints(self, a, b):
+        if self.int_source_in_register(a):
+            self.emit(f"cmpq {self.int_operand(b)}, {self.location(a)}")
+        else:
+            operand = self.int_operand(b)
+            self.load_int(a, '%rax')
+            self.emit(f"cmpq {operand}, %rax")
+
+    def compile_assignment(self, decoded):
+        kind, dest = decoded[0], decoded[1]
+        if kind == 'copy':
+            source = decoded[2]
+            if self.type_of(dest) == 'float':
+                self.load_float(source, '%xmm0')
+                self.store(dest, 'float')
+            elif (self.location(dest).startswith('%') or self.int_source_in_register(source)
+                  or (is_literal(source) and fits_imm32(parse_literal(source)))):
+                self.emit(f"movq {self.int_operand(source)}, {self.location(dest)}")
+            else:
+                self.load_int(source, '%rax')
+                self.store(dest, 'int')
+            return
+        if kind == 'unary':
+            if decoded[2] != '-':
+                raise ValueError(f"Unsupported unary operator '{decoded[2]}'")
+            if self.type_of(decoded[3]) == 'float':
+                self.load_float(decoded[3], '%xmm0')
+                self.emit("movq %xmm0, %rax")
+                self.emit("btcq $63, %rax") # Flip the sign bit: -0.0 stays distinct
+                self.emit("movq %rax, %xmm0")
+                self.store(dest, 'float')
+            else:
+                self.load_int(decoded[3], '%rax')
+                self.emit("negq %rax")
+                self.store(dest, 'int')
+            return
+
+        _, _, a, op, b = decoded
+        floating = 'float' in (self.type_of(a), self.type_of(b))
+        if floating:
+            self.load_float(a, '%xmm0')
+            self.load_float(b, '%xmm1')
+            if op in FLOAT_ARITHMETIC:
+                self.emit(f"{FLOAT_ARITHMETIC[op]} %xmm1, %xmm0")
+                self.store(dest, 'float')
+            elif op == '/':
+                self.emit("pxor %xmm2, %xmm2")
+                self.emit("ucomisd %xmm2, %xmm1")
+                self.emit("je mc_division_by_zero")
+                self.emit("divsd %xmm1, %xmm0")
+                self.emit("cvttsd2siq %xmm0, %rax") # Truncates, like the VM's int(a / b)
+                self.store(dest, 'int')
+            else:
+                # a < b is tested as b > a, so unordered (NaN) compares false
+                if op in ('<', '<='):
+                    self.emit("ucomisd %xmm0, %xmm1")
+                    self.emit(f"{'seta' if op == '<' else 'setae'} %al")
+                elif op in ('>', '>='):
+                    self.emit("ucomisd %xmm1, %xmm0")
+                    self.emit(f"{'seta' if op == '>' else 'setae'} %al")
+                else:
+                    self.emit("ucomisd %xmm1, %xmm0")
+                    self.emit(f"{'sete' if op == '==' else 'setne'} %al")
+                    self.emit(f"{'setnp' if op == '==' else 'setp'} %cl")
+                    self.emit(f"{'andb' if op == '==' else 'orb'} %cl, %al")
+                self.emit("movzbq %al, %rax")
+                self.store(dest, 'int')
+            return
+
+        if op in INT_ARITHMETIC:
+            target = self.location(dest)
+            operand = self.int_operand(b)
+            if target.startswith('%') and self.type_of(dest) == 'int' and operand != target:
+                # Straight into the destination register
+                self.load_int(a, target)
+                self.emit(f"{INT_ARITHMETIC[op]} {operand}, {target}")
+            else:
+                self.load_int(a, '%rax')
+                self.emit(f"{INT_ARITHMETIC[op]} {operand}, %rax")
+                self.store(dest, 'int')
+        elif op == '/':
+            self.load_int(b, '%rcx')
+            self.emit("testq %rcx, %rcx")
+            self.emit("jz mc_division_by_zero")
+            self.load_int(a, '%rax')
+            self.emit("cqto")
+            self.emit("idivq %rcx") # Truncates toward zero
+            self.store(dest, 'int')
+        else:
+            self.compare_ints(a, b)
+            self.emit(f"{SETCC[op]} %al")
+            self.emit("movzbq %al, %rax")
+            self.store(dest, 'int')
+
+    def compile_if_false(self, condition, label):
+        if is_literal(condition):
+            if parse_literal(condition) == 0:
+                self.emit(f"jmp {label}")
+        elif self.type_of(condition) == 'float':
+            skip = self.generator.new_label()
+            self.load_float(condition, '%xmm0')
+            self.emit("pxor %xmm1, %xmm1")
+            self.emit("ucomisd %xmm1, %xmm0")
+            self.emit(f"jp {skip}") # NaN is true
+            self.emit(f"je {label}")
+            self.lines.append(f"{skip}:")
+        else:
+            self.emit(f"cmpq $0, {self.location(condition)}")
+            self.emit(f"je {label}")
+
+    def compile_return(self, value):
+        if self.name is None:
+            raise ValueError("RETURN outside a function")
+        returns = self.types.returns[self.name]
+        if value is None:
+            self.emit("xorl %eax, %eax")
+            self.emit("pxor %xmm0, %xmm0")
+        elif returns == 'float':
+            self.load_float(value, '%xmm0')
+        else:
+            self.load_int(value, '%rax')
+        self.emit(f"jmp {self.prefix}return")
+
+    def compile_call(self, callee, args, dest):
+        types = [self.types.locals[callee].get(param, 'int') for param in self.types.params[callee]]
+        ints, floats, stack = self.classify(args, types)
+        padding = 8 * (len(stack) % 2)
+        if padding:
+            self.emit("subq $8, %rsp")
+        for arg, kind in reversed(stack):
+            if kind == 'float':
+                self.load_float(arg, '%xmm0')
+                self.emit("subq $8, %rsp")
+                self.emit("movsd %xmm0, (%rsp)")
+            else:
+                self.load_int(arg, '%rax')
+                self.emit("pushq %rax")
+        for register, (arg, _) in zip(FLOAT_ARG_REGISTERS, floats):
+            self.load_float(arg, register)
+        for register, (arg, _) in zip(INT_ARG_REGISTERS, ints):
+            self.load_int(arg, register)
+        self.emit(f"call mc_f_{callee}")
+        if stack:
+            self.emit(f"addq ${8 * len(stack) + padding}, %rsp")
+        if dest is not None:
+            self.store(dest, self.types.returns[callee])
+
+class X86CodeGenerator:
+    def __init__(self, instructions):
+        self.instructions = instructions
+        self.types = None
+        self.global_names = set() # Globals the code refers to
+        self.constants = {}       # Float constant bits -> label
+        self.labels = 0
+
+    def constant(self, value):
+        bits = float_bits(value)
+        if bits not in self.constants:
+            self.constants[bits] = f".LC{len(self.constants)}"
+        return self.constants[bits]
+
+    def new_label(self):
+        self.labels += 1
+        return f".LX{self.labels}"
+
+    def generate(self):
+        if reads_input(self.instructions):
+            raise NativeBuildError("read() is not supported by the native backend")
+        global_code, functions = split_functions(self.instructions)
+        data, global_code = split_data(global_code)
+        self.types = ProgramTypes(list(global_code) + [f"{name} = {value}" for name, value in data.items()],
+                                  functions)
+        output = ["# -- Mini C x86-64 assembly --", "    .text", "    .globl mc_program"]
+        for index, (name, body) in enumerate(functions.items()):
+            output += FunctionCompiler(self, name, body, index).compile()
+            output.append("")
+        output += FunctionCompiler(self, None, global_code, len(functions)).compile()
+        output.append("mc_division_by_zero:")
+        output.append("    andq $-16, %rsp")
+        output.append("    call mc_div_zero")
+
+        output += ["", "    .data", "    .p2align 3"]
+        for name in sorted(self.global_names | set(data)):
+            value = parse_literal(data[name]) if name in data else 0
+            if self.types.globals.get(name) == 'float':
+                value = float_bits(float(value))
+            output.append(f"mc_g_{name}: .quad {value}")
+        if self.constants:
+            output += ["", "    .section .rodata", "    .p2align 3"]
+            for bits, label in self.constants.items():
+                output.append(f"{label}: .quad {bits}")
+        output.append('    .section .note.GNU-stack,"",@progbits')
+        return "\n".join(output) + "\n"
+
+# Formats a double like Python's repr, as the VM prints floats. Shared with
+# the C backend (cbackend.py).
+FORMAT_FLOAT = r"""
+static void mc_format_float(char *line, double value)
+{
+    char text[40], digits[24], *out = line, *p;
+    int precision, exponent, count = 0, i;
+
+    if (isnan(value)) {
+        strcpy(line, "nan");
+        return;
+    }
+    if (isinf(value)) {
+        strcpy(line, value < 0 ? "-inf" : "inf");
+        return;
+    }
+    /* Fewest digits that read back as the same double */
+    for (precision = 0; precision < 17; precision++) {
+        snprintf(text, sizeof text, "%.*e", precision, value);
+        if (strtod(text, NULL) == value)
+            break;
+    }
+    p = text;
+    if (*p == '-')
+        *out++ = *p++;
+    for (; *p != 'e'; p++)
+        if (*p != '.')
+            digits[count++] = *p;
+    exponent = atoi(p + 1);
+    while (count > 1 && digits[count - 1] == '0')
+        count--;
+    digits[count] = '\0';
+
+    if (exponent >= -4 && exponent < 16) {
+        if (exponent < 0) {
+            *out++ = '0';
+            *out++ = '.';
+            for (i = -1; i > exponent; i--)
+                *out++ = '0';
+            strcpy(out, digits);
+        } else {
+            for (i = 0; i <= exponent; i++)
+                *out++ = i < count ? digits[i] : '0';
+            *out++ = '.';
+            strcpy(out, count > exponent + 1 ? digits + exponent + 1 : "0");
+        }
+    } else {
+        *out++ = digits[0];
+        if (count > 1) {
+            *out++ = '.';
+            strcpy(out, digits + 1);
+            out += count - 1;
+        }
+        sprintf(out, "e%c%02d", exponent < 0 ? '-' : '+', abs(exponent));
+    }
+}
+"""
+
+# Printing and errors, linked into every executable
+RUNTIME = r"""
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+void mc_program(void);
+""" + FORMAT_FLOAT + r"""
+void mc_print_int(long value)
+{
+    printf("%ld\n", value);
+}
+
+void mc_print_float(double value)
+{
+    char line[48];
+
+    mc_format_float(line, value);
+    puts(line);
+}
+
+void mc_div_zero(void)
+{
+    printf("Runtime Error: division by zero\n");
+    exit(1);
+}
+
+int main(void)
+{
+    static char buffer[1 << 16];
+    setvbuf(stdout, buffer, _IOFBF, sizeof buffer);
+    mc_program();
+    return 0;
+}
+"""
+
+def find_compiler():
+    return os.environ.get('CC') or shutil.which('cc') or shutil.which('gcc')
+
+def build_executable(assembly, output_path, compiler=None):
+    """Assemble and link generated assembly with the runtime into an executable."""
+    compiler = compiler or find_compiler()
+    if not compiler:
+        raise NativeBuildError("No C compiler found (set CC)")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'program.s')
+        runtime = os.path.join(directory, 'runtime.c')
+        with open(source, 'w') as f:
+            f.write(assembly)
+        with open(runtime, 'w') as f:
+            f.write(RUNTIME)
+        try:
+            result = subprocess.run([compiler, '-O2', '-o', output_path, source, runtime, '-lm'],
+                                    capture_output=True, text=True)
+        except OSError as e:
+            raise NativeBuildError(f"Cannot run {compiler}: {e}")
+    if result.returncode != 0:
+        raise NativeBuildError(result.stderr.strip())
+    return output_path